@@ -18,6 +18,9 @@ Utility modules
 .. autosummary::
   :toctree:
 
+  COT.cache
+  COT.checksum_cache
+  COT.conversion_cache
   COT.data_validation
   COT.file_reference
   COT.utilities
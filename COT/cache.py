@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+#
+# cache.py - Common support for COT's persistent caches
+#
+# October 2026
+# Copyright (c) 2026 the COT project developers.
+# See the COPYRIGHT.txt file at the top-level directory of this distribution
+# and at https://github.com/glennmatthews/cot/blob/master/COPYRIGHT.txt.
+#
+# This file is part of the Common OVF Tool (COT) project.
+# It is subject to the license terms in the LICENSE.txt file found in the
+# top-level directory of this distribution and at
+# https://github.com/glennmatthews/cot/blob/master/LICENSE.txt. No part
+# of COT, including this file, may be copied, modified, propagated, or
+# distributed except according to the terms contained in the LICENSE.txt file.
+
+"""Common support for COT's persistent on-disk caches.
+
+COT's caches live under a common directory (see :func:`cache_home`), and
+each is indexed by a SQLite database, which provides safe concurrent
+access from multiple COT processes. Every entry records when it was last
+used, so that the least recently used entries can be evicted.
+
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  SQLiteCache
+
+**Functions**
+
+.. autosummary::
+  :nosignatures:
+
+  cache_home
+"""
+
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def cache_home():
+    """Get the directory under which COT's caches are stored.
+
+    Follows the XDG Base Directory specification, i.e.,
+    ``$XDG_CACHE_HOME/cot/``, where ``$XDG_CACHE_HOME`` defaults to
+    ``~/.cache``.
+
+    Returns:
+      str: Path to the directory.
+    """
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                        os.path.join(os.path.expanduser('~'), '.cache'),
+                        'cot')
+
+
+class SQLiteCache(object):
+    """Abstract persistent cache, indexed by a SQLite database.
+
+    Each entry is a row of :attr:`TABLE`, identified by a string ``key``,
+    with a ``last_used`` timestamp and the subclass's own :attr:`COLUMNS`.
+
+    Any errors accessing the cache are logged by :meth:`_run` and otherwise
+    ignored, so that a broken cache never prevents COT from working.
+    A new database connection is opened for each operation, so a single
+    instance can safely be used from multiple threads.
+    """
+
+    TIMEOUT = 30
+    """Seconds to wait for another process to release a lock on the cache."""
+
+    TABLE = None
+    """Name of the database table holding the entries of this cache."""
+
+    COLUMNS = ()
+    """SQL definitions of the columns of :attr:`TABLE`, other than
+    ``key`` and ``last_used``."""
+
+    def __init__(self, db_path, description):
+        """Create a cache indexed by the given database file.
+
+        Args:
+          db_path (str): Path to the database file. It, and its directory,
+            are created when first needed.
+          description (str): What this cache is, for log messages,
+            such as "checksum cache".
+        """
+        self.db_path = db_path
+        self.description = description
+        self._initialized = False
+
+    def _connect(self):
+        """Open a connection to the database, creating it if needed.
+
+        Returns:
+          sqlite3.Connection: Database connection.
+        """
+        if not self._initialized:
+            directory = os.path.dirname(self.db_path)
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        conn = sqlite3.connect(self.db_path, timeout=self.TIMEOUT)
+        if not self._initialized:
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS {0} ("
+                             "key TEXT PRIMARY KEY, {1}, "
+                             "last_used REAL NOT NULL)"
+                             .format(self.TABLE, ", ".join(self.COLUMNS)))
+                conn.execute("CREATE INDEX IF NOT EXISTS {0}_last_used "
+                             "ON {0} (last_used)".format(self.TABLE))
+            self._initialized = True
+        return conn
+
+    def _run(self, action, operation, default=None):
+        """Run the given operation on the database, within a transaction.
+
+        Args:
+          action (str): 'read' or 'update', for the warning logged on error.
+          operation (function): Called with the open
+            :class:`sqlite3.Connection` as its only argument.
+          default (object): Value to return if the cache can't be accessed.
+
+        Returns:
+          object: Result of ``operation``, or ``default`` on error.
+        """
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    return operation(conn)
+            finally:
+                conn.close()
+        except (IOError, OSError, sqlite3.Error) as exc:
+            logger.warning("Unable to %s %s %s: %s",
+                           action, self.description, self.db_path, exc)
+            return default
+
+    def _lookup(self, conn, key, columns):
+        """Look up an entry, marking it as the most recently used.
+
+        Args:
+          conn (sqlite3.Connection): Connection, within a transaction.
+          key (str): Key of the entry.
+          columns (str): Comma-separated names of the columns to get.
+
+        Returns:
+          tuple: Values of the requested columns, or ``None`` if no such
+          entry exists.
+        """
+        row = conn.execute("SELECT {0} FROM {1} WHERE key = ?"
+                           .format(columns, self.TABLE), (key,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE {0} SET last_used = ? WHERE key = ?"
+                         .format(self.TABLE), (time.time(), key))
+        return row
+
+    def _store(self, conn, key, **values):
+        """Add or replace an entry, as the most recently used, then evict.
+
+        Args:
+          conn (sqlite3.Connection): Connection, within a transaction.
+          key (str): Key of the entry.
+          **values: Values of the other :attr:`COLUMNS` of the entry.
+        """
+        names = sorted(values)
+        conn.execute("INSERT OR REPLACE INTO {0} (key, {1}, last_used) "
+                     "VALUES (?, {2}, ?)"
+                     .format(self.TABLE, ", ".join(names),
+                             ", ".join("?" for _ in names)),
+                     [key] + [values[name] for name in names] + [time.time()])
+        self._evict(conn)
+
+    def _evict(self, conn):
+        """Discard least recently used entries if the cache is too large.
+
+        Called by :meth:`_store`. The base implementation does nothing.
+
+        Args:
+          conn (sqlite3.Connection): Connection, within a transaction.
+        """
+        pass
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+#
+# checksum_cache.py - Persistent cache of previously calculated checksums
+#
+# October 2026
+# Copyright (c) 2026 the COT project developers.
+# See the COPYRIGHT.txt file at the top-level directory of this distribution
+# and at https://github.com/glennmatthews/cot/blob/master/COPYRIGHT.txt.
+#
+# This file is part of the Common OVF Tool (COT) project.
+# It is subject to the license terms in the LICENSE.txt file found in the
+# top-level directory of this distribution and at
+# https://github.com/glennmatthews/cot/blob/master/LICENSE.txt. No part
+# of COT, including this file, may be copied, modified, propagated, or
+# distributed except according to the terms contained in the LICENSE.txt file.
+
+"""Persistent on-disk cache of file checksums.
+
+Calculating the checksum of a multi-gigabyte disk image is expensive,
+so when COT is run repeatedly against the same files, it can be useful to
+remember checksums between runs. Each cached checksum is keyed by the
+:attr:`~COT.file_reference.FileReference.fingerprint` of the file
+(device, inode, size, and modification time for a file on disk; archive
+identity, member name, and offset for a file inside a TAR archive)
+together with the checksum algorithm, so any modification to a file
+results in a cache miss rather than a stale checksum.
+
+The cache is a :class:`~COT.cache.SQLiteCache`. The least recently used
+entries are evicted once it exceeds a configurable number of entries.
+
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  ChecksumCache
+
+**Functions**
+
+.. autosummary::
+  :nosignatures:
+
+  default_cache_path
+"""
+
+import json
+import logging
+import os
+
+from COT.cache import SQLiteCache, cache_home
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_path():
+    """Get the default location of the checksum cache database.
+
+    Returns:
+      str: ``checksums.sqlite`` under :func:`~COT.cache.cache_home`.
+    """
+    return os.path.join(cache_home(), 'checksums.sqlite')
+
+
+class ChecksumCache(SQLiteCache):
+    """Persistent cache of file checksums, stored in a SQLite database.
+
+    If the cache can't be accessed, checksums are simply recalculated.
+    """
+
+    TABLE = "checksums"
+    COLUMNS = ("checksum TEXT NOT NULL",)
+
+    def __init__(self, path=None, max_entries=10000):
+        """Create a cache stored at the given path.
+
+        Args:
+          path (str): Path to database file. If unspecified,
+            :func:`default_cache_path` is used.
+          max_entries (int): Maximum number of checksums to keep; once this
+            is exceeded, the least recently used entries are discarded.
+        """
+        super(ChecksumCache, self).__init__(path or default_cache_path(),
+                                            "checksum cache")
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(fingerprint, checksum_algorithm):
+        """Construct the cache key for the given file fingerprint.
+
+        Args:
+          fingerprint (tuple): File fingerprint.
+          checksum_algorithm (str): 'sha1', 'sha256', etc.
+
+        Returns:
+          str: Cache key
+
+        Examples:
+          ::
+
+            >>> ChecksumCache.key((1, 2, 3, 4), 'sha1')
+            '["sha1", 1, 2, 3, 4]'
+        """
+        return json.dumps([checksum_algorithm] + list(fingerprint))
+
+    def get(self, fingerprint, checksum_algorithm):
+        """Look up the cached checksum for a file, if any.
+
+        Args:
+          fingerprint (tuple): File fingerprint.
+          checksum_algorithm (str): 'sha1', 'sha256', etc.
+
+        Returns:
+          str: Cached checksum, or ``None`` if not cached.
+        """
+        if fingerprint is None:
+            return None
+        key = self.key(fingerprint, checksum_algorithm)
+        row = self._run('read',
+                        lambda conn: self._lookup(conn, key, "checksum"))
+        if row is None:
+            return None
+        logger.debug("Found cached checksum for %s", key)
+        return row[0]
+
+    def put(self, fingerprint, checksum_algorithm, checksum):
+        """Store the checksum for a file in the cache.
+
+        Args:
+          fingerprint (tuple): File fingerprint.
+          checksum_algorithm (str): 'sha1', 'sha256', etc.
+          checksum (str): Checksum of the file.
+        """
+        if fingerprint is None or checksum is None:
+            return
+        key = self.key(fingerprint, checksum_algorithm)
+        self._run('update',
+                  lambda conn: self._store(conn, key, checksum=checksum))
+
+    def _evict(self, conn):
+        """Discard the least recently used entries beyond :attr:`max_entries`.
+
+        Args:
+          conn (sqlite3.Connection): Connection, within a transaction.
+        """
+        (count,) = conn.execute("SELECT COUNT(*) FROM checksums").fetchone()
+        if count > self.max_entries:
+            logger.debug("Evicting %d entries from checksum cache",
+                         count - self.max_entries)
+            conn.execute("DELETE FROM checksums WHERE key IN ("
+                         "SELECT key FROM checksums "
+                         "ORDER BY last_used ASC LIMIT ?)",
+                         (count - self.max_entries,))
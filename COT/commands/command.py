@@ -205,7 +205,8 @@ class ReadCommand(Command):
     :attr:`ui`
 
     Attributes:
-    :attr:`package`
+    :attr:`package`,
+    :attr:`verify`
     """
 
     def __init__(self, ui):
@@ -216,6 +217,33 @@ class ReadCommand(Command):
         """
         super(ReadCommand, self).__init__(ui)
         self._package = None
+        self._verify = False
+
+    @property
+    def verify_policy(self):
+        """Verify policy to use when loading :attr:`package`.
+
+        As this command does not write out a new package, files are only
+        verified against the manifest if and when their contents are read
+        (``'lazy'``), unless :attr:`verify` is set (``'strict'``).
+        See :data:`COT.file_reference.VERIFY_POLICIES`.
+        """
+        return 'strict' if self.verify else 'lazy'
+
+    @property
+    def verify(self):
+        """Whether to fully verify all files in the package up front.
+
+        If set after :attr:`package` has already been loaded, the
+        verification is performed at that time.
+        """
+        return self._verify
+
+    @verify.setter
+    def verify(self, value):
+        self._verify = value
+        if value and self.vm is not None:
+            self.vm.verify_files()
 
     @property
     def package(self):
@@ -238,7 +266,8 @@ class ReadCommand(Command):
             self.vm.destroy()
             self.vm = None
         if value is not None:
-            self.vm = VMDescription.factory(value, None)
+            self.vm = VMDescription.factory(value, None,
+                                            verify_policy=self.verify_policy)
         self._package = value
 
     def ready_to_run(self):
@@ -298,9 +327,20 @@ class ReadWriteCommand(ReadCommand):
             self.vm = None
         if value is not None:
             # Unlike ReadCommand, we pass self.output to the VM factory
-            self.vm = VMDescription.factory(value, self.output)
+            self.vm = VMDescription.factory(value, self.output,
+                                            verify_policy=self.verify_policy)
         self._package = value
 
+    @property
+    def verify_policy(self):
+        """Verify policy to use when loading :attr:`package`.
+
+        Files are always verified up front (``'strict'``), as they may be
+        written out again to :attr:`output`.
+        See :data:`COT.file_reference.VERIFY_POLICIES`.
+        """
+        return 'strict'
+
     @property
     def output(self):
         """Output file for this command.
@@ -433,6 +433,13 @@ class COTDeploy(ReadCommand):
         self.generic_parser.add_argument('-u', '--username',
                                          help="Server login username")
 
+        self.generic_parser.add_argument(
+            '--verify', action='store_true',
+            help="Verify all files in the package against its manifest "
+            "before deploying it. Otherwise, COT itself does not check the "
+            "manifest at all, as it passes the package as-is to the "
+            "deployment tool (such as ovftool)")
+
         self.generic_parser.add_argument('-p', '--password',
                                          help="Server login password")
 
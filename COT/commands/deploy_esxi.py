@@ -492,7 +492,7 @@ class COTDeployESXi(COTDeploy):
                 "LOCATOR [-u USERNAME] [-p PASSWORD] [-c CONFIGURATION] "
                 "[-n VM_NAME] [-P] [-N OVF1=HOST1 [-N OVF2=HOST2 ...]] "
                 "[-S KIND1:VAL1[,OPTS1] [-S KIND2:VAL2[,OPTS2] ...]] "
-                "[-d DATASTORE] [-o=OVFTOOL_ARGS]",
+                "[-d DATASTORE] [-o=OVFTOOL_ARGS] [--verify]",
             ]),
             formatter_class=argparse.RawDescriptionHelpFormatter,
             help="Deploy to ESXi, vSphere, or vCenter",
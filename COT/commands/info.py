@@ -36,7 +36,8 @@ class COTInfo(Command):
 
     Attributes:
     :attr:`package_list`,
-    :attr:`verbosity`
+    :attr:`verbosity`,
+    :attr:`verify`
     """
 
     def __init__(self, ui):
@@ -48,6 +49,22 @@ class COTInfo(Command):
         super(COTInfo, self).__init__(ui)
         self._package_list = None
         self._verbosity = None
+        self.verify = False
+        """Whether to fully verify each package against its manifest.
+
+        If False (the default), files are only verified if and when their
+        contents are read, which for this command is typically never.
+        """
+
+    @property
+    def verify_policy(self):
+        """Verify policy to use when loading each package.
+
+        Files are only verified against the manifest if and when their
+        contents are read (``'lazy'``), unless :attr:`verify` is set
+        (``'strict'``). See :data:`COT.file_reference.VERIFY_POLICIES`.
+        """
+        return 'strict' if self.verify else 'lazy'
 
     @property
     def package_list(self):
@@ -99,7 +116,9 @@ class COTInfo(Command):
             if not first:
                 print("")
             try:
-                with VMDescription.factory(package, None) as vm:
+                with VMDescription.factory(
+                        package, None,
+                        verify_policy=self.verify_policy) as vm:
                     print(vm.info_string(self.ui.terminal_width - 1,
                                          self.verbosity))
             except VMInitError as exc:
@@ -115,7 +134,7 @@ class COTInfo(Command):
             help="""Generate a description of an OVF package""",
             usage="""
   cot info --help
-  cot info [-b | -v] PACKAGE [PACKAGE ...]""",
+  cot info [-b | -v] [--verify] PACKAGE [PACKAGE ...]""",
             description="""
 Show a summary of the contents of the given OVF(s) and/or OVA(s).""")
 
@@ -130,6 +149,11 @@ Show a summary of the contents of the given OVF(s) and/or OVA(s).""")
                            dest='verbosity',
                            help="""Verbose output (longer)""")
 
+        parser.add_argument('--verify', action='store_true',
+                            help="""Verify all files in each package """
+                            """against its manifest, rather than only """
+                            """the files that need to be read""")
+
         parser.add_argument(
             'PACKAGE_LIST', nargs='+', metavar='PACKAGE [PACKAGE ...]',
             help="OVF descriptor(s) and/or OVA file(s) to describe")
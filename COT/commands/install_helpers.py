@@ -205,20 +205,12 @@ class COTInstallHelpers(Command):
         """Verify all helper tools and install any that are missing."""
         result = True
         results = {}
-        for name in ['fatdisk', 'ovftool', 'qemu-img', 'vmdktool']:
+        for name in ['ovftool', 'qemu-img', 'vmdktool']:
             helper = helpers[name]
             rc, results[helper.name] = self.install_helper(helper)
             if not rc:
                 result = False
 
-        # We only need one of these three tools so stop as soon as one succeeds
-        for name in ['mkisofs', 'genisoimage', 'xorriso']:
-            isorc, results[name] = self.install_helper(helpers[name])
-            if isorc:
-                break
-        if not isorc:
-            result = False
-
         rc, results["COT manpages"] = self.manpages_helper()
         if not rc:
             result = False
@@ -248,9 +240,7 @@ Install or verify the installation of COT manual pages and various required
 third-party helper programs for COT.
 
 * qemu-img (http://www.qemu.org/)
-* mkisofs  (http://cdrecord.org/)
 * ovftool  (https://www.vmware.com/support/developer/ovf/)
-* fatdisk  (http://github.com/goblinhack/fatdisk)
 * vmdktool (http://www.freshports.org/sysutils/vmdktool/)""",
             epilog=self.ui.fill_examples([
                 ("Verify whether COT can find all expected helper programs",
@@ -259,8 +249,6 @@ third-party helper programs for COT.
 Results:
 -------------
 COT manpages: present in /usr/share/man/man1/
-fatdisk:      present at /opt/local/bin/fatdisk
-mkisofs:      present at /opt/local/bin/mkisofs
 ovftool:      present at /usr/local/bin/ovftool
 qemu-img:     present at /opt/local/bin/qemu-img
 vmdktool:     NOT FOUND""".strip()),
@@ -275,8 +263,6 @@ vmdktool:     NOT FOUND""".strip()),
 Results:
 -------------
 COT manpages: successfully installed to /usr/share/man
-fatdisk:      successfully installed to /usr/local/bin/fatdisk
-mkisofs:      present at /usr/bin/mkisofs
 ovftool:      INSTALLATION FAILED: No support for automated
               installation of ovftool, as VMware requires a site
               login to download it. See
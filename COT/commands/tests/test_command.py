@@ -153,6 +153,12 @@ class TestReadCommand(TestCommand):
 
         self.assertTrue(ready)
 
+    def test_verify_policy(self):
+        """Files are only verified up front if requested."""
+        self.assertEqual(self.command.verify_policy, 'lazy')
+        self.command.verify = True
+        self.assertEqual(self.command.verify_policy, 'strict')
+
 
 class TestReadWriteCommand(TestReadCommand):
     """Test cases for ReadWriteCommand class."""
@@ -165,6 +171,12 @@ class TestReadWriteCommand(TestReadCommand):
         with self.assertRaises(VMInitError):
             self.command.package = self.input_ovf
 
+    def test_verify_policy(self):
+        """Files are always verified up front."""
+        self.assertEqual(self.command.verify_policy, 'strict')
+        self.command.verify = True
+        self.assertEqual(self.command.verify_policy, 'strict')
+
     def test_create_subparser_noop(self):
         """The generic class doesn't create a subparser."""
         self.command.create_subparser()
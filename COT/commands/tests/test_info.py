@@ -16,9 +16,23 @@
 
 """Unit test cases for the COT.info.COTInfo class."""
 
+import logging
+import os
+import shutil
+import tarfile
+
+import mock
+
+try:
+    import StringIO
+except ImportError:
+    import io as StringIO    # noqa: N812
+
 from COT.commands.tests.command_testcase import CommandTestCase
 from COT.commands.info import COTInfo
-from COT.data_validation import InvalidInputError
+from COT.data_validation import InvalidInputError, file_checksum
+from COT.disks import RAW, VMDK
+from COT.file_reference import FileReference
 
 
 class TestCOTInfo(CommandTestCase):
@@ -802,6 +816,99 @@ Properties:
         self.assertLogged(**self.UNRECOGNIZED_PRODUCT_CLASS)
         self.assertLogged(**self.NONEXISTENT_FILE)
 
+    def test_verify(self):
+        """Files are only verified against the manifest if requested."""
+        names = ['input.ovf', 'input.vmdk', 'input.iso', 'sample_cfg.txt']
+        with open(os.path.join(self.temp_dir, 'input.mf'), 'w') as mf_obj:
+            for name in names:
+                path = os.path.join(os.path.dirname(self.input_ovf), name)
+                shutil.copy(path, self.temp_dir)
+                mf_obj.write("SHA256({0})= {1}\n".format(
+                    name, file_checksum(path, 'sha256')))
+        # Tamper with a file without changing its size
+        with open(os.path.join(self.temp_dir, 'sample_cfg.txt'), 'r+b') as f:
+            f.write(b'?')
+        self.command.package_list = [os.path.join(self.temp_dir, 'input.ovf')]
+
+        self.assertEqual(self.command.verify_policy, 'lazy')
+        with mock.patch('sys.stdout'):
+            self.command.run()
+        self.assertNoLogsOver(logging.WARNING)
+
+        self.command.verify = True
+        self.assertEqual(self.command.verify_policy, 'strict')
+        with mock.patch('sys.stdout'):
+            self.command.run()
+        self.assertLogged(levelname="ERROR",
+                          msg="The %s checksum for file '%s' is expected",
+                          args=('sha256', 'sample_cfg.txt', '.*', '.*'))
+
+    def test_verbose_no_verify(self):
+        """Listing disk contents in verbose mode doesn't verify any files."""
+        names = ['input.ovf', 'input.vmdk', 'input.iso', 'sample_cfg.txt']
+        with open(os.path.join(self.temp_dir, 'input.mf'), 'w') as mf_obj:
+            for name in names:
+                path = os.path.join(os.path.dirname(self.input_ovf), name)
+                shutil.copy(path, self.temp_dir)
+                mf_obj.write("SHA256({0})= {1}\n".format(
+                    name, file_checksum(path, 'sha256')))
+        self.command.package_list = [os.path.join(self.temp_dir, 'input.ovf')]
+        self.command.verbosity = 'verbose'
+        with mock.patch.object(FileReference, 'verify', autospec=True,
+                               return_value=True) as mock_verify:
+            with mock.patch('sys.stdout'):
+                self.command.run()
+        # Only the manifest itself, which has no expected checksum
+        self.assertEqual([args[0].filename
+                          for (args, _) in mock_verify.call_args_list],
+                         ['input.mf'])
+
+    def test_disk_contents(self):
+        """Verbose output lists the files in a FAT-formatted disk image."""
+        for name in ['input.ovf', 'input.iso', 'sample_cfg.txt']:
+            shutil.copy(os.path.join(os.path.dirname(self.input_ovf), name),
+                        self.temp_dir)
+        raw_path = os.path.join(self.temp_dir, 'input.img')
+        RAW.create_file(raw_path, files=[self.minimal_ovf, self.invalid_ovf])
+        vmdk = VMDK.from_other_image(RAW(raw_path), self.temp_dir)
+        os.rename(vmdk.path, os.path.join(self.temp_dir, 'input.vmdk'))
+        self.command.package_list = [os.path.join(self.temp_dir, 'input.ovf')]
+        self.command.verbosity = 'verbose'
+        with mock.patch('sys.stdout',
+                        new_callable=StringIO.StringIO) as stdout:
+            self.command.run()
+        output = stdout.getvalue()
+        self.assertIn("    Contents: invalid.ovf, minimal.ovf\n", output)
+        self.assertEqual(output.count("Contents:"), 1)
+        self.assertLogged(levelname="WARNING",
+                          msg="The size of file '%s' is expected to be",
+                          args=('input.vmdk', os.path.getsize(self.input_vmdk),
+                                '.*'))
+
+    def test_disk_contents_vmdk(self):
+        """Verbose output lists the files in a VMDK, read from an OVA."""
+        raw_path = os.path.join(self.temp_dir, 'input.img')
+        RAW.create_file(raw_path, files=[self.minimal_ovf])
+        vmdk = VMDK.from_other_image(RAW(raw_path), self.temp_dir)
+        ova_path = os.path.join(self.temp_dir, 'input.ova')
+        with tarfile.open(ova_path, 'w') as tarf:
+            tarf.add(self.input_ovf, 'input.ovf')
+            tarf.add(vmdk.path, 'input.vmdk')
+            tarf.add(self.input_iso, 'input.iso')
+            tarf.add(self.sample_cfg, 'sample_cfg.txt')
+        self.command.package_list = [ova_path]
+        self.command.verbosity = 'verbose'
+        with mock.patch('sys.stdout',
+                        new_callable=StringIO.StringIO) as stdout:
+            self.command.run()
+        output = stdout.getvalue()
+        self.assertIn("    Contents: minimal.ovf\n", output)
+        self.assertEqual(output.count("Contents:"), 1)
+        self.assertLogged(levelname="WARNING",
+                          msg="The size of file '%s' is expected to be",
+                          args=('input.vmdk', os.path.getsize(self.input_vmdk),
+                                os.path.getsize(vmdk.path)))
+
     def test_ovf_failure(self):
         """Ensure info gracefully handles failure to load an OVF."""
         self.command.package_list = [self.ersatz_v3_ovf, self.minimal_ovf]
@@ -28,7 +28,6 @@ from COT.ui import UI
 from COT.commands.inject_config import COTInjectConfig
 from COT.data_validation import InvalidInputError, ValueUnsupportedError
 from COT.platforms import CSR1000V, IOSv, IOSXRv, IOSXRvLC
-from COT.helpers import helpers
 from COT.disks import DiskRepresentation
 from COT.commands.remove_file import COTRemoveFile
 
@@ -134,13 +133,10 @@ ovf:size="{config_size}" />
          <rasd:InstanceID>8</rasd:InstanceID>"""
                         .format(cfg_size=self.FILE_SIZE['sample_cfg.txt'],
                                 config_size=os.path.getsize(config_iso)))
-        if helpers['isoinfo']:
-            # The sample_cfg.text should be renamed to the platform-specific
-            # file name for bootstrap config - in this case, config.txt
-            self.assertEqual(DiskRepresentation.from_file(config_iso).files,
-                             ["config.txt"])
-        else:
-            logger.info("isoinfo not available, not checking disk contents")
+        # The sample_cfg.text should be renamed to the platform-specific
+        # file name for bootstrap config - in this case, config.txt
+        self.assertEqual(DiskRepresentation.from_file(config_iso).files,
+                         ["config.txt"])
 
     def test_inject_config_iso_relative_path(self):
         """Inject config file specified by relative path, on an ISO."""
@@ -199,13 +195,10 @@ ovf:size="{config_size}" />
          <rasd:InstanceID>8</rasd:InstanceID>"""
                         .format(cfg_size=self.FILE_SIZE['sample_cfg.txt'],
                                 config_size=os.path.getsize(config_iso)))
-        if helpers['isoinfo']:
-            # The sample_cfg.text should be renamed to the platform-specific
-            # file name for secondary bootstrap config
-            self.assertEqual(DiskRepresentation.from_file(config_iso).files,
-                             ["iosxr_config_admin.txt"])
-        else:
-            logger.info("isoinfo not available, not checking disk contents")
+        # The sample_cfg.text should be renamed to the platform-specific
+        # file name for secondary bootstrap config
+        self.assertEqual(DiskRepresentation.from_file(config_iso).files,
+                         ["iosxr_config_admin.txt"])
 
     def test_inject_config_iso_multiple_drives(self):
         """Inject config file on an ISO when multiple empty drives exist."""
@@ -246,13 +239,10 @@ ovf:size="{config_size}" />
                                 iso_size=self.FILE_SIZE['input.iso'],
                                 cfg_size=self.FILE_SIZE['sample_cfg.txt'],
                                 config_size=os.path.getsize(config_iso)))
-        if helpers['isoinfo']:
-            # The sample_cfg.text should be renamed to the platform-specific
-            # file name for bootstrap config - in this case, config.txt
-            self.assertEqual(DiskRepresentation.from_file(config_iso).files,
-                             ["config.txt"])
-        else:
-            logger.info("isoinfo not available, not checking disk contents")
+        # The sample_cfg.text should be renamed to the platform-specific
+        # file name for bootstrap config - in this case, config.txt
+        self.assertEqual(DiskRepresentation.from_file(config_iso).files,
+                         ["config.txt"])
 
     def test_inject_config_vmdk(self):
         """Inject config file on a VMDK."""
@@ -407,18 +397,15 @@ ovf:size="{config_size}" />
         self.command.finished()
 
         config_iso = os.path.join(self.temp_dir, 'config.iso')
-        if helpers['isoinfo']:
-            self.assertEqual(
-                DiskRepresentation.from_file(config_iso).files,
-                [
-                    'input.ovf',
-                    'minimal.ovf',
-                    'subdirectory',
-                    'subdirectory/invalid.ovf',
-                ]
-            )
-        else:
-            logger.info("isoinfo not present, not checking disk contents")
+        self.assertEqual(
+            DiskRepresentation.from_file(config_iso).files,
+            [
+                'input.ovf',
+                'minimal.ovf',
+                'subdirectory',
+                'subdirectory/invalid.ovf',
+            ]
+        )
 
     def test_inject_config_primary_secondary_extra(self):
         """Test injection of primary and secondary files and extras."""
@@ -456,15 +443,12 @@ ovf:size="{config_size}" />
          <rasd:InstanceID>8</rasd:InstanceID>"""
                         .format(cfg_size=self.FILE_SIZE['sample_cfg.txt'],
                                 config_size=os.path.getsize(config_iso)))
-        if helpers['isoinfo']:
-            self.assertEqual(
-                DiskRepresentation.from_file(config_iso).files,
-                [
-                    "iosxr_config.txt",
-                    "iosxr_config_admin.txt",
-                    "minimal.ovf",
-                    "vmware.ovf",
-                ]
-            )
-        else:
-            logger.info("isoinfo not available, not checking disk contents")
+        self.assertEqual(
+            DiskRepresentation.from_file(config_iso).files,
+            [
+                "iosxr_config.txt",
+                "iosxr_config_admin.txt",
+                "minimal.ovf",
+                "vmware.ovf",
+            ]
+        )
@@ -41,10 +41,6 @@ def stub_check_output(arg_list, *_args, **_kwargs):
       str: Canned output line, or ""
     """
     versions = {
-        "fatdisk": "fatdisk, version 1.0.0-beta",
-        "genisoimage": "genisoimage 1.1.11 (Linux)",
-        "mkisofs": "mkisofs 3.00 (--) Copyright (C) 1993-1997 "
-        "Eric Youngdale (C) 1997-2010 Jörg Schilling",
         "ovftool": "VMware ovftool 4.0.0 (build-2301625)",
         "qemu-img": "qemu-img version 2.1.2, "
         "Copyright (c) 2004-2008 Fabrice Bellard",
@@ -119,8 +115,6 @@ class TestCOTInstallHelpers(CommandTestCase):
 Results:
 -------------
 COT manpages: already installed, no updates needed
-fatdisk:      version 1.0, present at /usr/local/bin/fatdisk
-mkisofs:      version 3.0, present at /usr/local/bin/mkisofs
 ovftool:      NOT FOUND
 qemu-img:     version 2.1.2, present at /usr/local/bin/qemu-img
 vmdktool:     version 1.4, present at /usr/local/bin/vmdktool
@@ -144,14 +138,14 @@ vmdktool:     version 1.4, present at /usr/local/bin/vmdktool
                      *_):
         """Show results when pretending to install helpers."""
         paths = {
-            "fatdisk": "/opt/local/bin/fatdisk",
+            "vmdktool": "/opt/local/bin/vmdktool",
         }
 
         for helper_name in helpers:
             helpers[helper_name]._installed = False
 
-        helpers['fatdisk']._installed = True
-        helpers['fatdisk']._path = "/opt/local/bin/fatdisk"
+        helpers['vmdktool']._installed = True
+        helpers['vmdktool']._path = "/opt/local/bin/vmdktool"
 
         def stub_find_executable(name):
             """Pretend to find every executable except ovftool."""
@@ -159,9 +153,9 @@ vmdktool:     version 1.4, present at /usr/local/bin/vmdktool
 
         def stub_install(package):
             """Fake successful or unsuccessful installation of tools."""
-            if package == "genisoimage":
-                helpers['genisoimage']._path = "/usr/bin/genisoimage"
-                helpers['genisoimage']._installed = True
+            if package == "qemu-utils":
+                helpers['qemu-img']._path = "/usr/bin/qemu-img"
+                helpers['qemu-img']._installed = True
                 return
             raise HelperError(1, "not really installing!")
 
@@ -178,14 +172,11 @@ vmdktool:     version 1.4, present at /usr/local/bin/vmdktool
 Results:
 -------------
 COT manpages: already installed, no updates needed
-fatdisk:      version 1.0, present at /opt/local/bin/fatdisk
-genisoimage:  successfully installed to /usr/bin/genisoimage, version 1.1.11
-mkisofs:      INSTALLATION FAILED: [Errno 1] not really installing!
 ovftool:      INSTALLATION FAILED: No support for automated installation of
               ovftool, as VMware requires a site login to download it. See
               https://www.vmware.com/support/developer/ovf/
-qemu-img:     INSTALLATION FAILED: [Errno 1] not really installing!
-vmdktool:     INSTALLATION FAILED: [Errno 1] not really installing!
+qemu-img:     successfully installed to /usr/bin/qemu-img, version 2.1.2
+vmdktool:     version 1.4, present at /opt/local/bin/vmdktool
 """
         # Normally we raise an error due to the failed installations
         with self.assertRaises(EnvironmentError):
@@ -193,7 +184,7 @@ vmdktool:     INSTALLATION FAILED: [Errno 1] not really installing!
         # ...but we can set ignore_errors to suppress this behavior
         self.command.ignore_errors = True
         # revert to initial state
-        helpers["genisoimage"]._installed = False
+        helpers["qemu-img"]._installed = False
         self.check_cot_output(expected_output)
 
     @mock.patch('os.path.exists', return_value=False)
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+#
+# conversion_cache.py - Persistent cache of previously converted disk images
+#
+# October 2026
+# Copyright (c) 2026 the COT project developers.
+# See the COPYRIGHT.txt file at the top-level directory of this distribution
+# and at https://github.com/glennmatthews/cot/blob/master/COPYRIGHT.txt.
+#
+# This file is part of the Common OVF Tool (COT) project.
+# It is subject to the license terms in the LICENSE.txt file found in the
+# top-level directory of this distribution and at
+# https://github.com/glennmatthews/cot/blob/master/LICENSE.txt. No part
+# of COT, including this file, may be copied, modified, propagated, or
+# distributed except according to the terms contained in the LICENSE.txt file.
+
+"""Persistent on-disk cache of converted disk images.
+
+Converting a large disk image (for example, from QCOW2 to the
+streamOptimized VMDK required in an OVA) is often the slowest part of
+building a package, and the same image is frequently added to many
+different packages. This cache remembers the result of each conversion,
+keyed by the SHA256 digest of the source image's contents together with
+the target format, subformat, and the program (and version) that performed
+the conversion, so that an identical conversion never has to be repeated.
+
+Converted images are stored as read-only files in a cache directory, which
+is a :class:`~COT.cache.SQLiteCache` limited by the total size of the
+images it holds. The size, modification time, and SHA256 digest of each
+stored image are recorded. If the size or modification time of an image
+has changed when it is reused, its digest is verified, so that a damaged
+entry is discarded rather than silently packaged. A cache hit is always a
+new file, created by reflink where possible or else by copying; it is never
+a hard link, as the caller may modify it, and it must not share the
+permissions of the cached image.
+
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  ConversionCache
+
+**Functions**
+
+.. autosummary::
+  :nosignatures:
+
+  converter_id
+  default_cache_dir
+"""
+
+import hashlib
+import json
+import logging
+import os
+import stat
+
+from COT import __version__
+from COT.cache import SQLiteCache, cache_home
+from COT.data_validation import file_checksum
+from COT.file_reference import copy_file
+from COT.helpers import helpers
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_dir():
+    """Get the default location of the conversion cache.
+
+    Returns:
+      str: ``conversions/`` under :func:`~COT.cache.cache_home`.
+    """
+    return os.path.join(cache_home(), 'conversions')
+
+
+def converter_id(*helper_names):
+    """Identify the software that is used to convert a disk image.
+
+    Args:
+      *helper_names (str): Names of any helper programs that are
+        used for the conversion, in addition to COT itself.
+
+    Returns:
+      str: Description of the versions of COT and of any of the given
+      helpers that are installed.
+    """
+    parts = ["COT {0}".format(__version__)]
+    for name in helper_names:
+        helper = helpers[name]
+        if helper.installed:
+            parts.append("{0} {1}".format(name, helper.version))
+    return ", ".join(parts)
+
+
+class ConversionCache(SQLiteCache):
+    """Persistent cache of converted disk images.
+
+    If the cache can't be used, disk images are simply converted again.
+    """
+
+    TABLE = "conversions"
+    COLUMNS = ("size INTEGER NOT NULL", "mtime_ns INTEGER NOT NULL",
+               "digest TEXT NOT NULL")
+
+    def __init__(self, directory=None, max_size=20 * 1024 * 1024 * 1024):
+        """Create a cache stored in the given directory.
+
+        Args:
+          directory (str): Path to cache directory. If unspecified,
+            :func:`default_cache_dir` is used.
+          max_size (int): Maximum total size, in bytes, of the converted
+            images to keep; once this is exceeded, the least recently used
+            images are discarded.
+        """
+        self.directory = directory or default_cache_dir()
+        super(ConversionCache, self).__init__(
+            os.path.join(self.directory, 'index.sqlite'), "conversion cache")
+        self.max_size = max_size
+
+    @staticmethod
+    def key(digest, disk_format, disk_subformat, converter):
+        """Construct the cache key for the given conversion.
+
+        Args:
+          digest (str): SHA256 checksum of the source image.
+          disk_format (str): Format converted to, such as 'vmdk'.
+          disk_subformat (str): Subformat converted to, if any.
+          converter (str): Identity of the converter, as from
+            :func:`converter_id`.
+
+        Returns:
+          str: Cache key
+
+        Examples:
+          ::
+
+            >>> ConversionCache.key('abcd', 'vmdk', 'streamOptimized',
+            ...                     'COT 2.0')
+            '["abcd", "vmdk", "streamOptimized", "COT 2.0"]'
+        """
+        return json.dumps([digest, disk_format, disk_subformat, converter])
+
+    def entry_path(self, key):
+        """Get the path at which the image for the given key is stored.
+
+        Args:
+          key (str): Cache key, as from :meth:`key`.
+
+        Returns:
+          str: Path within :attr:`directory`.
+        """
+        return os.path.join(self.directory,
+                            hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def _fingerprint(path):
+        """Get the size and modification time of the given file.
+
+        Args:
+          path (str): Path to file.
+        Returns:
+          tuple: (size, mtime in nanoseconds)
+        Raises:
+          OSError: if the file cannot be stat'ed.
+        """
+        file_stat = os.stat(path)
+        return (file_stat.st_size,
+                getattr(file_stat, 'st_mtime_ns',
+                        int(file_stat.st_mtime * 1e9)))
+
+    def get(self, key, dest_path):
+        """Create a copy of the cached image for the given conversion.
+
+        The cached image is trusted if its size and modification time are
+        unchanged since it was stored; otherwise, the copy is checksummed.
+
+        Args:
+          key (str): Cache key, as from :meth:`key`.
+          dest_path (str): Path to create the copy at.
+
+        Returns:
+          bool: True if a valid image was found in the cache, else False.
+        """
+        row = self._run('read', lambda conn: self._lookup(
+            conn, key, "size, mtime_ns, digest"))
+        if row is None:
+            return False
+        entry_path = self.entry_path(key)
+        # Hold no lock while copying and verifying, which may take a while
+        try:
+            method = copy_file(entry_path, dest_path, link=False)
+            # Check the fingerprint only after copying, so that any change
+            # to the image made while we were copying it is noticed.
+            valid = (self._fingerprint(entry_path) == tuple(row[:2]))
+            if not valid:
+                logger.debug("%s has changed since it was cached; "
+                             "verifying its checksum", entry_path)
+                valid = (file_checksum(dest_path, 'sha256') == row[2])
+        except (IOError, OSError) as exc:
+            logger.warning("Unable to read %s from %s: %s",
+                           entry_path, self.description, exc)
+            valid = False
+        if not valid:
+            logger.warning("Discarding invalid image %s from %s",
+                           entry_path, self.description)
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            self._run('update', lambda conn: self._discard(conn, key))
+            return False
+        logger.info("Using previously converted image from %s (%s)",
+                    entry_path, method)
+        return True
+
+    def put(self, key, src_path):
+        """Store a copy of the converted image in the cache.
+
+        Args:
+          key (str): Cache key, as from :meth:`key`.
+          src_path (str): Path to the newly converted image.
+        """
+        size = os.path.getsize(src_path)
+        if size > self.max_size:
+            logger.debug("Not caching %s as it is larger than the cache",
+                         src_path)
+            return
+        self._run('update', lambda conn: self._add(conn, key, src_path, size))
+
+    def _add(self, conn, key, src_path, size):
+        """Copy an image into the cache, then add its entry to the database.
+
+        Args:
+          conn (sqlite3.Connection): Connection, within a transaction.
+          key (str): Cache key, as from :meth:`key`.
+          src_path (str): Path to the image.
+          size (int): Size of the image.
+        """
+        entry_path = self.entry_path(key)
+        temp_path = "{0}.{1}.tmp".format(entry_path, os.getpid())
+        try:
+            # Copy first, then publish it atomically, so that a
+            # concurrent get() never sees a partial image.
+            copy_file(src_path, temp_path, link=False)
+            digest = file_checksum(temp_path, 'sha256')
+            os.chmod(temp_path, stat.S_IRUSR | stat.S_IRGRP)
+            os.rename(temp_path, entry_path)
+            (_, mtime_ns) = self._fingerprint(entry_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._store(conn, key, size=size, mtime_ns=mtime_ns, digest=digest)
+
+    def _discard(self, conn, key):
+        """Remove an entry from the database, and its image from the disk.
+
+        Args:
+          conn (sqlite3.Connection): Connection, within a transaction.
+          key (str): Cache key, as from :meth:`key`.
+        """
+        conn.execute("DELETE FROM conversions WHERE key = ?", (key,))
+        try:
+            os.remove(self.entry_path(key))
+        except OSError as exc:
+            logger.debug("Unable to remove %s: %s", self.entry_path(key), exc)
+
+    def _evict(self, conn):
+        """Discard least recently used images until the cache is small enough.
+
+        Args:
+          conn (sqlite3.Connection): Connection, within a transaction.
+        """
+        (total,) = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM conversions").fetchone()
+        for (key, size) in conn.execute(
+                "SELECT key, size FROM conversions "
+                "ORDER BY last_used ASC").fetchall():
+            if total <= self.max_size:
+                break
+            logger.debug("Evicting %s from %s",
+                         self.entry_path(key), self.description)
+            self._discard(conn, key)
+            total -= size
@@ -16,6 +16,14 @@
 
 """Various helpers for data sanity checks.
 
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  ChecksumReader
+  ReadAheadReader
+
 **Exceptions**
 
 .. autosummary::
@@ -38,6 +46,7 @@
   canonicalize_nic_subtype
   canonicalize_scsi_subtype
   check_for_conflict
+  checksum_object
   device_address
   file_checksum
   mac_address
@@ -53,13 +62,20 @@
 
 .. autosummary::
   NIC_TYPES
+  READ_BUFFER_SIZE
 """
 
 import hashlib
 import re
+import threading
 from collections import namedtuple
 from distutils.util import strtobool
 
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue  # noqa: N813
+
 from COT.utilities import to_string
 
 
@@ -318,26 +334,206 @@ def check_for_conflict(label, refs):
     return obj
 
 
+def checksum_object(checksum_type):
+    """Get a new hash object for the given checksum type.
+
+    Args:
+      checksum_type (str): Supported values are 'md5', 'sha1', 'sha256'.
+    Returns:
+      object: New :mod:`hashlib` hash object.
+    Raises:
+      NotImplementedError: if ``checksum_type`` is not supported.
+    Examples:
+      ::
+
+        >>> checksum_object('sha1').name
+        'sha1'
+    """
+    if checksum_type == 'md5':
+        return hashlib.md5()
+    elif checksum_type == 'sha1':
+        return hashlib.sha1()
+    elif checksum_type == 'sha256':
+        return hashlib.sha256()
+    raise NotImplementedError(
+        "No support for generating checksum type {0}"
+        .format(checksum_type))
+
+
+READ_BUFFER_SIZE = 1024 * 1024
+"""Size in bytes of each buffer read by :class:`ReadAheadReader`.
+
+Larger buffers (up to a few MiB) mean fewer, larger reads, at the cost of
+more memory per file being read.
+"""
+
+
+class ReadAheadReader(object):
+    """Read-only file object wrapper that reads ahead in a background thread.
+
+    Data is read from the wrapped file in large buffers by a reader thread
+    and passed to the consumer through a small bounded queue, so that the
+    consumer (calculating a checksum, writing to another file, etc.) can
+    work on one buffer while the next is being read, instead of alternating
+    between reading and processing.
+
+    The reader thread is only started once a second buffer is needed,
+    so small files are simply read directly.
+
+    Examples:
+      ::
+
+        >>> import io
+        >>> with ReadAheadReader(io.BytesIO(b"hello world"), 4) as reader:
+        ...     print((reader.read(2) + reader.read(5) +
+        ...            reader.read()).decode())
+        hello world
+    """
+
+    def __init__(self, file_obj, buffer_size=None, size=None, depth=2):
+        """Wrap the given file object.
+
+        Args:
+          file_obj (file): Readable (binary) file object.
+          buffer_size (int): Size of each read from ``file_obj``, in bytes.
+            Defaults to :data:`READ_BUFFER_SIZE`.
+          size (int): Maximum number of bytes to read from ``file_obj``,
+            or ``None`` to read until end of file.
+          depth (int): Maximum number of buffers to read ahead.
+        """
+        self.file_obj = file_obj
+        self.buffer_size = buffer_size or READ_BUFFER_SIZE
+        self._remaining = size
+        self._queue = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._thread = None
+        self._buf = b''
+        self._pos = 0
+        self._eof = False
+
+    def __enter__(self):
+        """Use this reader as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, trace):
+        """Stop reading ahead on exiting the context manager block."""
+        self.close()
+
+    def _read_buffer(self):
+        """Read the next buffer from the wrapped file.
+
+        Returns:
+          bytes: Data read, empty at end of file.
+        """
+        size = self.buffer_size
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+            if size <= 0:
+                return b''
+        buf = self.file_obj.read(size)
+        if self._remaining is not None:
+            self._remaining -= len(buf)
+        return buf
+
+    def _read_ahead(self):
+        """Reader thread - read buffers into the queue until end of file."""
+        while not self._stop.is_set():
+            try:
+                buf = self._read_buffer()
+            except Exception as exc:    # pylint: disable=broad-except
+                buf = exc
+            # Don't block forever if the consumer goes away
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(buf, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if not isinstance(buf, bytes) or not buf:
+                return
+
+    def _next_buffer(self):
+        """Get the next buffer of data, starting the reader if needed.
+
+        Returns:
+          bytes: Data read, empty at end of file.
+        Raises:
+          Exception: any exception raised while reading the wrapped file.
+        """
+        if self._eof:
+            return b''
+        if self._thread is None:
+            # Read the first buffer directly; if there's more to come,
+            # continue reading in the background.
+            buf = self._read_buffer()
+            if len(buf) == self.buffer_size:
+                self._thread = threading.Thread(target=self._read_ahead,
+                                                name="read_ahead")
+                self._thread.daemon = True
+                self._thread.start()
+        elif self._stop.is_set():
+            buf = b''
+        else:
+            buf = self._queue.get()
+            if not isinstance(buf, bytes):
+                self._eof = True
+                raise buf
+        if len(buf) < self.buffer_size and self._thread is None:
+            self._eof = True
+        elif not buf:
+            self._eof = True
+        return buf
+
+    def read(self, size=-1):
+        """Read data from the wrapped file.
+
+        Args:
+          size (int): Maximum number of bytes to read, or -1 for all.
+        Returns:
+          bytes: Data read.
+        """
+        chunks = []
+        while size < 0 or size > 0:
+            if self._pos >= len(self._buf):
+                self._buf = self._next_buffer()
+                self._pos = 0
+                if not self._buf:
+                    break
+            end = len(self._buf)
+            if size >= 0:
+                end = min(end, self._pos + size)
+                size -= end - self._pos
+            if self._pos == 0 and end == len(self._buf):
+                chunks.append(self._buf)
+            else:
+                chunks.append(self._buf[self._pos:end])
+            self._pos = end
+        if len(chunks) == 1:
+            return chunks[0]
+        return b''.join(chunks)
+
+    def close(self):
+        """Stop reading ahead. Does not close the wrapped file object."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._buf = b''
+        self._eof = True
+
+
 def file_checksum(path_or_obj, checksum_type):
     """Get the checksum of the given file.
 
+    The file is read by a :class:`ReadAheadReader`, so that reading the file
+    and calculating its checksum can overlap.
+
     Args:
       path_or_obj (str): File path to checksum OR an opened file object
       checksum_type (str): Supported values are 'md5', 'sha1', 'sha256'.
     Returns:
       str: Hexadecimal file checksum
     """
-    # pylint: disable=redefined-variable-type
-    if checksum_type == 'md5':
-        hash_obj = hashlib.md5()
-    elif checksum_type == 'sha1':
-        hash_obj = hashlib.sha1()
-    elif checksum_type == 'sha256':
-        hash_obj = hashlib.sha256()
-    else:
-        raise NotImplementedError(
-            "No support for generating checksum type {0}"
-            .format(checksum_type))
+    hash_obj = checksum_object(checksum_type)
 
     # Is it a file or do we need to open it?
     try:
@@ -346,14 +542,13 @@ def file_checksum(path_or_obj, checksum_type):
     except AttributeError:
         file_obj = open(path_or_obj, 'rb')
 
-    blocksize = 65536
-
     try:
-        while True:
-            buf = file_obj.read(blocksize)
-            if len(buf) == 0:
-                break
-            hash_obj.update(buf)
+        with ReadAheadReader(file_obj) as reader:
+            while True:
+                buf = reader.read(reader.buffer_size)
+                if len(buf) == 0:
+                    break
+                hash_obj.update(buf)
     finally:
         if file_obj != path_or_obj:
             file_obj.close()
@@ -361,6 +556,61 @@ def file_checksum(path_or_obj, checksum_type):
     return hash_obj.hexdigest()
 
 
+class ChecksumReader(object):
+    """Read-only file object wrapper that checksums data as it is read.
+
+    This lets a consumer such as :meth:`tarfile.TarFile.addfile` and the
+    checksum calculation share a single pass over the underlying file.
+    The underlying file is read by a :class:`ReadAheadReader`, so reading
+    it overlaps with checksumming and consuming the data.
+
+    Examples:
+      ::
+
+        >>> import io
+        >>> reader = ChecksumReader(io.BytesIO(b"hello"), 'md5')
+        >>> print((reader.read(2) + reader.read()).decode())
+        hello
+        >>> reader.hexdigest()
+        '5d41402abc4b2a76b9719d911017c592'
+    """
+
+    def __init__(self, file_obj, checksum_type):
+        """Wrap the given file object.
+
+        Args:
+          file_obj (file): Readable (binary) file object.
+          checksum_type (str): Supported values are 'md5', 'sha1', 'sha256'.
+        """
+        self.file_obj = file_obj
+        self.hash_obj = checksum_object(checksum_type)
+        self._reader = ReadAheadReader(file_obj)
+
+    def read(self, size=-1):
+        """Read data from the wrapped file and add it to the checksum.
+
+        Args:
+          size (int): Maximum number of bytes to read, or -1 for all.
+        Returns:
+          bytes: Data read.
+        """
+        buf = self._reader.read(size)
+        self.hash_obj.update(buf)
+        return buf
+
+    def hexdigest(self):
+        """Get the checksum of all data read so far.
+
+        Returns:
+          str: Hexadecimal checksum
+        """
+        return self.hash_obj.hexdigest()
+
+    def close(self):
+        """Stop reading ahead. Does not close the wrapped file object."""
+        self._reader.close()
+
+
 def mac_address(string):
     """Parser helper function for MAC address arguments.
 
@@ -29,6 +29,7 @@ Disk modules
 .. autosummary::
   :toctree:
 
+  COT.disks.fat
   COT.disks.iso
   COT.disks.qcow2
   COT.disks.raw
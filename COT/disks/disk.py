@@ -10,7 +10,28 @@
 # of COT, including this file, may be copied, modified, propagated, or
 # distributed except according to the terms contained in the LICENSE.txt file.
 
-"""Abstract base class for representations of disk image files."""
+"""Abstract base class for representations of disk image files.
+
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  DiskRepresentation
+
+**Functions**
+
+.. autosummary::
+  :nosignatures:
+
+  capacity_bytes
+  match_signatures
+
+**Constants**
+
+.. autosummary::
+  UNSUPPORTED_SIGNATURES
+"""
 
 import logging
 import os
@@ -21,12 +42,130 @@ from COT.helpers import helpers, HelperError
 logger = logging.getLogger(__name__)
 
 
+def capacity_bytes(capacity):
+    """Convert a capacity string, as understood by ``qemu-img``, to bytes.
+
+    Args:
+      capacity (str): Capacity such as "16M", "1G", "512k", or "1048576".
+    Returns:
+      int: Capacity in bytes.
+    Raises:
+      ValueError: if the capacity string can't be parsed.
+    """
+    match = re.match(r"^\s*(\d+)\s*([bkKMGT]?)\s*$", str(capacity))
+    if not match:
+        raise ValueError("Invalid capacity '{0}'".format(capacity))
+    shift = {'': 0, 'b': 9, 'k': 10, 'K': 10,
+             'M': 20, 'G': 30, 'T': 40}[match.group(2)]
+    return int(match.group(1)) << shift
+
+
+UNSUPPORTED_SIGNATURES = {
+    'qcow': ((0, b'QFI\xfb\0\0\0\x01'),),
+    'vdi': ((64, b'\x7f\x10\xda\xbe'),),
+    'vhd': ((0, b'conectix'), (-512, b'conectix')),
+}
+"""Magic signatures of disk image formats that COT recognizes but doesn't
+support, so that :meth:`DiskRepresentation.from_file` can reject them
+without needing to call ``qemu-img``. See :func:`match_signatures`.
+"""
+
+_SIGNATURE_READ_GAP = 64 * 1024
+"""Byte ranges closer together than this are read in a single read."""
+
+
+def _read_spans(file_obj, wanted):
+    """Read the byte ranges needed to check the given signatures.
+
+    Args:
+      file_obj (file): Opened, seekable binary file object.
+      wanted (list): Sorted ``(start, end, name, magic)`` tuples.
+
+    Returns:
+      list: ``(start, data)`` pairs, covering every range in ``wanted``,
+      with ranges close together combined into a single read.
+    """
+    spans = []
+    for (start, end, _, _) in wanted:
+        if spans and start <= spans[-1][1] + _SIGNATURE_READ_GAP:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    buffers = []
+    for (start, end) in spans:
+        file_obj.seek(start)
+        buffers.append((start, file_obj.read(end - start)))
+    return buffers
+
+
+def match_signatures(path_or_obj, signatures):
+    r"""Check which of the given magic signatures a file matches.
+
+    Every byte range needed by any of the signatures is read only once, and
+    ranges that are close together (such as the magic numbers near the start
+    of VMDK, QCOW2, and ISO images) are combined into a single read.
+
+    Args:
+      path_or_obj (str): Path to the file to check OR an opened, seekable
+        binary file object.
+      signatures (dict): Mapping of format names to sequences of
+        ``(offset, magic)`` pairs, where ``magic`` is a byte string and a
+        negative ``offset`` is relative to the end of the file.
+
+    Returns:
+      set: Names of the formats with at least one matching signature.
+
+    Examples:
+      ::
+
+        >>> import io
+        >>> sorted(match_signatures(io.BytesIO(b'KDMV' + b'\0' * 1020), {
+        ...     'vmdk': [(0, b'KDMV'), (0, b'# Disk DescriptorFile')],
+        ...     'vhd': [(0, b'conectix'), (-512, b'conectix')],
+        ... }))
+        ['vmdk']
+    """
+    if not hasattr(path_or_obj, 'read'):
+        with open(path_or_obj, 'rb') as file_obj:
+            return match_signatures(file_obj, signatures)
+    file_obj = path_or_obj
+    file_obj.seek(0, os.SEEK_END)
+    size = file_obj.tell()
+
+    wanted = []
+    for (name, pairs) in signatures.items():
+        for (offset, magic) in pairs:
+            if offset < 0:
+                offset += size
+            if offset >= 0 and offset + len(magic) <= size:
+                wanted.append((offset, offset + len(magic), name, magic))
+    wanted.sort()
+    buffers = _read_spans(file_obj, wanted)
+
+    matches = set()
+    for (start, end, name, magic) in wanted:
+        for (buf_start, data) in buffers:
+            if buf_start <= start and end <= buf_start + len(data):
+                if data[start - buf_start:end - buf_start] == magic:
+                    matches.add(name)
+                break
+    return matches
+
+
 class DiskRepresentation(object):
     """Abstract disk image file representation."""
 
     disk_format = None
     """Disk format represented by this class."""
 
+    magic_signatures = ()
+    """Magic numbers identifying files of this format.
+
+    A sequence of ``(offset, magic)`` pairs, as for :func:`match_signatures`.
+    If empty, the format has no magic number, and ``qemu-img`` is consulted
+    to detect it.
+    """
+
     @staticmethod
     def subclasses():
         """List of subclasses of DiskRepresentation.
@@ -54,24 +193,19 @@ class DiskRepresentation(object):
                     None)
 
     @staticmethod
-    def from_file(path):
-        """Get a DiskRepresentation instance appropriate to the given file.
+    def _best_candidate(path, candidates):
+        """Ask each candidate class how confident it is that it fits the file.
 
         Args:
           path (str): Path of existing file to represent.
+          candidates (list): DiskRepresentation subclasses to consult.
 
         Returns:
-          DiskRepresentation: Representation of this file.
-
-        Raises:
-          IOError: if no file exists at the given path
-          NotImplementedError: if the file is not a supported type.
+          tuple: (best matching subclass or ``None``, its confidence)
         """
-        if not os.path.exists(path):
-            raise IOError(2, "No such file or directory: {0}".format(path))
         best_guess = None
         best_confidence = 0
-        for subclass in DiskRepresentation.subclasses():
+        for subclass in candidates:
             confidence = subclass.file_is_this_type(path)
             if confidence > best_confidence:
                 logger.debug("File %s may be a %s, with confidence %d%%",
@@ -83,17 +217,63 @@ class DiskRepresentation(object):
                                "classes %s and %s. Using %s",
                                path, confidence, best_guess,
                                subclass, best_guess)
-        if best_guess is not None:
-            logger.verbose("File %s appears to be a %s, with confidence %s%%",
-                           path, best_guess.disk_format, best_confidence)
-            if best_confidence < 50:
-                logger.warning("File %s has been guessed to be a %s disk "
-                               "image, but COT has low confidence (%s%%) "
-                               "in this guess.",
-                               path, best_guess.disk_format, best_confidence)
-            return best_guess(path)
+        return (best_guess, best_confidence)
+
+    @staticmethod
+    def from_file(path):
+        """Get a DiskRepresentation instance appropriate to the given file.
+
+        The magic numbers of all known formats (see :attr:`magic_signatures`
+        and :data:`UNSUPPORTED_SIGNATURES`) are checked together, reading
+        the file only once, to narrow down the candidate classes. Then
+        :meth:`file_is_this_type` of each candidate makes the final
+        decision. That is cheap for formats with a magic number, but for
+        a file matching none of them may call ``qemu-img``.
+
+        Args:
+          path (str): Path of existing file to represent.
+
+        Returns:
+          DiskRepresentation: Representation of this file.
+
+        Raises:
+          IOError: if no file exists at the given path
+          NotImplementedError: if the file is not a supported type.
+        """
+        if not os.path.exists(path):
+            raise IOError(2, "No such file or directory: {0}".format(path))
+        subclasses = DiskRepresentation.subclasses()
+        signatures = dict(UNSUPPORTED_SIGNATURES)
+        for subclass in subclasses:
+            if subclass.magic_signatures:
+                signatures[subclass.disk_format] = subclass.magic_signatures
+        matches = match_signatures(path, signatures)
+        logger.debug("File %s has the magic numbers of: %s",
+                     path, sorted(matches))
+        unsupported = matches.intersection(UNSUPPORTED_SIGNATURES)
+        if unsupported:
+            raise NotImplementedError("No support for files of type '{0}'"
+                                      .format(sorted(unsupported)[0]))
+
+        if matches:
+            candidates = [subclass for subclass in subclasses
+                          if subclass.disk_format in matches]
         else:
+            # Only a format without a magic number is still possible
+            candidates = [subclass for subclass in subclasses
+                          if not subclass.magic_signatures]
+        (best_guess, best_confidence) = DiskRepresentation._best_candidate(
+            path, candidates)
+        if best_guess is None:
             raise NotImplementedError("No support for files of this type")
+        logger.verbose("File %s appears to be a %s, with confidence %s%%",
+                       path, best_guess.disk_format, best_confidence)
+        if best_confidence < 50:
+            logger.warning("File %s has been guessed to be a %s disk "
+                           "image, but COT has low confidence (%s%%) "
+                           "in this guess.",
+                           path, best_guess.disk_format, best_confidence)
+        return best_guess(path)
 
     @classmethod
     def for_new_file(cls, path, disk_format, **kwargs):
@@ -234,6 +414,12 @@ class DiskRepresentation(object):
             raise HelperError(2, "No such file or directory: '{0}'"
                               .format(path))
 
+        if cls.magic_signatures:
+            if match_signatures(path, {cls.disk_format:
+                                       cls.magic_signatures}):
+                return 100
+            return 0
+
         # Default implementation using qemu-img
         logger.debug("Using 'qemu-img' to check whether %s is a %s",
                      path, cls.disk_format)
@@ -0,0 +1,937 @@
+# October 2026, the COT project developers
+# Copyright (c) 2026 the COT project developers.
+# See the COPYRIGHT.txt file at the top-level directory of this distribution
+# and at https://github.com/glennmatthews/cot/blob/master/COPYRIGHT.txt.
+#
+# This file is part of the Common OVF Tool (COT) project.
+# It is subject to the license terms in the LICENSE.txt file found in the
+# top-level directory of this distribution and at
+# https://github.com/glennmatthews/cot/blob/master/LICENSE.txt. No part
+# of COT, including this file, may be copied, modified, propagated, or
+# distributed except according to the terms contained in the LICENSE.txt file.
+
+"""Native creation and reading of FAT file systems in raw disk images.
+
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  FATBuilder
+  FATEntry
+  FATReader
+
+**Constants**
+
+.. autosummary::
+
+  SECTOR_SIZE
+  PARTITION_START
+"""
+
+import logging
+import os
+import string
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from COT.data_validation import ReadAheadReader, READ_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+SECTOR_SIZE = 512
+"""Size of a disk sector, in bytes."""
+
+PARTITION_START = 2048
+"""Sector at which the FAT partition starts (1 MiB, for alignment)."""
+
+_PARTITION_TYPE_FAT16_LBA = 0x0e
+_PARTITION_TYPE_FAT32_LBA = 0x0c
+_RESERVED_SECTORS_FAT16 = 1
+_RESERVED_SECTORS_FAT32 = 32
+_ROOT_ENTRIES_FAT16 = 512
+_NUM_FATS = 2
+_ROOT_CLUSTER = 2
+_FSINFO_SECTOR = 1
+_BACKUP_BOOT_SECTOR = 6
+_MEDIA_FIXED_DISK = 0xf8
+_END_OF_CHAIN = {16: 0xffff, 32: 0x0fffffff}
+_DIR_ENTRY_SIZE = 32
+_MAX_NAME_LENGTH = 255
+
+_ATTR_VOLUME_ID = 0x08
+_ATTR_DIRECTORY = 0x10
+_ATTR_ARCHIVE = 0x20
+_ATTR_LONG_NAME = 0x0f
+_LFN_LAST_ENTRY = 0x40
+_LFN_CHARS_PER_ENTRY = 13
+
+_SHORT_NAME_CHARS = frozenset(string.ascii_uppercase + string.digits +
+                              "!#$%&'()-@^_`{}~")
+"""Characters permitted in 8.3 short names."""
+
+_BPB = '<3s8sHBHBHHBHHHII'
+_BOOT_SECTOR_FAT16 = struct.Struct(_BPB + 'BBBI11s8s')
+_BOOT_SECTOR_FAT32 = struct.Struct(_BPB + 'IHHIHH12sBBBI11s8s')
+_DIR_ENTRY = struct.Struct('<11sBBBHHHHHHHI')
+_LFN_ENTRY = struct.Struct('<B10sBBB12sH4s')
+
+_MIN_CLUSTERS = {16: 4085, 32: 65525}
+"""Minimum number of clusters in a FAT16 or FAT32 file system."""
+
+# Maximum partition size (in sectors) for each cluster size (in sectors),
+# as recommended by Microsoft, except that FAT16 also uses 1-sector clusters
+# for small partitions rather than falling back to FAT12.
+_CLUSTER_SIZES = {
+    16: ((8400, 1), (32680, 2), (262144, 4), (524288, 8), (1048576, 16),
+         (2097152, 32), (4194304, 64)),
+    32: ((532480, 1), (16777216, 8), (33554432, 16), (67108864, 32),
+         (0xffffffff, 64)),
+}
+
+
+def _dos_datetime(timestamp):
+    """Convert a timestamp to FAT (date, time) values."""
+    tm = time.localtime(timestamp)
+    if tm.tm_year < 1980:
+        return ((1 << 5) | 1, 0)
+    return (((tm.tm_year - 1980) << 9) | (tm.tm_mon << 5) | tm.tm_mday,
+            (tm.tm_hour << 11) | (tm.tm_min << 5) | (tm.tm_sec // 2))
+
+
+def _lfn_checksum(short_name):
+    """Checksum of an 11-byte short name, as stored in its LFN entries."""
+    total = 0
+    for byte in bytearray(short_name):
+        total = (((total & 1) << 7) + (total >> 1) + byte) & 0xff
+    return total
+
+
+def _lfn_entries(name, checksum):
+    """Construct the long file name entries for a name.
+
+    Args:
+      name (str): Long file name.
+      checksum (int): :func:`_lfn_checksum` of the matching short name.
+    Returns:
+      list: Directory entries (bytes), in on-disk order.
+    """
+    encoded = name.encode('utf-16-le')
+    if len(encoded) % (2 * _LFN_CHARS_PER_ENTRY):
+        # NUL-terminate, then pad with 0xFFFF
+        encoded += b'\0\0'
+        encoded += b'\xff' * (-len(encoded) % (2 * _LFN_CHARS_PER_ENTRY))
+    entries = []
+    for index in range(0, len(encoded) // 26):
+        chunk = encoded[index * 26:(index + 1) * 26]
+        order = index + 1
+        if (index + 1) * 26 == len(encoded):
+            order |= _LFN_LAST_ENTRY
+        entries.append(_LFN_ENTRY.pack(order, chunk[0:10], _ATTR_LONG_NAME,
+                                       0, checksum, chunk[10:22], 0,
+                                       chunk[22:26]))
+    return list(reversed(entries))
+
+
+class _FATNode(object):
+    """A file or directory to be written into a FAT file system."""
+
+    def __init__(self, name, parent, path=None, data=None, directory=False):
+        """Create a node.
+
+        Args:
+          name (str): Name of this file or directory within its parent.
+          parent (_FATNode): Parent directory, or ``None`` for the root.
+          path (str): Path to the file on disk to read contents from.
+          data (bytes): Contents of the file, if ``path`` is not set.
+          directory (bool): Whether this is a directory.
+        """
+        self.name = name
+        self.parent = parent
+        self.path = path
+        self.data = data
+        self.children = {} if directory else None
+        if path is not None:
+            self.size = os.path.getsize(path)
+        else:
+            self.size = len(data or b'')
+        self.short_name = None
+        self.long_name = False
+        self.cluster = 0
+        self.clusters = 0
+
+    @property
+    def is_directory(self):
+        """Whether this node is a directory."""
+        return self.children is not None
+
+
+class FATBuilder(object):
+    r"""Build a raw disk image containing a FAT file system, natively.
+
+    The image has an MBR partition table with a single FAT32 partition,
+    as created by ``fatdisk <image> format size <capacity> fat32``, unless
+    the partition is too small to hold the minimum number of clusters
+    for FAT32, in which case it is formatted as FAT16 instead.
+    Files and directories get 8.3 short names plus, where needed, long
+    file names. Only the structures and file contents are written, so
+    on most file systems the resulting image is sparse.
+
+    ::
+
+      builder = FATBuilder(8 << 20)
+      builder.add_file("config.txt", path="/path/to/my_config.txt")
+      builder.add_file("extra/notes.txt", data=b"Hello world\n")
+      with open("config.img", "wb") as file_obj:
+          builder.write(file_obj)
+    """
+
+    def __init__(self, capacity, volume_label="NO NAME", timestamp=None):
+        """Create an empty FAT builder.
+
+        Args:
+          capacity (int): Size of the disk image, in bytes.
+          volume_label (str): Volume label of the file system.
+          timestamp (float): Timestamp to record for all files and
+            directories. Defaults to the current time.
+
+        Raises:
+          ValueError: if ``capacity`` is too small to hold a FAT16 file
+            system, or too large for FAT32.
+        """
+        self.capacity = capacity - capacity % SECTOR_SIZE
+        self.volume_label = volume_label
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._root = _FATNode("", None, directory=True)
+        self._layout = None
+
+        sectors = self.capacity // SECTOR_SIZE - PARTITION_START
+        self.partition_sectors = sectors
+        for fat_type in (32, 16):
+            self.fat_type = fat_type
+            self._plan_partition(capacity)
+            if self.cluster_count >= _MIN_CLUSTERS[fat_type]:
+                break
+        else:
+            raise ValueError("Capacity {0} is too small for FAT16"
+                             .format(capacity))
+
+    def _plan_partition(self, capacity):
+        """Size the clusters and FATs of the partition for :attr:`fat_type`.
+
+        Args:
+          capacity (int): Requested capacity, for error reporting.
+        Raises:
+          ValueError: if the partition is too large for this FAT type.
+        """
+        sectors = max(self.partition_sectors, 0)
+        for (limit, sectors_per_cluster) in _CLUSTER_SIZES[self.fat_type]:
+            if sectors <= limit:
+                break
+        else:
+            raise ValueError("Capacity {0} is too large for FAT{1}"
+                             .format(capacity, self.fat_type))
+        if self.fat_type == 32:
+            self.reserved_sectors = _RESERVED_SECTORS_FAT32
+            self.root_entries = 0
+        else:
+            self.reserved_sectors = _RESERVED_SECTORS_FAT16
+            self.root_entries = _ROOT_ENTRIES_FAT16
+        root_sectors = self.root_entries * _DIR_ENTRY_SIZE // SECTOR_SIZE
+        self.sectors_per_cluster = sectors_per_cluster
+        self.cluster_size = sectors_per_cluster * SECTOR_SIZE
+        # Calculation of the FAT size per the Microsoft FAT specification
+        denominator = 256 * sectors_per_cluster + _NUM_FATS
+        if self.fat_type == 32:
+            denominator //= 2
+        numerator = sectors - self.reserved_sectors - root_sectors
+        self.fat_sectors = max((numerator + denominator - 1) // denominator,
+                               1)
+        self.root_start = self.reserved_sectors + _NUM_FATS * self.fat_sectors
+        self.data_start = self.root_start + root_sectors
+        self.cluster_count = max((sectors - self.data_start) //
+                                 sectors_per_cluster, 0)
+
+    def _node_for(self, name, directory=False, **kwargs):
+        """Add a node at the given path, creating any parent directories.
+
+        Args:
+          name (str): '/'-separated path of the node within the image.
+          directory (bool): Whether the new node is a directory.
+          **kwargs: Passed through to :class:`_FATNode`.
+        Returns:
+          _FATNode: New (or, for a directory, possibly existing) node.
+        Raises:
+          ValueError: if the name is invalid or already in use.
+        """
+        if isinstance(name, bytes):
+            name = name.decode(sys.getfilesystemencoding() or 'utf-8')
+        parts = [part for part in name.split("/") if part]
+        if not parts:
+            raise ValueError("Invalid file name '{0}'".format(name))
+        parent = self._root
+        for index, part in enumerate(parts):
+            if len(part) > _MAX_NAME_LENGTH or part in (".", ".."):
+                raise ValueError("Invalid file name '{0}'".format(part))
+            # FAT names are case-insensitive
+            node = next((child for child in parent.children.values()
+                         if child.name.upper() == part.upper()), None)
+            last = (index == len(parts) - 1)
+            if node is None:
+                if last:
+                    node = _FATNode(part, parent, directory=directory,
+                                    **kwargs)
+                else:
+                    node = _FATNode(part, parent, directory=True)
+                parent.children[part] = node
+            elif not (node.is_directory and (directory or not last)):
+                raise ValueError("Duplicate file name '{0}'".format(name))
+            parent = node
+        self._layout = None
+        return parent
+
+    def add_directory(self, name):
+        """Add an (empty) directory to the file system.
+
+        Args:
+          name (str): '/'-separated path of the directory to create.
+        """
+        self._node_for(name, directory=True)
+
+    def add_file(self, name, path=None, data=None):
+        """Add a file to the file system, from a file on disk or from memory.
+
+        Args:
+          name (str): '/'-separated path of the file within the image.
+          path (str): Path to the file on disk to add.
+          data (bytes): File contents to add, if ``path`` is not given.
+
+        Raises:
+          ValueError: if the name is invalid or already in use, or the
+            file is too large to be stored in a FAT file system.
+        """
+        node = self._node_for(name, path=path, data=data)
+        if node.size > 0xffffffff:
+            raise ValueError("File '{0}' is too large for FAT"
+                             .format(name))
+
+    def add_tree(self, path, name=""):
+        """Add the contents of a directory on disk, recursively.
+
+        Args:
+          path (str): Directory on disk whose contents are to be added.
+          name (str): Directory within the image to add them to.
+            Defaults to the root directory.
+        """
+        for entry in sorted(os.listdir(path)):
+            entry_path = os.path.join(path, entry)
+            if isinstance(entry, bytes):
+                entry = entry.decode(sys.getfilesystemencoding() or 'utf-8')
+            entry_name = name + "/" + entry if name else entry
+            if os.path.isdir(entry_path):
+                self.add_directory(entry_name)
+                self.add_tree(entry_path, entry_name)
+            else:
+                self.add_file(entry_name, path=entry_path)
+
+    @staticmethod
+    def _assign_short_names(directory):
+        """Assign unique 8.3 short names to the children of a directory.
+
+        Args:
+          directory (_FATNode): Directory whose children are to be named.
+        Returns:
+          list: Child nodes, sorted by name.
+        """
+        used = set()
+        children = [directory.children[name]
+                    for name in sorted(directory.children)]
+        for node in children:
+            upper = node.name.upper().strip(" ").lstrip(".")
+            (base, dot, ext) = upper.rpartition(".")
+            if not dot:
+                (base, ext) = (upper, "")
+            (base, ext) = ["".join(c if c in _SHORT_NAME_CHARS else "_"
+                                   for c in part.replace(" ", "")
+                                   .replace(".", ""))
+                           for part in (base, ext)]
+            exact = base + ("." + ext if ext else "")
+            lossy = (exact != node.name.upper() or len(base) > 8 or
+                     len(ext) > 3 or not base)
+            (base, ext) = (base[:8] or "_", ext[:3])
+            candidate = base
+            suffix = 0
+            while (lossy and not suffix) or (candidate, ext) in used:
+                # Replace the end of the name with a "numeric tail"
+                suffix += 1
+                tail = "~{0}".format(suffix)
+                candidate = base[:8 - len(tail)] + tail
+            used.add((candidate, ext))
+            node.short_name = (candidate.ljust(8) + ext.ljust(3)).encode(
+                'ascii')
+            node.long_name = lossy or node.name != exact
+        return children
+
+    def _plan_directories(self):
+        """Name the entries of every directory and work out its size.
+
+        Returns:
+          tuple: (directories, breadth-first from the root, and files)
+        """
+        directories = []
+        files = []
+        queue = [self._root]
+        while queue:
+            directory = queue.pop(0)
+            directories.append(directory)
+            directory.sorted_children = self._assign_short_names(directory)
+            entries = 1 if directory is self._root else 2
+            for child in directory.sorted_children:
+                entries += 1
+                if child.long_name:
+                    entries += ((len(child.name.encode('utf-16-le')) // 2 +
+                                 _LFN_CHARS_PER_ENTRY - 1) //
+                                _LFN_CHARS_PER_ENTRY)
+                if child.is_directory:
+                    queue.append(child)
+                else:
+                    files.append(child)
+            directory.size = entries * _DIR_ENTRY_SIZE
+        return (directories, files)
+
+    def _get_layout(self):
+        """Assign clusters to all directories and files.
+
+        Returns:
+          dict: Directories and files, in the order their clusters were
+          assigned, and the number of the first unused cluster.
+        Raises:
+          ValueError: if the contents don't fit in the file system.
+        """
+        if self._layout is not None:
+            return self._layout
+        (directories, files) = self._plan_directories()
+        nodes = directories + files
+        if self.root_entries:
+            # The FAT12/16 root directory has a fixed area of its own
+            if self._root.size > self.root_entries * _DIR_ENTRY_SIZE:
+                raise ValueError("Too many files in the root directory of "
+                                 "a FAT{0} file system".format(self.fat_type))
+            nodes.remove(self._root)
+        cluster = _ROOT_CLUSTER
+        for node in nodes:
+            node.clusters = ((node.size + self.cluster_size - 1) //
+                             self.cluster_size)
+            if node.is_directory:
+                node.clusters = max(node.clusters, 1)
+            if node.clusters:
+                node.cluster = cluster
+                cluster += node.clusters
+        if cluster - _ROOT_CLUSTER > self.cluster_count:
+            raise ValueError("Files totalling {0} bytes do not fit in a "
+                             "FAT{1} file system of capacity {2}"
+                             .format(sum(node.size for node in files),
+                                     self.fat_type, self.capacity))
+        self._layout = {
+            'directories': directories,
+            'files': files,
+            'next_cluster': cluster,
+        }
+        return self._layout
+
+    def _entry(self, short_name, attributes, cluster, size=0):
+        """Encode a short name directory entry."""
+        (date, dos_time) = _dos_datetime(self.timestamp)
+        return _DIR_ENTRY.pack(short_name, attributes, 0, 0, dos_time, date,
+                               date, cluster >> 16, dos_time, date,
+                               cluster & 0xffff, size)
+
+    def _directory_data(self, directory):
+        """Encode the entries of a directory."""
+        entries = []
+        if directory is self._root:
+            label = self.volume_label.upper().encode('ascii', 'replace')
+            entries.append(self._entry(label[:11].ljust(11), _ATTR_VOLUME_ID,
+                                       0))
+        else:
+            parent = directory.parent
+            entries.append(self._entry(b'.'.ljust(11), _ATTR_DIRECTORY,
+                                       directory.cluster))
+            entries.append(self._entry(
+                b'..'.ljust(11), _ATTR_DIRECTORY,
+                0 if parent is self._root else parent.cluster))
+        for child in directory.sorted_children:
+            if child.long_name:
+                entries += _lfn_entries(child.name,
+                                        _lfn_checksum(child.short_name))
+            if child.is_directory:
+                entries.append(self._entry(child.short_name, _ATTR_DIRECTORY,
+                                           child.cluster))
+            else:
+                entries.append(self._entry(child.short_name, _ATTR_ARCHIVE,
+                                           child.cluster, child.size))
+        return b''.join(entries)
+
+    def _boot_sector(self):
+        """Encode the boot sector, for either FAT16 or FAT32."""
+        label = (self.volume_label.upper().encode('ascii', 'replace')[:11]
+                 .ljust(11))
+        serial = int(self.timestamp) & 0xffffffff
+        sectors = self.partition_sectors
+        if self.fat_type == 16:
+            boot_sector = _BOOT_SECTOR_FAT16.pack(
+                b'\xeb<\x90', b'MSWIN4.1', SECTOR_SIZE,
+                self.sectors_per_cluster, self.reserved_sectors, _NUM_FATS,
+                self.root_entries, sectors if sectors < 0x10000 else 0,
+                _MEDIA_FIXED_DISK, self.fat_sectors, 32, 64, PARTITION_START,
+                sectors if sectors >= 0x10000 else 0,
+                0x80, 0, 0x29, serial, label, b'FAT16   ')
+        else:
+            boot_sector = _BOOT_SECTOR_FAT32.pack(
+                b'\xebX\x90', b'MSWIN4.1', SECTOR_SIZE,
+                self.sectors_per_cluster, self.reserved_sectors, _NUM_FATS,
+                0, 0, _MEDIA_FIXED_DISK, 0, 32, 64, PARTITION_START, sectors,
+                self.fat_sectors, 0, 0, _ROOT_CLUSTER, _FSINFO_SECTOR,
+                _BACKUP_BOOT_SECTOR, b'\0' * 12,
+                0x80, 0, 0x29, serial, label, b'FAT32   ')
+        return boot_sector.ljust(510, b'\0') + b'\x55\xaa'
+
+    def _fsinfo_sector(self, next_cluster):
+        """Encode the FAT32 FSInfo sector."""
+        free = self.cluster_count - (next_cluster - _ROOT_CLUSTER)
+        return (struct.pack('<I', 0x41615252) + b'\0' * 480 +
+                struct.pack('<III', 0x61417272, free, next_cluster) +
+                b'\0' * 12 + struct.pack('<I', 0xaa550000))
+
+    def _master_boot_record(self):
+        """Encode the MBR, with a single partition."""
+        entry = struct.pack('<B3sB3sII', 0, b'\xfe\xff\xff',
+                            _PARTITION_TYPE_FAT32_LBA if self.fat_type == 32
+                            else _PARTITION_TYPE_FAT16_LBA, b'\xfe\xff\xff',
+                            PARTITION_START, self.partition_sectors)
+        return (b'\0' * 440 +
+                struct.pack('<IH', int(self.timestamp) & 0xffffffff, 0) +
+                entry + b'\0' * 48 + b'\x55\xaa')
+
+    def cluster_offset(self, cluster):
+        """Offset into the image of the given data cluster.
+
+        Args:
+          cluster (int): Cluster number (2 or greater).
+        Returns:
+          int: Byte offset.
+        """
+        return ((PARTITION_START + self.data_start) * SECTOR_SIZE +
+                (cluster - _ROOT_CLUSTER) * self.cluster_size)
+
+    def _fat_data(self, layout):
+        """Encode the FAT, chaining together the clusters of each node."""
+        end = _END_OF_CHAIN[self.fat_type]
+        fat = [(_MEDIA_FIXED_DISK | 0x0fffff00) & end, end]
+        for node in layout['directories'] + layout['files']:
+            if node.clusters:
+                fat += list(range(node.cluster + 1,
+                                  node.cluster + node.clusters))
+                fat.append(end)
+        fmt = '<{0}{1}'.format(len(fat), 'H' if self.fat_type == 16 else 'I')
+        return struct.pack(fmt, *fat)
+
+    @staticmethod
+    def _write_file_contents(file_obj, node):
+        """Copy the contents of a file node on disk to the current offset."""
+        with open(node.path, 'rb') as source:
+            with ReadAheadReader(source, size=node.size) as data:
+                while True:
+                    chunk = data.read(READ_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    file_obj.write(chunk)
+
+    def write(self, file_obj):
+        """Write the disk image to the given (seekable) file object.
+
+        Only non-zero areas of the image are written; everything else is
+        left as holes by seeking past it.
+
+        Args:
+          file_obj (file): Binary file object to write to. It will be
+            truncated first.
+        """
+        layout = self._get_layout()
+        file_obj.seek(0)
+        file_obj.truncate()
+
+        def write_at(offset, data):
+            """Write data at the given offset into the image."""
+            file_obj.seek(offset)
+            file_obj.write(data)
+
+        write_at(0, self._master_boot_record())
+        partition = PARTITION_START * SECTOR_SIZE
+        boot_sector = self._boot_sector()
+        if self.fat_type == 32:
+            fsinfo = self._fsinfo_sector(layout['next_cluster'])
+            for sector in (0, _BACKUP_BOOT_SECTOR):
+                write_at(partition + sector * SECTOR_SIZE,
+                         boot_sector + fsinfo)
+        else:
+            write_at(partition, boot_sector)
+
+        fat = self._fat_data(layout)
+        for index in range(_NUM_FATS):
+            write_at(partition + (self.reserved_sectors +
+                                  index * self.fat_sectors) * SECTOR_SIZE,
+                     fat)
+
+        for directory in layout['directories']:
+            if directory.cluster:
+                offset = self.cluster_offset(directory.cluster)
+            else:
+                offset = partition + self.root_start * SECTOR_SIZE
+            write_at(offset, self._directory_data(directory))
+        for node in layout['files']:
+            if not node.size:
+                continue
+            if node.path is None:
+                write_at(self.cluster_offset(node.cluster), node.data)
+            else:
+                file_obj.seek(self.cluster_offset(node.cluster))
+                self._write_file_contents(file_obj, node)
+        file_obj.truncate(self.capacity)
+
+
+FATEntry = namedtuple('FATEntry', ['path', 'is_directory', 'size', 'cluster'])
+"""A file or directory found by :class:`FATReader`.
+
+``path`` is relative to the root of the file system, using long file names
+where present. ``cluster`` is the first cluster of its contents.
+"""
+
+_PARTITION_TABLE_OFFSET = 446
+_DELETED = 0xe5
+_LOWERCASE_BASE = 0x08
+_LOWERCASE_EXT = 0x10
+_FAT_CACHE_BLOCK = 64 * 1024
+
+
+def _is_boot_sector(sector):
+    """Whether the given sector looks like a FAT boot sector (with a BPB)."""
+    if len(sector) < SECTOR_SIZE or bytearray(sector[0:1])[0] not in (
+            0xeb, 0xe9):
+        return False
+    (sector_size, sectors_per_cluster, reserved, fats) = struct.unpack_from(
+        '<HBHB', sector, 11)
+    return (sector_size in (512, 1024, 2048, 4096) and
+            sectors_per_cluster in (1, 2, 4, 8, 16, 32, 64, 128) and
+            reserved >= 1 and fats >= 1)
+
+
+class FATReader(object):
+    """Read a FAT12, FAT16, or FAT32 file system within a raw disk image.
+
+    The file system may occupy the whole image, or may be within a partition
+    in an MBR partition table, as created by :class:`FATBuilder`. Only
+    the boot sector, the directories, and the parts of the FAT actually
+    needed are read, so listing the files in even a large image is fast.
+
+    ::
+
+      with open("config.img", "rb") as file_obj:
+          reader = FATReader(file_obj)
+          print(reader.files)
+          with open("config.txt", "wb") as output:
+              for chunk in reader.read_file("config.txt"):
+                  output.write(chunk)
+    """
+
+    def __init__(self, file_obj):
+        """Locate and parse the boot sector of the FAT file system.
+
+        Args:
+          file_obj (file): Seekable binary file object for the disk image.
+
+        Raises:
+          ValueError: if no FAT file system is found.
+        """
+        self.file_obj = file_obj
+        self.start = file_obj.tell()
+        self.offset = None
+        sector = self._read(0, SECTOR_SIZE)
+        if _is_boot_sector(sector):
+            self.offset = 0
+        elif sector[510:512] == b'\x55\xaa':
+            for index in range(4):
+                (ptype, first) = struct.unpack_from(
+                    '<4xB3xI', sector, _PARTITION_TABLE_OFFSET + 16 * index)
+                if ptype and first and _is_boot_sector(
+                        self._read(first * SECTOR_SIZE, SECTOR_SIZE)):
+                    self.offset = first * SECTOR_SIZE
+                    sector = self._read(self.offset, SECTOR_SIZE)
+                    break
+        if self.offset is None:
+            raise ValueError("No FAT file system found")
+
+        (self.sector_size, self.sectors_per_cluster, reserved, fats,
+         root_entries, total_sectors, _, fat_sectors) = struct.unpack_from(
+             '<HBHBHHBH', sector, 11)
+        if not total_sectors:
+            total_sectors = struct.unpack_from('<I', sector, 32)[0]
+        self.root_cluster = None
+        if not fat_sectors:
+            # Only FAT32 uses this field; this is what Linux checks too
+            (fat_sectors, self.root_cluster) = struct.unpack_from(
+                '<I4xI', sector, 36)
+        self.cluster_size = self.sectors_per_cluster * self.sector_size
+        self.fat_offset = self.offset + reserved * self.sector_size
+        self.root_offset = self.fat_offset + (fats * fat_sectors *
+                                              self.sector_size)
+        self.root_size = root_entries * _DIR_ENTRY_SIZE
+        root_sectors = ((self.root_size + self.sector_size - 1) //
+                        self.sector_size)
+        self.data_offset = self.root_offset + root_sectors * self.sector_size
+        data_sectors = (total_sectors - reserved - fats * fat_sectors -
+                        root_sectors)
+        self.cluster_count = data_sectors // self.sectors_per_cluster
+        if self.root_cluster is not None:
+            self.fat_type = 32
+        elif self.cluster_count < 4085:
+            self.fat_type = 12
+        else:
+            self.fat_type = 16
+        self._fat_cache = {}
+        self._entries = None
+
+    def _read(self, offset, length):
+        """Read data from the given offset into the disk image."""
+        self.file_obj.seek(self.start + offset)
+        return self.file_obj.read(length)
+
+    def _next_cluster(self, cluster):
+        """Look up the given cluster in the FAT.
+
+        Args:
+          cluster (int): Cluster number.
+        Returns:
+          int: Next cluster in the chain, or ``None`` at the end of it.
+        """
+        offset = {12: cluster + cluster // 2,
+                  16: cluster * 2,
+                  32: cluster * 4}[self.fat_type]
+        (block, offset) = divmod(offset, _FAT_CACHE_BLOCK)
+        data = self._fat_cache.get(block)
+        if data is None:
+            # A FAT12 entry may span two blocks, so overlap them slightly
+            data = self._read(self.fat_offset + block * _FAT_CACHE_BLOCK,
+                              _FAT_CACHE_BLOCK + 4)
+            self._fat_cache[block] = data
+        if offset + 4 > len(data):
+            # Truncated image
+            return None
+        if self.fat_type == 32:
+            value = struct.unpack_from('<I', data, offset)[0] & 0x0fffffff
+            end = 0x0ffffff7
+        else:
+            value = struct.unpack_from('<H', data, offset)[0]
+            end = 0xfff7
+            if self.fat_type == 12:
+                value = (value >> 4) if cluster % 2 else (value & 0x0fff)
+                end = 0xff7
+        if value < 2 or value >= end or value >= self.cluster_count + 2:
+            return None
+        return value
+
+    def _extents(self, cluster, size=None):
+        """Get the (offset, length) runs of contiguous clusters in a chain.
+
+        Args:
+          cluster (int): First cluster of the chain.
+          size (int): Number of bytes of data wanted, or ``None`` for the
+            whole chain.
+        Yields:
+          tuple: (offset into the disk image, length in bytes)
+        """
+        remaining = size
+        visited = 0
+        while cluster is not None and (remaining is None or remaining > 0):
+            first = cluster
+            count = 1
+            while True:
+                following = self._next_cluster(cluster)
+                visited += 1
+                if visited > self.cluster_count:
+                    raise ValueError("Loop in FAT cluster chain")
+                if following != cluster + 1:
+                    break
+                cluster = following
+                count += 1
+            cluster = following
+            length = count * self.cluster_size
+            if remaining is not None:
+                length = min(length, remaining)
+                remaining -= length
+            yield (self.data_offset +
+                   (first - _ROOT_CLUSTER) * self.cluster_size, length)
+
+    def _raw_entries(self, cluster):
+        """Iterate over the 32-byte entries in a directory, up to its end.
+
+        Args:
+          cluster (int): First cluster of the directory, or ``None`` for
+            the fixed-size root directory of FAT12/FAT16.
+        Yields:
+          bytes: Each directory entry, including deleted and LFN entries.
+        """
+        if cluster is None:
+            extents = [(self.root_offset, self.root_size)]
+        else:
+            extents = self._extents(cluster)
+        for (offset, length) in extents:
+            data = self._read(offset, length)
+            for pos in range(0, len(data) - _DIR_ENTRY_SIZE + 1,
+                             _DIR_ENTRY_SIZE):
+                entry = data[pos:pos + _DIR_ENTRY_SIZE]
+                if bytearray(entry[0:1])[0] == 0:
+                    return
+                yield entry
+
+    @staticmethod
+    def _long_name(long_name, entry):
+        """Decode the long file name preceding a short name entry, if any.
+
+        Args:
+          long_name (list): LFN entries (bytes) seen since the last short
+            name entry, in on-disk order.
+          entry (bytes): The short name entry.
+        Returns:
+          str: Long file name, or ``None`` if there is no long name or it
+          doesn't belong to this entry.
+        """
+        if not long_name:
+            return None
+        parts = []
+        for lfn_entry in long_name:
+            (_, part1, _, _, checksum, part2, _,
+             part3) = _LFN_ENTRY.unpack(lfn_entry)
+            if checksum != _lfn_checksum(entry[:11]):
+                return None
+            parts.insert(0, part1 + part2 + part3)
+        return b''.join(parts).decode('utf-16-le', 'replace').split(u'\0')[0]
+
+    def _directory(self, cluster):
+        """Iterate over the entries in a directory.
+
+        Args:
+          cluster (int): First cluster of the directory, or ``None`` for
+            the fixed-size root directory of FAT12/FAT16.
+        Yields:
+          tuple: (name, is_directory, size, first cluster)
+        """
+        long_name = []
+        for entry in self._raw_entries(cluster):
+            attributes = bytearray(entry[11:12])[0]
+            deleted = (bytearray(entry[0:1])[0] == _DELETED)
+            if not deleted and attributes & 0x3f == _ATTR_LONG_NAME:
+                if bytearray(entry[0:1])[0] & _LFN_LAST_ENTRY:
+                    # First (on disk) entry of a new long name
+                    long_name = []
+                long_name.append(entry)
+                continue
+            name = self._long_name(long_name, entry)
+            long_name = []
+            if deleted or attributes & _ATTR_VOLUME_ID:
+                continue
+            if name is None:
+                name = self._short_name(entry)
+            if name in (".", ".."):
+                continue
+            (cluster_high, cluster_low,
+             size) = struct.unpack_from('<8xH4xHI', entry, 12)
+            yield (name, bool(attributes & _ATTR_DIRECTORY),
+                   size, (cluster_high << 16) | cluster_low)
+
+    @staticmethod
+    def _short_name(entry):
+        """Decode the 8.3 short name of a directory entry."""
+        raw = bytearray(entry[:11])
+        if raw[0] == 0x05:
+            raw[0] = _DELETED
+        case = bytearray(entry[12:13])[0]
+        base = bytes(raw[:8]).decode('cp437').rstrip(" ")
+        ext = bytes(raw[8:11]).decode('cp437').rstrip(" ")
+        if case & _LOWERCASE_BASE:
+            base = base.lower()
+        if case & _LOWERCASE_EXT:
+            ext = ext.lower()
+        return base + ("." + ext if ext else "")
+
+    @property
+    def entries(self):
+        """List of all files and directories, as :class:`FATEntry` objects.
+
+        Like ``isoinfo -f``, all entries in a directory are listed before
+        the contents of its subdirectories.
+        """
+        if self._entries is None:
+            entries = []
+            queue = [("", self.root_cluster)]
+            visited = set()
+            while queue:
+                (prefix, cluster) = queue.pop(0)
+                if cluster in visited:
+                    continue
+                visited.add(cluster)
+                for (name, is_directory, size,
+                     first) in self._directory(cluster):
+                    entries.append(FATEntry(prefix + name, is_directory,
+                                            size, first))
+                    if is_directory and first >= _ROOT_CLUSTER:
+                        queue.append((prefix + name + "/", first))
+            self._entries = entries
+        return self._entries
+
+    @property
+    def files(self):
+        """List of paths of all files and directories in the file system."""
+        return [entry.path for entry in self.entries]
+
+    def find(self, path):
+        """Find the entry for the given path (case-insensitively).
+
+        Args:
+          path (str): '/'-separated path within the file system.
+        Returns:
+          FATEntry: The matching entry.
+        Raises:
+          KeyError: if no such file or directory exists.
+        """
+        wanted = path.strip("/").upper()
+        for entry in self.entries:
+            if entry.path.upper() == wanted:
+                return entry
+        raise KeyError(path)
+
+    def read_file(self, path):
+        """Read a file from the file system by streaming its clusters.
+
+        Args:
+          path (str): '/'-separated path of a file within the file system.
+        Yields:
+          bytes: Successive chunks of the file's contents.
+        Raises:
+          KeyError: if no such file exists.
+        """
+        entry = self.find(path)
+        if entry.is_directory:
+            raise KeyError("{0} is a directory".format(path))
+        if not entry.size:
+            return
+        for (offset, length) in self._extents(entry.cluster, entry.size):
+            while length > 0:
+                chunk = self._read(offset, min(length, READ_BUFFER_SIZE))
+                if not chunk:
+                    return
+                yield chunk
+                offset += len(chunk)
+                length -= len(chunk)
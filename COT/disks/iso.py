@@ -10,23 +10,871 @@
 # of COT, including this file, may be copied, modified, propagated, or
 # distributed except according to the terms contained in the LICENSE.txt file.
 
-"""Handling of ISO files."""
+"""Handling of ISO files.
+
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  ISO
+  ISOBuilder
+  ISOContents
+
+**Functions**
+
+.. autosummary::
+  :nosignatures:
+
+  read_iso_contents
+"""
 
 import logging
 import os
-import re
+import string
+import struct
+import sys
+import time
+from collections import namedtuple
 
+from COT.data_validation import ReadAheadReader, READ_BUFFER_SIZE
 from COT.disks.disk import DiskRepresentation
-from COT.helpers import helpers, HelperError, helper_select
 
 logger = logging.getLogger(__name__)
 
+SECTOR_SIZE = 2048
+"""Size of an ISO 9660 sector."""
+
+ISO_MAGIC = b'CD001'
+"""Standard identifier found in each ISO 9660 volume descriptor."""
+
+_FIRST_DESCRIPTOR_SECTOR = 16
+_PRIMARY_VOLUME_DESCRIPTOR = 1
+_DESCRIPTOR_SET_TERMINATOR = 255
+_MAX_DESCRIPTORS = 64
+
+_ROCK_RIDGE_IDS = (b'RRIP_1991A', b'IEEE_P1282', b'IEEE_1282')
+"""Extension identifiers, found in SUSP 'ER' entries, for Rock Ridge."""
+
+_UINT32 = struct.Struct('<I')
+
+_FLAG_DIRECTORY = 0x02
+_FLAG_MULTI_EXTENT = 0x80
+_NM_CURRENT = 0x02
+_NM_PARENT = 0x04
+
+ISOContents = namedtuple('ISOContents', ['subformat', 'files'])
+"""Information read from an ISO image by :func:`read_iso_contents`.
+
+``subformat`` is ``'rockridge'`` if the image has Rock Ridge extensions,
+else ``''``. ``files`` is the list of paths of all files and directories
+in the image, using Rock Ridge names if available, else ISO 9660 names
+(such as ``'FOO.TXT;1'``).
+"""
+
+
+class _ISOReader(object):
+    """Walk the directory hierarchy of an ISO 9660 image."""
+
+    def __init__(self, file_obj):
+        """Read the primary volume descriptor.
+
+        Args:
+          file_obj (file): Binary file object positioned at start of image.
+        Raises:
+          ValueError: if no primary volume descriptor is found.
+        """
+        self.file_obj = file_obj
+        self.start = file_obj.tell()
+        self.block_size = SECTOR_SIZE
+        self.susp_skip = None
+        self.rockridge = False
+        self.files = []
+        self._visited = set()
+
+        for index in range(_MAX_DESCRIPTORS):
+            descriptor = self.read(_FIRST_DESCRIPTOR_SECTOR + index,
+                                   SECTOR_SIZE)
+            if (len(descriptor) < SECTOR_SIZE or
+                    descriptor[1:6] != ISO_MAGIC):
+                break
+            descriptor_type = bytearray(descriptor)[0]
+            if descriptor_type == _PRIMARY_VOLUME_DESCRIPTOR:
+                self.block_size = struct.unpack_from('<H', descriptor,
+                                                     128)[0]
+                self.root = descriptor[156:190]
+                return
+            if descriptor_type == _DESCRIPTOR_SET_TERMINATOR:
+                break
+        raise ValueError("No ISO 9660 primary volume descriptor found")
+
+    def read(self, block, size, offset=0):
+        """Read data from the given logical block.
+
+        Args:
+          block (int): Logical block number.
+          size (int): Number of bytes to read.
+          offset (int): Offset within the block to start reading from.
+        Returns:
+          bytes: Data read.
+        """
+        self.file_obj.seek(self.start + block * self.block_size + offset)
+        return self.file_obj.read(size)
+
+    def records(self, extent, length):
+        """Iterate over the directory records in a directory extent.
+
+        Args:
+          extent (int): Logical block number of the directory.
+          length (int): Length of the directory data, in bytes.
+        Yields:
+          tuple: (extent, data length, flags, identifier, system use bytes)
+        """
+        data = self.read(extent, length)
+        pos = 0
+        while pos < len(data):
+            record_length = bytearray(data[pos:pos + 1])[0]
+            if record_length == 0:
+                # Records don't span blocks; skip the padding to the next
+                pos = (pos // self.block_size + 1) * self.block_size
+                continue
+            record = data[pos:pos + record_length]
+            pos += record_length
+            if len(record) < 34:
+                break
+            fields = bytearray(record)
+            name_length = fields[32]
+            name = record[33:33 + name_length]
+            system_use = record[33 + name_length + (1 - name_length % 2):]
+            yield (_UINT32.unpack_from(record, 2)[0],
+                   _UINT32.unpack_from(record, 10)[0],
+                   fields[25], name, system_use)
+
+    def susp_entries(self, system_use, depth=0):
+        """Iterate over the SUSP entries in a System Use area.
+
+        Follows any continuation ('CE') entries.
+
+        Args:
+          system_use (bytes): System Use area of a directory record.
+          depth (int): Number of continuation areas already followed.
+        Yields:
+          tuple: (signature, entry data) for each entry.
+        """
+        continuation = None
+        pos = 0
+        while pos + 4 <= len(system_use):
+            signature = system_use[pos:pos + 2]
+            length = bytearray(system_use[pos + 2:pos + 3])[0]
+            if length < 4 or signature == b'ST':
+                break
+            entry = system_use[pos:pos + length]
+            pos += length
+            if signature == b'CE' and len(entry) >= 28:
+                continuation = (_UINT32.unpack_from(entry, 4)[0],
+                                _UINT32.unpack_from(entry, 12)[0],
+                                _UINT32.unpack_from(entry, 20)[0])
+                continue
+            yield signature, entry
+        if continuation is not None and depth < 8:
+            (block, offset, length) = continuation
+            for item in self.susp_entries(self.read(block, length, offset),
+                                          depth + 1):
+                yield item
+
+    def walk(self):
+        """Walk the directory hierarchy and record all files within it."""
+        (extent, length, _, _, system_use) = next(self.records(
+            _UINT32.unpack_from(self.root, 2)[0],
+            _UINT32.unpack_from(self.root, 10)[0]))
+        # The root directory's '.' entry tells us whether SUSP is in use,
+        # and if so whether Rock Ridge is one of the extensions in use.
+        if system_use[:2] == b'SP' and system_use[4:6] == b'\xbe\xef':
+            self.susp_skip = bytearray(system_use[6:7])[0]
+            for signature, entry in self.susp_entries(system_use):
+                if signature == b'RR':
+                    self.rockridge = True
+                elif signature == b'ER':
+                    id_length = bytearray(entry[4:5])[0]
+                    if entry[8:8 + id_length] in _ROCK_RIDGE_IDS:
+                        self.rockridge = True
+        self._walk(extent, length, "")
+
+    def _walk(self, extent, length, prefix):
+        """Record the contents of the given directory, recursively.
+
+        Like ``isoinfo -f``, lists all entries in a directory before
+        descending into its subdirectories.
+
+        Args:
+          extent (int): Logical block number of the directory.
+          length (int): Length of the directory data, in bytes.
+          prefix (str): Path of this directory, relative to the root.
+        """
+        if extent in self._visited:
+            return
+        self._visited.add(extent)
+        subdirectories = []
+        for (child_extent, child_length, flags, identifier,
+             system_use) in self.records(extent, length):
+            if identifier in (b'\0', b'\1') or flags & _FLAG_MULTI_EXTENT:
+                # '.', '..', or not the last extent of a multi-extent file
+                continue
+            name = identifier.decode('latin-1')
+            if self.rockridge:
+                (rr_name, relocated, child_link) = self._rock_ridge(
+                    system_use)
+                if relocated:
+                    # Appears elsewhere in the hierarchy via a 'CL' entry
+                    continue
+                if rr_name is not None:
+                    name = rr_name
+                if child_link is not None:
+                    flags |= _FLAG_DIRECTORY
+                    child_extent = child_link
+                    child_length = next(self.records(child_link,
+                                                     self.block_size))[1]
+            path = prefix + name
+            self.files.append(path)
+            if flags & _FLAG_DIRECTORY:
+                subdirectories.append((child_extent, child_length,
+                                       path + "/"))
+        for (child_extent, child_length, path) in subdirectories:
+            self._walk(child_extent, child_length, path)
+
+    def _rock_ridge(self, system_use):
+        """Get the Rock Ridge information from a directory record.
+
+        Args:
+          system_use (bytes): System Use area of the directory record.
+        Returns:
+          tuple: (name, or ``None``; whether this is a relocated directory;
+          logical block of the real directory, if this is a child link)
+        """
+        name = None
+        relocated = False
+        child_link = None
+        for signature, entry in self.susp_entries(
+                system_use[self.susp_skip or 0:]):
+            if signature == b'NM':
+                flags = bytearray(entry[4:5])[0]
+                if flags & (_NM_CURRENT | _NM_PARENT):
+                    continue
+                name = (name or "") + entry[5:].decode('utf-8', 'replace')
+            elif signature == b'RE':
+                relocated = True
+            elif signature == b'CL':
+                child_link = _UINT32.unpack_from(entry, 4)[0]
+        return name, relocated, child_link
+
+
+def read_iso_contents(path_or_obj):
+    """Read the subformat and file list of an ISO 9660 image, natively.
+
+    Walks the primary volume descriptor and the directory records, including
+    any SUSP / Rock Ridge entries, without calling any helper programs.
+    Joliet extensions are not considered.
+
+    Args:
+      path_or_obj (str): Path to the ISO file OR an opened binary file
+        object, positioned at the start of the image.
+
+    Returns:
+      ISOContents: Subformat and file list of this image.
+
+    Raises:
+      ValueError: if this isn't an ISO 9660 image.
+    """
+    if not hasattr(path_or_obj, 'read'):
+        with open(path_or_obj, 'rb') as file_obj:
+            return read_iso_contents(file_obj)
+    reader = _ISOReader(path_or_obj)
+    reader.walk()
+    return ISOContents("rockridge" if reader.rockridge else "",
+                       reader.files)
+
+
+_RR_PX = 0x01
+_RR_NM = 0x08
+_RR_TF = 0x80
+_TF_MODIFY = 0x02
+_TF_ACCESS = 0x04
+_TF_ATTRIBUTES = 0x08
+
+_ER_ID = b'RRIP_1991A'
+_ER_DESCRIPTOR = (b'THE ROCK RIDGE INTERCHANGE PROTOCOL PROVIDES SUPPORT FOR '
+                  b'POSIX FILE SYSTEM SEMANTICS')
+_ER_SOURCE = (b'PLEASE CONTACT DISC PUBLISHER FOR SPECIFICATION SOURCE.  '
+              b'SEE PUBLISHER IDENTIFIER IN PRIMARY VOLUME DESCRIPTOR FOR '
+              b'CONTACT INFORMATION.')
+
+_MAX_RECORD_LENGTH = 254
+_CE_LENGTH = 28
+_MAX_NM_LENGTH = 250
+_MAX_NAME_LENGTH = 30
+"""ISO level 2 limit on the length of a file or directory identifier."""
+
+_D_CHARACTERS = frozenset(string.ascii_letters + string.digits + "_")
+"""Characters permitted in ISO identifiers (allowing lowercase)."""
+
+
+def _both16(value):
+    """Encode a 16-bit value in ISO 9660 both-byte-order format."""
+    return struct.pack('<H', value) + struct.pack('>H', value)
+
+
+def _both32(value):
+    """Encode a 32-bit value in ISO 9660 both-byte-order format."""
+    return struct.pack('<I', value) + struct.pack('>I', value)
+
+
+def _susp(signature, data):
+    """Encode a version 1 SUSP / Rock Ridge entry."""
+    return signature + struct.pack('<BB', len(data) + 4, 1) + data
+
+
+def _record_date(timestamp):
+    """Encode a timestamp in 7-byte directory record format."""
+    tm = time.gmtime(timestamp)
+    return struct.pack('<7B', tm.tm_year - 1900, tm.tm_mon, tm.tm_mday,
+                       tm.tm_hour, tm.tm_min, tm.tm_sec, 0)
+
+
+def _volume_date(timestamp):
+    """Encode a timestamp in 17-byte volume descriptor format."""
+    return (time.strftime("%Y%m%d%H%M%S", time.gmtime(timestamp)).encode() +
+            b'00\0')
+
+
+def _padded(text, length):
+    """Encode a volume descriptor text field, padded with spaces."""
+    return text.encode('ascii')[:length].ljust(length, b' ')
+
+
+def _sectors(length):
+    """Count the sectors needed to hold ``length`` bytes."""
+    return (length + SECTOR_SIZE - 1) // SECTOR_SIZE
+
+
+def _sanitize(name):
+    """Replace any characters not permitted in ISO identifiers."""
+    return "".join(c if c in _D_CHARACTERS else "_" for c in name)
+
+
+class _ISONode(object):
+    """A file or directory to be written into an ISO image."""
+
+    def __init__(self, name, parent, path=None, data=None, directory=False):
+        """Create a node.
+
+        Args:
+          name (str): Name of this file or directory within its parent.
+          parent (_ISONode): Parent directory, or ``None`` for the root.
+          path (str): Path to the file on disk to read contents from.
+          data (bytes): Contents of the file, if ``path`` is not set.
+          directory (bool): Whether this is a directory.
+        """
+        self.name = name
+        self.parent = parent
+        self.path = path
+        self.data = data
+        self.children = {} if directory else None
+        self.mode = 0o40555 if directory else 0o100444
+        if path is not None:
+            self.size = os.path.getsize(path)
+            if os.stat(path).st_mode & 0o111:
+                self.mode |= 0o111
+        else:
+            self.size = len(data or b'')
+        self.identifier = None
+        self.extent = 0
+        self.records = None
+
+    @property
+    def is_directory(self):
+        """Whether this node is a directory."""
+        return self.children is not None
+
+    def sort_key(self):
+        """Key for ordering directory records by ISO identifier."""
+        (base, _, ext) = self.identifier.partition(b';')[0].partition(b'.')
+        return (base, ext)
+
+
+class ISOBuilder(object):
+    r"""Build an ISO 9660 image natively, without mkisofs or similar helpers.
+
+    Produces the same layout as ``mkisofs -full-iso9660-filenames
+    -iso-level 2 -allow-lowercase [-r]`` would, in a single sequential pass,
+    so the image can be streamed to any writable file object. The size of
+    the image is known in advance, from :attr:`size`.
+
+    ::
+
+      builder = ISOBuilder()
+      builder.add_file("config.txt", path="/path/to/my_config.txt")
+      builder.add_file("extra/notes.txt", data=b"Hello world\n")
+      with open("config.iso", "wb") as file_obj:
+          builder.write(file_obj)
+    """
+
+    def __init__(self, rockridge=True, volume_id="CDROM", timestamp=None):
+        """Create an empty ISO builder.
+
+        Args:
+          rockridge (bool): Whether to include Rock Ridge extensions.
+          volume_id (str): Volume identifier for the image.
+          timestamp (float): Timestamp to record for all files and
+            directories in the image. Defaults to the current time.
+        """
+        self.rockridge = rockridge
+        self.volume_id = volume_id
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._root = _ISONode("", None, directory=True)
+        self._layout = None
+
+    def _node_for(self, name, directory=False, **kwargs):
+        """Add a node at the given path, creating any parent directories.
+
+        Args:
+          name (str): '/'-separated path of the node within the image.
+          directory (bool): Whether the new node is a directory.
+          **kwargs: Passed through to :class:`_ISONode`.
+        Returns:
+          _ISONode: New (or, for a directory, possibly existing) node.
+        Raises:
+          ValueError: if the name is invalid or already in use.
+        """
+        if isinstance(name, bytes):
+            name = name.decode(sys.getfilesystemencoding() or 'utf-8')
+        parts = [part for part in name.split("/") if part]
+        if not parts:
+            raise ValueError("Invalid file name '{0}'".format(name))
+        parent = self._root
+        for index, part in enumerate(parts):
+            if len(part.encode('utf-8')) > 255:
+                raise ValueError("File name '{0}' is too long".format(part))
+            node = parent.children.get(part)
+            last = (index == len(parts) - 1)
+            if node is None:
+                if last:
+                    node = _ISONode(part, parent, directory=directory,
+                                    **kwargs)
+                else:
+                    node = _ISONode(part, parent, directory=True)
+                parent.children[part] = node
+            elif not (node.is_directory and (directory or not last)):
+                raise ValueError("Duplicate file name '{0}'".format(name))
+            parent = node
+        self._layout = None
+        return parent
+
+    def add_directory(self, name):
+        """Add an (empty) directory to the image.
+
+        Args:
+          name (str): '/'-separated path of the directory within the image.
+        """
+        self._node_for(name, directory=True)
+
+    def add_file(self, name, path=None, data=None):
+        """Add a file to the image, from a file on disk or from memory.
+
+        Args:
+          name (str): '/'-separated path of the file within the image.
+          path (str): Path to the file on disk to add.
+          data (bytes): File contents to add, if ``path`` is not given.
+
+        Raises:
+          ValueError: if the name is invalid or already in use, or the
+            file is too large to be stored in an ISO 9660 image.
+        """
+        node = self._node_for(name, path=path, data=data)
+        if node.size > 0xffffffff:
+            raise ValueError("File '{0}' is too large for an ISO image"
+                             .format(name))
+
+    def add_tree(self, path, name=""):
+        """Add the contents of a directory on disk to the image, recursively.
+
+        Args:
+          path (str): Directory on disk whose contents are to be added.
+          name (str): Directory within the image to add them to.
+            Defaults to the root directory.
+        """
+        for entry in sorted(os.listdir(path)):
+            entry_path = os.path.join(path, entry)
+            if isinstance(entry, bytes):
+                entry = entry.decode(sys.getfilesystemencoding() or 'utf-8')
+            entry_name = name + "/" + entry if name else entry
+            if os.path.isdir(entry_path):
+                self.add_directory(entry_name)
+                self.add_tree(entry_path, entry_name)
+            else:
+                self.add_file(entry_name, path=entry_path)
+
+    @property
+    def size(self):
+        """Size, in bytes, of the image that :meth:`write` will produce."""
+        return self._get_layout()['blocks'] * SECTOR_SIZE
+
+    def _assign_identifiers(self, directory):
+        """Assign unique ISO identifiers to the children of a directory.
+
+        Args:
+          directory (_ISONode): Directory whose children are to be named.
+        Returns:
+          list: Child nodes, sorted by identifier.
+        """
+        used = set()
+        for name in sorted(directory.children):
+            node = directory.children[name]
+            if node.is_directory:
+                (base, ext) = (_sanitize(name), "")
+            else:
+                (base, dot, ext) = name.rpartition(".")
+                if not dot:
+                    (base, ext) = (name, "")
+                (base, ext) = (_sanitize(base), _sanitize(ext))
+            ext = ext[:_MAX_NAME_LENGTH - 1]
+            candidate = base[:_MAX_NAME_LENGTH - len(ext)] or "_"
+            suffix = 0
+            while candidate.upper() + "." + ext.upper() in used:
+                # Replace the end of the name with a unique number
+                suffix += 1
+                candidate = (base[:_MAX_NAME_LENGTH - len(ext) -
+                                  len(str(suffix))] + str(suffix))
+            used.add(candidate.upper() + "." + ext.upper())
+            if node.is_directory:
+                node.identifier = candidate.encode('ascii')
+            else:
+                node.identifier = (candidate + "." + ext + ";1").encode(
+                    'ascii')
+        return sorted(directory.children.values(),
+                      key=lambda node: node.sort_key())
+
+    def _system_use(self, node, name=None, root=False):
+        """Construct the Rock Ridge entries describing a node.
+
+        Args:
+          node (_ISONode): Node being described.
+          name (str): Rock Ridge name for the node, if any.
+          root (bool): Whether this is the first record of the root
+            directory, which identifies the extensions in use.
+        Returns:
+          list: SUSP entries (bytes) for this node.
+        """
+        if not self.rockridge:
+            return []
+        entries = []
+        if root:
+            entries.append(_susp(b'SP', b'\xbe\xef\0'))
+        nlink = 1
+        if node.is_directory:
+            nlink = 2 + sum(1 for child in node.children.values()
+                            if child.is_directory)
+        entries.append(_susp(b'RR', struct.pack(
+            '<B', _RR_PX | _RR_TF | (_RR_NM if name else 0))))
+        entries.append(_susp(b'PX', _both32(node.mode) + _both32(nlink) +
+                             _both32(0) + _both32(0)))
+        entries.append(_susp(b'TF', (
+            struct.pack('<B', _TF_MODIFY | _TF_ACCESS | _TF_ATTRIBUTES) +
+            _record_date(self.timestamp) * 3)))
+        if name:
+            encoded = name.encode('utf-8')
+            while len(encoded) > _MAX_NM_LENGTH:
+                entries.append(_susp(b'NM', b'\x01' +
+                                     encoded[:_MAX_NM_LENGTH]))
+                encoded = encoded[_MAX_NM_LENGTH:]
+            entries.append(_susp(b'NM', b'\0' + encoded))
+        if root:
+            entries.append(_susp(b'ER', (
+                struct.pack('<4B', len(_ER_ID), len(_ER_DESCRIPTOR),
+                            len(_ER_SOURCE), 1) +
+                _ER_ID + _ER_DESCRIPTOR + _ER_SOURCE)))
+        return entries
+
+    def _directory_records(self, directory, children):
+        """Plan the directory records for the given directory.
+
+        Args:
+          directory (_ISONode): Directory to plan.
+          children (list): Child nodes of this directory, in order.
+        Returns:
+          list: of lists ``[node, identifier, inline entries,
+          continuation entries, continuation location]``.
+        """
+        parent = directory.parent or directory
+        records = [
+            [directory, b'\0',
+             self._system_use(directory, root=(directory is self._root))],
+            [parent, b'\1', self._system_use(parent)],
+        ]
+        records += [[child, child.identifier,
+                     self._system_use(child, name=child.name)]
+                    for child in children]
+        for record in records:
+            (identifier, entries) = (record[1], record[2])
+            room = (_MAX_RECORD_LENGTH - 33 - len(identifier) -
+                    (1 - len(identifier) % 2))
+            overflow = []
+            if sum(len(entry) for entry in entries) > room:
+                # Move what doesn't fit into a continuation area
+                room -= _CE_LENGTH
+                while sum(len(entry) for entry in entries) > room:
+                    overflow.insert(0, entries.pop())
+            record[3:] = [b''.join(overflow), None]
+        return records
+
+    def _plan_directories(self):
+        """Name and plan the records of every directory in the image.
+
+        Returns:
+          tuple: (directories, in path table order, and files, in the
+          order their contents appear)
+        """
+        directories = []
+        files = []
+        queue = [self._root]
+        while queue:
+            directory = queue.pop(0)
+            directories.append(directory)
+            children = self._assign_identifiers(directory)
+            queue += [child for child in children if child.is_directory]
+            files += [child for child in children if not child.is_directory]
+            directory.records = self._directory_records(directory, children)
+            length = 0
+            for record in directory.records:
+                record_length = self._record_length(record)
+                if length % SECTOR_SIZE + record_length > SECTOR_SIZE:
+                    # Records may not span sectors
+                    length = _sectors(length) * SECTOR_SIZE
+                length += record_length
+            directory.size = _sectors(length) * SECTOR_SIZE
+        return (directories, files)
+
+    @staticmethod
+    def _place_continuations(directories, block):
+        """Pack the continuation areas into sectors starting at ``block``.
+
+        Args:
+          directories (list): Directories whose records are to be placed.
+          block (int): First sector available for continuation areas.
+        Returns:
+          int: Number of sectors used.
+        """
+        start = block
+        offset = 0
+        for directory in directories:
+            for record in directory.records:
+                length = len(record[3])
+                if not length:
+                    continue
+                if offset + length > SECTOR_SIZE:
+                    block += 1
+                    offset = 0
+                record[4] = (block, offset, length)
+                offset += length
+        if offset:
+            block += 1
+        return block - start
+
+    def _get_layout(self):
+        """Assign locations to everything in the image.
+
+        Returns:
+          dict: Directories (in path table order), files (in the order
+          their contents appear), path tables, and number of blocks.
+        """
+        if self._layout is not None:
+            return self._layout
+        (directories, files) = self._plan_directories()
+
+        path_table_size = sum(8 + len(d.identifier or b'\0') +
+                              len(d.identifier or b'\0') % 2
+                              for d in directories)
+        block = _FIRST_DESCRIPTOR_SECTOR + 2
+        path_table_blocks = (block, block + _sectors(path_table_size))
+        block += 2 * _sectors(path_table_size)
+        for directory in directories:
+            directory.extent = block
+            block += directory.size // SECTOR_SIZE
+        # Continuation areas are packed into sectors after the directories
+        continuation_block = block
+        continuation_blocks = self._place_continuations(directories, block)
+        block += continuation_blocks
+        for node in files:
+            node.extent = block
+            block += _sectors(node.size)
+
+        self._layout = {
+            'directories': directories,
+            'files': files,
+            'path_table_size': path_table_size,
+            'path_table_blocks': path_table_blocks,
+            'continuation_block': continuation_block,
+            'continuation_blocks': continuation_blocks,
+            'blocks': block,
+        }
+        return self._layout
+
+    @staticmethod
+    def _record_length(record):
+        """Length of the given planned directory record."""
+        length = (33 + len(record[1]) + (1 - len(record[1]) % 2) +
+                  sum(len(entry) for entry in record[2]) +
+                  (_CE_LENGTH if record[3] else 0))
+        return length + length % 2
+
+    def _encode_record(self, record):
+        """Encode a planned directory record, once its layout is known."""
+        (node, identifier, entries, _, continuation) = record
+        if continuation:
+            entries = entries + [_susp(b'CE', b''.join(
+                _both32(value) for value in continuation))]
+        body = (b'\0' + _both32(node.extent) + _both32(node.size) +
+                _record_date(self.timestamp) +
+                struct.pack('<3B', _FLAG_DIRECTORY if node.is_directory else 0,
+                            0, 0) +
+                _both16(1) + struct.pack('<B', len(identifier)) + identifier +
+                (b'\0' if len(identifier) % 2 == 0 else b'') +
+                b''.join(entries))
+        if len(body) % 2 == 0:
+            body += b'\0'
+        return struct.pack('<B', len(body) + 1) + body
+
+    def _path_table(self, directories, fmt):
+        """Encode a path table, with integers in the given byte order."""
+        numbers = dict((id(d), index + 1)
+                       for (index, d) in enumerate(directories))
+        table = b''
+        for directory in directories:
+            identifier = directory.identifier or b'\0'
+            parent = directory.parent or directory
+            table += (struct.pack(fmt, len(identifier), 0, directory.extent,
+                                  numbers[id(parent)]) +
+                      identifier + b'\0' * (len(identifier) % 2))
+        return table
+
+    def _volume_descriptor(self, layout):
+        """Encode the primary volume descriptor."""
+        root = self._root
+        record = self._encode_record([root, b'\0', [], b'', None])
+        created = _volume_date(self.timestamp)
+        descriptor = (
+            b'\1' + ISO_MAGIC + b'\1\0' + _padded("", 32) +
+            _padded(self.volume_id, 32) + b'\0' * 8 +
+            _both32(layout['blocks']) + b'\0' * 32 +
+            _both16(1) + _both16(1) + _both16(SECTOR_SIZE) +
+            _both32(layout['path_table_size']) +
+            struct.pack('<II', layout['path_table_blocks'][0], 0) +
+            struct.pack('>II', layout['path_table_blocks'][1], 0) +
+            record + _padded("", 128) * 4 + _padded("", 37) * 3 +
+            created + created + b'0' * 16 + b'\0' + created + b'\1\0')
+        return descriptor.ljust(SECTOR_SIZE, b'\0')
+
+    def _directory_data(self, directory):
+        """Encode the records of a directory, padded to its full size."""
+        data = b''
+        for record in directory.records:
+            encoded = self._encode_record(record)
+            if len(data) % SECTOR_SIZE + len(encoded) > SECTOR_SIZE:
+                data += b'\0' * (SECTOR_SIZE - len(data) % SECTOR_SIZE)
+            data += encoded
+        return data.ljust(directory.size, b'\0')
+
+    @staticmethod
+    def _continuation_data(layout):
+        """Encode all continuation areas, padded to whole sectors."""
+        data = b''
+        for directory in layout['directories']:
+            for record in directory.records:
+                if record[3]:
+                    (block, offset, _) = record[4]
+                    offset += ((block - layout['continuation_block']) *
+                               SECTOR_SIZE)
+                    data = data.ljust(offset, b'\0') + record[3]
+        return data.ljust(layout['continuation_blocks'] * SECTOR_SIZE, b'\0')
+
+    @staticmethod
+    def _write_sectors(file_obj, data):
+        """Write the data, padded to a whole number of sectors."""
+        file_obj.write(data)
+        if len(data) % SECTOR_SIZE:
+            file_obj.write(b'\0' * (SECTOR_SIZE - len(data) % SECTOR_SIZE))
+
+    @staticmethod
+    def _write_file_contents(file_obj, node):
+        """Copy the contents of a file node on disk, padded to its extent."""
+        remaining = node.size
+        with open(node.path, 'rb') as source:
+            with ReadAheadReader(source, size=node.size) as data:
+                while remaining > 0:
+                    chunk = data.read(READ_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    file_obj.write(chunk)
+                    remaining -= len(chunk)
+        # Pad out the file (if it has shrunk since layout) and the sector
+        file_obj.write(b'\0' * (remaining + (-node.size) % SECTOR_SIZE))
+
+    def write(self, file_obj):
+        """Write the image to the given file object.
+
+        The image is written sequentially, so ``file_obj`` need not
+        be seekable.
+
+        Args:
+          file_obj (file): Binary file object to write to.
+        """
+        layout = self._get_layout()
+        write_sectors = self._write_sectors
+        write_sectors(file_obj,
+                      b'\0' * _FIRST_DESCRIPTOR_SECTOR * SECTOR_SIZE)
+        write_sectors(file_obj, self._volume_descriptor(layout))
+        write_sectors(file_obj, b'\xff' + ISO_MAGIC + b'\1')
+        write_sectors(file_obj,
+                      self._path_table(layout['directories'], '<BBIH'))
+        write_sectors(file_obj,
+                      self._path_table(layout['directories'], '>BBIH'))
+        for directory in layout['directories']:
+            write_sectors(file_obj, self._directory_data(directory))
+        write_sectors(file_obj, self._continuation_data(layout))
+        for node in layout['files']:
+            if node.path is None:
+                write_sectors(file_obj, node.data or b'')
+            else:
+                self._write_file_contents(file_obj, node)
+
 
 class ISO(DiskRepresentation):
     """ISO 9660 disk image file representation."""
 
     disk_format = "iso"
 
+    magic_signatures = ((0x8001, ISO_MAGIC), (0x8801, ISO_MAGIC),
+                        (0x9001, ISO_MAGIC))
+
+    def __init__(self, path):
+        """Create a representation of an existing ISO image.
+
+        Args:
+          path (str): Path to existing file.
+        """
+        super(ISO, self).__init__(path)
+        self._contents = None
+
+    @property
+    def contents(self):
+        """Subformat and file list of this ISO (:class:`ISOContents`).
+
+        Read in a single pass by :func:`read_iso_contents`.
+        """
+        if self._contents is None:
+            self._contents = read_iso_contents(self.path)
+            logger.debug("ISO %s: %s", self.path, self._contents)
+        return self._contents
+
     @property
     def disk_subformat(self):
         """ISO sub-format.
@@ -37,37 +885,24 @@ class ISO(DiskRepresentation):
         - "rockridge" - has Rock Ridge extensions
         """
         if self._disk_subformat is None:
-            output = helpers['isoinfo'].call(['-i', self.path, '-d'])
-            if re.search(r"Rock Ridge.*found", output):
-                self._disk_subformat = "rockridge"
-            else:
-                # At this time we don't care about Joliet extensions
-                self._disk_subformat = ""
+            # At this time we don't care about Joliet extensions
+            self._disk_subformat = self.contents.subformat
         return self._disk_subformat
 
     @property
     def files(self):
         """Get the list of files contained in this ISO."""
         if self._files is None:
-            if helpers['isoinfo']:    # TODO
-                # It's safe to specify -R even for non-rockridge ISOs
-                args = ["-i", self.path, "-f", "-R"]
-                # At this time we don't support Joliet extensions
-                output = helpers['isoinfo'].call(args)
-                result = []
-                for line in output.split("\n"):
-                    # discard non-file output lines
-                    if not line or line[0] != "/":
-                        continue
-                    # Non-Rock-Ridge filenames look like this in isoinfo:
-                    # /IOSXR_CONFIG.TXT;1
-                    # but the actual filename thus is:
-                    # /iosxr_config.txt
-                    if self.disk_subformat != "rockridge" and ";1" in line:
-                        line = line.lower()[:-2]
-                    # Strip the leading '/'
-                    result.append(line[1:])
-                self._files = result
+            result = []
+            for path in self.contents.files:
+                # Non-Rock-Ridge filenames look like this:
+                # IOSXR_CONFIG.TXT;1
+                # but the actual filename thus is:
+                # iosxr_config.txt
+                if self.disk_subformat != "rockridge" and ";1" in path:
+                    path = path.lower()[:-2]
+                result.append(path)
+            self._files = result
         return self._files
 
     @property
@@ -92,51 +927,16 @@ class ISO(DiskRepresentation):
         """
         if not files:
             raise RuntimeError("Unable to create an empty ISO file")
-        # We can use mkisofs, genisoimage, or xorriso, and fortunately
-        # all three take similar parameters
-        args = ['-output', path, '-full-iso9660-filenames',
-                '-iso-level', '2', '-allow-lowercase']
-        if disk_subformat == 'rockridge':
-            args.append('-r')
-        args += files
-        helper = helper_select(['mkisofs', 'genisoimage', 'xorriso'])
-        if helper.name == "xorriso":
-            args = ['-as', 'mkisofs'] + args
-        helper.call(args)
-
-    @classmethod
-    def file_is_this_type(cls, path):
-        """Detect whether the given file is an ISO image.
-
-        Args:
-          path (str): Path to file
-
-        Returns:
-          bool: True (file is an ISO) or False (file is not an ISO)
-
-        Raises:
-          HelperError: if ``path`` is not a file at all.
-        """
-        if not os.path.exists(path):
-            raise HelperError(2, "No such file or directory: '{0}'"
-                              .format(path))
-        if helpers['isoinfo']:
-            logger.debug("Using 'isoinfo' to check whether %s is an ISO", path)
-            try:
-                helpers['isoinfo'].call(['-i', path, '-d'])
-                return 100
-            except HelperError:
-                # Not an ISO
-                return 0
-
-        # else, try to detect ISO files by file magic number
-        with open(path, 'rb') as fileobj:
-            for offset in (0x8001, 0x8801, 0x9001):
-                fileobj.seek(offset)
-                magic = fileobj.read(5).decode('ascii', 'ignore')
-                if magic == "CD001":
-                    return 100
-        return 0
+        # Like mkisofs, the contents of any directory are added to the root
+        builder = ISOBuilder(rockridge=(disk_subformat == 'rockridge'))
+        for file_path in files:
+            if os.path.isdir(file_path):
+                builder.add_tree(file_path)
+            else:
+                builder.add_file(os.path.basename(file_path), path=file_path)
+        logger.debug("Writing %d-byte ISO image to %s", builder.size, path)
+        with open(path, 'wb') as file_obj:
+            builder.write(file_obj)
 
     @classmethod
     def from_other_image(cls, input_image, output_dir, output_subformat=None):
@@ -10,12 +10,355 @@
 # of COT, including this file, may be copied, modified, propagated, or
 # distributed except according to the terms contained in the LICENSE.txt file.
 
-"""Handling of QCOW2 files."""
+"""Handling of QCOW2 files.
 
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  QCOW2
+  QCOW2Header
+  QCOW2Reader
+
+**Functions**
+
+.. autosummary::
+  :nosignatures:
+
+  read_qcow2_header
+"""
+
+import logging
 import os
+import struct
+import zlib
+from collections import namedtuple
 
 from COT.disks.disk import DiskRepresentation
-from COT.helpers import helpers, helper_select
+from COT.helpers import helpers, helper_select, HelperError
+
+logger = logging.getLogger(__name__)
+
+QCOW_MAGIC = b'QFI\xfb'
+"""Magic number at the start of a QCOW (version 1, 2, or 3) image."""
+
+_HEADER_V2 = struct.Struct('>4sIQIIQIIQQIIQ')
+"""Layout of the QCOW2 version 2 header.
+
+magic, version, backing_file_offset, backing_file_size, cluster_bits,
+size, crypt_method, l1_size, l1_table_offset, refcount_table_offset,
+refcount_table_clusters, nb_snapshots, snapshots_offset.
+"""
+
+_HEADER_V3 = struct.Struct('>QQQII')
+"""Layout of the additional QCOW2 version 3 header fields.
+
+incompatible_features, compatible_features, autoclear_features,
+refcount_order, header_length.
+"""
+
+_EXTENSION = struct.Struct('>II')
+"""Layout of a header extension's type and length."""
+
+_EXT_END = 0
+_EXT_BACKING_FORMAT = 0xe2792aca
+
+INCOMPATIBLE_FEATURES = {
+    0: 'dirty',
+    1: 'corrupt',
+    2: 'external data file',
+    3: 'compression type',
+    4: 'extended L2 entries',
+}
+"""Names of the known incompatible feature bits of a QCOW2 v3 header."""
+
+_L1_OFFSET_MASK = 0x00fffffffffffe00
+"""Bits of an L1 table entry giving the offset of an L2 table."""
+
+_L2_OFFSET_MASK = 0x00fffffffffffe00
+"""Bits of a standard L2 table entry giving the offset of a cluster."""
+
+_L2_COMPRESSED = 1 << 62
+_L2_ZERO = 1
+
+_READABLE_FEATURES = frozenset([0, 1])
+"""Incompatible features (dirty, corrupt) that don't affect reading data."""
+
+QCOW2Header = namedtuple('QCOW2Header', [
+    'version', 'size', 'cluster_size', 'backing_file', 'backing_format',
+    'encrypted', 'incompatible_features'])
+"""Information read from a QCOW2 header by :func:`read_qcow2_header`.
+
+``size`` (the virtual size) and ``cluster_size`` are in bytes.
+``backing_file`` and ``backing_format`` are ``None`` if the image has no
+backing file or no recorded backing format. ``encrypted`` is True if the
+image is encrypted, and ``incompatible_features`` is the set of
+incompatible feature bit numbers that are set (see
+:data:`INCOMPATIBLE_FEATURES`).
+"""
+
+
+def _read_v3_header(header):
+    """Parse the version 3 fields that follow the version 2 QCOW2 header.
+
+    Args:
+      header (bytes): Start of the QCOW2 image.
+
+    Returns:
+      tuple: (set of incompatible feature bit numbers, header length)
+
+    Raises:
+      ValueError: if the header is truncated.
+    """
+    if len(header) < _HEADER_V2.size + _HEADER_V3.size:
+        raise ValueError("QCOW2 header is truncated")
+    (incompatible_bits, _, _, _, header_length) = _HEADER_V3.unpack_from(
+        header, _HEADER_V2.size)
+    return (set(bit for bit in range(64) if incompatible_bits & (1 << bit)),
+            header_length)
+
+
+def _read_header_extensions(file_obj, offset, cluster_size):
+    """Read the header extensions that follow the QCOW2 header.
+
+    Args:
+      file_obj (file): Opened binary file object, positioned at the first
+        header extension.
+      offset (int): Offset of the first extension from the start of the image.
+      cluster_size (int): Cluster size of the image, which bounds the
+        extensions.
+
+    Returns:
+      str: Backing file format, or ``None`` if not recorded.
+    """
+    backing_format = None
+    while offset + _EXTENSION.size <= cluster_size:
+        data = file_obj.read(_EXTENSION.size)
+        if len(data) < _EXTENSION.size:
+            break
+        (ext_type, ext_length) = _EXTENSION.unpack(data)
+        if ext_type == _EXT_END:
+            break
+        data = file_obj.read((ext_length + 7) & ~7)
+        if ext_type == _EXT_BACKING_FORMAT:
+            backing_format = data[:ext_length].decode('utf-8')
+        offset += _EXTENSION.size + len(data)
+    return backing_format
+
+
+def read_qcow2_header(path_or_obj):
+    """Read the header of a QCOW2 image, without any helpers.
+
+    Args:
+      path_or_obj (str): Path to the QCOW2 file OR an opened binary file
+        object, positioned at the start of the image.
+
+    Returns:
+      QCOW2Header: Information from the header.
+
+    Raises:
+      ValueError: if this isn't a QCOW2 (version 2 or 3) image.
+    """
+    if not hasattr(path_or_obj, 'read'):
+        with open(path_or_obj, 'rb') as file_obj:
+            return read_qcow2_header(file_obj)
+    file_obj = path_or_obj
+    start = file_obj.tell()
+    header = file_obj.read(_HEADER_V2.size + _HEADER_V3.size)
+    if not header.startswith(QCOW_MAGIC):
+        raise ValueError("Not a QCOW file")
+    if len(header) < _HEADER_V2.size:
+        raise ValueError("QCOW2 header is truncated")
+    (_, version, backing_file_offset, backing_file_size, cluster_bits,
+     size, crypt_method, _, _, _, _, _, _) = _HEADER_V2.unpack_from(header)
+    if version not in (2, 3):
+        raise ValueError("QCOW version {0} is not supported".format(version))
+    if not 9 <= cluster_bits <= 21:
+        raise ValueError("Invalid QCOW2 cluster size (2^{0} bytes)"
+                         .format(cluster_bits))
+
+    incompatible_features = set()
+    header_length = _HEADER_V2.size
+    if version == 3:
+        (incompatible_features, header_length) = _read_v3_header(header)
+
+    backing_file = None
+    if backing_file_offset and backing_file_size:
+        file_obj.seek(start + backing_file_offset)
+        backing_file = file_obj.read(backing_file_size).decode('utf-8')
+
+    # Header extensions follow the header, up to the first cluster boundary
+    file_obj.seek(start + header_length)
+    backing_format = _read_header_extensions(file_obj, header_length,
+                                             1 << cluster_bits)
+
+    return QCOW2Header(version, size, 1 << cluster_bits, backing_file,
+                       backing_format, crypt_method != 0,
+                       incompatible_features)
+
+
+class QCOW2Reader(object):
+    """Read-only, seekable file object for the guest data of a QCOW2 image.
+
+    Reads standard, zero, and (zlib-)compressed clusters directly from
+    the image, without any helpers. Unallocated clusters read as zeros.
+
+    Images with a backing file, encryption, an external data file,
+    extended L2 entries, or a non-default compression type are not
+    supported.
+    """
+
+    def __init__(self, file_obj):
+        """Wrap the given QCOW2 file.
+
+        Args:
+          file_obj (file): Opened binary file object, positioned at the
+            start of the QCOW2 image.
+
+        Raises:
+          ValueError: if this isn't a QCOW2 (version 2 or 3) image.
+          NotImplementedError: if this image can't be read natively.
+        """
+        self.file_obj = file_obj
+        self._start = file_obj.tell()
+        header = read_qcow2_header(file_obj)
+        if header.encrypted:
+            raise NotImplementedError("Encrypted QCOW2 images are not "
+                                      "supported")
+        if header.backing_file is not None:
+            raise NotImplementedError("QCOW2 images with a backing file are "
+                                      "not supported")
+        unsupported = header.incompatible_features - _READABLE_FEATURES
+        if unsupported:
+            raise NotImplementedError(
+                "QCOW2 incompatible features {0} are not supported"
+                .format(sorted(unsupported)))
+        self.size = header.size
+        """Virtual size of the image, in bytes."""
+        self.cluster_size = header.cluster_size
+        self._version = header.version
+        self._cluster_bits = self.cluster_size.bit_length() - 1
+        self._l2_entries = self.cluster_size // 8
+
+        file_obj.seek(self._start)
+        (_, _, _, _, _, _, _, l1_size, l1_table_offset,
+         _, _, _, _) = _HEADER_V2.unpack(file_obj.read(_HEADER_V2.size))
+        file_obj.seek(self._start + l1_table_offset)
+        data = file_obj.read(l1_size * 8)
+        self._l1_table = struct.unpack('>{0}Q'.format(len(data) // 8), data)
+
+        # Compressed cluster descriptors pack the offset and sector count
+        self._csize_shift = 62 - (self._cluster_bits - 8)
+        self._csize_mask = (1 << (self._cluster_bits - 8)) - 1
+
+        self._l2_index = None
+        self._l2_table = None
+        self._pos = 0
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Change the current position in the guest data.
+
+        Args:
+          offset (int): Offset relative to ``whence``.
+          whence (int): :data:`os.SEEK_SET`, :data:`os.SEEK_CUR`,
+            or :data:`os.SEEK_END`.
+        Returns:
+          int: New absolute position.
+        """
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self):
+        """Get the current position in the guest data.
+
+        Returns:
+          int: Current position.
+        """
+        return self._pos
+
+    def _l2_entry(self, cluster):
+        """Look up the L2 table entry for the given guest cluster.
+
+        Args:
+          cluster (int): Guest cluster number.
+        Returns:
+          int: L2 table entry, or 0 if unallocated.
+        """
+        l1_index = cluster // self._l2_entries
+        if l1_index != self._l2_index:
+            self._l2_index = l1_index
+            self._l2_table = None
+            if l1_index < len(self._l1_table):
+                offset = self._l1_table[l1_index] & _L1_OFFSET_MASK
+                if offset:
+                    self.file_obj.seek(self._start + offset)
+                    data = self.file_obj.read(self.cluster_size)
+                    self._l2_table = struct.unpack(
+                        '>{0}Q'.format(len(data) // 8), data)
+        if self._l2_table is None:
+            return 0
+        l2_index = cluster % self._l2_entries
+        if l2_index >= len(self._l2_table):
+            return 0
+        return self._l2_table[l2_index]
+
+    def _read_cluster(self, cluster):
+        """Read one guest cluster.
+
+        Args:
+          cluster (int): Guest cluster number.
+        Returns:
+          bytes: Cluster data, or ``None`` if the cluster reads as zeros.
+        Raises:
+          ValueError: if the cluster data can't be read.
+        """
+        entry = self._l2_entry(cluster)
+        if entry & _L2_COMPRESSED:
+            offset = entry & ((1 << self._csize_shift) - 1)
+            sectors = ((entry >> self._csize_shift) & self._csize_mask) + 1
+            self.file_obj.seek(self._start + offset)
+            data = self.file_obj.read(sectors * 512 - (offset % 512))
+            try:
+                data = zlib.decompressobj(-15).decompress(data,
+                                                          self.cluster_size)
+            except zlib.error as exc:
+                raise ValueError("Invalid compressed QCOW2 cluster {0}: {1}"
+                                 .format(cluster, exc))
+        else:
+            offset = entry & _L2_OFFSET_MASK
+            if not offset or (self._version >= 3 and entry & _L2_ZERO):
+                return None
+            self.file_obj.seek(self._start + offset)
+            data = self.file_obj.read(self.cluster_size)
+        if len(data) != self.cluster_size:
+            raise ValueError("QCOW2 cluster {0} is truncated".format(cluster))
+        return data
+
+    def read(self, size=-1):
+        """Read guest data from the current position.
+
+        Args:
+          size (int): Maximum number of bytes to read, or -1 for all.
+        Returns:
+          bytes: Data read, empty at the end of the image.
+        """
+        end = self.size if size < 0 else min(self.size, self._pos + size)
+        chunks = []
+        while self._pos < end:
+            (cluster, within) = divmod(self._pos, self.cluster_size)
+            length = min(self.cluster_size - within, end - self._pos)
+            data = self._read_cluster(cluster)
+            if data is None:
+                chunks.append(b'\0' * length)
+            else:
+                chunks.append(data[within:within + length])
+            self._pos += length
+        return b''.join(chunks)
 
 
 class QCOW2(DiskRepresentation):
@@ -23,6 +366,115 @@ class QCOW2(DiskRepresentation):
 
     disk_format = "qcow2"
 
+    magic_signatures = ((0, QCOW_MAGIC + b'\0\0\0\x02'),
+                        (0, QCOW_MAGIC + b'\0\0\0\x03'))
+
+    def __init__(self, path):
+        """Create a representation of an existing QCOW2 image.
+
+        Args:
+          path (str): Path to existing file.
+        """
+        super(QCOW2, self).__init__(path)
+        self._header = None
+
+    @property
+    def header(self):
+        """Header information of this image, as a :class:`QCOW2Header`.
+
+        Raises:
+          ValueError: if the QCOW2 header can't be parsed.
+        """
+        if self._header is None:
+            self._header = read_qcow2_header(self.path)
+            logger.debug("QCOW2 %s: %s", self.path, self._header)
+        return self._header
+
+    @property
+    def capacity(self):
+        """Capacity of this disk image, in bytes."""
+        if self._capacity is None:
+            try:
+                self._capacity = str(self.header.size)
+                logger.debug("Disk %s capacity is %s bytes", self.path,
+                             self._capacity)
+            except ValueError as exc:
+                logger.debug("Unable to read capacity of %s directly (%s)",
+                             self.path, exc)
+                return super(QCOW2, self).capacity
+        return self._capacity
+
+    @property
+    def backing_file(self):
+        """Path to the backing file of this image, or ``None``.
+
+        A relative backing file path is relative to this image's directory.
+        """
+        backing_file = self.header.backing_file
+        if backing_file is None:
+            return None
+        return os.path.join(os.path.dirname(self.path), backing_file)
+
+    @classmethod
+    def file_is_this_type(cls, path):
+        """Detect whether the given file is a QCOW2 image, from its header.
+
+        Args:
+          path (str): Path to file.
+
+        Returns:
+          int: 100 if the file is a QCOW2 (version 2 or 3) image, else 0.
+
+        Raises:
+          HelperError: if no file exists at ``path``.
+        """
+        if not os.path.exists(path):
+            raise HelperError(2, "No such file or directory: '{0}'"
+                              .format(path))
+        try:
+            read_qcow2_header(path)
+        except ValueError:
+            return 0
+        return 100
+
+    def convert_to(self, new_format, new_directory, new_subformat=None):
+        """Convert the disk file to a new format and return the new instance.
+
+        Checks first that the image can actually be converted - that it is
+        not encrypted and that its backing file (if any) exists, in which
+        case the backing chain is flattened into the converted image.
+
+        For the parameters, see :meth:`DiskRepresentation.convert_to`.
+
+        Returns:
+          DiskRepresentation: Converted disk
+
+        Raises:
+          NotImplementedError: if this image is encrypted or uses
+            unknown incompatible features.
+          IOError: if this image's backing file does not exist.
+        """
+        header = self.header
+        if header.encrypted:
+            raise NotImplementedError("Unable to convert encrypted QCOW2 "
+                                      "image {0}".format(self.path))
+        unknown = header.incompatible_features - set(INCOMPATIBLE_FEATURES)
+        if unknown:
+            raise NotImplementedError(
+                "QCOW2 image {0} uses unknown incompatible features {1}"
+                .format(self.path, sorted(unknown)))
+        backing_file = self.backing_file
+        if backing_file is not None:
+            if not os.path.exists(backing_file):
+                raise IOError(2, "Backing file '{0}' of QCOW2 image {1} does "
+                              "not exist".format(header.backing_file,
+                                                 self.path))
+            logger.info("QCOW2 image %s has backing file %s, which will be "
+                        "merged into the converted image.",
+                        self.path, backing_file)
+        return super(QCOW2, self).convert_to(new_format, new_directory,
+                                             new_subformat)
+
     @classmethod
     def from_other_image(cls, input_image, output_dir, output_subformat=None):
         """Convert the other disk image into an image of this type.
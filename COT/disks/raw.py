@@ -14,10 +14,13 @@
 
 import logging
 import os
-import re
 
-from COT.disks.disk import DiskRepresentation
+from COT.data_validation import ReadAheadReader
+from COT.disks.disk import DiskRepresentation, capacity_bytes
+from COT.disks.fat import FATBuilder, FATReader
+from COT.disks.vmdk import decode_stream_optimized
 from COT.helpers import helpers, helper_select
+from COT.utilities import directory_size
 
 logger = logging.getLogger(__name__)
 
@@ -29,30 +32,14 @@ class RAW(DiskRepresentation):
 
     @property
     def files(self):
-        """List of files on the FAT32 file system of this disk."""
+        """List of files on the FAT file system of this disk.
+
+        Raises:
+          ValueError: if this disk doesn't contain a FAT file system.
+        """
         if self._files is None and self.path and os.path.exists(self.path):
-            output = helpers['fatdisk'].call([self.path, "ls"])
-            # Output looks like:
-            #
-            # -----aD        13706       2016 Aug 04 input.ovf
-            # Listed 1 entry
-            #
-            # where all we really want is the 'input.ovf'
-            result = []
-            for line in output.split("\n"):
-                if not output:
-                    continue
-                if re.match(r"^Listed", line):
-                    continue
-                fields = line.split()
-                if not fields:
-                    continue
-                if len(fields) < 6:
-                    logger.warning("Unexpected line in 'fatdisk' output: %s",
-                                   line)
-                    continue
-                result.append(fields[5])
-            self._files = result
+            with open(self.path, 'rb') as file_obj:
+                self._files = FATReader(file_obj).files
         return self._files
 
     @classmethod
@@ -87,7 +74,7 @@ class RAW(DiskRepresentation):
 
         Args:
           path (str): Location to create RAW file.
-          files (list): List of files to include in a FAT32 filesystem.
+          files (list): List of files to include in a FAT filesystem.
           capacity (str): Disk capacity string. If not set, will be calculated
             as just sufficient to include the given ``files``.
           **kwargs: passed through to :meth:`DiskRepresentation._create_file`
@@ -100,7 +87,10 @@ class RAW(DiskRepresentation):
             # What size disk do we need to contain the requested file(s)?
             capacity_val = 0
             for content_file in files:
-                capacity_val += os.path.getsize(content_file)
+                if os.path.isdir(content_file):
+                    capacity_val += directory_size(content_file)
+                else:
+                    capacity_val += os.path.getsize(content_file)
             # Round capacity to the next larger multiple of 8 MB
             # just to be safe...
             capacity_val = int(8 * ((capacity_val / 1024 / 1024 / 8) + 1))
@@ -110,13 +100,17 @@ class RAW(DiskRepresentation):
                 "To contain files %s, disk capacity of %s will be %s",
                 files, path, capacity_str)
 
-        logger.info("Calling fatdisk to create/format a raw disk image")
-        helpers['fatdisk'].call([path, 'format', 'size', capacity, 'fat32'])
+        builder = FATBuilder(capacity_bytes(capacity))
         for content_file in files:
-            logger.verbose("Calling fatdisk to add %s to the image",
-                           content_file)
-            helpers['fatdisk'].call([path, 'fileadd', content_file,
-                                     os.path.basename(content_file)])
+            if os.path.isdir(content_file):
+                builder.add_tree(content_file)
+            else:
+                builder.add_file(os.path.basename(content_file),
+                                 path=content_file)
+        logger.info("Creating FAT%d-formatted raw disk image %s",
+                    builder.fat_type, path)
+        with open(path, 'wb') as file_obj:
+            builder.write(file_obj)
         logger.info("All requested files successfully added to %s", path)
 
     @classmethod
@@ -130,12 +124,37 @@ class RAW(DiskRepresentation):
 
         Returns:
           RAW: representation of newly created raw image.
+
+        .. note::
+
+          StreamOptimized VMDKs are decoded natively by
+          :func:`~COT.disks.vmdk.decode_stream_optimized`, leaving holes in
+          the raw image for any unallocated or zero grains. Other images
+          are converted by ``qemu-img``.
         """
         file_name = os.path.basename(input_image.path)
         file_prefix, _ = os.path.splitext(file_name)
         output_path = os.path.join(output_dir, file_prefix + ".img")
         if (input_image.disk_format == 'vmdk' and
                 input_image.disk_subformat == 'streamOptimized'):
+            logger.info("Decoding streamOptimized VMDK %s to %s",
+                        input_image.path, output_path)
+            try:
+                with open(input_image.path, 'rb') as input_obj, \
+                        ReadAheadReader(input_obj) as reader, \
+                        open(output_path, 'wb') as output_obj:
+                    decode_stream_optimized(reader, output_obj)
+                return cls(output_path)
+            except NotImplementedError as exc:
+                logger.debug("Not converting %s natively: %s",
+                             input_image.path, exc)
+                os.remove(output_path)
+            except Exception:
+                # Don't leave a partial image behind
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                raise
+
             helper = helper_select([('qemu-img', '1.2.0'), 'vmdktool'])
             # Special case: qemu-img < 1.2.0 can't read streamOptimized VMDKs
             if helper.name == 'vmdktool':
@@ -22,6 +22,8 @@ import mock
 
 from COT.tests import COTTestCase
 from COT.disks import DiskRepresentation
+from COT.disks.disk import match_signatures
+from COT.disks.tests.test_qcow2 import write_qcow2_header
 from COT.helpers import helpers, HelperError
 
 logger = logging.getLogger(__name__)
@@ -88,13 +90,66 @@ class TestDiskRepresentation(COTTestCase):
             mock_co.return_value = "qemu-img info: unsupported command"
             self.assertRaises(RuntimeError,
                               DiskRepresentation.from_file,
-                              self.input_vmdk)
+                              self.sample_cfg)
         # We support QCOW2 but not QCOW at present
         temp_path = os.path.join(self.temp_dir, "foo.qcow")
         helpers['qemu-img'].call(['create', '-f', 'qcow', temp_path, '8M'])
         self.assertRaises(NotImplementedError,
                           DiskRepresentation.from_file, temp_path)
 
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_disk_representation_from_file_magic(self, mock_check_output):
+        """Formats with a magic number are identified without helpers."""
+        qcow2_path = os.path.join(self.temp_dir, 'foo.img')
+        write_qcow2_header(qcow2_path)
+        for (path, disk_format) in ((self.blank_vmdk, "vmdk"),
+                                    (self.input_iso, "iso"),
+                                    (qcow2_path, "qcow2")):
+            diskrep = DiskRepresentation.from_file(path)
+            self.assertEqual(diskrep.disk_format, disk_format)
+        mock_check_output.assert_not_called()
+
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_disk_representation_from_file_unsupported(self,
+                                                       mock_check_output):
+        """Known but unsupported formats are rejected without helpers."""
+        temp_path = os.path.join(self.temp_dir, "foo.vhd")
+        with open(temp_path, 'wb') as fileobj:
+            fileobj.write(b'\0' * 4096 + b'conectix' + b'\0' * 504)
+        self.assertRaises(NotImplementedError,
+                          DiskRepresentation.from_file, temp_path)
+        write_qcow2_header(temp_path, version=1)
+        self.assertRaises(NotImplementedError,
+                          DiskRepresentation.from_file, temp_path)
+        mock_check_output.assert_not_called()
+
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_disk_representation_from_file_bad_header(self,
+                                                      mock_check_output):
+        """A magic number alone isn't enough if the header is invalid."""
+        temp_path = os.path.join(self.temp_dir, "foo.qcow2")
+        with open(temp_path, 'wb') as fileobj:
+            fileobj.write(b'QFI\xfb\0\0\0\x03')
+        self.assertRaises(NotImplementedError,
+                          DiskRepresentation.from_file, temp_path)
+        mock_check_output.assert_not_called()
+
+    def test_match_signatures(self):
+        """Signatures are matched from both ends of the file."""
+        signatures = {
+            'vhd': [(0, b'conectix'), (-512, b'conectix')],
+            'iso': [(0x8001, b'CD001')],
+        }
+        self.assertEqual(match_signatures(self.input_iso, signatures),
+                         set(['iso']))
+        self.assertEqual(match_signatures(self.blank_vmdk, signatures),
+                         set())
+        temp_path = os.path.join(self.temp_dir, "foo.vhd")
+        with open(temp_path, 'wb') as fileobj:
+            fileobj.write(b'conectix' + b'\0' * 504)
+        self.assertEqual(match_signatures(temp_path, signatures),
+                         set(['vhd']))
+
     @mock.patch('COT.helpers.helper.check_output')
     def test_capacity_qemu_error(self, mock_check_output):
         """Test error handline if qemu-img reports an error."""
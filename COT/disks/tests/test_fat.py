@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+#
+# test_fat.py - Unit test cases for native FAT file system handling.
+#
+# October 2026, the COT project developers
+# Copyright (c) 2026 the COT project developers.
+# See the COPYRIGHT.txt file at the top-level directory of this distribution
+# and at https://github.com/glennmatthews/cot/blob/master/COPYRIGHT.txt.
+#
+# This file is part of the Common OVF Tool (COT) project.
+# It is subject to the license terms in the LICENSE.txt file found in the
+# top-level directory of this distribution and at
+# https://github.com/glennmatthews/cot/blob/master/LICENSE.txt. No part
+# of COT, including this file, may be copied, modified, propagated, or
+# distributed except according to the terms contained in the LICENSE.txt file.
+
+"""Unit test cases for the COT.disks.fat module."""
+
+import os
+import struct
+
+from COT.tests import COTTestCase
+from COT.disks.fat import (
+    FATBuilder, FATReader, SECTOR_SIZE, PARTITION_START,
+)
+
+# pylint: disable=missing-type-doc,missing-param-doc
+
+
+def write_fat12_image(path):
+    """Write a minimal FAT12 floppy image without a partition table.
+
+    Contains ``readme.txt`` (an 8.3 name stored in lowercase via the
+    NT case flags, whose clusters are not contiguous) and ``EMPTY.DAT``.
+    """
+    boot = bytearray(SECTOR_SIZE)
+    boot[0:3] = b'\xeb\x3c\x90'
+    # 512-byte sectors, 1 sector/cluster, 1 reserved, 2 FATs,
+    # 16 root entries, 64 sectors in total, 1 sector per FAT
+    struct.pack_into('<HBHBHHBH', boot, 11, 512, 1, 1, 2, 16, 64, 0xf0, 1)
+    boot[510:512] = b'\x55\xaa'
+    fat = bytearray(SECTOR_SIZE)
+    # Entries 0-1 reserved; chain 2 -> 4 -> 5 (end); 3 unused
+    entries = [0xff0, 0xfff, 4, 0, 5, 0xfff]
+    for index in range(0, len(entries), 2):
+        (low, high) = entries[index:index + 2]
+        fat[index * 3 // 2:index * 3 // 2 + 3] = struct.pack(
+            '<I', low | (high << 12))[:3]
+    root = bytearray(SECTOR_SIZE)
+    root[0:32] = struct.pack('<11sBBB8xHHHI', b'README  TXT', 0x20, 0x18,
+                             0, 0, 0, 2, 1100)
+    root[32:64] = struct.pack('<11sBBB8xHHHI', b'EMPTY   DAT', 0x20, 0, 0,
+                              0, 0, 0, 0)
+    root[64:96] = struct.pack('<11sB20x', b'\xe5ELETED TXT', 0x20)
+    data = {2: b'a' * 512, 3: b'x' * 512, 4: b'b' * 512, 5: b'c' * 76}
+    with open(path, 'wb') as fobj:
+        fobj.write(bytes(boot) + bytes(fat) * 2 + bytes(root))
+        # Data area starts at sector 4
+        for cluster in sorted(data):
+            fobj.seek((4 + cluster - 2) * SECTOR_SIZE)
+            fobj.write(data[cluster])
+        fobj.truncate(64 * SECTOR_SIZE)
+
+
+class TestFATBuilder(COTTestCase):
+    """Test cases for FATBuilder class."""
+
+    def setUp(self):
+        """Test case setup function called automatically before each test."""
+        super(TestFATBuilder, self).setUp()
+        self.image = os.path.join(self.temp_dir, "fat.img")
+
+    def build(self, builder):
+        """Write the builder's image and return its contents."""
+        with open(self.image, 'wb') as fobj:
+            builder.write(fobj)
+        with open(self.image, 'rb') as fobj:
+            return fobj.read()
+
+    def test_layout(self):
+        """Check the MBR, boot sector, FATs, and root directory of FAT32."""
+        builder = FATBuilder(64 << 20, timestamp=0)
+        builder.add_file("CONFIG.TXT", data=b"hello\n")
+        data = self.build(builder)
+        self.assertEqual(builder.fat_type, 32)
+        self.assertEqual(len(data), 64 << 20)
+
+        # MBR with a single FAT32 (LBA) partition
+        self.assertEqual(data[510:512], b'\x55\xaa')
+        (ptype, start, sectors) = struct.unpack_from('<4xB3xII', data, 446)
+        self.assertEqual((ptype, start, sectors),
+                         (0x0c, PARTITION_START, 131072 - PARTITION_START))
+
+        boot = data[start * SECTOR_SIZE:(start + 1) * SECTOR_SIZE]
+        self.assertEqual(boot[510:], b'\x55\xaa')
+        self.assertEqual(boot[82:90], b'FAT32   ')
+        (sector_size, sectors_per_cluster, reserved, fats) = \
+            struct.unpack_from('<HBHB', boot, 11)
+        self.assertEqual((sector_size, sectors_per_cluster, reserved, fats),
+                         (512, 1, 32, 2))
+        (fat_sectors, _, _, root_cluster) = struct.unpack_from('<IHHI',
+                                                               boot, 36)
+        self.assertEqual(root_cluster, 2)
+        # FSInfo sector: signatures, free count, and next free cluster
+        fsinfo = data[(start + 1) * SECTOR_SIZE:(start + 2) * SECTOR_SIZE]
+        self.assertEqual(len(builder._fsinfo_sector(4)), SECTOR_SIZE)
+        self.assertEqual(struct.unpack_from('<I', fsinfo, 0), (0x41615252,))
+        self.assertEqual(struct.unpack_from('<III', fsinfo, 484),
+                         (0x61417272, builder.cluster_count - 2, 4))
+        self.assertEqual(fsinfo[508:], b'\0\0\x55\xaa')
+        # Backup boot sector and FSInfo sector
+        self.assertEqual(data[(start + 6) * SECTOR_SIZE:
+                              (start + 7) * SECTOR_SIZE], boot)
+        self.assertEqual(data[(start + 7) * SECTOR_SIZE:
+                              (start + 8) * SECTOR_SIZE], fsinfo)
+
+        # Both FATs: root directory and the file each occupy one cluster
+        fat_start = (start + reserved) * SECTOR_SIZE
+        for index in range(fats):
+            offset = fat_start + index * fat_sectors * SECTOR_SIZE
+            self.assertEqual(struct.unpack_from('<4I', data, offset),
+                             (0x0ffffff8, 0x0fffffff,
+                              0x0fffffff, 0x0fffffff))
+
+        # Root directory: volume label, then a short name with no LFN
+        root = (start + reserved + fats * fat_sectors) * SECTOR_SIZE
+        self.assertEqual(data[root:root + 12], b'NO NAME    \x08')
+        entry = data[root + 32:root + 64]
+        self.assertEqual(entry[:12], b'CONFIG  TXT\x20')
+        (cluster, size) = struct.unpack_from('<HI', entry, 26)
+        self.assertEqual((cluster, size), (3, 6))
+        self.assertEqual(data[root + SECTOR_SIZE:root + SECTOR_SIZE + 6],
+                         b"hello\n")
+
+    def test_layout_fat16(self):
+        """Images too small for 65525 FAT32 clusters are FAT16 instead."""
+        builder = FATBuilder(8 << 20, timestamp=0)
+        builder.add_file("CONFIG.TXT", data=b"hello\n")
+        data = self.build(builder)
+        self.assertEqual(builder.fat_type, 16)
+        self.assertGreaterEqual(builder.cluster_count, 4085)
+        self.assertLess(builder.cluster_count, 65525)
+
+        (ptype, start, sectors) = struct.unpack_from('<4xB3xII', data, 446)
+        self.assertEqual((ptype, start, sectors),
+                         (0x0e, PARTITION_START, 16384 - PARTITION_START))
+
+        boot = data[start * SECTOR_SIZE:(start + 1) * SECTOR_SIZE]
+        self.assertEqual(boot[510:], b'\x55\xaa')
+        self.assertEqual(boot[54:62], b'FAT16   ')
+        (sector_size, sectors_per_cluster, reserved, fats, root_entries,
+         total_sectors, _, fat_sectors) = struct.unpack_from('<HBHBHHBH',
+                                                             boot, 11)
+        self.assertEqual((sector_size, sectors_per_cluster, reserved, fats,
+                          root_entries, total_sectors),
+                         (512, 2, 1, 2, 512, sectors))
+
+        # Both FATs: the root directory has no clusters, the file has one
+        fat_start = (start + reserved) * SECTOR_SIZE
+        for index in range(fats):
+            offset = fat_start + index * fat_sectors * SECTOR_SIZE
+            self.assertEqual(struct.unpack_from('<4H', data, offset),
+                             (0xfff8, 0xffff, 0xffff, 0))
+
+        # Fixed root directory area, then the data clusters
+        root = (start + reserved + fats * fat_sectors) * SECTOR_SIZE
+        self.assertEqual(data[root:root + 12], b'NO NAME    \x08')
+        entry = data[root + 32:root + 64]
+        self.assertEqual(entry[:12], b'CONFIG  TXT\x20')
+        (cluster, size) = struct.unpack_from('<HI', entry, 26)
+        self.assertEqual((cluster, size), (2, 6))
+        data_start = root + root_entries * 32
+        self.assertEqual(data[data_start:data_start + 6], b"hello\n")
+
+    def test_long_names(self):
+        """Names that aren't upper-case 8.3 get LFN entries and a ~N tail."""
+        builder = FATBuilder(8 << 20)
+        builder.add_file("config.txt", data=b"1")
+        builder.add_file("My long file name.text", data=b"2")
+        builder.add_file("My long file name.text2", data=b"3")
+        data = self.build(builder)
+        root = data.index(b'NO NAME    \x08')
+        entries = [data[offset:offset + 32]
+                   for offset in range(root + 32, root + 32 * 9, 32)]
+        # 22-character name - two LFN entries, last part first
+        self.assertEqual(entries[0][0:1], b'\x42')
+        self.assertEqual(entries[0][11:12], b'\x0f')
+        self.assertEqual(entries[1][0:1], b'\x01')
+        self.assertEqual(entries[1][1:11].decode('utf-16-le'), "My lo")
+        self.assertEqual(entries[2][:11], b'MYLONG~1TEX')
+        self.assertEqual(entries[5][:11], b'MYLONG~2TEX')
+        # config.txt - one LFN entry, then the short name
+        self.assertEqual(entries[6][0:1], b'\x41')
+        self.assertEqual(entries[7][:11], b'CONFIG  TXT')
+
+        # Upper-case names that don't fit 8.3 need LFN entries too
+        builder = FATBuilder(8 << 20)
+        builder.add_file("IOSXR_CONFIG.TXT", data=b"4")
+        builder.add_file("FILE.JSON", data=b"5")
+        self.build(builder)
+        with open(self.image, 'rb') as fobj:
+            reader = FATReader(fobj)
+            self.assertEqual(reader.files, ['FILE.JSON', 'IOSXR_CONFIG.TXT'])
+            self.assertEqual(b''.join(reader.read_file("IOSXR_CONFIG.TXT")),
+                             b"4")
+            self.assertEqual(b''.join(reader.read_file("FILE.JSON")), b"5")
+
+    def test_subdirectory(self):
+        """Subdirectories have '.' and '..' entries."""
+        builder = FATBuilder(8 << 20)
+        builder.add_file("SUB/FILE.TXT", data=b"hello")
+        builder.add_directory("SUB")
+        data = self.build(builder)
+        offset = data.index(b'.          \x10')
+        self.assertEqual(data[offset + 32:offset + 44],
+                         b'..         \x10')
+        self.assertEqual(data[offset + 64:offset + 75], b'FILE    TXT')
+
+    def test_sparse(self):
+        """Only the used areas of the image are written."""
+        builder = FATBuilder(64 << 20)
+        builder.add_file("config.txt", path=self.input_ovf)
+        self.build(builder)
+        stat = os.stat(self.image)
+        self.assertEqual(stat.st_size, 64 << 20)
+        if hasattr(stat, 'st_blocks'):
+            self.assertLess(stat.st_blocks * 512, 16 << 20)
+
+    def test_errors(self):
+        """Invalid names, duplicates, and files that don't fit."""
+        self.assertRaises(ValueError, FATBuilder, 1 << 20)
+        # Too few clusters even for FAT16
+        self.assertRaises(ValueError, FATBuilder, 3 << 20)
+        builder = FATBuilder(4 << 20)
+        builder.add_file("foo.txt", data=b"")
+        self.assertRaises(ValueError, builder.add_file, "FOO.TXT", data=b"")
+        self.assertRaises(ValueError, builder.add_file, "x" * 256, data=b"")
+        self.assertRaises(ValueError, builder.add_directory, "foo.txt/bar")
+        builder.add_file("big", data=b"\1" * (4 << 20))
+        with open(self.image, 'wb') as fobj:
+            self.assertRaises(ValueError, builder.write, fobj)
+
+
+class TestFATReader(COTTestCase):
+    """Test cases for FATReader class."""
+
+    def setUp(self):
+        """Test case setup function called automatically before each test."""
+        super(TestFATReader, self).setUp()
+        self.image = os.path.join(self.temp_dir, "fat.img")
+
+    def test_round_trip(self):
+        """Read back an image created by FATBuilder."""
+        builder = FATBuilder(8 << 20)
+        builder.add_file("config.txt", path=self.input_ovf)
+        builder.add_file("Sub Directory/A rather long file name.text",
+                         data=b"hello\n")
+        builder.add_file("Sub Directory/SHORT.TXT", data=b"")
+        with open(self.image, 'wb') as fobj:
+            builder.write(fobj)
+
+        with open(self.image, 'rb') as fobj:
+            reader = FATReader(fobj)
+            self.assertEqual(reader.fat_type, 16)
+            self.assertEqual(reader.files, [
+                'Sub Directory',
+                'config.txt',
+                'Sub Directory/A rather long file name.text',
+                'Sub Directory/SHORT.TXT',
+            ])
+            entry = reader.find("CONFIG.TXT")
+            self.assertFalse(entry.is_directory)
+            self.assertEqual(entry.size, os.path.getsize(self.input_ovf))
+            self.assertTrue(reader.find("sub directory").is_directory)
+            with open(self.input_ovf, 'rb') as expected:
+                self.assertEqual(b''.join(reader.read_file("config.txt")),
+                                 expected.read())
+            self.assertEqual(b''.join(reader.read_file(
+                "Sub Directory/A rather long file name.text")), b"hello\n")
+            self.assertEqual(b''.join(reader.read_file(
+                "Sub Directory/SHORT.TXT")), b"")
+            self.assertRaises(KeyError, reader.find, "nonexistent")
+            self.assertRaises(KeyError, list,
+                              reader.read_file("Sub Directory"))
+
+    def test_fat12(self):
+        """Read a FAT12 image with a non-contiguous cluster chain."""
+        write_fat12_image(self.image)
+        with open(self.image, 'rb') as fobj:
+            reader = FATReader(fobj)
+            self.assertEqual(reader.fat_type, 12)
+            self.assertEqual(reader.files, ['readme.txt', 'EMPTY.DAT'])
+            self.assertEqual(b''.join(reader.read_file('readme.txt')),
+                             b'a' * 512 + b'b' * 512 + b'c' * 76)
+
+    def test_not_fat(self):
+        """FATReader rejects images without a FAT file system."""
+        with open(self.input_iso, 'rb') as fobj:
+            self.assertRaises(ValueError, FATReader, fobj)
@@ -18,19 +18,72 @@
 
 import logging
 import os
+import struct
 import mock
 
 from COT.tests import COTTestCase
 from COT.disks import ISO
-from COT.helpers import (
-    helpers, HelperError, HelperNotFoundError,
-)
+from COT.disks.iso import ISOBuilder, read_iso_contents, SECTOR_SIZE
+from COT.helpers import helpers, HelperError
 
 logger = logging.getLogger(__name__)
 
 # pylint: disable=protected-access,missing-type-doc,missing-param-doc
 
 
+def both_endian(value):
+    """Encode a 32-bit value in ISO 9660 both-endian format."""
+    return struct.pack('<I', value) + struct.pack('>I', value)
+
+
+def directory_record(extent, size, name, flags=0, system_use=b''):
+    """Construct an ISO 9660 directory record."""
+    body = (b'\0' + both_endian(extent) + both_endian(size) + b'\0' * 7 +
+            struct.pack('<BBB', flags, 0, 0) + b'\0\x01\x01\0' +
+            struct.pack('<B', len(name)) + name +
+            (b'' if len(name) % 2 else b'\0') + system_use)
+    return struct.pack('<B', len(body) + 1) + body
+
+
+def write_rockridge_iso(path):
+    """Write a minimal ISO with Rock Ridge names and a subdirectory.
+
+    Contents are ``Mixed.Case.txt`` and ``subdir/a_very_long_name.txt``,
+    the latter name being split across two 'NM' entries in a 'CE'
+    continuation area.
+    """
+    def entry(signature, data):
+        return signature + struct.pack('<BB', len(data) + 4, 1) + data
+
+    root_dot = (entry(b'SP', b'\xbe\xef\0') +
+                entry(b'ER', b'\x0a\0\0\x01RRIP_1991A'))
+    continuation = (entry(b'NM', b'\x01a_very_long_') +
+                    entry(b'NM', b'\0name.txt'))
+    root = (directory_record(18, SECTOR_SIZE, b'\0', 2, root_dot) +
+            directory_record(18, SECTOR_SIZE, b'\1', 2) +
+            directory_record(20, 4, b'MIXED_CA.TXT;1', 0,
+                             entry(b'NM', b'\0Mixed.Case.txt')) +
+            directory_record(19, SECTOR_SIZE, b'SUBDIR', 2,
+                             entry(b'NM', b'\0subdir')))
+    subdir = (directory_record(19, SECTOR_SIZE, b'\0', 2) +
+              directory_record(18, SECTOR_SIZE, b'\1', 2) +
+              directory_record(20, 4, b'A_VERY_L.TXT;1', 0,
+                               entry(b'CE', both_endian(21) + both_endian(0) +
+                                     both_endian(len(continuation)))))
+    pvd = bytearray(SECTOR_SIZE)
+    pvd[0:6] = b'\x01CD001'
+    pvd[128:132] = struct.pack('<H', SECTOR_SIZE) * 2
+    pvd[156:190] = directory_record(18, SECTOR_SIZE, b'\0', 2)
+    terminator = b'\xffCD001'
+    with open(path, 'wb') as fileobj:
+        for (sector, data) in ((16, bytes(pvd)), (17, terminator),
+                               (18, root), (19, subdir), (20, b'foo\n'),
+                               (21, continuation)):
+            fileobj.seek(sector * SECTOR_SIZE)
+            fileobj.write(data)
+        fileobj.truncate(22 * SECTOR_SIZE)
+
+
 class TestISO(COTTestCase):
     """Test cases for ISO class."""
 
@@ -54,10 +107,9 @@ class TestISO(COTTestCase):
         self.assertEqual(iso.path, self.input_iso)
         self.assertEqual(iso.disk_format, 'iso')
         self.assertEqual(iso.capacity, str(self.FILE_SIZE['input.iso']))
-        if helpers['isoinfo']:
-            self.assertEqual(iso.disk_subformat, "")
-            self.assertEqual(iso.files,
-                             ['iosxr_config.txt', 'iosxr_config_admin.txt'])
+        self.assertEqual(iso.disk_subformat, "")
+        self.assertEqual(iso.files,
+                         ['iosxr_config.txt', 'iosxr_config_admin.txt'])
         self.assertEqual(iso.predicted_drive_type, 'cdrom')
 
     def test_create_with_files(self):
@@ -65,48 +117,32 @@ class TestISO(COTTestCase):
         disk_path = os.path.join(self.temp_dir, "out.iso")
         ISO.create_file(disk_path, files=[self.input_ovf])
         iso = ISO(disk_path)
-        if helpers['isoinfo']:
-            # Our default create format is rockridge
-            self.assertEqual(iso.disk_subformat, "rockridge")
-            self.assertEqual(iso.files,
-                             [os.path.basename(self.input_ovf)])
-        else:
-            helpers['isoinfo']._installed = True
-
-            with mock.patch.object(helpers['isoinfo'], "call",
-                                   return_value="Rock Ridge extensions found"):
-                self.assertEqual(iso.disk_subformat, "rockridge")
-
-            with mock.patch.object(helpers['isoinfo'], "call",
-                                   return_value="""
-Setting input-charset to 'UTF-8' from locale.
-/{0}
-""".format(os.path.basename(self.input_ovf))):
-                self.assertEqual(iso.files,
-                                 [os.path.basename(self.input_ovf)])
+        # Our default create format is rockridge
+        self.assertEqual(iso.disk_subformat, "rockridge")
+        self.assertEqual(iso.files, [os.path.basename(self.input_ovf)])
 
     def test_create_with_files_non_rockridge(self):
         """Creation of a non-rock-ridge ISO with specific file contents."""
         disk_path = os.path.join(self.temp_dir, "out.iso")
         ISO.create_file(disk_path, files=[self.input_ovf], disk_subformat="")
         iso = ISO(disk_path)
-        if helpers['isoinfo']:
-            self.assertEqual(iso.disk_subformat, "")
+        self.assertEqual(iso.disk_subformat, "")
+        self.assertEqual(iso.files, [os.path.basename(self.input_ovf)])
+
+    def test_rock_ridge(self):
+        """Rock Ridge names are read natively, without isoinfo."""
+        write_rockridge_iso(self.foo_iso)
+        with mock.patch.object(helpers['isoinfo'], "call") as mock_call:
+            iso = ISO(self.foo_iso)
+            self.assertEqual(iso.disk_subformat, "rockridge")
             self.assertEqual(iso.files,
-                             [os.path.basename(self.input_ovf)])
-        else:
-            helpers['isoinfo']._installed = True
-            with mock.patch.object(helpers['isoinfo'], "call",
-                                   return_value="No SUSP/Rock Ridge present"):
-                self.assertEqual(iso.disk_subformat, "")
-
-            with mock.patch.object(helpers['isoinfo'], "call",
-                                   return_value="""
-Setting input-charset to 'UTF-8' from locale.
-/{0};1
-""".format(os.path.basename(self.input_ovf).upper())):
-                self.assertEqual(iso.files,
-                                 [os.path.basename(self.input_ovf)])
+                             ['Mixed.Case.txt', 'subdir',
+                              'subdir/a_very_long_name.txt'])
+            mock_call.assert_not_called()
+
+    def test_read_iso_contents_invalid(self):
+        """read_iso_contents rejects files that aren't ISO images."""
+        self.assertRaises(ValueError, read_iso_contents, self.blank_vmdk)
 
     def test_create_without_files(self):
         """Can't create an empty ISO."""
@@ -115,82 +151,70 @@ Setting input-charset to 'UTF-8' from locale.
                           path=os.path.join(self.temp_dir, "out.iso"),
                           capacity="100")
 
-    @mock.patch("COT.helpers.mkisofs.MkISOFS.call")
-    def test_create_with_mkisofs(self, mock_call):
-        """Creation of an ISO with mkisofs (default)."""
-        helpers['mkisofs']._installed = True
-        ISO.create_file(path=self.foo_iso, files=[self.input_ovf])
-        mock_call.assert_called_with(
-            ['-output', self.foo_iso, '-full-iso9660-filenames',
-             '-iso-level', '2', '-allow-lowercase', '-r', self.input_ovf])
-
-    @mock.patch("COT.helpers.mkisofs.GenISOImage.call")
-    def test_create_with_genisoimage(self, mock_call):
-        """Creation of an ISO with genisoimage if mkisofs is unavailable."""
-        helpers['mkisofs']._installed = False
-        helpers['genisoimage']._installed = True
-        ISO.create_file(path=self.foo_iso, files=[self.input_ovf])
-        mock_call.assert_called_with(
-            ['-output', self.foo_iso, '-full-iso9660-filenames',
-             '-iso-level', '2', '-allow-lowercase', '-r', self.input_ovf])
-
-    @mock.patch("COT.helpers.mkisofs.XorrISO.call")
-    def test_create_with_xorriso(self, mock_call):
-        """Creation of an ISO with xorriso as last resort."""
-        helpers['mkisofs']._installed = False
-        helpers['genisoimage']._installed = False
-        helpers['xorriso']._installed = True
-        ISO.create_file(path=self.foo_iso, files=[self.input_ovf])
-        mock_call.assert_called_with(
-            ['-as', 'mkisofs', '-output', self.foo_iso,
-             '-full-iso9660-filenames', '-iso-level', '2', '-allow-lowercase',
-             '-r', self.input_ovf])
-
-    def test_create_no_helpers_available(self):
-        """Creation of ISO should fail if no helpers are install[ed|able]."""
-        helpers['mkisofs']._installed = False
-        helpers['genisoimage']._installed = False
-        helpers['xorriso']._installed = False
-        helpers['apt-get']._installed = False
-        helpers['brew']._installed = False
-        helpers['port']._installed = False
-        helpers['yum']._installed = False
-        self.assertRaises(HelperNotFoundError,
-                          ISO.create_file,
-                          path=self.foo_iso,
-                          files=[self.input_ovf])
-
-    @mock.patch("COT.helpers.mkisofs.MkISOFS.call")
-    def test_create_with_mkisofs_non_rockridge(self, mock_call):
-        """Creation of a non-Rock-Ridge ISO with mkisofs (default)."""
-        helpers['mkisofs']._installed = True
-        ISO.create_file(path=self.foo_iso, files=[self.input_ovf],
-                        disk_subformat="")
-        mock_call.assert_called_with(
-            ['-output', self.foo_iso, '-full-iso9660-filenames',
-             '-iso-level', '2', '-allow-lowercase', self.input_ovf])
+    def test_create_with_directory(self):
+        """Like mkisofs, the contents of a directory are added to the root."""
+        extra_dir = os.path.join(self.temp_dir, "extra")
+        os.makedirs(os.path.join(extra_dir, "subdir"))
+        with open(os.path.join(extra_dir, "subdir", "file.txt"), 'w') as fobj:
+            fobj.write("Hello world\n")
+        ISO.create_file(self.foo_iso, files=[self.input_ovf, extra_dir])
+        self.assertEqual(ISO(self.foo_iso).files,
+                         ['input.ovf', 'subdir', 'subdir/file.txt'])
+
+    def test_create_no_helpers(self):
+        """Creation of an ISO doesn't need mkisofs or similar helpers."""
+        with mock.patch("COT.helpers.helper.Helper.call") as mock_call:
+            ISO.create_file(path=self.foo_iso, files=[self.input_ovf])
+            mock_call.assert_not_called()
+        self.assertTrue(ISO.file_is_this_type(self.foo_iso))
+
+    def test_builder(self):
+        """ISOBuilder round trip with in-memory data and long names."""
+        long_name = "x" * 200 + ".txt"
+        builder = ISOBuilder(timestamp=0)
+        builder.add_file("config.txt", data=b"hello\n")
+        builder.add_file("dir/" + long_name, data=b"")
+        builder.add_file("dir/" + long_name[:-1], path=self.input_ovf)
+        builder.add_directory("empty")
+        self.assertRaises(ValueError, builder.add_file, "config.txt",
+                          data=b"")
+        size = builder.size
+        with open(self.foo_iso, 'wb') as fobj:
+            builder.write(fobj)
+        self.assertEqual(os.path.getsize(self.foo_iso), size)
+        self.assertEqual(size % SECTOR_SIZE, 0)
+        self.assertEqual(read_iso_contents(self.foo_iso),
+                         ("rockridge",
+                          ['config.txt', 'dir', 'empty',
+                           'dir/' + long_name, 'dir/' + long_name[:-1]]))
+        # File contents are at the expected, sector-aligned locations
+        with open(self.foo_iso, 'rb') as fobj:
+            data = fobj.read()
+        self.assertEqual(data.count(b"hello\n"), 1)
+        self.assertEqual(data.index(b"hello\n") % SECTOR_SIZE, 0)
+
+    def test_builder_non_rockridge(self):
+        """ISO 9660 names are sanitized, truncated, and made unique."""
+        builder = ISOBuilder(rockridge=False)
+        builder.add_file("my file.cfg.txt", data=b"1")
+        builder.add_file("y" * 40 + ".txt", data=b"2")
+        builder.add_file("y" * 40 + ".txt.txt", data=b"3")
+        builder.add_file("subdir.d/README", data=b"4")
+        with open(self.foo_iso, 'wb') as fobj:
+            builder.write(fobj)
+        self.assertEqual(read_iso_contents(self.foo_iso),
+                         ("",
+                          ['my_file_cfg.txt;1', 'subdir_d',
+                           'y' * 26 + '1.txt;1', 'y' * 27 + '.txt;1',
+                           'subdir_d/README.;1']))
 
     def test_file_is_this_type_nonexistent(self):
         """Call file_is_this_type should fail if file doesn't exist."""
         self.assertRaises(HelperError,
                           ISO.file_is_this_type, "/foo/bar")
 
-    def test_file_is_this_type_isoinfo(self):
-        """The file_is_this_type API should use isoinfo if available."""
-        if helpers['isoinfo']:
-            self.assertTrue(ISO.file_is_this_type(self.input_iso))
-            self.assertFalse(ISO.file_is_this_type(self.blank_vmdk))
-        else:
-            # Fake it til you make it
-            helpers['isoinfo']._installed = True
-            with mock.patch.object(helpers['isoinfo'], "call"):
-                self.assertTrue(ISO.file_is_this_type(self.input_iso))
-            with mock.patch.object(helpers['isoinfo'], "call",
-                                   side_effect=HelperError):
-                self.assertFalse(ISO.file_is_this_type(self.blank_vmdk))
-
-    def test_file_is_this_type_noisoinfo(self):
-        """The file_is_this_type API should work if isoinfo isn't available."""
+    def test_file_is_this_type(self):
+        """The file_is_this_type API should work without isoinfo."""
         _isoinfo = helpers['isoinfo']
         helpers['isoinfo'] = False
         try:
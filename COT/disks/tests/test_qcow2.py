@@ -18,19 +18,201 @@
 
 import logging
 import os
+import struct
+import zlib
 
 from distutils.version import StrictVersion
 import mock
 
 from COT.tests import COTTestCase
 from COT.disks import QCOW2, VMDK, RAW
-from COT.helpers import helpers
+from COT.disks.qcow2 import QCOW2Reader, read_qcow2_header
+from COT.helpers import helpers, HelperError
 
 logger = logging.getLogger(__name__)
 
 # pylint: disable=missing-type-doc,missing-param-doc
 
 
+def write_qcow2_header(path, version=3, size=(1 << 30), backing_file=None,
+                       backing_format=None, crypt_method=0,
+                       incompatible_features=0):
+    """Write a QCOW2 header (only) with the given properties."""
+    header_length = 72 if version == 2 else 104
+    extensions = b''
+    if backing_format:
+        data = backing_format.encode()
+        extensions += struct.pack('>II', 0xe2792aca, len(data))
+        extensions += data + b'\0' * (-len(data) % 8)
+    extensions += struct.pack('>II', 0, 0)
+    backing_file = (backing_file or '').encode()
+    backing_file_offset = (header_length + len(extensions)
+                           if backing_file else 0)
+    header = struct.pack('>4sIQIIQIIQQIIQ', b'QFI\xfb', version,
+                         backing_file_offset, len(backing_file), 16, size,
+                         crypt_method, 0, 0, 0, 0, 0, 0)
+    if version == 3:
+        header += struct.pack('>QQQII', incompatible_features, 0, 0, 4,
+                              header_length)
+    with open(path, 'wb') as fileobj:
+        fileobj.write(header + extensions + backing_file)
+
+
+def write_qcow2_image(path, size, clusters):
+    """Write a small QCOW2 v3 image with 4 KiB clusters and one L2 table.
+
+    ``clusters`` maps guest cluster numbers to their data; a value of
+    ``None`` marks a zero cluster, and a tuple ``('compressed', data)``
+    marks a compressed cluster.
+    """
+    cluster_size = 4096
+    # Cluster 0 is the header, 1 the L1 table, 2 the L2 table, then data
+    l1_size = (size + cluster_size * 512 - 1) // (cluster_size * 512)
+    header = struct.pack('>4sIQIIQIIQQIIQ', b'QFI\xfb', 3, 0, 0, 12, size,
+                         0, l1_size, cluster_size, 0, 0, 0, 0)
+    header += struct.pack('>QQQII', 0, 0, 0, 4, 104)
+    header += struct.pack('>II', 0, 0)
+    l2_table = [0] * 512
+    data = b''
+    offset = 3 * cluster_size
+    for cluster, content in sorted(clusters.items()):
+        if content is None:
+            l2_table[cluster] = 1
+        elif isinstance(content, tuple):
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -12)
+            compressed = compressor.compress(content[1]) + compressor.flush()
+            # Deliberately not sector-aligned
+            start = offset + len(data) + 100
+            sectors = (start % 512 + len(compressed) + 511) // 512
+            l2_table[cluster] = (1 << 62) | ((sectors - 1) << 58) | start
+            data += b'\0' * 100 + compressed
+        else:
+            l2_table[cluster] = offset + len(data)
+            data += content
+        data += b'\0' * (-len(data) % cluster_size)
+    l1_table = [2 * cluster_size] + [0] * (l1_size - 1)
+    with open(path, 'wb') as fileobj:
+        fileobj.write(header + b'\0' * (cluster_size - len(header)))
+        fileobj.write(struct.pack('>{0}Q'.format(l1_size), *l1_table))
+        fileobj.write(b'\0' * (cluster_size - 8 * l1_size))
+        fileobj.write(struct.pack('>512Q', *l2_table))
+        fileobj.write(data)
+
+
+class TestQCOW2Header(COTTestCase):
+    """Test cases for reading QCOW2 headers natively."""
+
+    def setUp(self):
+        """Pre-testcase setup."""
+        super(TestQCOW2Header, self).setUp()
+        self.path = os.path.join(self.temp_dir, "foo.qcow2")
+
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_header(self, mock_check_output):
+        """Capacity and type are read without calling qemu-img."""
+        for version in (2, 3):
+            write_qcow2_header(self.path, version=version, size=12345678)
+            self.assertEqual(QCOW2.file_is_this_type(self.path), 100)
+            qcow2 = QCOW2(self.path)
+            self.assertEqual(qcow2.capacity, "12345678")
+            self.assertEqual(qcow2.header.version, version)
+            self.assertEqual(qcow2.header.cluster_size, 65536)
+            self.assertFalse(qcow2.header.encrypted)
+            self.assertEqual(qcow2.header.incompatible_features, set())
+            self.assertIsNone(qcow2.backing_file)
+        mock_check_output.assert_not_called()
+
+    def test_not_qcow2(self):
+        """Other files, including QCOW version 1, are not QCOW2."""
+        self.assertEqual(QCOW2.file_is_this_type(self.blank_vmdk), 0)
+        write_qcow2_header(self.path, version=1)
+        self.assertEqual(QCOW2.file_is_this_type(self.path), 0)
+        self.assertRaises(ValueError, read_qcow2_header, self.path)
+        with open(self.path, 'wb') as fileobj:
+            fileobj.write(b'QFI\xfb\0\0\0\x03')
+        self.assertRaises(ValueError, read_qcow2_header, self.path)
+        self.assertRaises(HelperError, QCOW2.file_is_this_type, "/foo/bar")
+
+    def test_backing_file(self):
+        """A missing backing file is detected before conversion."""
+        write_qcow2_header(self.path, backing_file="base.qcow2",
+                           backing_format="qcow2")
+        qcow2 = QCOW2(self.path)
+        self.assertEqual(qcow2.header.backing_file, "base.qcow2")
+        self.assertEqual(qcow2.header.backing_format, "qcow2")
+        self.assertEqual(qcow2.backing_file,
+                         os.path.join(self.temp_dir, "base.qcow2"))
+        with mock.patch('COT.disks.vmdk.VMDK.from_other_image') as convert:
+            self.assertRaises(IOError, qcow2.convert_to,
+                              'vmdk', self.temp_dir, 'streamOptimized')
+            convert.assert_not_called()
+
+            write_qcow2_header(os.path.join(self.temp_dir, "base.qcow2"))
+            qcow2.convert_to('vmdk', self.temp_dir, 'streamOptimized')
+            convert.assert_called_once_with(qcow2, self.temp_dir,
+                                            'streamOptimized')
+        self.assertLogged(levelname='INFO', msg="has backing file")
+
+    def test_unconvertible(self):
+        """Encrypted images and unknown features are rejected."""
+        for kwargs in ({'crypt_method': 1},
+                       {'incompatible_features': 1 << 40}):
+            write_qcow2_header(self.path, **kwargs)
+            qcow2 = QCOW2(self.path)
+            with mock.patch('COT.disks.vmdk.VMDK.from_other_image') as conv:
+                self.assertRaises(NotImplementedError, qcow2.convert_to,
+                                  'vmdk', self.temp_dir, 'streamOptimized')
+                conv.assert_not_called()
+
+
+class TestQCOW2Reader(COTTestCase):
+    """Test cases for reading QCOW2 guest data natively."""
+
+    def setUp(self):
+        """Pre-testcase setup."""
+        super(TestQCOW2Reader, self).setUp()
+        self.path = os.path.join(self.temp_dir, "foo.qcow2")
+
+    def test_read(self):
+        """Standard, zero, compressed, and unallocated clusters."""
+        size = 3 * 1024 * 1024
+        write_qcow2_image(self.path, size, {
+            0: b'a' * 4096,
+            1: None,
+            2: ('compressed', b'hello world' * 372 + b'!!!!'),
+            511: b'z' * 4096,
+        })
+        with open(self.path, 'rb') as fileobj:
+            reader = QCOW2Reader(fileobj)
+            self.assertEqual(reader.size, size)
+            self.assertEqual(reader.cluster_size, 4096)
+            data = reader.read()
+            self.assertEqual(len(data), size)
+            self.assertEqual(data[:4096], b'a' * 4096)
+            self.assertEqual(data[4096:8192], b'\0' * 4096)
+            self.assertEqual(data[8192:12288], b'hello world' * 372 + b'!!!!')
+            self.assertEqual(data[12288:511 * 4096], b'\0' * 508 * 4096)
+            self.assertEqual(data[511 * 4096:512 * 4096], b'z' * 4096)
+            # Beyond the first L2 table, nothing is allocated
+            self.assertEqual(data[512 * 4096:], b'\0' * (size - 512 * 4096))
+            self.assertEqual(reader.read(), b'')
+
+            reader.seek(4090)
+            self.assertEqual(reader.read(12), b'aaaaaa\0\0\0\0\0\0')
+            self.assertEqual(reader.tell(), 4102)
+            reader.seek(-3, os.SEEK_END)
+            self.assertEqual(reader.read(10), b'\0\0\0')
+
+    def test_unsupported(self):
+        """Backing files, encryption and some features can't be read."""
+        for kwargs in ({'crypt_method': 1},
+                       {'backing_file': 'base.qcow2'},
+                       {'incompatible_features': 1 << 2}):
+            write_qcow2_header(self.path, **kwargs)
+            with open(self.path, 'rb') as fileobj:
+                self.assertRaises(NotImplementedError, QCOW2Reader, fileobj)
+
+
 class TestQCOW2(COTTestCase):
     """Test cases for QCOW2 class."""
 
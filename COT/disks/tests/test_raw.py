@@ -24,7 +24,6 @@ import mock
 
 from COT.tests import COTTestCase
 from COT.disks import RAW, VMDK, DiskRepresentation
-from COT.helpers import HelperError
 
 logger = logging.getLogger(__name__)
 
@@ -37,17 +36,29 @@ class TestRAW(COTTestCase):
     def test_representation_invalid(self):
         """Representation of a file that isn't really a raw disk."""
         fake_raw = RAW(self.input_iso)
-        with self.assertRaises(HelperError):
+        with self.assertRaises(ValueError):
             assert fake_raw.files
 
     def test_convert_from_vmdk(self):
         """Test conversion of a RAW image from a VMDK."""
         old = DiskRepresentation.from_file(self.blank_vmdk)
-        raw = RAW.from_other_image(old, self.temp_dir)
+        with mock.patch('COT.helpers.helper.check_output') as mock_check:
+            raw = RAW.from_other_image(old, self.temp_dir)
+            mock_check.assert_not_called()
 
         self.assertEqual(raw.disk_format, 'raw')
         self.assertEqual(raw.disk_subformat, None)
         self.assertEqual(raw.predicted_drive_type, 'harddisk')
+        self.assertEqual(os.path.getsize(raw.path), 536870912)
+
+    @mock.patch('COT.disks.raw.decode_stream_optimized',
+                side_effect=ValueError("Bad grain marker"))
+    def test_convert_from_vmdk_corrupt(self, _):
+        """A corrupt VMDK leaves no partial output behind."""
+        with self.assertRaises(ValueError):
+            RAW.from_other_image(VMDK(self.blank_vmdk), self.temp_dir)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.temp_dir, "blank.img")))
 
     @mock.patch('COT.helpers.qemu_img.QEMUImg.version',
                 new_callable=mock.PropertyMock,
@@ -55,8 +66,11 @@ class TestRAW(COTTestCase):
     @mock.patch('os.path.exists', return_value=True)
     @mock.patch('COT.helpers.qemu_img.QEMUImg.call')
     @mock.patch('COT.helpers.vmdktool.VMDKTool.call')
-    def test_convert_from_vmdk_old_qemu(self, mock_vmdktool, mock_qemuimg, *_):
-        """Test conversion from streamOptimized VMDK with old QEMU."""
+    @mock.patch('COT.disks.raw.decode_stream_optimized',
+                side_effect=NotImplementedError)
+    def test_convert_from_vmdk_old_qemu(self, _, mock_vmdktool,
+                                        mock_qemuimg, *__):
+        """Test fallback conversion of a VMDK with old QEMU."""
         RAW.from_other_image(VMDK(self.blank_vmdk), self.temp_dir)
 
         mock_vmdktool.assert_called_with([
@@ -69,8 +83,11 @@ class TestRAW(COTTestCase):
     @mock.patch('os.path.exists', return_value=True)
     @mock.patch('COT.helpers.qemu_img.QEMUImg.call')
     @mock.patch('COT.helpers.vmdktool.VMDKTool.call')
-    def test_convert_from_vmdk_new_qemu(self, mock_vmdktool, mock_qemuimg, *_):
-        """Test conversion from streamOptimized VMDK with new QEMU."""
+    @mock.patch('COT.disks.raw.decode_stream_optimized',
+                side_effect=NotImplementedError)
+    def test_convert_from_vmdk_new_qemu(self, _, mock_vmdktool,
+                                        mock_qemuimg, *__):
+        """Test fallback conversion of a VMDK with new QEMU."""
         RAW.from_other_image(VMDK(self.blank_vmdk), self.temp_dir)
 
         mock_vmdktool.assert_not_called()
@@ -95,6 +112,20 @@ class TestRAW(COTTestCase):
                          [os.path.basename(self.input_ovf)])
         self.assertEqual(raw.capacity, "8388608")
 
+    def test_create_with_directory(self):
+        """Creation of a raw image doesn't require fatdisk."""
+        disk_path = os.path.join(self.temp_dir, "out.img")
+        extra_dir = os.path.join(self.temp_dir, "extra")
+        os.makedirs(os.path.join(extra_dir, "subdir"))
+        with open(os.path.join(extra_dir, "subdir", "file.txt"), 'w') as fobj:
+            fobj.write("Hello world\n")
+        with mock.patch("COT.helpers.helper.Helper.call") as mock_call:
+            RAW.create_file(disk_path, files=[self.input_ovf, extra_dir])
+            self.assertEqual(RAW(disk_path).files,
+                             ['input.ovf', 'subdir', 'subdir/file.txt'])
+            mock_call.assert_not_called()
+        self.assertEqual(os.path.getsize(disk_path), 8 << 20)
+
     def test_create_with_files_and_capacity(self):
         """Creation of raw image with specified capacity and file contents."""
         disk_path = os.path.join(self.temp_dir, "out.img")
@@ -16,14 +16,25 @@
 
 """Unit test cases for VMDK subclass of DiskRepresentation."""
 
+import io
 import logging
 import os
+import shutil
+import struct
+import tarfile
+import zlib
 
 from distutils.version import StrictVersion
 import mock
 
 from COT.tests import COTTestCase
-from COT.disks import VMDK, DiskRepresentation
+from COT.disks import VMDK, DiskRepresentation, QCOW2, RAW
+from COT.disks.tests.test_qcow2 import write_qcow2_header, write_qcow2_image
+from COT.disks.vmdk import (
+    GD_AT_END, StreamOptimizedWriter, VMDKExtent, decode_stream_optimized,
+    read_vmdk_info,
+)
+from COT.file_reference import FileInTAR
 from COT.helpers import helpers, HelperError
 
 logger = logging.getLogger(__name__)
@@ -36,6 +47,40 @@ QEMU_VERSION_WARNING = {
 }
 
 
+def read_stream_optimized(path):
+    """Decode a streamOptimized VMDK by following its footer's metadata.
+
+    Returns:
+      tuple: (raw disk data, number of grains stored)
+    """
+    with open(path, 'rb') as fileobj:
+        data = fileobj.read()
+    assert struct.unpack_from('<QII', data, len(data) - 1536) == (1, 0, 3)
+    assert data[-512:] == b'\0' * 512
+    (magic, version, _, capacity, grain_size, _, _, gtes_per_gt, _,
+     gd_offset) = struct.unpack_from('<4sIIQQQQIQQ', data, len(data) - 1024)
+    assert (magic, version) == (b'KDMV', 3)
+    num_gts = -(-capacity // (grain_size * gtes_per_gt))
+    grain_directory = struct.unpack_from('<{0}I'.format(num_gts),
+                                         data, gd_offset * 512)
+    output = bytearray(capacity * 512)
+    grains = 0
+    for gt_index, gt_offset in enumerate(grain_directory):
+        grain_table = struct.unpack_from('<{0}I'.format(gtes_per_gt),
+                                         data, gt_offset * 512)
+        for gte_index, sector in enumerate(grain_table):
+            if not sector:
+                continue
+            (lba, size) = struct.unpack_from('<QI', data, sector * 512)
+            assert lba == (gt_index * gtes_per_gt + gte_index) * grain_size
+            grain = zlib.decompress(data[sector * 512 + 12:
+                                         sector * 512 + 12 + size])
+            assert len(grain) == grain_size * 512
+            output[lba * 512:(lba + grain_size) * 512] = grain
+            grains += 1
+    return bytes(output[:capacity * 512]), grains
+
+
 class TestVMDK(COTTestCase):
     """Generic test cases for VMDK class."""
 
@@ -49,8 +94,84 @@ class TestVMDK(COTTestCase):
         self.assertEqual(vmdk2.capacity, "1073741824")
         self.assertEqual(vmdk2.predicted_drive_type, 'harddisk')
 
-    def test_create_default(self):
-        """Default creation logic."""
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_native_header(self, mock_check_output):
+        """Capacity, subformat, etc. are read without calling qemu-img."""
+        vmdk = VMDK(self.input_vmdk)
+        self.assertEqual(vmdk.capacity, "1073741824")
+        self.assertEqual(vmdk.disk_subformat, "streamOptimized")
+        self.assertEqual(vmdk.info.version, 3)
+        self.assertEqual(vmdk.info.grain_size, 65536)
+        self.assertEqual(vmdk.info.extents, [
+            VMDKExtent('RDONLY', 1073741824, 'SPARSE',
+                       'generated-stream.vmdk', None)])
+        self.assertEqual(vmdk.info.descriptor['ddb.adapterType'], 'lsilogic')
+        self.assertEqual(VMDK.file_is_this_type(self.input_vmdk), 100)
+        self.assertEqual(VMDK.file_is_this_type(self.input_ovf), 0)
+        self.assertEqual(VMDK.file_is_this_type(self.input_iso), 0)
+        mock_check_output.assert_not_called()
+
+        self.assertRaises(HelperError, VMDK.file_is_this_type, "/foo/bar")
+
+    def test_descriptor_file(self):
+        """A standalone descriptor's capacity is the sum of its extents."""
+        disk_path = os.path.join(self.temp_dir, "foo.vmdk")
+        with open(disk_path, 'w') as fileobj:
+            fileobj.write('# Disk DescriptorFile\n'
+                          'version=1\n'
+                          'CID=fffffffe\n'
+                          'parentCID=ffffffff\n'
+                          'createType="twoGbMaxExtentFlat"\n'
+                          '\n'
+                          '# Extent description\n'
+                          'RW 4192256 FLAT "foo-f001.vmdk" 0\n'
+                          'RW 2048 FLAT "foo-f002.vmdk" 0\n'
+                          'RW 1024 ZERO\n'
+                          '\n'
+                          'an unrecognized line\n')
+        self.assertEqual(VMDK.file_is_this_type(disk_path), 100)
+        vmdk = VMDK(disk_path)
+        self.assertEqual(vmdk.disk_subformat, "twoGbMaxExtentFlat")
+        self.assertEqual(vmdk.capacity, str((4192256 + 2048 + 1024) * 512))
+        self.assertIsNone(vmdk.info.version)
+        self.assertEqual(vmdk.info.extents[2],
+                         VMDKExtent('RW', 1024 * 512, 'ZERO', None, None))
+
+    def test_invalid_header(self):
+        """Invalid VMDKs are rejected, falling back to qemu-img."""
+        disk_path = os.path.join(self.temp_dir, "foo.vmdk")
+        with open(self.input_vmdk, 'rb') as fileobj:
+            header = fileobj.read(512)
+        # Truncated header
+        with open(disk_path, 'wb') as fileobj:
+            fileobj.write(header[:40])
+        self.assertRaises(ValueError, read_vmdk_info, disk_path)
+        # No descriptor
+        with open(disk_path, 'wb') as fileobj:
+            fileobj.write(header[:28] + b'\0' * 16 + header[44:])
+        self.assertRaises(ValueError, read_vmdk_info, disk_path)
+        # Not a VMDK at all
+        self.assertRaises(ValueError, read_vmdk_info, self.input_ovf)
+        # ESXi sparse extents can't be parsed natively, but are still VMDKs
+        with open(disk_path, 'wb') as fileobj:
+            fileobj.write(b'COWD' + header[4:])
+        self.assertRaises(ValueError, read_vmdk_info, disk_path)
+        self.assertEqual(VMDK.file_is_this_type(disk_path), 100)
+
+        vmdk = VMDK(disk_path)
+        with mock.patch.object(helpers['qemu-img'], 'call', return_value=(
+                "virtual size: 1.0G (1073741824 bytes)")):
+            with self.assertRaises(RuntimeError):
+                assert vmdk.disk_subformat
+            self.assertEqual(vmdk.capacity, "1073741824")
+        with mock.patch.object(helpers['qemu-img'], 'call', return_value=(
+                "Format specific information:\n"
+                "    create type: vmfsSparse\n")):
+            self.assertEqual(vmdk.disk_subformat, "vmfsSparse")
+
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_create_default(self, mock_check_output):
+        """Default creation logic, without helpers."""
         disk_path = os.path.join(self.temp_dir, "foo.vmdk")
         VMDK.create_file(path=disk_path, capacity="16M")
         vmdk = VMDK(disk_path)
@@ -58,10 +179,13 @@ class TestVMDK(COTTestCase):
         self.assertEqual(vmdk.disk_format, "vmdk")
         self.assertEqual(vmdk.disk_subformat, "streamOptimized")
         self.assertEqual(vmdk.disk_subformat, "streamOptimized")
-        if helpers['qemu-img'].version < StrictVersion("2.5.1"):
-            self.assertLogged(**QEMU_VERSION_WARNING)
+        self.assertEqual(vmdk.info.version, 3)
+        self.assertEqual(read_stream_optimized(disk_path),
+                         (b'\0' * 16 * 1024 * 1024, 0))
+        mock_check_output.assert_not_called()
 
-    def test_create_stream_optimized(self):
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_create_stream_optimized(self, mock_check_output):
         """Explicit subformat specification."""
         disk_path = os.path.join(self.temp_dir, "foo.vmdk")
         VMDK.create_file(path=disk_path, capacity="16M",
@@ -71,8 +195,10 @@ class TestVMDK(COTTestCase):
         self.assertEqual(vmdk.disk_format, "vmdk")
         self.assertEqual(vmdk.disk_subformat, "streamOptimized")
         self.assertEqual(vmdk.disk_subformat, "streamOptimized")
-        if helpers['qemu-img'].version < StrictVersion("2.5.1"):
-            self.assertLogged(**QEMU_VERSION_WARNING)
+        self.assertEqual(vmdk.info.version, 3)
+        self.assertEqual(read_stream_optimized(disk_path),
+                         (b'\0' * 16 * 1024 * 1024, 0))
+        mock_check_output.assert_not_called()
 
     def test_create_monolithic_sparse(self):
         """Explicit subformat specification."""
@@ -139,23 +265,20 @@ class TestVMDKConversion(COTTestCase):
         """Test disk conversion flows with old qemu-img version.
 
         This version doesn't support streamOptimized output at all,
-        so we'll use vmdktool instead.
+        so we'll use vmdktool instead, except for RAW and QCOW2 images,
+        which COT converts natively.
         """
-        for disk_format in ["raw", "qcow2", "vmdk"]:
+        for disk_format in ["raw", "qcow2"]:
             self.other_format_to_vmdk_test(disk_format)
+            mock_qemu_call.assert_not_called()
+            mock_vmdktool_call.assert_not_called()
 
-            if disk_format != "raw":
-                # use qemu-img to convert to raw
-                mock_qemu_call.assert_called_once_with(
-                    ['convert', '-O', 'raw',
-                     self.input_disks[disk_format].path, mock.ANY])
-            else:
-                mock_qemu_call.assert_not_called()
-
-            mock_vmdktool_call.assert_called_once()
-
-            mock_qemu_call.reset_mock()
-            mock_vmdktool_call.reset_mock()
+        self.other_format_to_vmdk_test("vmdk")
+        # use qemu-img to convert to raw
+        mock_qemu_call.assert_called_once_with(
+            ['convert', '-O', 'raw',
+             self.input_disks["vmdk"].path, mock.ANY])
+        mock_vmdktool_call.assert_called_once()
 
     @mock.patch('COT.helpers.qemu_img.QEMUImg.version',
                 new_callable=mock.PropertyMock,
@@ -165,19 +288,19 @@ class TestVMDKConversion(COTTestCase):
 
         https://github.com/glennmatthews/cot/issues/67
         """
-        # Error in conversion from qcow2 to raw
+        # Error in conversion from vmdk to raw
         with mock.patch('COT.helpers.qemu_img.QEMUImg.call',
                         side_effect=HelperError):
             self.assertRaises(HelperError,
                               VMDK.from_other_image,
-                              self.input_disks['qcow2'], self.temp_dir)
+                              self.input_disks['vmdk'], self.temp_dir)
 
         # Error in conversion from raw to vmdk
         with mock.patch('COT.helpers.vmdktool.VMDKTool.call',
                         side_effect=HelperError):
             self.assertRaises(HelperError,
                               VMDK.from_other_image,
-                              self.input_disks['qcow2'], self.temp_dir)
+                              self.input_disks['vmdk'], self.temp_dir)
 
         # Make sure we didn't leave the temporary image behind
         temp_image = os.path.join(self.temp_dir, 'foo.img')
@@ -201,37 +324,31 @@ class TestVMDKConversion(COTTestCase):
         if vmdktool is not available.
         """
         # First, with vmdktool, same as test_disk_conversion_old_qemu
-        for disk_format in ["raw", "qcow2", "vmdk"]:
-            self.other_format_to_vmdk_test(disk_format)
+        self.other_format_to_vmdk_test("vmdk")
+        mock_qemu_call.assert_called_once_with(
+            ['convert', '-O', 'raw',
+             self.input_disks["vmdk"].path, mock.ANY])
+        mock_vmdktool_call.assert_called_once()
 
-            if disk_format != "raw":
-                # use qemu-img to convert to raw
-                mock_qemu_call.assert_called_once_with(
-                    ['convert', '-O', 'raw',
-                     self.input_disks[disk_format].path, mock.ANY])
-            else:
-                mock_qemu_call.assert_not_called()
-            mock_vmdktool_call.assert_called_once()
-
-            mock_qemu_call.reset_mock()
-            mock_vmdktool_call.reset_mock()
+        mock_qemu_call.reset_mock()
+        mock_vmdktool_call.reset_mock()
 
         # Now, disable vmdktool
         with mock.patch("COT.helpers.vmdktool.VMDKTool.installed",
                         new_callable=mock.PropertyMock, return_value=False),\
             mock.patch("COT.helpers.vmdktool.VMDKTool.installable",
                        new_callable=mock.PropertyMock, return_value=False):
-            for disk_format in ["raw", "qcow2", "vmdk"]:
+            for disk_format in ["raw", "qcow2"]:
                 self.other_format_to_vmdk_test(disk_format)
-
-                # Since we lack vmdktool, and we have a technically
-                # new enough version of qemu-img, we call it, under protest.
-                mock_qemu_call.assert_called_once()
-                self.assertLogged(**QEMU_VERSION_WARNING)
+                mock_qemu_call.assert_not_called()
                 mock_vmdktool_call.assert_not_called()
 
-                mock_qemu_call.reset_mock()
-                mock_vmdktool_call.reset_mock()
+            self.other_format_to_vmdk_test("vmdk")
+            # Since we lack vmdktool, and we have a technically
+            # new enough version of qemu-img, we call it, under protest.
+            mock_qemu_call.assert_called_once()
+            self.assertLogged(**QEMU_VERSION_WARNING)
+            mock_vmdktool_call.assert_not_called()
 
     @mock.patch('COT.helpers.qemu_img.QEMUImg.version',
                 new_callable=mock.PropertyMock,
@@ -250,7 +367,10 @@ class TestVMDKConversion(COTTestCase):
         for disk_format in ["raw", "qcow2", "vmdk"]:
             self.other_format_to_vmdk_test(disk_format)
 
-            mock_qemu_call.assert_called_once()
+            if disk_format == "vmdk":
+                mock_qemu_call.assert_called_once()
+            else:
+                mock_qemu_call.assert_not_called()
             mock_vmdktool_call.assert_not_called()
 
             mock_qemu_call.reset_mock()
@@ -260,3 +380,202 @@ class TestVMDKConversion(COTTestCase):
         self.assertRaises(HelperError,
                           self.other_format_to_vmdk_test,
                           'qcow2', output_subformat="foobar")
+
+
+class TestStreamOptimizedWriter(COTTestCase):
+    """Test cases for writing streamOptimized VMDKs natively."""
+
+    def setUp(self):
+        """Pre-test setup."""
+        super(TestStreamOptimizedWriter, self).setUp()
+        self.path = os.path.join(self.temp_dir, "foo.vmdk")
+
+    def test_write(self):
+        """Zero grains are skipped and data round-trips, in parallel too."""
+        # Spans two grain tables, with a partial grain at the end
+        data = bytearray(33 * 1024 * 1024 + 1536)
+        for offset in (0, 70000, 32 * 1024 * 1024 + 5, len(data) - 1):
+            data[offset] = 0x42
+        data = bytes(data)
+        for workers in (1, 4):
+            writer = StreamOptimizedWriter(len(data), "foo.vmdk",
+                                           workers=workers)
+            with open(self.path, 'wb') as fileobj:
+                writer.write(io.BytesIO(data), fileobj)
+            info = read_vmdk_info(self.path)
+            self.assertEqual(info.version, 3)
+            self.assertEqual(info.capacity, len(data))
+            self.assertEqual(info.subformat, "streamOptimized")
+            self.assertEqual(info.extents, [
+                VMDKExtent('RW', len(data), 'SPARSE', 'foo.vmdk', None)])
+            with open(self.path, 'rb') as fileobj:
+                header = struct.unpack('<4sIIQQQQIQQ', fileobj.read(64))
+            self.assertEqual(header[9], GD_AT_END)
+            self.assertEqual(read_stream_optimized(self.path), (data, 4))
+
+    def test_short_source(self):
+        """Data beyond the end of the source reads as zeros."""
+        writer = StreamOptimizedWriter(1024 * 1024, "foo.vmdk")
+        with open(self.path, 'wb') as fileobj:
+            writer.write(io.BytesIO(b'hello'), fileobj)
+        self.assertEqual(read_stream_optimized(self.path),
+                         (b'hello' + b'\0' * (1024 * 1024 - 5), 1))
+
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_from_raw(self, mock_check_output):
+        """RAW images are converted without helpers."""
+        raw_path = os.path.join(self.temp_dir, "foo.img")
+        data = b'\0' * 1024 * 1024 + b'hello world' + b'\0' * 1048565
+        with open(raw_path, 'wb') as fileobj:
+            fileobj.write(data)
+        vmdk = VMDK.from_other_image(RAW(raw_path), self.temp_dir)
+        self.assertEqual(vmdk.path, self.path)
+        self.assertEqual(vmdk.disk_subformat, "streamOptimized")
+        self.assertEqual(read_stream_optimized(self.path), (data, 1))
+        mock_check_output.assert_not_called()
+
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_from_qcow2(self, mock_check_output):
+        """QCOW2 images are converted without helpers."""
+        qcow2_path = os.path.join(self.temp_dir, "foo.qcow2")
+        write_qcow2_image(qcow2_path, 2 * 1024 * 1024, {
+            0: b'a' * 4096,
+            1: None,
+            40: ('compressed', b'b' * 4096),
+        })
+        vmdk = VMDK.from_other_image(QCOW2(qcow2_path), self.temp_dir)
+        self.assertEqual(vmdk.disk_subformat, "streamOptimized")
+        self.assertEqual(read_stream_optimized(self.path),
+                         (b'a' * 4096 + b'\0' * 159744 + b'b' * 4096 +
+                          b'\0' * (2 * 1024 * 1024 - 167936), 2))
+        mock_check_output.assert_not_called()
+
+    def test_converts_natively(self):
+        """RAW and QCOW2 images without a backing file don't need helpers."""
+        raw_path = os.path.join(self.temp_dir, "foo.img")
+        with open(raw_path, 'wb') as fileobj:
+            fileobj.write(b'\0' * 1024 * 1024)
+        self.assertTrue(VMDK.converts_natively(RAW(raw_path)))
+        qcow2_path = os.path.join(self.temp_dir, "foo.qcow2")
+        write_qcow2_image(qcow2_path, 2 * 1024 * 1024, {0: b'a' * 4096})
+        self.assertTrue(VMDK.converts_natively(QCOW2(qcow2_path)))
+        write_qcow2_header(qcow2_path, backing_file="base.qcow2")
+        self.assertFalse(VMDK.converts_natively(QCOW2(qcow2_path)))
+        self.assertFalse(VMDK.converts_natively(VMDK(self.blank_vmdk)))
+
+    def test_from_qcow2_truncated(self):
+        """A truncated QCOW2 image leaves no partial output behind."""
+        qcow2_path = os.path.join(self.temp_dir, "foo.qcow2")
+        write_qcow2_image(qcow2_path, 2 * 1024 * 1024, {0: b'a' * 4096})
+        with open(qcow2_path, 'r+b') as fileobj:
+            fileobj.truncate(os.path.getsize(qcow2_path) - 2048)
+        with self.assertRaises(ValueError):
+            VMDK.from_other_image(QCOW2(qcow2_path), self.temp_dir)
+        self.assertFalse(os.path.exists(self.path))
+
+    @mock.patch('COT.helpers.qemu_img.QEMUImg.installed',
+                new_callable=mock.PropertyMock, return_value=True)
+    @mock.patch('COT.helpers.qemu_img.QEMUImg.version',
+                new_callable=mock.PropertyMock,
+                return_value=StrictVersion("2.5.1"))
+    @mock.patch('COT.helpers.qemu_img.QEMUImg.call')
+    def test_from_qcow2_backing_file(self, mock_qemu_call, *_):
+        """QCOW2 images with a backing file are converted by qemu-img."""
+        qcow2_path = os.path.join(self.temp_dir, "foo.qcow2")
+        write_qcow2_header(qcow2_path, backing_file="base.qcow2")
+        mock_qemu_call.side_effect = (
+            lambda args: shutil.copy(self.blank_vmdk, args[-1]))
+        VMDK.from_other_image(QCOW2(qcow2_path), self.temp_dir)
+        mock_qemu_call.assert_called_once_with([
+            'convert', '-O', 'vmdk', '-o', 'subformat=streamOptimized',
+            qcow2_path, self.path])
+
+
+class TestStreamOptimizedDecoder(COTTestCase):
+    """Test cases for decoding streamOptimized VMDKs natively."""
+
+    def setUp(self):
+        """Pre-test setup."""
+        super(TestStreamOptimizedDecoder, self).setUp()
+        self.path = os.path.join(self.temp_dir, "foo.vmdk")
+        self.raw_path = os.path.join(self.temp_dir, "foo.img")
+
+    def write_vmdk(self, data):
+        """Write the given raw data as a streamOptimized VMDK."""
+        with open(self.path, 'wb') as fileobj:
+            StreamOptimizedWriter(len(data), "foo.vmdk").write(
+                io.BytesIO(data), fileobj)
+
+    def test_round_trip(self):
+        """Data round-trips, with zero grains left as holes."""
+        data = bytearray(33 * 1024 * 1024)
+        for offset in (0, 70000, 32 * 1024 * 1024 + 5, len(data) - 1):
+            data[offset] = 0x42
+        data = bytes(data)
+        self.write_vmdk(data)
+        for workers in (1, 4):
+            with open(self.path, 'rb') as input_obj:
+                with open(self.raw_path, 'wb') as output_obj:
+                    self.assertEqual(decode_stream_optimized(
+                        input_obj, output_obj, workers), len(data))
+            with open(self.raw_path, 'rb') as fileobj:
+                self.assertEqual(fileobj.read(), data)
+            self.assertLess(os.stat(self.raw_path).st_blocks * 512,
+                            len(data) // 2)
+            os.remove(self.raw_path)
+
+    def test_existing_vmdks(self):
+        """Decode VMDKs created by other tools."""
+        for path, capacity in ((self.input_vmdk, 1 << 30),
+                               (self.blank_vmdk, 512 << 20)):
+            with open(path, 'rb') as input_obj:
+                with open(self.raw_path, 'wb') as output_obj:
+                    self.assertEqual(decode_stream_optimized(
+                        input_obj, output_obj), capacity)
+            self.assertEqual(os.path.getsize(self.raw_path), capacity)
+            os.remove(self.raw_path)
+
+    def test_from_tar(self):
+        """A VMDK can be decoded directly from within a TAR file."""
+        self.write_vmdk(b'hello world!' * 8192)
+        tar_path = os.path.join(self.temp_dir, "foo.ova")
+        with tarfile.open(tar_path, 'w') as tarf:
+            tarf.add(self.input_ovf, "foo.ovf")
+            tarf.add(self.path, "foo.vmdk")
+        with FileInTAR(tar_path, "foo.vmdk").open('rb') as input_obj:
+            with open(self.raw_path, 'wb') as output_obj:
+                decode_stream_optimized(input_obj, output_obj)
+        with open(self.raw_path, 'rb') as fileobj:
+            self.assertEqual(fileobj.read(), b'hello world!' * 8192)
+
+    def test_invalid(self):
+        """Invalid or unsupported VMDKs are rejected."""
+        output_obj = io.BytesIO()
+        with open(self.input_iso, 'rb') as input_obj:
+            self.assertRaises(ValueError, decode_stream_optimized,
+                              input_obj, output_obj)
+
+        self.write_vmdk(b'hello world!' * 8192)
+        with open(self.path, 'rb') as fileobj:
+            data = fileobj.read()
+        # Truncated
+        self.assertRaises(ValueError, decode_stream_optimized,
+                          io.BytesIO(data[:-512]), output_obj)
+        # Corrupted grain
+        self.assertRaises(ValueError, decode_stream_optimized,
+                          io.BytesIO(data[:65536 + 12] + b'\xff' * 100 +
+                                     data[65536 + 112:]), output_obj)
+        # Not compressed, as in a monolithicSparse VMDK
+        self.assertRaises(NotImplementedError, decode_stream_optimized,
+                          io.BytesIO(data[:8] + b'\0' * 4 + data[12:]),
+                          output_obj)
+
+    @mock.patch('COT.helpers.helper.check_output')
+    def test_to_raw(self, mock_check_output):
+        """RAW.from_other_image decodes streamOptimized VMDKs natively."""
+        self.write_vmdk(b'hello world!' * 8192)
+        raw = RAW.from_other_image(VMDK(self.path), self.temp_dir)
+        self.assertEqual(raw.path, self.raw_path)
+        with open(self.raw_path, 'rb') as fileobj:
+            self.assertEqual(fileobj.read(), b'hello world!' * 8192)
+        mock_check_output.assert_not_called()
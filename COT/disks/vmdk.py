@@ -10,46 +10,668 @@
 # of COT, including this file, may be copied, modified, propagated, or
 # distributed except according to the terms contained in the LICENSE.txt file.
 
-"""Handling of VMDK files."""
+"""Handling of VMDK files.
 
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  StreamOptimizedWriter
+  VMDK
+  VMDKExtent
+  VMDKInfo
+
+**Functions**
+
+.. autosummary::
+  :nosignatures:
+
+  decode_stream_optimized
+  parse_descriptor
+  read_vmdk_info
+"""
+
+import io
 import logging
 import os
+import random
 import re
+import struct
+import zlib
+from collections import namedtuple
 
 from distutils.version import StrictVersion
 
-from COT.disks.disk import DiskRepresentation
+from COT.data_validation import ReadAheadReader
+from COT.disks.disk import DiskRepresentation, capacity_bytes
+from COT.disks.qcow2 import QCOW2Reader
+from COT.file_reference import imap_concurrently
 from COT.helpers import helpers, helper_select
 
 logger = logging.getLogger(__name__)
 
+SECTOR_SIZE = 512
+
+SPARSE_MAGIC = b'KDMV'
+"""Magic number at the start of a hosted sparse extent."""
+
+COWD_MAGIC = b'COWD'
+"""Magic number at the start of an ESXi sparse extent."""
+
+DESCRIPTOR_MAGIC = b'# Disk DescriptorFile'
+"""Start of a standalone VMDK descriptor file."""
+
+_SPARSE_HEADER = struct.Struct('<4sIIQQQQIQQQ?ccccH')
+"""Layout of the start of a hosted sparse extent header.
+
+magicNumber, version, flags, capacity, grainSize, descriptorOffset,
+descriptorSize, numGTEsPerGT, rgdOffset, gdOffset, overHead,
+uncleanShutdown, singleEndLineChar, nonEndLineChar, doubleEndLineChar1,
+doubleEndLineChar2, compressAlgorithm. Sizes and offsets are in sectors.
+"""
+
+_FLAG_VALID_NEWLINE_TEST = 1 << 0
+_FLAG_COMPRESSED = 1 << 16
+_FLAG_MARKERS = 1 << 17
+_COMPRESSION_DEFLATE = 1
+
+GD_AT_END = 0xffffffffffffffff
+"""Header ``gdOffset`` meaning that the grain directory is in the footer."""
+
+_GRAIN_MARKER = struct.Struct('<QI')
+"""Layout of a compressed grain marker: LBA (in sectors) and data size."""
+
+_METADATA_MARKER = struct.Struct('<QII')
+"""Layout of a metadata marker: size (in sectors), 0, and marker type."""
+
+MARKER_EOS = 0
+MARKER_GT = 1
+MARKER_GD = 2
+MARKER_FOOTER = 3
+
+_MAX_DESCRIPTOR_SIZE = 1024 * 1024
+"""Sanity limit on the size of a descriptor we're willing to read."""
+
+_EXTENT_RE = re.compile(
+    r'^(RW|RDONLY|NOACCESS)\s+(\d+)\s+(\w+)'
+    r'(?:\s+"([^"]*)"(?:\s+(\d+))?)?\s*$')
+
+VMDKExtent = namedtuple('VMDKExtent',
+                        ['access', 'size', 'type', 'filename', 'offset'])
+"""An extent described by a VMDK descriptor.
+
+``size`` and ``offset`` are in bytes. ``filename`` and ``offset`` are
+``None`` if not applicable (e.g., for a ``ZERO`` extent).
+"""
+
+VMDKInfo = namedtuple('VMDKInfo', ['version', 'capacity', 'grain_size',
+                                   'subformat', 'extents', 'descriptor'])
+"""Information parsed from a VMDK file by :func:`read_vmdk_info`.
+
+``version`` is the sparse extent header version (such as 1 or 3), or
+``None`` for a standalone descriptor file. ``capacity`` and ``grain_size``
+are in bytes (``grain_size`` is ``None`` for a standalone descriptor).
+``subformat`` is the ``createType``, such as ``'streamOptimized'``.
+``extents`` is a list of :class:`VMDKExtent`, and ``descriptor`` is a dict
+of all other ``key=value`` entries in the descriptor.
+"""
+
+
+def parse_descriptor(text):
+    """Parse the text of a VMDK descriptor.
+
+    Args:
+      text (str): Descriptor text.
+
+    Unrecognized lines are ignored.
+
+    Returns:
+      tuple: (dict of ``key=value`` entries, list of :class:`VMDKExtent`)
+
+    Examples:
+      ::
+
+        >>> fields, extents = parse_descriptor('''
+        ... # Disk DescriptorFile
+        ... version=1
+        ... createType="monolithicFlat"
+        ... RW 2048 FLAT "foo-flat.vmdk" 0
+        ... ddb.adapterType = "lsilogic"
+        ... ''')
+        >>> print(fields['createType'])
+        monolithicFlat
+        >>> print(fields['ddb.adapterType'])
+        lsilogic
+        >>> print(extents[0].filename)
+        foo-flat.vmdk
+        >>> extents[0].size, extents[0].offset
+        (1048576, 0)
+    """
+    fields = {}
+    extents = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = _EXTENT_RE.match(line)
+        if match:
+            (access, sectors, extent_type, filename, offset) = match.groups()
+            extents.append(VMDKExtent(
+                access, int(sectors) * SECTOR_SIZE, extent_type, filename,
+                None if offset is None else int(offset) * SECTOR_SIZE))
+            continue
+        if '=' not in line:
+            logger.debug("Ignoring unrecognized line in VMDK descriptor: "
+                         "'%s'", line)
+            continue
+        (key, value) = line.split('=', 1)
+        fields[key.strip()] = value.strip().strip('"')
+    return fields, extents
+
+
+def read_vmdk_info(path_or_obj):
+    """Read the header and descriptor of a VMDK file, without any helpers.
+
+    Supports hosted sparse extents (such as ``monolithicSparse`` and
+    ``streamOptimized`` VMDKs, which embed their descriptor) as well as
+    standalone descriptor files (such as ``monolithicFlat`` VMDKs).
+
+    Args:
+      path_or_obj (str): Path to the VMDK file OR an opened binary file
+        object, positioned at the start of the VMDK.
+
+    Returns:
+      VMDKInfo: Information about this VMDK.
+
+    Raises:
+      ValueError: if this doesn't appear to be a supported VMDK file.
+    """
+    if not hasattr(path_or_obj, 'read'):
+        with open(path_or_obj, 'rb') as file_obj:
+            return read_vmdk_info(file_obj)
+    file_obj = path_or_obj
+    start = file_obj.tell()
+    header = file_obj.read(SECTOR_SIZE)
+
+    if header.startswith(DESCRIPTOR_MAGIC):
+        text = (header + file_obj.read(_MAX_DESCRIPTOR_SIZE - SECTOR_SIZE))
+        fields, extents = parse_descriptor(
+            text.split(b'\0', 1)[0].decode('ascii', 'replace'))
+        version = None
+        capacity = sum(extent.size for extent in extents)
+        grain_size = None
+    elif header.startswith(SPARSE_MAGIC):
+        if len(header) < _SPARSE_HEADER.size:
+            raise ValueError("VMDK sparse extent header is truncated")
+        (_, version, _, capacity, grain_size, desc_offset, desc_size,
+         _, _, _, _, _, _, _, _, _, _) = _SPARSE_HEADER.unpack_from(header)
+        if desc_offset == 0 or desc_size == 0:
+            raise ValueError("VMDK sparse extent has no embedded descriptor")
+        if desc_size * SECTOR_SIZE > _MAX_DESCRIPTOR_SIZE:
+            raise ValueError("VMDK descriptor size ({0} sectors) is too large"
+                             .format(desc_size))
+        file_obj.seek(start + desc_offset * SECTOR_SIZE)
+        text = file_obj.read(desc_size * SECTOR_SIZE)
+        fields, extents = parse_descriptor(
+            text.split(b'\0', 1)[0].decode('ascii', 'replace'))
+        capacity *= SECTOR_SIZE
+        grain_size *= SECTOR_SIZE
+    elif header.startswith(COWD_MAGIC):
+        raise ValueError("ESXi sparse (COWD) VMDK extents are not supported")
+    else:
+        raise ValueError("Not a VMDK file")
+
+    subformat = fields.pop('createType', None)
+    if subformat is None:
+        raise ValueError("No 'createType' found in VMDK descriptor")
+    return VMDKInfo(version, capacity, grain_size, subformat, extents, fields)
+
+
+class StreamOptimizedWriter(object):
+    """Write a streamOptimized (version 3) VMDK from raw disk data.
+
+    The source data is read sequentially, one grain at a time. Grains that
+    are entirely zero are omitted, while all others are compressed with
+    :mod:`zlib` on a pool of worker threads - :mod:`zlib` releases the GIL
+    while compressing, so this scales with the number of available cores.
+    The compressed grains are written in order, each grain table following
+    the grains it describes, then the grain directory, footer, and
+    end-of-stream marker, so the output file is written strictly
+    sequentially.
+
+    Examples:
+      ::
+
+        >>> import io
+        >>> writer = StreamOptimizedWriter(1048576, "foo.vmdk")
+        >>> output = io.BytesIO()
+        >>> writer.write(io.BytesIO(b"hello world"), output)
+        >>> info = read_vmdk_info(io.BytesIO(output.getvalue()))
+        >>> print(info.subformat)
+        streamOptimized
+        >>> info.version, info.capacity
+        (3, 1048576)
+    """
+
+    GRAIN_SIZE = 65536
+    """Size of each grain, in bytes."""
+
+    GTES_PER_GT = 512
+    """Number of entries in each grain table."""
+
+    def __init__(self, capacity, file_name, adapter_type="ide", workers=None,
+                 level=zlib.Z_DEFAULT_COMPRESSION):
+        """Create a writer for a VMDK of the given capacity.
+
+        Args:
+          capacity (int): Disk capacity, in bytes.
+          file_name (str): Name of the VMDK file, for its descriptor.
+          adapter_type (str): Disk adapter type, for its descriptor.
+          workers (int): Number of compression threads to use; defaults to
+            :data:`COT.file_reference.MAX_WORKERS`.
+          level (int): :mod:`zlib` compression level.
+        """
+        self.capacity = capacity
+        self.file_name = file_name
+        self.adapter_type = adapter_type
+        self.workers = workers
+        self.level = level
+        self._sector = 0
+
+    @property
+    def descriptor(self):
+        """Text of the embedded descriptor for this VMDK."""
+        sectors = self._sectors(self.capacity)
+        return (
+            '# Disk DescriptorFile\n'
+            'version=1\n'
+            'CID={cid:08x}\n'
+            'parentCID=ffffffff\n'
+            'createType="streamOptimized"\n'
+            '\n'
+            '# Extent description\n'
+            'RW {sectors} SPARSE "{file_name}"\n'
+            '\n'
+            '# The Disk Data Base\n'
+            '#DDB\n'
+            '\n'
+            'ddb.virtualHWVersion = "4"\n'
+            'ddb.geometry.cylinders = "{cylinders}"\n'
+            'ddb.geometry.heads = "16"\n'
+            'ddb.geometry.sectors = "63"\n'
+            'ddb.adapterType = "{adapter_type}"\n'
+            'ddb.toolsVersion = "2147483647"\n'
+            .format(cid=random.randint(0, 0xfffffffe), sectors=sectors,
+                    file_name=self.file_name,
+                    cylinders=min(sectors // (16 * 63), 16383),
+                    adapter_type=self.adapter_type))
+
+    @staticmethod
+    def _sectors(size):
+        """Get the number of sectors needed to hold the given size.
+
+        Args:
+          size (int): Size in bytes.
+        Returns:
+          int: Size in sectors, rounded up.
+        """
+        return (size + SECTOR_SIZE - 1) // SECTOR_SIZE
+
+    def _header(self, descriptor_sectors, overhead, gd_offset):
+        """Construct a sparse extent header (or footer).
+
+        Args:
+          descriptor_sectors (int): Size of the embedded descriptor.
+          overhead (int): Sector offset of the first grain.
+          gd_offset (int): Sector offset of the grain directory,
+            or :data:`GD_AT_END`.
+        Returns:
+          bytes: Header, padded to a full sector.
+        """
+        header = _SPARSE_HEADER.pack(
+            SPARSE_MAGIC, 3,
+            _FLAG_VALID_NEWLINE_TEST | _FLAG_COMPRESSED | _FLAG_MARKERS,
+            self._sectors(self.capacity), self.GRAIN_SIZE // SECTOR_SIZE,
+            1, descriptor_sectors, self.GTES_PER_GT, 0, gd_offset, overhead,
+            False, b'\n', b' ', b'\r', b'\n', _COMPRESSION_DEFLATE)
+        return header + b'\0' * (SECTOR_SIZE - len(header))
+
+    def _emit(self, file_obj, data):
+        """Write the given data, padded to a sector boundary.
+
+        Args:
+          file_obj (file): Output file object.
+          data (bytes): Data to write.
+        Returns:
+          int: Sector offset at which the data was written.
+        """
+        sector = self._sector
+        file_obj.write(data)
+        padding = -len(data) % SECTOR_SIZE
+        if padding:
+            file_obj.write(b'\0' * padding)
+        self._sector += self._sectors(len(data))
+        return sector
+
+    def _emit_metadata(self, file_obj, marker_type, data):
+        """Write a metadata marker followed by the metadata it describes.
+
+        Args:
+          file_obj (file): Output file object.
+          marker_type (int): :data:`MARKER_GT`, :data:`MARKER_GD`, etc.
+          data (bytes): Metadata to write.
+        Returns:
+          int: Sector offset at which the metadata (not the marker) was
+          written.
+        """
+        self._emit(file_obj, _METADATA_MARKER.pack(
+            self._sectors(len(data)), 0, marker_type))
+        return self._emit(file_obj, data)
+
+    def _grains(self, source):
+        """Read the source data, skipping any grains that are all zeros.
+
+        Args:
+          source (file): File object to read raw disk data from.
+        Yields:
+          tuple: (grain number, grain data)
+        """
+        zero_grain = b'\0' * self.GRAIN_SIZE
+        grain = 0
+        remaining = self.capacity
+        while remaining > 0:
+            data = source.read(min(self.GRAIN_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            if len(data) < self.GRAIN_SIZE:
+                data += zero_grain[len(data):]
+            if data != zero_grain:
+                yield grain, data
+            grain += 1
+
+    def _compressed_grains(self, source):
+        """Compress the non-zero grains of the source data, in parallel.
+
+        Args:
+          source (file): File object to read raw disk data from.
+        Yields:
+          tuple: (grain number, compressed grain data), in order.
+        """
+        level = self.level
+
+        def compress(item):
+            """Compress one grain."""
+            (grain, data) = item
+            return grain, zlib.compress(data, level)
+
+        return imap_concurrently(compress, self._grains(source),
+                                 self.workers)
+
+    def write(self, source, file_obj):
+        """Write the VMDK.
+
+        Args:
+          source (file): File object to read raw disk data from. Reading
+            stops at :attr:`capacity`; if the source is shorter than that,
+            the remainder of the disk reads as zeros.
+          file_obj (file): File object to write the VMDK to. It need not be
+            seekable.
+        """
+        self._sector = 0
+        grain_sectors = self.GRAIN_SIZE // SECTOR_SIZE
+        num_grains = ((self.capacity + self.GRAIN_SIZE - 1) //
+                      self.GRAIN_SIZE)
+        num_gts = (num_grains + self.GTES_PER_GT - 1) // self.GTES_PER_GT
+
+        descriptor = self.descriptor.encode('ascii')
+        descriptor_sectors = self._sectors(len(descriptor))
+        overhead = ((1 + descriptor_sectors + grain_sectors - 1) //
+                    grain_sectors) * grain_sectors
+        self._emit(file_obj, self._header(descriptor_sectors, overhead,
+                                          GD_AT_END))
+        self._emit(file_obj, descriptor)
+        self._emit(file_obj, b'\0' * (overhead - self._sector) * SECTOR_SIZE)
+
+        grain_directory = []
+        grain_table = [0] * self.GTES_PER_GT
+
+        def emit_grain_table():
+            """Write the current grain table and reset it."""
+            grain_directory.append(self._emit_metadata(
+                file_obj, MARKER_GT,
+                struct.pack('<{0}I'.format(self.GTES_PER_GT), *grain_table)))
+            grain_table[:] = [0] * self.GTES_PER_GT
+
+        for grain, data in self._compressed_grains(source):
+            while grain // self.GTES_PER_GT > len(grain_directory):
+                emit_grain_table()
+            grain_table[grain % self.GTES_PER_GT] = self._emit(
+                file_obj,
+                _GRAIN_MARKER.pack(grain * grain_sectors, len(data)) + data)
+        while len(grain_directory) < num_gts:
+            emit_grain_table()
+
+        gd_offset = self._emit_metadata(
+            file_obj, MARKER_GD,
+            struct.pack('<{0}I'.format(num_gts), *grain_directory))
+        self._emit_metadata(file_obj, MARKER_FOOTER,
+                            self._header(descriptor_sectors, overhead,
+                                         gd_offset))
+        self._emit(file_obj, _METADATA_MARKER.pack(0, 0, MARKER_EOS))
+        logger.debug("Wrote %d sectors of streamOptimized VMDK data",
+                     self._sector)
+
+
+def _read_exact(file_obj, size):
+    """Read exactly the given number of bytes from a VMDK.
+
+    Args:
+      file_obj (file): File object to read from.
+      size (int): Number of bytes to read.
+    Returns:
+      bytes: Data read.
+    Raises:
+      ValueError: if the end of the file is reached first.
+    """
+    data = file_obj.read(size)
+    if len(data) != size:
+        raise ValueError("VMDK is truncated")
+    return data
+
+
+def _skip(file_obj, size):
+    """Read and discard the given number of bytes from a VMDK.
+
+    Args:
+      file_obj (file): File object to read from, which need not be seekable.
+      size (int): Number of bytes to skip.
+    Raises:
+      ValueError: if the end of the file is reached first.
+    """
+    while size > 0:
+        size -= len(_read_exact(file_obj, min(size, 1024 * 1024)))
+
+
+def _grain_markers(file_obj):
+    """Walk the markers of a streamOptimized VMDK up to end-of-stream.
+
+    Args:
+      file_obj (file): File object positioned at the first marker.
+    Yields:
+      tuple: (LBA in sectors, compressed grain data) for each grain.
+    Raises:
+      ValueError: if an invalid marker is found.
+    """
+    while True:
+        (value, size) = _GRAIN_MARKER.unpack(
+            _read_exact(file_obj, _GRAIN_MARKER.size))
+        if size:
+            yield value, _read_exact(file_obj, size)
+            _skip(file_obj, -(_GRAIN_MARKER.size + size) % SECTOR_SIZE)
+            continue
+        rest = _read_exact(file_obj, SECTOR_SIZE - _GRAIN_MARKER.size)
+        (marker_type,) = struct.unpack_from('<I', rest)
+        if marker_type == MARKER_EOS:
+            return
+        if marker_type not in (MARKER_GT, MARKER_GD, MARKER_FOOTER):
+            raise ValueError("Unknown VMDK marker type {0}"
+                             .format(marker_type))
+        _skip(file_obj, value * SECTOR_SIZE)
+
+
+def decode_stream_optimized(input_obj, output_obj, workers=None):
+    """Decode a streamOptimized VMDK to raw disk data, without any helpers.
+
+    The grain markers of the VMDK are walked in order, so ``input_obj``
+    only needs to support :meth:`read` - it may be, for example, a file
+    within an OVA opened with :meth:`COT.file_reference.FileReference.open`.
+    Grains are inflated on a pool of worker threads. Grains that aren't
+    present in the VMDK, or that are entirely zero, are never written, so
+    if ``output_obj`` is a new file they are left as holes in it.
+
+    Args:
+      input_obj (file): Readable binary file object, positioned at the
+        start of the VMDK.
+      output_obj (file): Seekable, writable binary file object, normally
+        a newly created file.
+      workers (int): Number of decompression threads to use; defaults to
+        :data:`COT.file_reference.MAX_WORKERS`.
+
+    Returns:
+      int: Capacity of the disk (and size of the output) in bytes.
+
+    Raises:
+      ValueError: if this isn't a valid streamOptimized VMDK.
+      NotImplementedError: if this is a sparse extent without compressed
+        grains and markers, which can't be read sequentially.
+
+    Examples:
+      ::
+
+        >>> import io
+        >>> vmdk = io.BytesIO()
+        >>> StreamOptimizedWriter(1048576, "foo.vmdk").write(
+        ...     io.BytesIO(b"hello world"), vmdk)
+        >>> vmdk.seek(0)
+        0
+        >>> output = io.BytesIO()
+        >>> decode_stream_optimized(vmdk, output)
+        1048576
+        >>> data = output.getvalue()
+        >>> data[:11] == b"hello world" and not any(bytearray(data[11:]))
+        True
+    """
+    header = _read_exact(input_obj, SECTOR_SIZE)
+    if not header.startswith(SPARSE_MAGIC):
+        raise ValueError("Not a VMDK sparse extent")
+    (_, _, flags, capacity, grain_size, desc_offset, desc_size,
+     _, _, _, overhead, _, _, _, _, _,
+     compress_algorithm) = _SPARSE_HEADER.unpack_from(header)
+    if (not flags & _FLAG_COMPRESSED or not flags & _FLAG_MARKERS or
+            compress_algorithm != _COMPRESSION_DEFLATE):
+        raise NotImplementedError("VMDK sparse extent does not use markers "
+                                  "and compressed grains")
+    if not grain_size:
+        raise ValueError("Invalid VMDK grain size 0")
+    _skip(input_obj,
+          (max(overhead, desc_offset + desc_size, 1) - 1) * SECTOR_SIZE)
+
+    capacity *= SECTOR_SIZE
+    grain_bytes = grain_size * SECTOR_SIZE
+    zero_grain = b'\0' * grain_bytes
+
+    def inflate(item):
+        """Decompress one grain."""
+        (lba, data) = item
+        try:
+            data = zlib.decompress(data)
+        except zlib.error as exc:
+            raise ValueError("Invalid compressed VMDK grain at LBA {0}: {1}"
+                             .format(lba, exc))
+        if len(data) != grain_bytes or lba * SECTOR_SIZE >= capacity:
+            raise ValueError("Invalid VMDK grain at LBA {0}".format(lba))
+        return lba, data
+
+    grains = 0
+    for (lba, data) in imap_concurrently(inflate, _grain_markers(input_obj),
+                                         workers):
+        grains += 1
+        if data == zero_grain:
+            continue
+        offset = lba * SECTOR_SIZE
+        output_obj.seek(offset)
+        output_obj.write(data[:capacity - offset])
+    output_obj.truncate(capacity)
+    logger.debug("Decoded %d grains of streamOptimized VMDK data", grains)
+    return capacity
+
 
 class VMDK(DiskRepresentation):
     """VMDK disk image file representation."""
 
     disk_format = "vmdk"
 
+    magic_signatures = ((0, SPARSE_MAGIC), (0, COWD_MAGIC),
+                        (0, DESCRIPTOR_MAGIC))
+
+    def __init__(self, path):
+        """Create a representation of an existing VMDK.
+
+        Args:
+          path (str): Path to existing file.
+        """
+        super(VMDK, self).__init__(path)
+        self._info = None
+
+    @property
+    def info(self):
+        """Information parsed from the VMDK header (:class:`VMDKInfo`).
+
+        Raises:
+          ValueError: if the VMDK header or descriptor can't be parsed.
+        """
+        if self._info is None:
+            self._info = read_vmdk_info(self.path)
+            logger.debug("VMDK %s: %s", self.path, self._info)
+        return self._info
+
     @property
     def disk_subformat(self):
         """Disk subformat, such as 'streamOptimized'."""
         if self._disk_subformat is None:
-            # Look at the VMDK file header to determine the sub-format
-            with open(self.path, 'rb') as fileobj:
-                # The header contains a mix of binary and ASCII, so ignore
-                # any errors in decoding binary data to strings
-                header = fileobj.read(1000).decode('ascii', 'ignore')
-            # Detect the VMDK format from the output:
-            match = re.search('createType="(.*)"', header)
-            if not match:
-                raise RuntimeError(
-                    "Could not find VMDK 'createType' in the "
-                    "file header:\n{0}".format(header))
-            vmdk_format = match.group(1)
+            try:
+                vmdk_format = self.info.subformat
+            except ValueError as exc:
+                # Such as an ESXi sparse (COWD) extent - ask qemu-img
+                logger.debug("Unable to read VMDK sub-format of %s "
+                             "directly (%s)", self.path, exc)
+                output = helpers['qemu-img'].call(['info', self.path])
+                match = re.search(r"create type: (\S+)", output)
+                if not match:
+                    raise RuntimeError("Could not determine VMDK sub-format "
+                                       "of {0}: {1}".format(self.path, exc))
+                vmdk_format = match.group(1)
             logger.debug("VMDK sub-format for %s is '%s'",
                          self.path, vmdk_format)
             self._disk_subformat = vmdk_format
         return self._disk_subformat
 
+    @property
+    def capacity(self):
+        """Capacity of this disk image, in bytes."""
+        if self._capacity is None:
+            try:
+                self._capacity = str(self.info.capacity)
+                logger.debug("Disk %s capacity is %s bytes", self.path,
+                             self._capacity)
+            except ValueError as exc:
+                logger.debug("Unable to read capacity of %s directly (%s)",
+                             self.path, exc)
+                return super(VMDK, self).capacity
+        return self._capacity
+
     @classmethod
     def from_other_image(cls, input_image, output_dir,
                          output_subformat="streamOptimized"):
@@ -83,9 +705,11 @@ class VMDK(DiskRepresentation):
             but is less likely to be available on most user systems, and it
             can only convert from RAW format images to streamOptimized VMDK.
 
-          So, when creating streamOptimized VMDKs, if we have QEMU 2.5.1+,
-          we're golden. Else, if we have ``vmdktool``, use it, after
-          converting the :attr:`input_image` to RAW format first if necessary.
+          So, when creating streamOptimized VMDKs from RAW or QCOW2 images,
+          COT uses its own :class:`StreamOptimizedWriter`, which always
+          produces "version 3" images. For other input images, if we have
+          QEMU 2.5.1+, we're golden. Else, if we have ``vmdktool``, use it,
+          after converting the :attr:`input_image` to RAW format first.
           Else, fail back to QEMU 2.1.0+ but warn the user that the resulting
           image may not be usable with ESXi.
         """
@@ -93,11 +717,14 @@ class VMDK(DiskRepresentation):
         (file_prefix, _) = os.path.splitext(file_name)
         output_path = os.path.join(output_dir, file_prefix + ".vmdk")
         if output_subformat == "streamOptimized":
-            helper = helper_select([
-                ('qemu-img', '2.5.1'),  # best option, all needed functionality
-                'vmdktool',  # supports VMDK v.3, but only converts from RAW
-                ('qemu-img', '2.1.0'),  # fallback - produces VMDK v.1
-            ])
+            try:
+                cls._write_stream_optimized(input_image, output_path)
+                return cls(output_path)
+            except NotImplementedError as exc:
+                logger.debug("Not converting %s natively: %s",
+                             input_image.path, exc)
+
+            helper = cls.stream_optimized_helper()
             if helper.name == 'vmdktool':
                 if input_image.disk_format != 'raw':
                     # vmdktool needs a raw image as input
@@ -139,26 +766,100 @@ class VMDK(DiskRepresentation):
             output_path])
         return cls(output_path)
 
+    @staticmethod
+    def stream_optimized_helper():
+        """Select the helper to convert images to streamOptimized VMDKs.
+
+        This is the helper used by :meth:`from_other_image` for any image
+        that it can't convert natively (see :meth:`converts_natively`).
+
+        Returns:
+          Helper: ``qemu-img`` or ``vmdktool``.
+
+        Raises:
+          HelperNotFoundError: if no suitable helper is available.
+        """
+        return helper_select([
+            ('qemu-img', '2.5.1'),  # best option, all needed functionality
+            'vmdktool',  # supports VMDK v.3, but only converts from RAW
+            ('qemu-img', '2.1.0'),  # fallback - produces VMDK v.1
+        ])
+
+    @classmethod
+    def converts_natively(cls, input_image):
+        """Check whether the given image can be converted without helpers.
+
+        Args:
+          input_image (DiskRepresentation): Existing image representation.
+
+        Returns:
+          bool: True if :meth:`from_other_image` converts ``input_image``
+          to a streamOptimized VMDK natively, False if a helper is needed.
+        """
+        if input_image.disk_format == 'raw':
+            return True
+        if input_image.disk_format != 'qcow2':
+            return False
+        with open(input_image.path, 'rb') as input_obj:
+            try:
+                QCOW2Reader(input_obj)
+            except NotImplementedError:
+                return False
+        return True
+
+    @classmethod
+    def _write_stream_optimized(cls, input_image, output_path):
+        """Convert the given image to a streamOptimized VMDK without helpers.
+
+        Args:
+          input_image (DiskRepresentation): Existing RAW or QCOW2 image.
+          output_path (str): Path to write the new VMDK to.
+
+        Raises:
+          NotImplementedError: if the input image can't be read natively.
+        """
+        if input_image.disk_format not in ('raw', 'qcow2'):
+            raise NotImplementedError("{0} images are not supported"
+                                      .format(input_image.disk_format))
+        with open(input_image.path, 'rb') as input_obj:
+            if input_image.disk_format == 'qcow2':
+                source = QCOW2Reader(input_obj)
+                capacity = source.size
+            else:
+                source = input_obj
+                capacity = os.path.getsize(input_image.path)
+            writer = StreamOptimizedWriter(capacity,
+                                           os.path.basename(output_path))
+            logger.info("Converting %s to streamOptimized VMDK %s",
+                        input_image.path, output_path)
+            with ReadAheadReader(source, size=capacity) as reader:
+                try:
+                    with open(output_path, 'wb') as output_obj:
+                        writer.write(reader, output_obj)
+                except Exception:
+                    # Don't leave a partial image behind
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+                    raise
+
     @classmethod
     def _create_file(cls, path, disk_subformat="streamOptimized", **kwargs):
         """Worker function for create_file().
 
+        Blank streamOptimized VMDKs are written directly; other subformats
+        are created with ``qemu-img``.
+
         Args:
           path (str): Location to create VMDK file.
           disk_subformat (str): Defaults to "streamOptimized".
           **kwargs: See :meth:`DiskRepresentation._create_file`
         """
-        if (disk_subformat == "streamOptimized" and
-                helpers['qemu-img'].version < StrictVersion("2.5.1")):
-            # Slightly different warning from the one in from_other_image,
-            # as vmdktool doesn't help us with this case.
-            logger.warning(
-                "QEMU version %s produces 'version 1' VMDK images, which newer"
-                " versions of VMware ESXi will reject with the message '%s'."
-                "\nIn order to generate the preferred 'version 3' images,"
-                " please upgrade to QEMU 2.5.1 or later.",
-                str(helpers['qemu-img'].version),
-                "Not a supported disk format (sparse VMDK version too old)")
+        if disk_subformat == "streamOptimized" and not kwargs.get('files'):
+            writer = StreamOptimizedWriter(
+                capacity_bytes(kwargs['capacity']), os.path.basename(path))
+            with open(path, 'wb') as file_obj:
+                writer.write(io.BytesIO(), file_obj)
+            return
 
         super(VMDK, cls)._create_file(path, disk_subformat=disk_subformat,
                                       **kwargs)
@@ -21,22 +21,243 @@
 .. autosummary::
   :nosignatures:
 
+  ArchiveWriter
   FileReference
   FileOnDisk
   FileInTAR
+  TarIndex
+
+**Functions**
+
+.. autosummary::
+  :nosignatures:
+
+  calculate_checksums
+  copy_file
+  default_workers
+  imap_concurrently
+  run_concurrently
+
+**Constants**
+
+.. autosummary::
+  CHECKSUM_CACHE
+  MAX_WORKERS
+  VERIFY_POLICIES
 """
 
+import copy
+import io
 import logging
+import multiprocessing
 import os
 import shutil
+import stat
+import sys
 import tarfile
+import threading
 
+from collections import OrderedDict, deque
 from contextlib import contextmanager, closing
+from multiprocessing.pool import ThreadPool
+
+from COT.data_validation import (
+    ChecksumReader, ReadAheadReader, file_checksum,
+)
 
-from COT.data_validation import file_checksum
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
+_FICLONE = 0x40049409
+"""Linux ``ioctl()`` request code to clone a file's data blocks."""
+
+CHECKSUM_CACHE = None
+"""Optional :class:`~COT.checksum_cache.ChecksumCache` to use.
+
+If set, checksums calculated by :class:`FileReference` objects are stored
+in, and retrieved from, this persistent cache.
+"""
+
+MAX_WORKERS = None
+"""Maximum number of worker threads to use for concurrent processing.
+
+This applies to checksumming files as well as to compressing disk image
+data (see :class:`COT.disks.vmdk.StreamOptimizedWriter`). If ``None``,
+the number of CPUs is used, up to a limit of 8.
+"""
+
+VERIFY_POLICIES = ('strict', 'lazy', 'deferred', 'off')
+"""When to verify a file against its expected checksum, if any.
+
+``'strict'``
+  Immediately, when the :class:`FileReference` is created.
+``'lazy'``
+  When the file is first opened or copied.
+``'deferred'``
+  Only when :meth:`FileReference.verify` is explicitly called, typically
+  by a background thread, so as not to delay loading a package.
+``'off'``
+  Never.
+"""
+
+
+def default_workers():
+    """Get the number of worker threads to use if not otherwise specified.
+
+    Returns:
+      int: :data:`MAX_WORKERS` if set, else the number of CPUs, up to 8.
+    """
+    if MAX_WORKERS is not None:
+        return MAX_WORKERS
+    try:
+        return min(multiprocessing.cpu_count(), 8)
+    except NotImplementedError:
+        return 1
+
+
+def run_concurrently(func, items, workers=None):
+    """Call the given function on each item, using a pool of threads.
+
+    Intended for I/O-bound or hashing work - :mod:`hashlib` releases the
+    GIL while digesting large buffers, so checksumming several files
+    concurrently can make use of multiple cores and the full bandwidth
+    of the underlying storage.
+
+    Args:
+      func (function): Function taking a single item as argument.
+      items (iterable): Items to process.
+      workers (int): Maximum number of threads to use; if unspecified,
+        defaults to :data:`MAX_WORKERS`.
+    Returns:
+      list: Results of ``func`` for each item, in the same order as
+      ``items``. If any call raised an exception, it is re-raised here.
+    """
+    items = list(items)
+    if workers is None:
+        workers = default_workers()
+    workers = min(workers, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+    logger.debug("Processing %d items with %d worker threads",
+                 len(items), workers)
+    pool = ThreadPool(workers)
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def imap_concurrently(func, items, workers=None):
+    """Call the given function on each item, lazily, using a pool of threads.
+
+    Unlike :func:`run_concurrently`, ``items`` is consumed incrementally,
+    and only a few items per worker are in flight at any time, so memory
+    use is bounded no matter how many items there are.
+
+    Args:
+      func (function): Function taking a single item as argument.
+      items (iterable): Items to process.
+      workers (int): Maximum number of threads to use; if unspecified,
+        defaults to :data:`MAX_WORKERS`.
+    Yields:
+      object: Result of ``func`` for each item, in the same order as
+      ``items``. If any call raised an exception, it is re-raised here.
+    """
+    if workers is None:
+        workers = default_workers()
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    pool = ThreadPool(workers)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(pool.apply_async(func, (item,)))
+            if len(pending) >= 4 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def calculate_checksums(file_refs, workers=None):
+    """Calculate the checksums of the given files concurrently.
+
+    Args:
+      file_refs (list): List of :class:`FileReference` objects.
+      workers (int): See :func:`run_concurrently`.
+    Returns:
+      list: :attr:`FileReference.checksum` of each file, in order.
+    """
+    return run_concurrently(lambda file_ref: file_ref.checksum,
+                            file_refs, workers)
+
+
+def _stat_fingerprint(path):
+    """Get a tuple that changes whenever the given file is modified.
+
+    Args:
+      path (str): Path to file.
+    Returns:
+      tuple: (device, inode, size, mtime) of the file.
+    Raises:
+      OSError: if the file cannot be stat'ed.
+    """
+    file_stat = os.stat(path)
+    return (file_stat.st_dev, file_stat.st_ino, file_stat.st_size,
+            getattr(file_stat, 'st_mtime_ns', file_stat.st_mtime))
+
+
+class ArchiveWriter(tarfile.TarFile):
+    """TarFile that can efficiently add data copied from a range of a file.
+
+    Open it with :meth:`ArchiveWriter.open`, just like :func:`tarfile.open`.
+
+    :meth:`add_data_range` is equivalent to :meth:`~tarfile.TarFile.addfile`
+    with a file object positioned at the start of the data, but copies the
+    data by :func:`_copy_data`, which lets the OS copy it directly from file
+    to file where possible. To do so, it updates the same internal state of
+    :class:`tarfile.TarFile` that :meth:`~tarfile.TarFile.addfile` does in
+    every Python version COT supports:
+
+    * ``fileobj``, the file object being written, positioned at the end of
+      the archive, which must be a real file for the OS to copy into it;
+    * ``offset``, the current size of the archive;
+    * ``members``, the list of members of the archive;
+    * ``_check()``, which raises an error if the archive isn't writable.
+    """
+
+    def add_data_range(self, tarinfo, src_path, src_offset):
+        """Add a member whose data is a byte range of the given file.
+
+        Args:
+          tarinfo (tarfile.TarInfo): Header describing this member.
+            Its ``size`` determines the number of bytes copied.
+          src_path (str): File containing the data to add.
+          src_offset (int): Offset of the data within ``src_path``.
+        """
+        self._check("awx")
+        tarinfo = copy.copy(tarinfo)
+        buf = tarinfo.tobuf(self.format, self.encoding, self.errors)
+        self.fileobj.write(buf)
+        self.offset += len(buf)
+        with open(src_path, 'rb') as src_obj:
+            _copy_data(src_obj, src_offset, self.fileobj, tarinfo.size)
+        blocks, remainder = divmod(tarinfo.size, tarfile.BLOCKSIZE)
+        if remainder > 0:
+            self.fileobj.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+            blocks += 1
+        self.offset += blocks * tarfile.BLOCKSIZE
+        self.members.append(tarinfo)
+
 
 class FileReference(object):
     """Semi-abstract base class for file references."""
@@ -76,7 +297,8 @@ class FileReference(object):
                  filename,
                  checksum_algorithm=None,
                  expected_checksum=None,
-                 expected_size=None):
+                 expected_size=None,
+                 verify_policy='strict'):
         """Initialize and validate the file reference (common logic).
 
         Args:
@@ -85,10 +307,16 @@ class FileReference(object):
           checksum_algorithm (str): 'sha1', 'sha256', etc.
           expected_checksum (str): Expected checksum of the file, if any.
           expected_size (int): Expected size of the file, in bytes, if any.
+          verify_policy (str): When to check the file against
+            ``expected_checksum`` - one of :data:`VERIFY_POLICIES`.
 
         Raises:
           IOError: if the file does not actually exist or is not readable.
+          ValueError: if ``verify_policy`` is not valid.
         """
+        if verify_policy not in VERIFY_POLICIES:
+            raise ValueError("Unknown verify_policy '{0}' - expected one of "
+                             "{1}".format(verify_policy, VERIFY_POLICIES))
         if not os.path.isabs(container_path):
             logger.warning("Only absolute paths are accepted, but "
                            'got apparent relative path "%s".'
@@ -100,7 +328,11 @@ class FileReference(object):
         self.checksum_algorithm = checksum_algorithm
         self._checksum = None
         self._size = None
+        self._fingerprint = None
         self.force_refresh = False
+        self.expected_checksum = expected_checksum
+        self.verify_policy = verify_policy
+        self._verified = None
 
         logger.spam("Initing for file %s, expected_size %s,"
                     " expected_checksum %s",
@@ -110,15 +342,8 @@ class FileReference(object):
             raise IOError("File '{0}' does not exist in {1}"
                           .format(self.filename, self.container_path))
 
-        if expected_checksum is not None and (self.checksum !=
-                                              expected_checksum):
-            logger.error("The %s checksum for file '%s' is expected to be:"
-                         "\n%s\nbut is actually:\n%s\n"
-                         "This file may have been tampered with!",
-                         self.checksum_algorithm,
-                         self.filename,
-                         expected_checksum,
-                         self.checksum)
+        if verify_policy == 'strict':
+            self.verify()
 
         if expected_size is not None and self.size != int(expected_size):
             logger.warning("The size of file '%s' is expected to be %s bytes,"
@@ -128,17 +353,88 @@ class FileReference(object):
         # Should never fail this:
         assert self.exists
 
+    def verify(self):
+        """Check the file against its expected checksum, if any.
+
+        The check is only performed once; subsequent calls return the
+        previous result.
+
+        Returns:
+          bool: False if the checksum does not match, else True.
+        """
+        if self.expected_checksum is None:
+            return True
+        if self._verified is None:
+            checksum = self.checksum
+            self._verified = (checksum == self.expected_checksum)
+            if not self._verified:
+                logger.error("The %s checksum for file '%s' is expected to be:"
+                             "\n%s\nbut is actually:\n%s\n"
+                             "This file may have been tampered with!",
+                             self.checksum_algorithm,
+                             self.filename,
+                             self.expected_checksum,
+                             checksum)
+        return self._verified
+
+    def _verify_if_lazy(self):
+        """Call :meth:`verify` if using the ``'lazy'`` verify policy."""
+        if self.verify_policy == 'lazy':
+            self.verify()
+
+    def _check_fingerprint(self):
+        """Discard the cached size and checksum if the file has changed.
+
+        Also discards them unconditionally if :attr:`force_refresh` is set.
+        """
+        fingerprint = self.fingerprint
+        if self.force_refresh or fingerprint != self._fingerprint:
+            self._size = None
+            self._checksum = None
+            self._fingerprint = fingerprint
+
     @property
     def checksum(self):
-        """Checksum of the referenced file."""
+        """Checksum of the referenced file.
+
+        Only recalculated if the file's :attr:`fingerprint` has changed.
+        """
         if self.checksum_algorithm is None:
             return None
-        if self._checksum is None or self.force_refresh:
-            with self.open('rb') as file_obj:
-                self._checksum = file_checksum(file_obj,
-                                               self.checksum_algorithm)
+        self._check_fingerprint()
+        if self._checksum is None:
+            # Record the size too, as a baseline for refresh() to check
+            self._size = self.size
+            if self._known_checksum() is None:
+                with self._open('rb') as file_obj:
+                    self._checksum = file_checksum(file_obj,
+                                                   self.checksum_algorithm)
+                self._cache_checksum()
+        return self._checksum
+
+    def _known_checksum(self):
+        """Get the checksum of this file if it's known without reading it.
+
+        Returns:
+          str: Checksum previously calculated or found in
+          :data:`CHECKSUM_CACHE`, else ``None``.
+        """
+        self._check_fingerprint()
+        if self._checksum is None and CHECKSUM_CACHE is not None:
+            self._checksum = CHECKSUM_CACHE.get(self._fingerprint,
+                                                self.checksum_algorithm)
         return self._checksum
 
+    def _cache_checksum(self):
+        """Store the newly calculated checksum in :data:`CHECKSUM_CACHE`."""
+        if CHECKSUM_CACHE is None:
+            return
+        # Don't cache it if the file was modified while we were reading it
+        if self.fingerprint != self._fingerprint:
+            return
+        CHECKSUM_CACHE.put(self._fingerprint, self.checksum_algorithm,
+                           self._checksum)
+
     @property
     def exists(self):
         """Report whether this file actually exists."""
@@ -149,50 +445,149 @@ class FileReference(object):
         """Actual path to a real file, if any."""
         return None
 
+    @property
+    def fingerprint(self):
+        """Cheaply obtained value that changes whenever the file changes.
+
+        Used to avoid recalculating the :attr:`size` and :attr:`checksum`
+        of an unchanged file. ``None`` if the file does not exist.
+        """
+        raise NotImplementedError
+
     @property
     def size(self):
         """Size of the referenced file, in bytes."""
         raise NotImplementedError
 
     @contextmanager
-    def open(self, mode):
+    def open(self, mode, verify=True):
         """Open the file and yield a reference to the file object.
 
         Automatically closes the file when done.
         Some subclasses may not support all modes.
+        If using the ``'lazy'`` :attr:`verify_policy`, the file is verified
+        against its expected checksum before it is opened for the first time.
 
         Args:
           mode (str): Mode such as 'r', 'w', 'a', 'w+', etc.
+          verify (bool): If False, skip the ``'lazy'`` verification, such
+            as when only peeking at the file for informational purposes.
         Yields:
           file: File object
         """
+        if verify:
+            self._verify_if_lazy()
+        with self._open(mode) as obj:
+            yield obj
+
+    def _open(self, mode):
+        """Subclass implementation of :meth:`open`.
+
+        Args:
+          mode (str): Mode such as 'r', 'w', 'a', 'w+', etc.
+        Returns:
+          contextmanager: Context manager yielding a file object
+        """
         raise NotImplementedError
 
+    def _add_file_obj_to_archive(self, tarf, tarinfo, file_obj):
+        """Add the given file object to the archive, checksumming if needed.
+
+        Helper for subclass implementations of :meth:`add_to_archive`.
+
+        Args:
+          tarf (tarfile.TarFile): Add the data to this archive.
+          tarinfo (tarfile.TarInfo): Header describing this file.
+          file_obj (file): Opened file object to read data from.
+        Returns:
+          str: Checksum of the data added, or ``None`` if
+          :attr:`checksum_algorithm` is not set.
+        """
+        if self.checksum_algorithm is None or not tarinfo.isreg():
+            tarf.addfile(tarinfo, file_obj)
+            return None
+        self._check_fingerprint()
+        self._size = tarinfo.size
+        with closing(ChecksumReader(file_obj,
+                                    self.checksum_algorithm)) as reader:
+            tarf.addfile(tarinfo, reader)
+        # We just read every byte of the file, so this is up to date
+        self._checksum = reader.hexdigest()
+        self._cache_checksum()
+        self._verify_if_lazy()
+        return self._checksum
+
+    def _can_add_data_as_is(self, tarinfo):
+        """Check whether the data can be archived without reading it here.
+
+        Helper for subclass implementations of :meth:`add_to_archive`.
+
+        Args:
+          tarinfo (tarfile.TarInfo): Header describing this file.
+        Returns:
+          bool: True if the file's data can be copied into the archive as-is
+          by :meth:`_add_data_range_to_archive`, as it's a regular file
+          whose checksum is either already known or not needed.
+        """
+        return (tarinfo.isreg() and not tarinfo.issparse() and
+                (self.checksum_algorithm is None or
+                 self._known_checksum() is not None))
+
+    def _add_data_range_to_archive(self, tarf, tarinfo, src_path, src_offset):
+        """Add the file to the archive by copying a byte range of a file.
+
+        Helper for subclass implementations of :meth:`add_to_archive`,
+        usable if :meth:`_can_add_data_as_is` is True. If ``tarf`` is an
+        :class:`ArchiveWriter`, the data is copied without passing through
+        Python where the OS allows.
+
+        Args:
+          tarf (tarfile.TarFile): Add the data to this archive.
+          tarinfo (tarfile.TarInfo): Header describing this file.
+          src_path (str): File containing the data to add.
+          src_offset (int): Offset of the data within ``src_path``.
+        Returns:
+          str: Checksum of the data added, or ``None`` if
+          :attr:`checksum_algorithm` is not set.
+        """
+        self._verify_if_lazy()
+        if isinstance(tarf, ArchiveWriter):
+            tarf.add_data_range(tarinfo, src_path, src_offset)
+        else:
+            with open(src_path, 'rb') as src_obj:
+                src_obj.seek(src_offset)
+                tarf.addfile(tarinfo, src_obj)
+        return self._checksum
+
     def refresh(self):
-        """Make sure all information in this reference is still valid."""
+        """Make sure all information in this reference is still valid.
+
+        The size and checksum are only recalculated if the file's
+        :attr:`fingerprint` has changed since they were last calculated.
+
+        Returns:
+          bool: True if the file still exists and is unchanged, else False.
+        """
         # Cache the previously known values
-        exp_size = self.size
-        exp_checksum = self.checksum
+        exp_size = self._size
+        exp_checksum = self._checksum
         logger.spam("Refreshing FileReference for '%s', "
                     "expected size %s, cksum %s",
                     self.filename, exp_size, exp_checksum)
         result = True
 
-        self.force_refresh = True
-
         if not self.exists:
             logger.error("File '%s' no longer exists!", self.filename)
-            # keep force_refresh as True since we're in a bad state
             return False
 
         # Refresh the attributes and see if they've changed
-        if self.size != exp_size and exp_size is not None:
+        if exp_size is not None and self.size != exp_size:
             logger.warning("Size of file '%s' has changed"
                            " from %s bytes to %s bytes.",
                            self.filename, exp_size, self.size)
             result = False
 
-        if self.checksum != exp_checksum and exp_checksum is not None:
+        if exp_checksum is not None and self.checksum != exp_checksum:
             logger.error("The %s checksum of file '%s' has changed"
                          " from\n%s\nto\n%s\n"
                          "This file may have been tampered with!",
@@ -216,15 +611,24 @@ class FileOnDisk(FileReference):
         """Return True if the file exists on disk, else False."""
         return os.path.exists(self.file_path)
 
+    @property
+    def fingerprint(self):
+        """The (device, inode, size, mtime) of the file on disk."""
+        try:
+            return _stat_fingerprint(self.file_path)
+        except OSError:
+            return None
+
     @property
     def size(self):
         """Get the size of this file, in bytes."""
-        if self._size is None or self.force_refresh:
+        self._check_fingerprint()
+        if self._size is None:
             self._size = os.path.getsize(self.file_path)
         return self._size
 
     @contextmanager
-    def open(self, mode):
+    def _open(self, mode):
         """Open the file and return a reference to the file object.
 
         Args:
@@ -243,22 +647,445 @@ class FileOnDisk(FileReference):
         """
         if self.file_path == os.path.join(dest_dir, self.filename):
             return
+        self._verify_if_lazy()
         logger.debug("Copying %s to %s", self.file_path, dest_dir)
-        shutil.copy(self.file_path, dest_dir)
+        dest_path = dest_dir
+        if os.path.isdir(dest_dir):
+            dest_path = os.path.join(dest_dir,
+                                     os.path.basename(self.file_path))
+        if copy_file(self.file_path, dest_path) != 'link':
+            shutil.copymode(self.file_path, dest_path)
 
     def add_to_archive(self, tarf):
         """Copy this file into the given tarfile object.
 
+        If the checksum of the file is already known (or not needed), its
+        data is copied without passing through Python where the OS allows.
+        Otherwise, the checksum of the file is calculated as its data is
+        copied, so the file is only read once.
+
         Args:
           tarf (tarfile.TarFile): Add this file to that archive.
+        Returns:
+          str: Checksum of the data added, or ``None``.
         """
         logger.debug("Adding %s to TAR file as %s",
                      self.file_path, self.filename)
-        tarf.add(self.file_path, self.filename)
+        tarinfo = tarf.gettarinfo(self.file_path, self.filename)
+        if self._can_add_data_as_is(tarinfo):
+            return self._add_data_range_to_archive(tarf, tarinfo,
+                                                   self.file_path, 0)
+        with self._open('rb') as obj:
+            return self._add_file_obj_to_archive(tarf, tarinfo, obj)
+
+
+def _clone(src_obj, dest_obj):
+    """Try to make one file share the data blocks of another (a "reflink").
+
+    Only supported on Linux, on filesystems such as Btrfs and XFS.
+
+    Args:
+      src_obj (file): File object to clone.
+      dest_obj (file): Empty file object, opened for writing, to clone into.
+    Returns:
+      bool: True if successfully cloned, else False.
+    """
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        fcntl.ioctl(dest_obj.fileno(), _FICLONE, src_obj.fileno())
+    except (IOError, OSError) as exc:
+        logger.debug("Unable to clone %s (%s)", src_obj.name, exc)
+        return False
+    return True
+
+
+def _copy_file_range(src_fd, src_offset, dest_fd, dest_offset, size):
+    """Copy data within the kernel by :func:`os.copy_file_range`.
+
+    Helper for :func:`_copy_data`.
+
+    Args:
+      src_fd (int): File descriptor to copy data from.
+      src_offset (int): Offset of the data within ``src_fd``.
+      dest_fd (int): File descriptor to copy data to.
+      dest_offset (int): Offset to copy the data to within ``dest_fd``.
+      size (int): Number of bytes to copy.
+    Returns:
+      int: Number of bytes copied, which may be fewer than ``size`` (even 0)
+      if the call is unavailable or the kernel refuses to copy the data.
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    copied = 0
+    while copy_file_range is not None and copied < size:
+        try:
+            count = copy_file_range(src_fd, dest_fd, size - copied,
+                                    src_offset + copied, dest_offset + copied)
+        except OSError as exc:
+            logger.debug("copy_file_range() failed (%s)", exc)
+            break
+        if count == 0:
+            break
+        copied += count
+    return copied
+
+
+def _sendfile(src_fd, src_offset, dest_fd, dest_offset, size):
+    """Copy data within the kernel by :func:`os.sendfile`.
+
+    Helper for :func:`_copy_data`.
+
+    Args:
+      src_fd (int): File descriptor to copy data from.
+      src_offset (int): Offset of the data within ``src_fd``.
+      dest_fd (int): File descriptor to copy data to.
+      dest_offset (int): Offset to copy the data to within ``dest_fd``.
+      size (int): Number of bytes to copy.
+    Returns:
+      int: Number of bytes copied, which may be fewer than ``size`` (even 0)
+      if the call is unavailable or the kernel refuses to copy the data.
+    """
+    sendfile = getattr(os, 'sendfile', None)
+    if sendfile is None or size <= 0:
+        return 0
+    # Unlike copy_file_range(), sendfile() writes at the current position
+    os.lseek(dest_fd, dest_offset, os.SEEK_SET)
+    copied = 0
+    while copied < size:
+        try:
+            count = sendfile(dest_fd, src_fd, src_offset + copied,
+                             size - copied)
+        except OSError as exc:
+            logger.debug("sendfile() failed (%s)", exc)
+            break
+        if count == 0:
+            break
+        copied += count
+    return copied
+
+
+def _copy_buffered(src_obj, src_offset, dest_obj, size):
+    """Copy data through Python, reading ahead in a background thread.
+
+    Helper for :func:`_copy_data`.
+
+    Args:
+      src_obj (file): File object (opened in binary mode) to copy data from.
+      src_offset (int): Offset of the data within ``src_obj``.
+      dest_obj (file): File object (opened in binary mode) to copy data to,
+        at its current position.
+      size (int): Number of bytes to copy.
+    Raises:
+      IOError: if ``src_obj`` ends before ``size`` bytes were copied.
+    """
+    src_obj.seek(src_offset)
+    copied = 0
+    with ReadAheadReader(src_obj, size=size) as reader:
+        while copied < size:
+            data = reader.read(reader.buffer_size)
+            if not data:
+                raise IOError("Unexpected end of file {0} after {1} of {2}"
+                              " bytes".format(src_obj.name, copied, size))
+            dest_obj.write(data)
+            copied += len(data)
+
+
+def _copy_data(src_obj, src_offset, dest_obj, size):
+    """Copy a byte range of one file to the current position of another.
+
+    Uses :func:`os.copy_file_range` or else :func:`os.sendfile` where
+    available, so the data is copied within the kernel (or even shared,
+    on filesystems supporting reflinks) rather than passing through Python;
+    otherwise, or if the kernel refuses, falls back to a buffered copy,
+    reading ahead with a :class:`~COT.data_validation.ReadAheadReader`.
+
+    Args:
+      src_obj (file): File object (opened in binary mode) to copy data from.
+      src_offset (int): Offset of the data within ``src_obj``.
+      dest_obj (file): File object (opened in binary mode) to copy data to.
+        On return, its position is just after the copied data.
+      size (int): Number of bytes to copy.
+    Raises:
+      IOError: if ``src_obj`` ends before ``size`` bytes were copied.
+    """
+    dest_obj.flush()
+    dest_offset = dest_obj.tell()
+    src_fd = src_obj.fileno()
+    dest_fd = dest_obj.fileno()
+
+    copied = _copy_file_range(src_fd, src_offset, dest_fd, dest_offset, size)
+    copied += _sendfile(src_fd, src_offset + copied,
+                        dest_fd, dest_offset + copied, size - copied)
+
+    dest_obj.seek(dest_offset + copied)
+    if copied >= size:
+        return
+    logger.debug("Copying remaining %d bytes of %s via buffered I/O",
+                 size - copied, src_obj.name)
+    _copy_buffered(src_obj, src_offset + copied, dest_obj, size - copied)
+
+
+def copy_file(src_path, dest_path, src_offset=0, size=None, link=True):
+    """Copy a file, or a byte range within a file, to a new file.
+
+    The cheapest available method is used:
+
+    1. A reflink clone of the whole file, sharing its data blocks.
+    2. A hard link to the whole file, if it's read-only (so its data
+       can't change underneath either name) and on the same filesystem.
+    3. An in-kernel copy, as in :func:`_copy_data`.
+    4. A buffered copy.
+
+    Args:
+      src_path (str): File to copy from.
+      dest_path (str): File to create. If it already exists, it will be
+        replaced, never written through, so that any other names for it
+        (such as a hard link to an earlier source file) are unaffected.
+      src_offset (int): Offset of the data to copy within ``src_path``.
+      size (int): Number of bytes to copy, or ``None`` to copy everything
+        from ``src_offset`` onward.
+      link (bool): Whether a hard link may be used. Pass False if
+        ``dest_path`` must be a new file, with default permissions, that
+        can be modified without affecting ``src_path``.
+    Returns:
+      str: How the file was copied - ``'clone'``, ``'link'``, or ``'copy'``.
+    Raises:
+      shutil.Error: if ``src_path`` and ``dest_path`` are the same path.
+    """
+    src_stat = os.stat(src_path)
+    if size is None:
+        size = src_stat.st_size - src_offset
+    whole_file = (src_offset == 0 and size == src_stat.st_size)
+    read_only = not src_stat.st_mode & (stat.S_IWUSR | stat.S_IWGRP |
+                                        stat.S_IWOTH)
+
+    if os.path.exists(dest_path) and os.path.samefile(src_path, dest_path):
+        if os.path.realpath(src_path) == os.path.realpath(dest_path):
+            raise shutil.Error("{0} and {1} are the same file"
+                               .format(src_path, dest_path))
+        if link and whole_file and read_only:
+            logger.debug("%s is already a hard link to %s",
+                         dest_path, src_path)
+            return 'link'
+    if os.path.lexists(dest_path):
+        # Never write through an existing file - it may be a hard link
+        # to some other file, whose contents must not change.
+        os.remove(dest_path)
+
+    if (link and whole_file and read_only and hasattr(os, 'link') and
+            src_stat.st_dev == os.stat(os.path.dirname(
+                os.path.abspath(dest_path))).st_dev):
+        try:
+            os.link(src_path, dest_path)
+            logger.debug("Hard-linked %s to %s", dest_path, src_path)
+            return 'link'
+        except OSError as exc:
+            logger.debug("Unable to hard-link %s to %s (%s)",
+                         dest_path, src_path, exc)
+
+    with open(src_path, 'rb') as src_obj:
+        with open(dest_path, 'wb') as dest_obj:
+            if whole_file and _clone(src_obj, dest_obj):
+                logger.debug("Cloned %s to %s", src_path, dest_path)
+                return 'clone'
+            _copy_data(src_obj, src_offset, dest_obj, size)
+    return 'copy'
+
+
+def _read_at(file_obj, size, offset):
+    """Read up to ``size`` bytes from ``file_obj`` at absolute ``offset``.
+
+    Uses :func:`os.pread` where available, which does not move the shared
+    file position; otherwise falls back to seek-and-read.
+
+    Args:
+      file_obj (file): File object opened in binary mode.
+      size (int): Maximum number of bytes to read.
+      offset (int): Absolute offset in the file to read from.
+    Returns:
+      bytes: Data read (possibly shorter than ``size`` at end of file).
+    """
+    if hasattr(os, 'pread'):
+        return os.pread(file_obj.fileno(), size, offset)
+    file_obj.seek(offset)
+    return file_obj.read(size)
+
+
+class _TarMemberReader(io.RawIOBase):
+    """Read-only raw file object covering the data of a single TAR member.
+
+    Wrap in :class:`io.BufferedReader` to get ``readline()`` and friends.
+    """
+
+    def __init__(self, tarfile_path, offset, size):
+        """Open the archive for reading the given byte range.
+
+        Args:
+          tarfile_path (str): Path to the TAR archive.
+          offset (int): Offset of the member data in the archive.
+          size (int): Size of the member data, in bytes.
+        """
+        super(_TarMemberReader, self).__init__()
+        self._file = open(tarfile_path, 'rb')
+        self._offset = offset
+        self._size = size
+        self._pos = 0
+
+    def readable(self):
+        """Member data is always readable."""
+        return True
+
+    def seekable(self):
+        """Member data is always seekable."""
+        return True
+
+    def tell(self):
+        """Get the current position within the member data."""
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        """Move to a new position within the member data.
+
+        Args:
+          pos (int): Offset relative to ``whence``.
+          whence (int): :data:`io.SEEK_SET`, :data:`io.SEEK_CUR`,
+            or :data:`io.SEEK_END`.
+        Returns:
+          int: New absolute position within the member data.
+        """
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self._size
+        self._pos = max(0, pos)
+        return self._pos
+
+    def readinto(self, buf):
+        """Read member data into the given buffer.
+
+        Args:
+          buf (bytearray): Buffer to fill.
+        Returns:
+          int: Number of bytes read, 0 at end of member.
+        """
+        count = min(len(buf), self._size - self._pos)
+        if count <= 0:
+            return 0
+        data = _read_at(self._file, count, self._offset + self._pos)
+        buf[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self):
+        """Close the underlying archive file."""
+        if not self.closed:
+            self._file.close()
+        super(_TarMemberReader, self).close()
+
+
+class TarIndex(object):
+    """Index of the members of a TAR archive, built in a single header walk.
+
+    Each member is recorded as the :class:`tarfile.TarInfo` read from the
+    archive, whose ``offset``, ``offset_data``, ``size``, and ``mode``
+    attributes give the header offset, data offset, data size, and
+    permissions of the member respectively.
+
+    Indexes are shared between all users of a given archive - use
+    :meth:`for_path` rather than instantiating this class directly.
+    The shared index is rebuilt automatically if the archive is modified.
+    Only the :attr:`CACHE_SIZE` most recently used indexes are kept.
+    """
+
+    CACHE_SIZE = 16
+    """Maximum number of archives whose indexes are kept for reuse."""
+
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, tarfile_path):
+        """Get the shared, up-to-date index for the given TAR archive.
+
+        Args:
+          tarfile_path (str): Path to TAR archive.
+        Returns:
+          TarIndex: Index of this archive.
+        Raises:
+          tarfile.TarError: if ``tarfile_path`` is not a valid TAR archive.
+        """
+        tarfile_path = os.path.abspath(tarfile_path)
+        with cls._cache_lock:
+            # Any existing index is stale if the archive has changed or gone
+            index = cls._cache.pop(tarfile_path, None)
+            identity = _stat_fingerprint(tarfile_path)
+            if index is None or index.identity != identity:
+                index = cls(tarfile_path, identity)
+            cls._cache[tarfile_path] = index
+            while len(cls._cache) > cls.CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return index
+
+    def __init__(self, tarfile_path, identity=None):
+        """Walk the headers of the given TAR archive to build an index.
+
+        Args:
+          tarfile_path (str): Path to TAR archive.
+          identity (tuple): Identity of the file as of this reading.
+        """
+        self.path = tarfile_path
+        self.identity = identity or _stat_fingerprint(tarfile_path)
+        self.members = []
+        """List of :class:`tarfile.TarInfo`, in archive order."""
+        self._by_name = {}
+        self._by_normpath = {}
+        logger.debug("Indexing members of TAR file %s", tarfile_path)
+        with tarfile.open(tarfile_path, 'r') as tarf:
+            for member in tarf:
+                self.members.append(member)
+                # If a name is repeated, the last occurrence wins,
+                # just as with tarfile.TarFile.getmember()
+                self._by_name[member.name] = member
+                self._by_normpath[os.path.normpath(member.name)] = member
+
+    def get(self, name):
+        """Look up the given member, tolerating 'foo' versus './foo'.
+
+        Args:
+          name (str): Member name to look up.
+        Returns:
+          tarfile.TarInfo: Member information, or ``None`` if not found.
+        """
+        member = self._by_name.get(name)
+        if member is None:
+            member = self._by_normpath.get(os.path.normpath(name))
+        return member
+
+    @contextmanager
+    def open(self, member):
+        """Open the data of the given member for binary reading.
+
+        Args:
+          member (tarfile.TarInfo): Member (as found in :attr:`members`).
+        Yields:
+          file: Read-only file object.
+        """
+        if member.isreg() and not member.issparse():
+            with io.BufferedReader(_TarMemberReader(
+                    self.path, member.offset_data, member.size)) as obj:
+                yield obj
+        else:
+            with tarfile.open(self.path, 'r') as tarf:
+                with closing(tarf.extractfile(member)) as obj:
+                    yield obj
 
 
 class FileInTAR(FileReference):
-    """Wrapper for a file inside a TAR archive or OVA."""
+    """Wrapper for a file inside a TAR archive or OVA.
+
+    All references to the same archive share a single :class:`TarIndex`,
+    so the archive headers are only read once rather than on every access.
+    """
 
     def __init__(self, tarfile_path, filename, **kwargs):
         """Create a reference to a file contained in a TAR archive.
@@ -280,36 +1107,61 @@ class FileInTAR(FileReference):
             tarfile_path = os.path.abspath(tarfile_path)
         if not tarfile.is_tarfile(tarfile_path):
             raise IOError("{0} is not a valid TAR file.".format(tarfile_path))
-        self.tarf = None
         super(FileInTAR, self).__init__(tarfile_path, filename, **kwargs)
 
+    @property
+    def index(self):
+        """The up-to-date :class:`TarIndex` of the containing archive."""
+        return TarIndex.for_path(self.container_path)
+
+    @property
+    def member(self):
+        """The :class:`tarfile.TarInfo` describing this file.
+
+        Raises:
+          KeyError: if the file is not present in the archive.
+        """
+        member = self.index.get(self.filename)
+        if member is None:
+            raise KeyError("{0} not found in {1}"
+                           .format(self.filename, self.container_path))
+        return member
+
     @property
     def exists(self):
         """Return True if the file exists in the TAR archive, else False."""
-        with tarfile.open(self.container_path, 'r') as tarf:
-            try:
-                tarf.getmember(self.filename)
-                return True
-            except KeyError:
-                # Perhaps an issue with 'foo.txt' versus './foo.txt'?
-                for mem in tarf.getmembers():
-                    if os.path.normpath(mem.name) == self.filename:
-                        logger.debug("Found %s at %s in TAR file",
-                                     self.filename, mem.name)
-                        self.filename = mem.name
-                        return True
-                return False
+        member = self.index.get(self.filename)
+        if member is None:
+            return False
+        if member.name != self.filename:
+            # 'foo.txt' versus './foo.txt'
+            logger.debug("Found %s at %s in TAR file",
+                         self.filename, member.name)
+            self.filename = member.name
+        return True
+
+    @property
+    def fingerprint(self):
+        """Identity of the archive, plus name and location of this member."""
+        try:
+            index = self.index
+        except (OSError, IOError, tarfile.TarError):
+            return None
+        member = index.get(self.filename)
+        if member is None:
+            return None
+        return index.identity + (member.name, member.offset_data, member.size)
 
     @property
     def size(self):
         """Get the size of this file in bytes."""
-        if self._size is None or self.force_refresh:
-            with tarfile.open(self.container_path, 'r') as tarf:
-                self._size = tarf.getmember(self.filename).size
+        self._check_fingerprint()
+        if self._size is None:
+            self._size = self.member.size
         return self._size
 
     @contextmanager
-    def open(self, mode):
+    def _open(self, mode):
         """Open the TAR and return a reference to the relevant file object.
 
         Args:
@@ -322,12 +1174,9 @@ class FileInTAR(FileReference):
         # We can only extract a file object from a TAR file in read mode.
         if mode != 'r' and mode != 'rb':
             raise ValueError("FileInTar.open() only supports 'r'/'rb' mode")
-        # actually tarf.extractfile is always a binary object...
-        with tarfile.open(self.container_path, 'r') as tarf:
-            self.tarf = tarf
-            with closing(tarf.extractfile(self.filename)) as obj:
-                yield obj
-        self.tarf = None
+        # Like tarfile.extractfile, this is always a binary object
+        with self.index.open(self.member) as obj:
+            yield obj
 
     def copy_to(self, dest_dir):
         """Extract this file to the given destination directory.
@@ -335,18 +1184,44 @@ class FileInTAR(FileReference):
         Args:
           dest_dir (str): Destination directory or filename.
         """
-        with tarfile.open(self.container_path, 'r') as tarf:
-            logger.debug("Extracting %s from %s to %s",
-                         self.filename, self.container_path, dest_dir)
-            tarf.extract(self.filename, dest_dir)
+        member = self.member
+        logger.debug("Extracting %s from %s to %s",
+                     self.filename, self.container_path, dest_dir)
+        self._verify_if_lazy()
+        if not member.isreg():
+            with tarfile.open(self.container_path, 'r') as tarf:
+                tarf.extract(member.name, dest_dir)
+            return
+        dest_path = os.path.join(dest_dir, os.path.normpath(member.name))
+        if not os.path.isdir(os.path.dirname(dest_path)):
+            os.makedirs(os.path.dirname(dest_path))
+        copy_file(self.container_path, dest_path,
+                  member.offset_data, member.size)
+        os.chmod(dest_path, member.mode)
+        os.utime(dest_path, (member.mtime, member.mtime))
 
     def add_to_archive(self, tarf):
         """Copy this file into the given tarfile object.
 
+        If the checksum of the file is already known (or not needed), its
+        data is copied as a single byte range straight from the source
+        archive, without passing through Python where the OS allows.
+        Otherwise, the checksum of the file is calculated as its data is
+        copied, so the file is only read once.
+
         Args:
           tarf (tarfile.TarFile): Add this file to that archive.
+        Returns:
+          str: Checksum of the data added, or ``None``.
         """
-        with self.open('r') as obj:
+        member = self.member
+        if self._can_add_data_as_is(member):
+            logger.debug("Copying %s data range directly from %s to TAR file",
+                         self.filename, self.container_path)
+            return self._add_data_range_to_archive(
+                tarf, member, self.container_path, member.offset_data)
+
+        with self._open('r') as obj:
             logger.debug("Copying %s directly from %s to TAR file",
                          self.filename, self.container_path)
-            tarf.addfile(self.tarf.getmember(self.filename), obj)
+            return self._add_file_obj_to_archive(tarf, member, obj)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+#
+# October 2026
+# Copyright (c) 2026 the COT project developers.
+# See the COPYRIGHT.txt file at the top-level directory of this distribution
+# and at https://github.com/glennmatthews/cot/blob/master/COPYRIGHT.txt.
+#
+# This file is part of the Common OVF Tool (COT) project.
+# It is subject to the license terms in the LICENSE.txt file found in the
+# top-level directory of this distribution and at
+# https://github.com/glennmatthews/cot/blob/master/LICENSE.txt. No part
+# of COT, including this file, may be copied, modified, propagated, or
+# distributed except according to the terms contained in the LICENSE.txt file.
+
+"""Unit test cases for COT.cache module."""
+
+import os
+
+import mock
+
+from COT.tests import COTTestCase
+from COT.cache import SQLiteCache, cache_home
+from COT.checksum_cache import default_cache_path
+from COT.conversion_cache import default_cache_dir
+
+
+class NameCache(SQLiteCache):
+    """Minimal cache of names, for testing."""
+
+    TABLE = "names"
+    COLUMNS = ("name TEXT NOT NULL",)
+
+    def get(self, key):
+        """Get the name stored for the given key, if any."""
+        row = self._run('read', lambda conn: self._lookup(conn, key, "name"))
+        return row[0] if row else None
+
+    def put(self, key, name):
+        """Store a name for the given key."""
+        self._run('update', lambda conn: self._store(conn, key, name=name))
+
+
+class TestSQLiteCache(COTTestCase):
+    """Test cases for cache_home() and SQLiteCache class."""
+
+    def test_cache_home(self):
+        """Cache location follows the XDG base directory specification."""
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': '/foo/cache'}):
+            self.assertEqual(cache_home(), '/foo/cache/cot')
+            self.assertEqual(default_cache_path(),
+                             '/foo/cache/cot/checksums.sqlite')
+            self.assertEqual(default_cache_dir(),
+                             '/foo/cache/cot/conversions')
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': '',
+                                          'HOME': '/home/bar'}):
+            self.assertEqual(cache_home(), '/home/bar/.cache/cot')
+
+    def test_lookup_updates_last_used(self):
+        """Looking up an entry marks it as the most recently used."""
+        cache = NameCache(os.path.join(self.temp_dir, 'a', 'names.sqlite'),
+                          "name cache")
+        self.assertIsNone(cache.get('x'))
+        with mock.patch('time.time', return_value=1e9):
+            cache.put('x', 'foo')
+        with mock.patch('time.time', return_value=2e9):
+            self.assertEqual(cache.get('x'), 'foo')
+        conn = cache._connect()    # pylint: disable=protected-access
+        try:
+            self.assertEqual(conn.execute("SELECT last_used FROM names")
+                             .fetchall(), [(2e9,)])
+        finally:
+            conn.close()
+        # Persistent across instances
+        self.assertEqual(NameCache(cache.db_path, "name cache").get('x'),
+                         'foo')
+
+    def test_unusable_cache(self):
+        """Errors accessing the cache are logged but otherwise ignored."""
+        cache = NameCache(os.path.join(self.input_ovf, 'names.sqlite'),
+                          "name cache")
+        cache.put('x', 'foo')
+        self.assertLogged(levelname='WARNING', msg="Unable to %s %s",
+                          args=('update', 'name cache', cache.db_path, '.*'))
+        self.assertIsNone(cache.get('x'))
+        self.assertLogged(levelname='WARNING', msg="Unable to %s %s",
+                          args=('read', 'name cache', cache.db_path, '.*'))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#
+# October 2026
+# Copyright (c) 2026 the COT project developers.
+# See the COPYRIGHT.txt file at the top-level directory of this distribution
+# and at https://github.com/glennmatthews/cot/blob/master/COPYRIGHT.txt.
+#
+# This file is part of the Common OVF Tool (COT) project.
+# It is subject to the license terms in the LICENSE.txt file found in the
+# top-level directory of this distribution and at
+# https://github.com/glennmatthews/cot/blob/master/LICENSE.txt. No part
+# of COT, including this file, may be copied, modified, propagated, or
+# distributed except according to the terms contained in the LICENSE.txt file.
+
+"""Unit test cases for COT.checksum_cache module."""
+
+import os
+import shutil
+
+import mock
+from pkg_resources import resource_filename
+
+import COT.file_reference
+from COT.tests import COTTestCase
+from COT.checksum_cache import ChecksumCache
+from COT.data_validation import file_checksum
+from COT.file_reference import FileOnDisk, FileInTAR
+
+
+class TestChecksumCache(COTTestCase):
+    """Test cases for ChecksumCache class."""
+
+    def setUp(self):
+        """Test case setup function called automatically prior to each test."""
+        super(TestChecksumCache, self).setUp()
+        self.cache = ChecksumCache(os.path.join(self.temp_dir, 'cache',
+                                                'checksums.sqlite'))
+
+    def tearDown(self):
+        """Test case cleanup function called automatically."""
+        COT.file_reference.CHECKSUM_CACHE = None
+        super(TestChecksumCache, self).tearDown()
+
+    def test_get_put(self):
+        """Basic cache operation."""
+        self.assertIsNone(self.cache.get((1, 2, 3, 4), 'sha1'))
+        self.cache.put((1, 2, 3, 4), 'sha1', 'abcd')
+        self.assertEqual(self.cache.get((1, 2, 3, 4), 'sha1'), 'abcd')
+        # Keyed by algorithm as well as fingerprint
+        self.assertIsNone(self.cache.get((1, 2, 3, 4), 'sha256'))
+        self.assertIsNone(self.cache.get((1, 2, 3, 5), 'sha1'))
+        self.assertIsNone(self.cache.get(None, 'sha1'))
+        # Persistent across instances
+        new_cache = ChecksumCache(self.cache.db_path)
+        self.assertEqual(new_cache.get((1, 2, 3, 4), 'sha1'), 'abcd')
+
+    def test_eviction(self):
+        """Least recently used entries are evicted when the cache is full."""
+        self.cache.max_entries = 3
+        for i in range(3):
+            self.cache.put((i,), 'sha1', str(i))
+        # Use entry 0 so that entry 1 is now the least recently used
+        with mock.patch('time.time', return_value=2e9):
+            self.assertEqual(self.cache.get((0,), 'sha1'), '0')
+            self.cache.put((3,), 'sha1', '3')
+        self.assertIsNone(self.cache.get((1,), 'sha1'))
+        for i in (0, 2, 3):
+            self.assertEqual(self.cache.get((i,), 'sha1'), str(i))
+
+    @mock.patch('COT.file_reference.file_checksum', wraps=file_checksum)
+    def test_file_on_disk(self, mock_checksum):
+        """FileOnDisk uses the cache if enabled."""
+        COT.file_reference.CHECKSUM_CACHE = self.cache
+        shutil.copy(self.input_ovf, self.temp_dir)
+        temp_file = os.path.join(self.temp_dir, 'input.ovf')
+        expected = file_checksum(self.input_ovf, 'sha256')
+        self.assertEqual(
+            FileOnDisk(self.temp_dir, 'input.ovf',
+                       checksum_algorithm='sha256').checksum, expected)
+        self.assertEqual(mock_checksum.call_count, 1)
+        # A new reference to the same file uses the cached value
+        self.assertEqual(
+            FileOnDisk(self.temp_dir, 'input.ovf',
+                       checksum_algorithm='sha256').checksum, expected)
+        self.assertEqual(mock_checksum.call_count, 1)
+        # But not if the file has been changed
+        with open(temp_file, 'a') as file_obj:
+            file_obj.write("<!-- hello -->\n")
+        self.assertEqual(
+            FileOnDisk(self.temp_dir, 'input.ovf',
+                       checksum_algorithm='sha256').checksum,
+            file_checksum(temp_file, 'sha256'))
+        self.assertEqual(mock_checksum.call_count, 2)
+
+    @mock.patch('COT.file_reference.file_checksum', wraps=file_checksum)
+    def test_file_in_tar(self, mock_checksum):
+        """FileInTAR uses the cache if enabled."""
+        COT.file_reference.CHECKSUM_CACHE = self.cache
+        tarfile_path = resource_filename(__name__, "test.tar")
+        expected = file_checksum(resource_filename(__name__,
+                                                   "sample_cfg.txt"), 'sha1')
+        for _ in range(2):
+            self.assertEqual(FileInTAR(tarfile_path, "sample_cfg.txt",
+                                       checksum_algorithm='sha1').checksum,
+                             expected)
+        self.assertEqual(mock_checksum.call_count, 1)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+#
+# October 2026
+# Copyright (c) 2026 the COT project developers.
+# See the COPYRIGHT.txt file at the top-level directory of this distribution
+# and at https://github.com/glennmatthews/cot/blob/master/COPYRIGHT.txt.
+#
+# This file is part of the Common OVF Tool (COT) project.
+# It is subject to the license terms in the LICENSE.txt file found in the
+# top-level directory of this distribution and at
+# https://github.com/glennmatthews/cot/blob/master/LICENSE.txt. No part
+# of COT, including this file, may be copied, modified, propagated, or
+# distributed except according to the terms contained in the LICENSE.txt file.
+
+"""Unit test cases for COT.conversion_cache module."""
+
+import logging
+import os
+from distutils.version import StrictVersion
+
+import mock
+
+import COT.vm_description.ovf.ovf
+from COT import __version__
+from COT.tests import COTTestCase
+from COT.conversion_cache import ConversionCache, converter_id
+from COT.data_validation import file_checksum
+from COT.disks import RAW, VMDK
+from COT.helpers import helpers
+from COT.vm_description.ovf import OVF
+
+
+class TestConversionCache(COTTestCase):
+    """Test cases for ConversionCache class."""
+
+    def setUp(self):
+        """Test case setup function called automatically prior to each test."""
+        super(TestConversionCache, self).setUp()
+        self.cache = ConversionCache(os.path.join(self.temp_dir, 'cache'))
+
+    def tearDown(self):
+        """Test case cleanup function called automatically."""
+        COT.vm_description.ovf.ovf.CONVERSION_CACHE = None
+        super(TestConversionCache, self).tearDown()
+
+    def write_file(self, name, data):
+        """Create a file in the temporary directory.
+
+        Args:
+          name (str): File name.
+          data (bytes): File contents.
+        Returns:
+          str: Path to the new file.
+        """
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as file_obj:
+            file_obj.write(data)
+        return path
+
+    def test_converter_id(self):
+        """Cache keys identify the COT and helper versions used."""
+        with mock.patch.object(helpers['qemu-img'], '_installed', True), \
+                mock.patch.object(helpers['qemu-img'], '_version',
+                                  StrictVersion("2.5.1")), \
+                mock.patch.object(helpers['vmdktool'], '_installed', False):
+            self.assertEqual(converter_id('qemu-img', 'vmdktool'),
+                             "COT {0}, qemu-img 2.5.1".format(__version__))
+        self.assertEqual(converter_id(), "COT {0}".format(__version__))
+
+    def test_get_put(self):
+        """A cache hit is a new, writable file independent of the cache."""
+        key = self.cache.key('abcd', 'vmdk', 'streamOptimized', 'COT 2.0')
+        dest = os.path.join(self.temp_dir, 'dest.vmdk')
+        self.assertFalse(self.cache.get(key, dest))
+        self.assertFalse(os.path.exists(dest))
+
+        src = self.write_file('src.vmdk', b'converted')
+        self.cache.put(key, src)
+        entry = self.cache.entry_path(key)
+        self.assertFalse(os.stat(entry).st_mode & 0o222)
+        # Keyed by converter as well as source and format
+        self.assertFalse(self.cache.get(
+            self.cache.key('abcd', 'vmdk', 'streamOptimized', 'COT 2.1'),
+            dest))
+        self.assertFalse(os.path.exists(dest))
+
+        self.assertTrue(self.cache.get(key, dest))
+        self.assertFalse(os.path.samefile(dest, entry))
+        self.assertEqual(os.stat(dest).st_nlink, 1)
+        self.assertEqual(os.stat(dest).st_mode, os.stat(src).st_mode)
+        with open(dest, 'ab') as file_obj:
+            file_obj.write(b' and modified')
+        with open(entry, 'rb') as file_obj:
+            self.assertEqual(file_obj.read(), b'converted')
+
+    def test_corrupt_entry(self):
+        """A cached image that has been altered is discarded, not used."""
+        key = self.cache.key('abcd', 'vmdk', 'streamOptimized', 'COT 2.0')
+        self.cache.put(key, self.write_file('src.vmdk', b'converted'))
+        entry = self.cache.entry_path(key)
+        os.chmod(entry, 0o644)
+        with open(entry, 'wb') as file_obj:
+            file_obj.write(b'corrupted')
+        os.utime(entry, (0, 0))
+        dest = os.path.join(self.temp_dir, 'dest.vmdk')
+        self.assertFalse(self.cache.get(key, dest))
+        self.assertLogged(levelname='WARNING',
+                          msg="Discarding invalid image",
+                          args=(entry, 'conversion cache'))
+        self.assertFalse(os.path.exists(dest))
+        self.assertFalse(os.path.exists(entry))
+        # The entry is gone from the index as well
+        self.assertFalse(self.cache.get(key, dest))
+
+    def test_fingerprint(self):
+        """Only images whose size or mtime has changed are re-verified."""
+        key = self.cache.key('abcd', 'vmdk', 'streamOptimized', 'COT 2.0')
+        self.cache.put(key, self.write_file('src.vmdk', b'converted'))
+        entry = self.cache.entry_path(key)
+        dest = os.path.join(self.temp_dir, 'dest.vmdk')
+        with mock.patch('COT.conversion_cache.file_checksum') as checksum:
+            self.assertTrue(self.cache.get(key, dest))
+            checksum.assert_not_called()
+
+        # Touched, but not modified - still valid
+        os.utime(entry, (0, 0))
+        self.assertTrue(self.cache.get(key, dest))
+        self.assertNoLogsOver(logging.INFO)
+
+    def test_missing_entry(self):
+        """A cached image that has been deleted is discarded."""
+        key = self.cache.key('abcd', 'vmdk', 'streamOptimized', 'COT 2.0')
+        self.cache.put(key, self.write_file('src.vmdk', b'converted'))
+        os.remove(self.cache.entry_path(key))
+        self.assertFalse(self.cache.get(key, self.temp_file))
+        self.assertLogged(levelname='WARNING', msg="Unable to read")
+        self.assertLogged(levelname='WARNING',
+                          msg="Discarding invalid image")
+
+    def test_eviction_by_size(self):
+        """Images are removed once their total size exceeds the limit."""
+        self.cache.max_size = 25
+        keys = [self.cache.key(str(i), 'vmdk', None, 'COT') for i in range(3)]
+        with mock.patch('time.time', return_value=1e9):
+            self.cache.put(keys[0], self.write_file('0.vmdk', b'x' * 10))
+        with mock.patch('time.time', return_value=2e9):
+            self.cache.put(keys[1], self.write_file('1.vmdk', b'x' * 10))
+        self.cache.put(keys[2], self.write_file('2.vmdk', b'x' * 10))
+        self.assertFalse(os.path.exists(self.cache.entry_path(keys[0])))
+        self.assertEqual(sorted(os.listdir(self.cache.directory)),
+                         sorted([os.path.basename(self.cache.entry_path(k))
+                                 for k in keys[1:]] + ['index.sqlite']))
+
+        # An image larger than the whole cache isn't stored, and evicts nothing
+        self.cache.put(keys[0], self.write_file('big.vmdk', b'x' * 26))
+        self.assertFalse(os.path.exists(self.cache.entry_path(keys[0])))
+        for key in keys[1:]:
+            self.assertTrue(os.path.exists(self.cache.entry_path(key)))
+
+    def test_convert_disk_if_needed(self):
+        """OVF.convert_disk_if_needed() reuses previously converted images."""
+        COT.vm_description.ovf.ovf.CONVERSION_CACHE = self.cache
+        raw = RAW(self.write_file('disk.img', b'hello world!' * 8192))
+        with OVF(self.minimal_ovf, self.temp_file) as vm:
+            vmdk = vm.convert_disk_if_needed(raw, 'harddisk')
+            self.assertEqual(vmdk.disk_subformat, 'streamOptimized')
+            with open(vmdk.path, 'rb') as file_obj:
+                expected = file_obj.read()
+
+        # Upgrading a helper that isn't used for this conversion doesn't
+        # invalidate the cached image
+        with mock.patch.object(RAW, 'convert_to') as mock_convert, \
+                mock.patch.object(helpers['qemu-img'], '_installed', True), \
+                mock.patch.object(helpers['qemu-img'], '_version',
+                                  StrictVersion("99.0.1")):
+            with OVF(self.minimal_ovf, self.temp_file) as vm:
+                cached = vm.convert_disk_if_needed(raw, 'harddisk')
+                self.assertIsInstance(cached, VMDK)
+                self.assertEqual(os.path.dirname(cached.path), vm.working_dir)
+                self.assertEqual(os.path.basename(cached.path), 'disk.vmdk')
+                with open(cached.path, 'rb') as file_obj:
+                    self.assertEqual(file_obj.read(), expected)
+                self.assertEqual(os.stat(cached.path).st_nlink, 1)
+            mock_convert.assert_not_called()
+        key = self.cache.key(file_checksum(raw.path, 'sha256'), 'vmdk',
+                             'streamOptimized', converter_id())
+        self.assertLogged(levelname='INFO',
+                          msg="Using previously converted image",
+                          args=(self.cache.entry_path(key), '(clone|copy)'))
+
+    def test_convert_disk_if_needed_helper(self):
+        """Images converted by a helper are keyed on that helper alone."""
+        COT.vm_description.ovf.ovf.CONVERSION_CACHE = self.cache
+        raw = RAW(self.write_file('disk.img', b'hello world!' * 8192))
+        with mock.patch.object(VMDK, 'converts_natively',
+                               return_value=False), \
+                mock.patch.object(VMDK, 'stream_optimized_helper',
+                                  return_value=helpers['vmdktool']), \
+                mock.patch.object(helpers['vmdktool'], '_installed', True), \
+                mock.patch.object(helpers['vmdktool'], '_version',
+                                  StrictVersion("1.4")), \
+                mock.patch.object(helpers['qemu-img'], '_installed', True), \
+                mock.patch.object(helpers['qemu-img'], '_version',
+                                  StrictVersion("2.5.1")):
+            with OVF(self.minimal_ovf, self.temp_file) as vm:
+                vmdk_path = os.path.join(vm.working_dir, 'disk.vmdk')
+                with mock.patch.object(RAW, 'convert_to', return_value=VMDK(
+                        self.write_file(vmdk_path, b'converted'))):
+                    vm.convert_disk_if_needed(raw, 'harddisk')
+        key = self.cache.key(file_checksum(raw.path, 'sha256'), 'vmdk',
+                             'streamOptimized',
+                             "COT {0}, vmdktool 1.4".format(__version__))
+        self.assertTrue(self.cache.get(key, self.temp_file))
@@ -16,10 +16,11 @@
 
 """Unit test cases for COT.data_validation module."""
 
+import io
 import re
 
 from COT.data_validation import (
-    match_or_die, file_checksum,
+    match_or_die, file_checksum, ChecksumReader, ReadAheadReader,
     canonicalize_helper, canonicalize_nic_subtype, NIC_TYPES,
     mac_address, device_address, no_whitespace, truth_value,
     validate_int, non_negative_int, positive_int,
@@ -54,6 +55,15 @@ class TestFileChecksum(COTTestCase):
                          "0d25f7544be720ec07d9a7e09516d07b"
                          "a89d2efdc53f8b4c76a8375854d3a578")
 
+    def test_checksum_reader(self):
+        """Test case for ChecksumReader class."""
+        with open(self.input_ovf, 'rb') as fileobj:
+            reader = ChecksumReader(fileobj, 'sha256')
+            while reader.read(1000):
+                pass
+        self.assertEqual(reader.hexdigest(),
+                         file_checksum(self.input_ovf, 'sha256'))
+
     def test_file_checksum_unsupported(self):
         """Test invalid options to file_checksum()."""
         self.assertRaises(NotImplementedError,
@@ -62,6 +72,56 @@ class TestFileChecksum(COTTestCase):
                           'crc')
 
 
+class TestReadAheadReader(COTTestCase):
+    """Test cases for ReadAheadReader class."""
+
+    def test_read(self):
+        """Reads return the same data regardless of buffer boundaries."""
+        with open(self.input_ovf, 'rb') as fileobj:
+            expected = fileobj.read()
+        for buffer_size in (100, 4096, len(expected), 1 << 20):
+            with open(self.input_ovf, 'rb') as fileobj:
+                with ReadAheadReader(fileobj, buffer_size) as reader:
+                    data = reader.read(1)
+                    while True:
+                        buf = reader.read(777)
+                        if not buf:
+                            break
+                        data += buf
+                    self.assertEqual(reader.read(), b'')
+            self.assertEqual(data, expected)
+
+    def test_read_size(self):
+        """Only the requested amount of data is read from the file."""
+        fileobj = io.BytesIO(b"0123456789" * 100)
+        fileobj.seek(5)
+        with ReadAheadReader(fileobj, 16, size=100) as reader:
+            self.assertEqual(reader.read(), (b"5678901234" * 10))
+
+    def test_read_error(self):
+        """Errors in the reader thread are passed along to the consumer."""
+        class BrokenFile(io.BytesIO):
+            """File object that fails after its first read."""
+
+            def read(self, size=-1):
+                if self.tell() > 0:
+                    raise IOError("Drive on fire")
+                return super(BrokenFile, self).read(size)
+
+        with ReadAheadReader(BrokenFile(b"x" * 100), 10) as reader:
+            self.assertEqual(reader.read(10), b"x" * 10)
+            self.assertRaises(IOError, reader.read, 10)
+            self.assertEqual(reader.read(10), b"")
+
+    def test_close_early(self):
+        """Closing the reader early stops the reader thread."""
+        reader = ReadAheadReader(io.BytesIO(b"x" * 1000), 10)
+        self.assertEqual(reader.read(20), b"x" * 20)
+        reader.close()
+        self.assertFalse(reader._thread.is_alive())
+        self.assertEqual(reader.read(), b"")
+
+
 class TestValidationFunctions(COTTestCase):
     """Test cases for input validation APIs."""
 
@@ -31,6 +31,10 @@ def load_tests(*_):
     For the parameters, see :mod:`unittest`. The parameters are unused here.
     """
     suite = TestSuite()
+    suite.addTests(DocTestSuite('COT.checksum_cache'))
+    suite.addTests(DocTestSuite('COT.conversion_cache'))
     suite.addTests(DocTestSuite('COT.data_validation'))
+    suite.addTests(DocTestSuite('COT.disks.disk'))
+    suite.addTests(DocTestSuite('COT.disks.vmdk'))
     suite.addTests(DocTestSuite('COT.utilities'))
     return suite
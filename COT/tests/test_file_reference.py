@@ -17,12 +17,19 @@
 """Unit test cases for COT.file_reference classes."""
 
 import os
+import shutil
 import tarfile
+from collections import OrderedDict
 
+import mock
 from pkg_resources import resource_filename
 
 from COT.tests import COTTestCase
-from COT.file_reference import FileReference, FileOnDisk, FileInTAR
+from COT.data_validation import file_checksum
+from COT.file_reference import (
+    ArchiveWriter, FileReference, FileOnDisk, FileInTAR, TarIndex,
+    calculate_checksums, copy_file, run_concurrently,
+)
 
 
 class TestFileReference(COTTestCase):
@@ -60,6 +67,111 @@ class TestFileReference(COTTestCase):
                           self.input_vmdk, "config.txt")
 
 
+class TestConcurrency(COTTestCase):
+    """Test cases for concurrent processing of files."""
+
+    def test_run_concurrently(self):
+        """Results are returned in order regardless of worker count."""
+        for workers in (None, 1, 4, 100):
+            self.assertEqual(run_concurrently(lambda x: x * 2, range(10),
+                                              workers),
+                             [x * 2 for x in range(10)])
+        self.assertEqual(run_concurrently(abs, []), [])
+
+    def test_run_concurrently_error(self):
+        """Exceptions in worker threads are re-raised."""
+        def func(item):
+            if item == 3:
+                raise IOError("oops")
+            return item
+        self.assertRaises(IOError, run_concurrently, func, range(5), 4)
+
+    def test_calculate_checksums(self):
+        """Checksum several files at once."""
+        tarfile_path = resource_filename(__name__, "test.tar")
+        refs = [
+            FileOnDisk(os.path.dirname(self.input_ovf),
+                       os.path.basename(self.input_ovf),
+                       checksum_algorithm='sha256'),
+            FileInTAR(tarfile_path, "sample_cfg.txt",
+                      checksum_algorithm='sha256'),
+        ]
+        self.assertEqual(
+            calculate_checksums(refs, workers=2),
+            [file_checksum(self.input_ovf, 'sha256'),
+             file_checksum(resource_filename(__name__, 'sample_cfg.txt'),
+                           'sha256')])
+
+
+class TestCopyFile(COTTestCase):
+    """Test cases for the copy_file() function."""
+
+    def test_copy_file(self):
+        """Writable files are cloned or copied, never linked."""
+        src = os.path.join(self.temp_dir, 'src.ovf')
+        shutil.copy(self.input_ovf, src)
+        dest = os.path.join(self.temp_dir, 'dest.ovf')
+        self.assertIn(copy_file(src, dest), ('clone', 'copy'))
+        self.assertFalse(os.path.samefile(src, dest))
+        self.check_diff("", file2=dest)
+
+        # If cloning fails, falls back to copying
+        os.remove(dest)
+        with mock.patch('COT.file_reference._clone', return_value=False):
+            self.assertEqual(copy_file(src, dest), 'copy')
+        self.check_diff("", file2=dest)
+
+        self.assertRaises(shutil.Error, copy_file, src, src)
+
+    def test_copy_file_read_only(self):
+        """Read-only files on the same filesystem are hard-linked."""
+        src = os.path.join(self.temp_dir, 'src.ovf')
+        shutil.copy(self.input_ovf, src)
+        os.chmod(src, 0o444)
+        dest = os.path.join(self.temp_dir, 'dest.ovf')
+        self.assertEqual(copy_file(src, dest), 'link')
+        self.assertTrue(os.path.samefile(src, dest))
+
+        # Linking again is a no-op, not an error
+        self.assertEqual(copy_file(src, dest), 'link')
+        self.assertTrue(os.path.samefile(src, dest))
+
+        # Existing files are replaced, not written through
+        other = os.path.join(self.temp_dir, 'other.ovf')
+        with open(other, 'w') as file_obj:
+            file_obj.write("hello")
+        os.chmod(other, 0o444)
+        self.assertEqual(copy_file(other, dest), 'link')
+        self.assertTrue(os.path.samefile(other, dest))
+        self.check_diff("", file2=src)
+
+        with mock.patch('os.link', side_effect=OSError(1, "Not permitted")):
+            self.assertIn(copy_file(src, dest), ('clone', 'copy'))
+        self.assertFalse(os.path.samefile(other, dest))
+        self.check_diff("", file2=dest)
+        with open(other) as file_obj:
+            self.assertEqual(file_obj.read(), "hello")
+
+    def test_copy_file_range(self):
+        """Copy a byte range, such as a TAR member, out of a file."""
+        tarfile_path = resource_filename(__name__, "test.tar")
+        member = FileInTAR(tarfile_path, "sample_cfg.txt").member
+        dest = os.path.join(self.temp_dir, 'sample_cfg.txt')
+        sample_cfg = resource_filename(__name__, 'sample_cfg.txt')
+
+        self.assertEqual(copy_file(tarfile_path, dest,
+                                   member.offset_data, member.size), 'copy')
+        self.check_diff("", file1=sample_cfg, file2=dest)
+
+        # In-kernel copy methods are optional
+        enosys = OSError(38, "Function not implemented")
+        with mock.patch('os.copy_file_range', create=True,
+                        side_effect=enosys), \
+                mock.patch('os.sendfile', create=True, side_effect=enosys):
+            copy_file(tarfile_path, dest, member.offset_data, member.size)
+        self.check_diff("", file1=sample_cfg, file2=dest)
+
+
 class TestFileOnDisk(COTTestCase):
     """Test cases for FileOnDisk class."""
 
@@ -115,6 +227,46 @@ class TestFileOnDisk(COTTestCase):
             tarf.extract('input.ovf', self.temp_dir)
         self.check_diff("", file2=os.path.join(self.temp_dir, 'input.ovf'))
 
+    def test_add_to_archive_checksum(self):
+        """The add_to_archive() API checksums the file as it copies it."""
+        output_tarfile = os.path.join(self.temp_dir, 'test_output.tar')
+        ref = FileOnDisk(os.path.dirname(self.input_ovf),
+                         os.path.basename(self.input_ovf),
+                         checksum_algorithm='sha1')
+        with tarfile.open(output_tarfile, 'w') as tarf:
+            self.assertEqual(ref.add_to_archive(tarf),
+                             file_checksum(self.input_ovf, 'sha1'))
+
+    @mock.patch('COT.file_reference.file_checksum', wraps=file_checksum)
+    def test_refresh_unchanged(self, mock_checksum):
+        """refresh() does not recalculate the checksum of an unchanged file."""
+        ref = FileOnDisk(os.path.dirname(self.input_ovf),
+                         os.path.basename(self.input_ovf),
+                         checksum_algorithm='sha256')
+        checksum = ref.checksum
+        self.assertEqual(mock_checksum.call_count, 1)
+        self.assertTrue(ref.refresh())
+        self.assertEqual(ref.checksum, checksum)
+        self.assertEqual(mock_checksum.call_count, 1)
+
+    def test_refresh_changed(self):
+        """refresh() detects changes to the file."""
+        shutil.copy(self.input_ovf, self.temp_dir)
+        temp_file = os.path.join(self.temp_dir, 'input.ovf')
+        ref = FileOnDisk(self.temp_dir, 'input.ovf',
+                         checksum_algorithm='sha256')
+        self.assertEqual(ref.checksum, file_checksum(temp_file, 'sha256'))
+        with open(temp_file, 'a') as file_obj:
+            file_obj.write("<!-- hello -->\n")
+        self.assertFalse(ref.refresh())
+        self.assertLogged(levelname='WARNING',
+                          msg="Size of file '%s' has changed")
+        self.assertLogged(levelname='ERROR',
+                          msg="checksum of file '%s' has changed")
+        self.assertEqual(ref.checksum, file_checksum(temp_file, 'sha256'))
+        # Subsequent refresh is against the new state of the file
+        self.assertTrue(ref.refresh())
+
 
 class TestFileInTAR(COTTestCase):
     """Test cases for FileInTAR class."""
@@ -191,3 +343,189 @@ class TestFileInTAR(COTTestCase):
         self.check_diff("",
                         file1=resource_filename(__name__, 'sample_cfg.txt'),
                         file2=os.path.join(self.temp_dir, 'sample_cfg.txt'))
+
+    def test_add_to_archive_checksum(self):
+        """The add_to_archive() API checksums the file as it copies it."""
+        output_tarfile = os.path.join(self.temp_dir, 'test_output.tar')
+        ref = FileInTAR(self.tarfile, "sample_cfg.txt",
+                        checksum_algorithm='sha256')
+        with tarfile.open(output_tarfile, 'w') as tarf:
+            self.assertEqual(
+                ref.add_to_archive(tarf),
+                file_checksum(resource_filename(__name__, 'sample_cfg.txt'),
+                              'sha256'))
+
+    def test_add_to_archive_known_checksum(self):
+        """If the checksum is already known, the data range is just copied."""
+        sample_cfg = resource_filename(__name__, 'sample_cfg.txt')
+        ref = FileInTAR(self.tarfile, "sample_cfg.txt",
+                        checksum_algorithm='sha256')
+        checksum = ref.checksum
+        output_tarfile = os.path.join(self.temp_dir, 'test_output.tar')
+
+        def check_add_to_archive(tar_class=ArchiveWriter):
+            """Add the file and another after it, and check the results."""
+            with mock.patch('COT.file_reference.ChecksumReader') as reader:
+                with tar_class.open(output_tarfile, 'w') as tarf:
+                    self.assertEqual(ref.add_to_archive(tarf), checksum)
+                    # Subsequent additions land in the right place
+                    tarf.add(self.input_ovf, 'input.ovf')
+                reader.assert_not_called()
+            with tarfile.open(output_tarfile, 'r') as tarf:
+                self.assertEqual(tarf.getnames(),
+                                 ['sample_cfg.txt', 'input.ovf'])
+                self.assertEqual(
+                    file_checksum(tarf.extractfile('sample_cfg.txt'),
+                                  'sha256'),
+                    checksum)
+                self.assertEqual(
+                    file_checksum(tarf.extractfile('input.ovf'), 'sha256'),
+                    file_checksum(self.input_ovf, 'sha256'))
+            self.assertEqual(ref.size, os.path.getsize(sample_cfg))
+
+        check_add_to_archive()
+        # If the OS refuses copy_file_range() we fall back gracefully
+        with mock.patch('os.copy_file_range', create=True,
+                        side_effect=OSError(38, "Function not implemented")):
+            check_add_to_archive()
+        # A plain TarFile works too, though the data passes through Python
+        check_add_to_archive(tarfile.TarFile)
+
+        with ArchiveWriter.open(output_tarfile, 'r') as tarf:
+            self.assertRaises((IOError, OSError), tarf.add_data_range,
+                              ref.member, self.tarfile, 0)
+
+    def test_shared_index(self):
+        """References to the same archive share a single index."""
+        other_ref = FileInTAR(self.tarfile, "sample_cfg.txt")
+        self.assertIs(self.valid_ref.index, other_ref.index)
+        member = self.valid_ref.member
+        self.assertEqual(member.size, self.valid_ref.size)
+        self.assertEqual(member.offset_data, member.offset + 512)
+
+    def test_index_refreshed(self):
+        """The index is rebuilt when the archive is modified."""
+        tar_copy = os.path.join(self.temp_dir, 'test.tar')
+        with tarfile.open(tar_copy, 'w') as tarf:
+            tarf.add(resource_filename(__name__, 'sample_cfg.txt'),
+                     'sample_cfg.txt')
+        ref = FileInTAR(tar_copy, "sample_cfg.txt")
+        old_index = ref.index
+        self.assertEqual([mem.name for mem in old_index.members],
+                         ['sample_cfg.txt'])
+        # Later duplicates take precedence, as with tarfile.getmember()
+        with tarfile.open(tar_copy, 'a') as tarf:
+            tarf.add(self.input_ovf, 'sample_cfg.txt')
+        self.assertIsNot(ref.index, old_index)
+        self.assertEqual(len(ref.index.members), 2)
+        self.assertEqual(ref.member.size, os.path.getsize(self.input_ovf))
+        with ref.open('rb') as obj:
+            with open(self.input_ovf, 'rb') as expected:
+                self.assertEqual(obj.read(), expected.read())
+
+    def test_index_normpath(self):
+        """The index tolerates 'foo' versus './foo' member names."""
+        tar_copy = os.path.join(self.temp_dir, 'test.tar')
+        with tarfile.open(tar_copy, 'w') as tarf:
+            tarf.add(resource_filename(__name__, 'sample_cfg.txt'),
+                     './sample_cfg.txt')
+        index = TarIndex.for_path(tar_copy)
+        self.assertEqual(index.get('sample_cfg.txt').name,
+                         './sample_cfg.txt')
+        self.assertIsNone(index.get('foo.txt'))
+        ref = FileInTAR(tar_copy, "sample_cfg.txt")
+        self.assertEqual(ref.filename, './sample_cfg.txt')
+
+    @mock.patch.object(TarIndex, 'CACHE_SIZE', 2)
+    @mock.patch.object(TarIndex, '_cache', OrderedDict())
+    def test_index_cache_bounded(self):
+        """Only the most recently used indexes, of existing files, are kept."""
+        # pylint: disable=protected-access
+        paths = []
+        for i in range(3):
+            paths.append(os.path.join(self.temp_dir, '{0}.tar'.format(i)))
+            with tarfile.open(paths[-1], 'w') as tarf:
+                tarf.add(resource_filename(__name__, 'sample_cfg.txt'),
+                         'sample_cfg.txt')
+        index = TarIndex.for_path(paths[0])
+        TarIndex.for_path(paths[1])
+        self.assertIs(TarIndex.for_path(paths[0]), index)
+        TarIndex.for_path(paths[2])
+        self.assertEqual(list(TarIndex._cache.keys()), [paths[0], paths[2]])
+
+        os.remove(paths[0])
+        with self.assertRaises(OSError):
+            TarIndex.for_path(paths[0])
+        self.assertEqual(list(TarIndex._cache.keys()), [paths[2]])
+
+
+class TestVerifyPolicy(COTTestCase):
+    """Test cases for the verify_policy of FileReference."""
+
+    BAD_CHECKSUM = {
+        'levelname': 'ERROR',
+        'msg': "The %s checksum for file '%s' is expected to be:",
+    }
+
+    def setUp(self):
+        """Test case setup function called automatically prior to each test."""
+        super(TestVerifyPolicy, self).setUp()
+        self.tarfile = resource_filename(__name__, "test.tar")
+
+    def ref(self, verify_policy, expected_checksum='0123'):
+        """Create a FileInTAR with the given policy and expected checksum."""
+        return FileInTAR(self.tarfile, "sample_cfg.txt",
+                         checksum_algorithm='sha1',
+                         expected_checksum=expected_checksum,
+                         verify_policy=verify_policy)
+
+    def test_invalid(self):
+        """An unknown verify_policy is rejected."""
+        self.assertRaises(ValueError, self.ref, 'sometimes')
+
+    @mock.patch('COT.file_reference.file_checksum', wraps=file_checksum)
+    def test_strict(self, mock_checksum):
+        """Strict policy verifies the file immediately, and only once."""
+        ref = self.ref('strict')
+        self.assertLogged(**self.BAD_CHECKSUM)
+        self.assertFalse(ref.verify())
+        with ref.open('rb'):
+            pass
+        self.assertEqual(mock_checksum.call_count, 1)
+
+        ref = self.ref('strict', file_checksum(
+            resource_filename(__name__, 'sample_cfg.txt'), 'sha1'))
+        self.assertTrue(ref.verify())
+
+    @mock.patch('COT.file_reference.file_checksum', wraps=file_checksum)
+    def test_lazy(self, mock_checksum):
+        """Lazy policy verifies the file when it is first opened."""
+        ref = self.ref('lazy')
+        self.assertEqual(mock_checksum.call_count, 0)
+        with ref.open('rb'):
+            pass
+        self.assertLogged(**self.BAD_CHECKSUM)
+        self.assertEqual(mock_checksum.call_count, 1)
+        ref.copy_to(self.temp_dir)
+        self.assertEqual(mock_checksum.call_count, 1)
+
+    @mock.patch('COT.file_reference.file_checksum', wraps=file_checksum)
+    def test_lazy_add_to_archive(self, mock_checksum):
+        """Lazy verification reuses the checksum calculated when archiving."""
+        ref = self.ref('lazy')
+        with tarfile.open(os.path.join(self.temp_dir, 'out.tar'), 'w') as tarf:
+            ref.add_to_archive(tarf)
+        self.assertLogged(**self.BAD_CHECKSUM)
+        self.assertEqual(mock_checksum.call_count, 0)
+
+    @mock.patch('COT.file_reference.file_checksum', wraps=file_checksum)
+    def test_deferred_and_off(self, mock_checksum):
+        """Deferred and off policies only verify when explicitly asked."""
+        for policy in ('deferred', 'off'):
+            ref = self.ref(policy)
+            with ref.open('rb'):
+                pass
+            self.assertEqual(mock_checksum.call_count, 0)
+            self.assertFalse(ref.verify())
+            self.assertLogged(**self.BAD_CHECKSUM)
+            mock_checksum.reset_mock()
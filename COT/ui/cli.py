@@ -46,7 +46,13 @@ except ImportError:
     from backports.shutil_get_terminal_size import get_terminal_size
 
 from COT import __version_long__
-from COT.data_validation import InvalidInputError, ValueMismatchError
+from COT.data_validation import (
+    InvalidInputError, ValueMismatchError, positive_int,
+)
+from COT.checksum_cache import ChecksumCache
+from COT.conversion_cache import ConversionCache
+import COT.file_reference
+import COT.vm_description.ovf.ovf
 from COT.commands import command_classes
 from .ui import UI
 
@@ -431,6 +437,19 @@ class CLI(UI):
                             action='store_true',
                             help="""Perform requested actions without """
                             """prompting for confirmation""")
+        parser.add_argument('-j', '--jobs', dest='_jobs', metavar='N',
+                            type=positive_int,
+                            help="""Use up to N worker threads to process """
+                            """files and disk images concurrently """
+                            """(default: number of CPUs, up to 8)""")
+        parser.add_argument('--cache-checksums', dest='_cache_checksums',
+                            action='store_true',
+                            help="""Remember file checksums between runs, """
+                            """in $XDG_CACHE_HOME/cot/""")
+        parser.add_argument('--cache-conversions',
+                            dest='_cache_conversions', action='store_true',
+                            help="""Reuse disk images converted in previous """
+                            """runs, from $XDG_CACHE_HOME/cot/""")
 
         debug_group = parser.add_mutually_exclusive_group()
         debug_group.add_argument(
@@ -526,6 +545,9 @@ class CLI(UI):
         arg_dict = vars(args)
         del arg_dict["_verbosity"]
         del arg_dict["_force"]
+        del arg_dict["_jobs"]
+        del arg_dict["_cache_checksums"]
+        del arg_dict["_cache_conversions"]
         del arg_dict["_subcommand"]
         for (arg, value) in arg_dict.items():
             # When argparse is using both "nargs='+'" and "action=append",
@@ -557,11 +579,35 @@ class CLI(UI):
             if not arg[0].isupper() and value is not None:
                 setattr(arg_dict["instance"], arg, value)
 
-    def main(self, args):
-        """Invoke the main worker logic for COT when invoked from the CLI.
+    def set_global_options(self, args):
+        """Apply the options that are common to all subcommands.
 
         * Calls :meth:`adjust_verbosity` with the appropriate verbosity level
           derived from the args.
+        * Sets the number of worker threads and the caches to use, if any.
+
+        Args:
+          args (argparse.Namespace): Parser namespace object returned from
+              :func:`parse_args`.
+        """
+        # pylint: disable=protected-access
+        self.force = args._force
+
+        # Verbosity level adjusted by -v and -q options
+        self.adjust_verbosity(args._verbosity - args._quietude)
+
+        if args._jobs is not None:
+            COT.file_reference.MAX_WORKERS = args._jobs
+        if args._cache_checksums:
+            COT.file_reference.CHECKSUM_CACHE = ChecksumCache()
+        if args._cache_conversions:
+            COT.vm_description.ovf.ovf.CONVERSION_CACHE = ConversionCache()
+
+    def main(self, args):
+        """Invoke the main worker logic for COT when invoked from the CLI.
+
+        * Calls :meth:`set_global_options` to apply the options common to
+          all subcommands.
         * Looks up the appropriate :class:`~COT.commands.Command`
           instance corresponding to the subcommand that was invoked.
         * Converts :attr:`args` to a dict and calls
@@ -583,10 +629,7 @@ class CLI(UI):
              :class:`~COT.data_validation.InvalidInputError`, etc.)
         """
         # pylint: disable=protected-access
-        self.force = args._force
-
-        # Verbosity level adjusted by -v and -q options
-        self.adjust_verbosity(args._verbosity - args._quietude)
+        self.set_global_options(args)
 
         # In python3.3+ we can get here even without a subcommand:
         if not args._subcommand:
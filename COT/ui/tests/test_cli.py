@@ -333,6 +333,14 @@ class TestCLIGeneral(TestCOTCLI):
   -V, --version    show program's version number and exit
   -f, --force      Perform requested actions without prompting for
                    confirmation
+  -j N, --jobs N   Use up to N worker threads to process files and disk images
+                   concurrently (default: number of CPUs, up to 8)
+  --cache-checksums
+                   Remember file checksums between runs, in
+                   $XDG_CACHE_HOME/cot/
+  --cache-conversions
+                   Reuse disk images converted in previous runs, from
+                   $XDG_CACHE_HOME/cot/
   -q, --quiet      Decrease verbosity of the program (repeatable)
   -v, --verbose    Increase verbosity of the program (repeatable)
 """
@@ -362,6 +370,12 @@ class TestCLIGeneral(TestCOTCLI):
   -V, --version         show program's version number and exit
   -f, --force           Perform requested actions without prompting for
                         confirmation
+  -j N, --jobs N        Use up to N worker threads to process files and disk
+                        images concurrently (default: number of CPUs, up to 8)
+  --cache-checksums     Remember file checksums between runs, in
+                        $XDG_CACHE_HOME/cot/
+  --cache-conversions   Reuse disk images converted in previous runs, from
+                        $XDG_CACHE_HOME/cot/
   -q, --quiet           Decrease verbosity of the program (repeatable)
   -v, --verbose         Increase verbosity of the program (repeatable)
 """
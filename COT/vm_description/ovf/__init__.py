@@ -41,6 +41,7 @@ Modules
   :toctree:
 
   COT.vm_description.ovf.hardware
+  COT.vm_description.ovf.index
   COT.vm_description.ovf.item
   COT.vm_description.ovf.name_helper
   COT.vm_description.ovf.utilities
@@ -21,10 +21,12 @@
 .. autosummary::
   :nosignatures:
 
+  InstanceIDAllocator
   OVFHardware
   OVFHardwareDataError
 """
 
+import bisect
 import copy
 import logging
 
@@ -40,6 +42,143 @@ class OVFHardwareDataError(Exception):
     """The input data used to construct an :class:`OVFHardware` is not sane."""
 
 
+class InstanceIDAllocator(object):
+    """Tracker of which integer ``InstanceID`` values are in use.
+
+    Helper class for :class:`OVFHardware`. Stores the IDs in use as a sorted
+    list of runs of consecutive integers, so that the first free ID at or
+    after any given ID can be found by a binary search rather than by
+    probing each successive ID in turn. Non-integer IDs are ignored.
+
+    Examples:
+      ::
+
+        >>> ids = InstanceIDAllocator(['1', '2', '3', '5', 'foo'])
+        >>> ids.first_unused()
+        '4'
+        >>> ids.add('4')
+        >>> ids.first_unused(2)
+        '6'
+        >>> ids.remove('2')
+        >>> ids.first_unused()
+        '2'
+        >>> ids.first_unused(3)
+        '6'
+    """
+
+    def __init__(self, instance_ids=()):
+        """Create an allocator with the given IDs already in use.
+
+        Args:
+          instance_ids (list): InstanceID strings already in use.
+        """
+        self._starts = []
+        """Sorted list of the first ID in each run of used IDs."""
+        self._ends = []
+        """The last ID in each run of used IDs, in the same order."""
+        for instance in instance_ids:
+            self.add(instance)
+
+    @staticmethod
+    def _to_int(instance):
+        """Get the integer corresponding to the given InstanceID string.
+
+        Args:
+          instance (str): InstanceID
+
+        Returns:
+          int: Integer value, or None if not a canonical integer string.
+        """
+        try:
+            value = int(instance)
+        except (TypeError, ValueError):
+            return None
+        if str(value) != str(instance):
+            return None
+        return value
+
+    def _find_run(self, value):
+        """Find the run of used IDs that contains or precedes the given ID.
+
+        Args:
+          value (int): InstanceID
+
+        Returns:
+          int: Index into :attr:`_starts`, or -1 if there is no such run.
+        """
+        return bisect.bisect_right(self._starts, value) - 1
+
+    def add(self, instance):
+        """Mark the given InstanceID as in use.
+
+        Args:
+          instance (str): InstanceID
+        """
+        value = self._to_int(instance)
+        if value is None:
+            return
+        index = self._find_run(value)
+        if index >= 0 and self._ends[index] >= value:
+            return
+        joins_prev = index >= 0 and self._ends[index] == value - 1
+        joins_next = (index + 1 < len(self._starts) and
+                      self._starts[index + 1] == value + 1)
+        if joins_prev and joins_next:
+            self._ends[index] = self._ends[index + 1]
+            del self._starts[index + 1]
+            del self._ends[index + 1]
+        elif joins_prev:
+            self._ends[index] = value
+        elif joins_next:
+            self._starts[index + 1] = value
+        else:
+            self._starts.insert(index + 1, value)
+            self._ends.insert(index + 1, value)
+
+    def remove(self, instance):
+        """Mark the given InstanceID as no longer in use.
+
+        Args:
+          instance (str): InstanceID
+        """
+        value = self._to_int(instance)
+        if value is None:
+            return
+        index = self._find_run(value)
+        if index < 0 or self._ends[index] < value:
+            return
+        start = self._starts[index]
+        end = self._ends[index]
+        if start == end:
+            del self._starts[index]
+            del self._ends[index]
+        elif value == start:
+            self._starts[index] = value + 1
+        elif value == end:
+            self._ends[index] = value - 1
+        else:
+            # Split the run in two
+            self._ends[index] = value - 1
+            self._starts.insert(index + 1, value + 1)
+            self._ends.insert(index + 1, end)
+
+    def first_unused(self, start=1):
+        """Find the first InstanceID, at or after ``start``, not in use.
+
+        Args:
+          start (int): First InstanceID value to consider.
+
+        Returns:
+          str: An instance ID that is not yet in use.
+        """
+        value = int(start)
+        index = self._find_run(value)
+        if index >= 0 and self._ends[index] >= value:
+            # Runs are maximal, so the ID after the run is always free
+            value = self._ends[index] + 1
+        return str(value)
+
+
 class OVFHardware(object):
     """Helper class for :class:`~COT.vm_description.ovf.ovf.OVF`.
 
@@ -62,6 +201,29 @@ class OVFHardware(object):
         """
         self.ovf = ovf
         self.item_dict = {}
+        self._property_index = dict((name, {}) for name in
+                                    (ovf.HOST_RESOURCE, ovf.PARENT))
+        """Dict of dicts. _property_index[name][value] = set(OVFItems).
+
+        Indexes the Items that have (or had) the given value for each of the
+        properties most commonly searched on, to speed up
+        :meth:`find_all_items`. May contain stale entries - items that have
+        since been deleted, or whose value for the property has changed -
+        which are filtered out by :meth:`item_match` as usual.
+        """
+        self._sorted_instances = None
+        """Cached natural-sorted list of the keys of :attr:`item_dict`."""
+        self._instances_by_type = None
+        """Cached dict of ResourceType value to sorted list of InstanceIDs."""
+        self._profile_cache = {}
+        """Dict of dicts. _profile_cache[profile][item] = has_profile()."""
+        self._profile_cache_key = None
+        """Value of ``ovf.config_profiles`` when _profile_cache was filled."""
+        self._item_elements = {}
+        """Dict of OVFItem to the list of XML elements currently representing
+        it in the VirtualHardwareSection, as updated by :meth:`update_xml`."""
+        self._unchanged_elements = set()
+        """Item XML elements that are still exactly as they were parsed."""
         valid_profiles = set(ovf.config_profiles)
         item_count = 0
         for item in ovf.virtual_hw_section:
@@ -92,57 +254,131 @@ class OVFHardware(object):
                     # Mask away the nitty-gritty details from our caller
                     raise OVFHardwareDataError("Data conflict for instance {0}"
                                                .format(instance))
+            self._item_elements.setdefault(self.item_dict[instance],
+                                           []).append(item)
+            self._unchanged_elements.add(item)
         logger.debug(
             "OVF contains %s hardware Item elements describing %s "
             "unique devices", item_count, len(self.item_dict))
         # Treat the current state as golden:
         for ovfitem in self.item_dict.values():
             ovfitem.modified = False
+            self.index_item(ovfitem)
+        self._instance_ids = InstanceIDAllocator(self.item_dict)
+        """Allocator of unused InstanceIDs, tracking :attr:`item_dict`."""
 
     def update_xml(self):
-        """Regenerate all Items under the VirtualHardwareSection, if needed.
+        """Regenerate any changed Items under the VirtualHardwareSection.
+
+        Only the XML elements of :class:`~COT.vm_description.ovf.item.OVFItem`
+        objects that have been created, changed, or deleted are regenerated or
+        removed; the elements of all other Items are left untouched. Changed
+        Items are regenerated in place, while new Items are inserted
+        alongside the Items with the nearest InstanceIDs.
 
         Will do nothing if no Items have been changed.
         """
-        modified = False
-        if len(self.item_dict) != len(XML.find_all_children(
-                self.ovf.virtual_hw_section,
-                set([self.ovf.ITEM, self.ovf.STORAGE_ITEM,
-                     self.ovf.ETHERNET_PORT_ITEM]))):
-            modified = True
-        else:
-            for ovfitem in self.item_dict.values():
-                if ovfitem.modified:
-                    modified = True
-                    break
-        if not modified:
+        section = self.ovf.virtual_hw_section
+        current_items = set(self.item_dict.values())
+        deleted_items = [ovfitem for ovfitem in self._item_elements
+                         if ovfitem not in current_items]
+        modified = any(ovfitem.modified or ovfitem not in self._item_elements
+                       for ovfitem in current_items)
+        if not deleted_items and not modified:
             logger.verbose("No changes to hardware definition, "
                            "so no XML update is required")
             return
-        # Delete the existing Items:
+
         delete_count = 0
-        for item in list(self.ovf.virtual_hw_section):
-            if (item.tag == self.ovf.ITEM or
-                    item.tag == self.ovf.STORAGE_ITEM or
-                    item.tag == self.ovf.ETHERNET_PORT_ITEM):
-                self.ovf.virtual_hw_section.remove(item)
+        for ovfitem in deleted_items:
+            for item in self._item_elements.pop(ovfitem):
+                section.remove(item)
+                self._unchanged_elements.discard(item)
                 delete_count += 1
-        logger.debug("Cleared %d existing items from VirtualHWSection",
-                     delete_count)
-        # Generate the new XML Items, in appropriately sorted order by Instance
-        ordering = [self.ovf.INFO, self.ovf.SYSTEM, self.ovf.ITEM]
-        for instance in natural_sort(self.item_dict):
-            logger.debug("Writing Item(s) with InstanceID %s", instance)
+        logger.debug("Removed %d items of deleted devices from "
+                     "VirtualHWSection", delete_count)
+
+        # Regenerate the changed XML Items, in sorted order by Instance,
+        # so that new Items can be placed after their predecessors
+        instances = self._instances_of_type()
+        update_count = 0
+        for (position, instance) in enumerate(instances):
             ovfitem = self.item_dict[instance]
+            if not ovfitem.modified and ovfitem in self._item_elements:
+                continue
+            logger.debug("Writing Item(s) with InstanceID %s", instance)
+            old_items = self._item_elements.pop(ovfitem, [])
+            self._unchanged_elements.difference_update(old_items)
             new_items = ovfitem.generate_items()
             logger.spam("Generated %d items", len(new_items))
-            for item in new_items:
-                XML.add_child(self.ovf.virtual_hw_section, item, ordering)
-        logger.verbose("Updated XML VirtualHardwareSection, now contains %d "
-                       "Items representing %d devices",
-                       len(self.ovf.virtual_hw_section.findall(self.ovf.ITEM)),
+            if (old_items and new_items and
+                    old_items[0].tag == new_items[0].tag):
+                index = list(section).index(old_items[0])
+                for item in old_items:
+                    section.remove(item)
+                for item in new_items:
+                    section.insert(index, item)
+                    index += 1
+            else:
+                for item in old_items:
+                    section.remove(item)
+                self._insert_new_items(new_items, instances, position)
+            self._item_elements[ovfitem] = new_items
+            ovfitem.modified = False
+            update_count += 1
+        logger.verbose("Updated XML VirtualHardwareSection, regenerating %d "
+                       "devices; now contains %d Items representing %d "
+                       "devices", update_count,
+                       len(section.findall(self.ovf.ITEM)),
                        len(self.item_dict))
 
+    def unchanged_items(self):
+        """Get the XML Items that have not been regenerated since parsing.
+
+        Their formatting can be left exactly as it was when writing the OVF.
+
+        Returns:
+          set: :class:`xml.etree.ElementTree.Element` objects.
+        """
+        return set(self._unchanged_elements)
+
+    def _insert_new_items(self, new_items, instances, position):
+        """Insert newly generated XML Items into the VirtualHardwareSection.
+
+        Helper for :meth:`update_xml`. The Items are placed after those of
+        the nearest preceding instance with the same tag or, failing that,
+        before those of the nearest following instance with the same tag.
+
+        Args:
+          new_items (list): XML elements generated for a single OVFItem.
+          instances (list): Sorted list of all InstanceIDs.
+          position (int): Index of the new Items' InstanceID in ``instances``.
+        """
+        if not new_items:
+            return
+        section = self.ovf.virtual_hw_section
+        tag = new_items[0].tag
+        index = None
+        for neighbor in reversed(instances[:position]):
+            items = self._item_elements.get(self.item_dict[neighbor])
+            if items and items[0].tag == tag:
+                index = list(section).index(items[-1]) + 1
+                break
+        else:
+            for neighbor in instances[position + 1:]:
+                items = self._item_elements.get(self.item_dict[neighbor])
+                if items and items[0].tag == tag:
+                    index = list(section).index(items[0])
+                    break
+        if index is None:
+            ordering = [self.ovf.INFO, self.ovf.SYSTEM, self.ovf.ITEM]
+            for item in new_items:
+                XML.add_child(section, item, ordering)
+            return
+        for item in new_items:
+            section.insert(index, item)
+            index += 1
+
     def find_unused_instance_id(self, start=1):
         """Find the first available ``InstanceID`` number.
 
@@ -152,11 +388,9 @@ class OVFHardware(object):
         Returns:
           str: An instance ID that is not yet in use.
         """
-        instance = int(start)
-        while str(instance) in self.item_dict.keys():
-            instance += 1
-        logger.debug("Found unused InstanceID %d", instance)
-        return str(instance)
+        instance = self._instance_ids.first_unused(start)
+        logger.debug("Found unused InstanceID %s", instance)
+        return instance
 
     def new_item(self, resource_type, profile_list=None):
         """Create a new OVFItem of the given type.
@@ -181,6 +415,9 @@ class OVFHardware(object):
         ovfitem.set_property(self.ovf.ELEMENT_NAME, resource_type,
                              profile_list)
         self.item_dict[instance] = ovfitem
+        self._instance_ids.add(instance)
+        self._sorted_instances = None
+        self.index_item(ovfitem)
         ovfitem.modified = True
         logger.info("Created new %s under profile(s) %s, InstanceID is %s",
                     resource_type, profile_list, instance)
@@ -195,8 +432,127 @@ class OVFHardware(object):
         instance = item.get_value(self.ovf.INSTANCE_ID)
         if self.item_dict[instance] == item:
             del self.item_dict[instance]
+            self._instance_ids.remove(instance)
+            self._sorted_instances = None
+            for (prop, value_dict) in self._property_index.items():
+                for value in item.get_all_values(prop):
+                    value_dict.get(value, set()).discard(item)
+            for item_profiles in self._profile_cache.values():
+                item_profiles.pop(item, None)
         # TODO: error handling - currently a no-op if item not in item_dict
 
+    def index_item(self, item, name=None):
+        """Update the indexes of Items to reflect changes to the given item.
+
+        Called automatically by :class:`~COT.vm_description.ovf.item.OVFItem`
+        whenever its properties or profiles are changed.
+
+        Args:
+          item (OVFItem): Item that was added or updated.
+          name (str): Name of the property that was updated, or ``None`` to
+            index all properties.
+        """
+        if name is None or name == self.ovf.RESOURCE_TYPE:
+            self._instances_by_type = None
+        if name is None or name == self.ovf.INSTANCE_ID:
+            for item_profiles in self._profile_cache.values():
+                item_profiles.pop(item, None)
+        if name is not None:
+            if name not in self._property_index:
+                return
+            names = [name]
+        else:
+            names = self._property_index.keys()
+        for prop in names:
+            value_dict = self._property_index[prop]
+            for value in item.get_all_values(prop):
+                value_dict.setdefault(value, set()).add(item)
+
+    def _instances_of_type(self, resource_type=None):
+        """Get the InstanceIDs of all items of the given type.
+
+        Args:
+          resource_type (str): Resource type string like 'scsi' or 'serial',
+            or ``None`` to get the InstanceIDs of all items.
+
+        Returns:
+          list: InstanceIDs in natural sort order. Do not modify this list.
+        """
+        if self._sorted_instances is None:
+            self._sorted_instances = natural_sort(self.item_dict)
+            self._instances_by_type = None
+        if resource_type is None:
+            return self._sorted_instances
+        if self._instances_by_type is None:
+            instances_by_type = {}
+            for instance in self._sorted_instances:
+                instances_by_type.setdefault(
+                    self.item_dict[instance].get_value(
+                        self.ovf.RESOURCE_TYPE), []).append(instance)
+            self._instances_by_type = instances_by_type
+        return self._instances_by_type.get(self.ovf.RES_MAP[resource_type],
+                                           [])
+
+    def _candidate_instances(self, resource_type, properties):
+        """Get the instances that might possibly match the given filters.
+
+        Helper for :meth:`find_all_items`.
+
+        Args:
+          resource_type (str): Resource type string like 'scsi' or 'serial'
+          properties (dict): Properties and their values to match
+
+        Returns:
+          list: InstanceIDs of candidate items of the given resource type,
+          in natural sort order.
+        """
+        instances = None
+        instance = properties.get(self.ovf.INSTANCE_ID)
+        if instance is not None:
+            instances = [instance] if instance in self.item_dict else []
+        else:
+            for (prop, value_dict) in self._property_index.items():
+                value = properties.get(prop)
+                if value is not None:
+                    instances = natural_sort([
+                        item.instance_id for item in value_dict.get(value, ())
+                        if self.item_dict.get(item.instance_id) is item])
+                    break
+        if instances is None:
+            return self._instances_of_type(resource_type)
+        if resource_type:
+            type_value = self.ovf.RES_MAP[resource_type]
+            instances = [
+                i for i in instances if
+                self.item_dict[i].get_value(self.ovf.RESOURCE_TYPE) ==
+                type_value]
+        return instances
+
+    def item_has_profile(self, item, profile):
+        """Check if the given Item exists under the given profile.
+
+        Equivalent to :meth:`OVFItem.has_profile
+        <COT.vm_description.ovf.item.OVFItem.has_profile>`, but caches the
+        result until the item's profiles, or the OVF's profiles, change.
+
+        Args:
+          item (OVFItem): Item to check
+          profile (str): Profile name
+
+        Returns:
+          bool: True if the item exists in this profile, False if not.
+        """
+        config_profiles = self.ovf.config_profiles
+        if self._profile_cache_key != config_profiles:
+            self._profile_cache = {}
+            self._profile_cache_key = list(config_profiles)
+        item_profiles = self._profile_cache.setdefault(profile, {})
+        result = item_profiles.get(item)
+        if result is None:
+            result = item.has_profile(profile)
+            item_profiles[item] = result
+        return result
+
     def clone_item(self, parent_item, profile_list):
         """Clone an OVFItem to create a new instance.
 
@@ -222,6 +578,9 @@ class OVFHardware(object):
         ovfitem.set_property(self.ovf.INSTANCE_ID, instance, profile_list)
         ovfitem.modified = True
         self.item_dict[instance] = ovfitem
+        self._instance_ids.add(instance)
+        self._sorted_instances = None
+        self.index_item(ovfitem)
         logger.spam("Added clone of %s under %s, instance is %s",
                     parent_item, profile_list, instance)
         return (instance, ovfitem)
@@ -243,7 +602,7 @@ class OVFHardware(object):
             return False
         if profile_list:
             for profile in profile_list:
-                if not item.has_profile(profile):
+                if not self.item_has_profile(item, profile):
                     return False
         for (prop, value) in properties.items():
             if item.get_value(prop) != value:
@@ -262,13 +621,13 @@ class OVFHardware(object):
         Returns:
           list: Matching OVFItem instances
         """
-        items = [self.item_dict[instance] for instance in
-                 natural_sort(self.item_dict)]
-        filtered_items = []
         if properties is None:
             properties = {}
-        for item in items:
-            if self.item_match(item, resource_type, properties, profile_list):
+        filtered_items = []
+        for instance in self._candidate_instances(resource_type, properties):
+            item = self.item_dict[instance]
+            # Resource type was already checked by _candidate_instances()
+            if self.item_match(item, None, properties, profile_list):
                 filtered_items.append(item)
         logger.spam("Found %s Items of type %s with properties %s and"
                     " profiles %s", len(filtered_items), resource_type,
@@ -337,7 +696,7 @@ class OVFHardware(object):
             count_dict[profile] = 0
         for ovfitem in self.find_all_items(resource_type):
             for profile in profile_list:
-                if ovfitem.has_profile(profile):
+                if self.item_has_profile(ovfitem, profile):
                     count_dict[profile] += 1
         for (profile, count) in count_dict.items():
             logger.spam("Profile '%s' has %s %s Item(s)",
@@ -372,7 +731,7 @@ class OVFHardware(object):
         for ovfitem in self.find_all_items(resource_type):
             last_item = ovfitem
             for profile in profile_list:
-                if ovfitem.has_profile(profile):
+                if self.item_has_profile(ovfitem, profile):
                     if items_seen[profile] >= count:
                         # Too many items - remove this one!
                         ovfitem.remove_profile(profile)
@@ -557,7 +916,7 @@ class OVFHardware(object):
             else:
                 new_value = default
             for profile in profile_list:
-                if ovfitem.has_profile(profile):
+                if self.item_has_profile(ovfitem, profile):
                     ovfitem.set_property(prop_name, new_value, [profile])
             logger.info("Updated %s property %s to %s under %s",
                         resource_type, prop_name, new_value, profile_list)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+# index.py - ElementIndex class
+#
+# October 2026
+# Copyright (c) 2026 the COT project developers.
+# See the COPYRIGHT.txt file at the top-level directory of this distribution
+# and at https://github.com/glennmatthews/cot/blob/master/COPYRIGHT.txt.
+#
+# This file is part of the Common OVF Tool (COT) project.
+# It is subject to the license terms in the LICENSE.txt file found in the
+# top-level directory of this distribution and at
+# https://github.com/glennmatthews/cot/blob/master/LICENSE.txt. No part
+# of COT, including this file, may be copied, modified, propagated, or
+# distributed except according to the terms contained in the LICENSE.txt file.
+
+"""Indexes for fast lookup of OVF descriptor elements by attribute value.
+
+**Classes**
+
+.. autosummary::
+  :nosignatures:
+
+  ElementIndex
+"""
+
+import logging
+
+from COT.xml_file import XML
+
+logger = logging.getLogger(__name__)
+
+
+class ElementIndex(object):
+    """Index of the child elements of an XML element by attribute values.
+
+    Helper class for :class:`~COT.vm_description.ovf.ovf.OVF`, used to look
+    up ``File`` elements in the ``References`` and ``Disk`` elements in the
+    ``DiskSection`` without scanning every child element.
+
+    The index is built from the parent element the first time it's needed,
+    and must subsequently be kept up to date by calling :meth:`add` and
+    :meth:`remove` whenever a child element is added, removed, or has its
+    indexed attributes changed. If a different parent element is given to
+    :meth:`find`, the index is rebuilt.
+
+    Examples:
+      ::
+
+        >>> import xml.etree.ElementTree as ET
+        >>> refs = ET.fromstring('<References><File id="a" href="a.vmdk"/>'
+        ...                      '<File id="b" href="b.iso"/></References>')
+        >>> index = ElementIndex('File', ['id', 'href'])
+        >>> index.find(refs, 'href', 'b.iso').get('id')
+        'b'
+        >>> index.find(refs, 'id', 'c') is None
+        True
+    """
+
+    def __init__(self, tag, attribs):
+        """Create an index of child elements with the given tag.
+
+        Args:
+          tag (str): XML tag of the child elements to index.
+          attribs (list): Names of the attributes to index them by.
+        """
+        self.tag = tag
+        self.attribs = attribs
+        self._parent = None
+        self._maps = None
+
+    def _build(self, parent):
+        """Index all matching children of the given parent element.
+
+        Args:
+          parent (xml.etree.ElementTree.Element): Parent element, or None.
+        """
+        self._parent = parent
+        self._maps = dict((attrib, {}) for attrib in self.attribs)
+        if parent is not None:
+            for child in parent.findall(self.tag):
+                self.add(child)
+
+    def add(self, elem):
+        """Add the given element, with its current attributes, to the index.
+
+        Args:
+          elem (xml.etree.ElementTree.Element): Newly added or updated element.
+        """
+        if self._maps is None:
+            return
+        for (attrib, mapping) in self._maps.items():
+            value = elem.get(attrib)
+            if value is None:
+                continue
+            elems = mapping.setdefault(value, [])
+            if elem not in elems:
+                elems.append(elem)
+
+    def remove(self, elem):
+        """Remove the given element from the index.
+
+        Args:
+          elem (xml.etree.ElementTree.Element): Element being deleted, or
+            whose indexed attributes are about to be changed.
+        """
+        if self._maps is None:
+            return
+        for (attrib, mapping) in self._maps.items():
+            value = elem.get(attrib)
+            elems = mapping.get(value, [])
+            if elem in elems:
+                elems.remove(elem)
+                if not elems:
+                    del mapping[value]
+
+    def find(self, parent, attrib, value):
+        """Find the unique child element with the given attribute value.
+
+        Equivalent to :meth:`XML.find_child(parent, tag, {attrib: value})
+        <COT.xml_file.XML.find_child>`, but without scanning all children.
+
+        Args:
+          parent (xml.etree.ElementTree.Element): Parent element.
+          attrib (str): Indexed attribute name to match on.
+          value (str): Attribute value to match.
+
+        Returns:
+          xml.etree.ElementTree.Element: Child element found, or None
+
+        Raises:
+          LookupError: if more than one matching child is found
+        """
+        if parent is None or value is None:
+            return None
+        if self._maps is None or parent is not self._parent:
+            self._build(parent)
+        matches = self._maps[attrib].get(value, [])
+        if any(elem.get(attrib) != value for elem in matches):
+            # Someone changed an attribute without telling us
+            logger.debug("Index of %s elements is stale; rebuilding it",
+                         XML.strip_ns(self.tag))
+            self._build(parent)
+            matches = self._maps[attrib].get(value, [])
+        if len(matches) > 1:
+            raise LookupError(
+                "Found multiple matching <{0}> children (each with "
+                "attributes '{1}') under <{2}>"
+                .format(XML.strip_ns(self.tag), {attrib: value},
+                        XML.strip_ns(parent.tag)))
+        return matches[0] if matches else None
@@ -33,6 +33,7 @@ hardware configuration profiles.
 
   OVFItem
   OVFItemDataError
+  ProfileBits
 """
 
 import re
@@ -77,6 +78,88 @@ class OVFItemDataError(Exception):
     """Data to be added to an :class:`OVFItem` conflicts with existing data."""
 
 
+class ProfileBits(object):
+    """Mapping of configuration profile names to bits in an integer bitmask.
+
+    Each :class:`~COT.vm_description.ovf.ovf.OVF` has one of these, shared by
+    all of its :class:`OVFItem` instances, which store the set of profiles
+    associated with each property value as a bitmask rather than as a
+    ``set`` of strings. Bit 0 (:attr:`ANY`) represents ``None``, meaning
+    "all profiles"; other profiles are assigned bits as they are encountered.
+
+    Examples:
+      ::
+
+        >>> bits = ProfileBits()
+        >>> bits.mask(['1CPU', '2CPU'])
+        6
+        >>> bits.mask([None, '2CPU'])
+        5
+        >>> sorted(bits.names(6))
+        ['1CPU', '2CPU']
+        >>> bits.names(bits.ANY) == set([None])
+        True
+    """
+
+    ANY = 1
+    """Bit representing ``None``, i.e., all profiles."""
+
+    __slots__ = ('_bits', '_names')
+
+    def __init__(self):
+        """Create a mapping containing only :attr:`ANY`."""
+        self._bits = {None: self.ANY}
+        self._names = [None]
+
+    def bit(self, profile):
+        """Get the bit for the given profile, assigning one if needed.
+
+        Args:
+          profile (str): Profile name, or None.
+
+        Returns:
+          int: Bitmask with only this profile's bit set.
+        """
+        bit = self._bits.get(profile)
+        if bit is None:
+            bit = 1 << len(self._names)
+            self._bits[profile] = bit
+            self._names.append(profile)
+        return bit
+
+    def mask(self, profiles):
+        """Get the bitmask representing the given profiles.
+
+        Args:
+          profiles (list): Profile names, which may include None.
+
+        Returns:
+          int: Bitmask
+        """
+        mask = 0
+        for profile in profiles:
+            mask |= self.bit(profile)
+        return mask
+
+    def names(self, mask):
+        """Get the set of profiles represented by the given bitmask.
+
+        Args:
+          mask (int): Bitmask
+
+        Returns:
+          set: Profile names, which may include None.
+        """
+        names = set()
+        index = 0
+        while mask:
+            if mask & 1:
+                names.add(self._names[index])
+            mask >>= 1
+            index += 1
+        return names
+
+
 class OVFItem(object):
     """Helper class for :class:`OVF`.
 
@@ -86,13 +169,17 @@ class OVFItem(object):
     In essence, it is:
 
     * a dict of ``Item`` properties (indexed by element name)
-    * each of which is a dict of sets of profiles (indexed by element value)
+    * each of which is a dict of profile bitmasks (indexed by element value),
+      as assigned by the :class:`ProfileBits` of the owning OVF
     """
 
     # Magic strings
     ATTRIB_KEY_SUFFIX = " {Item attribute}"
     ELEMENT_KEY_SUFFIX = " {custom element}"
 
+    __slots__ = ('ovf', 'name_helper', 'profile_bits', 'properties',
+                 'modified', 'namespace')
+
     def __init__(self, ovf, item=None):
         """Create a new OVFItem with contents based on the given Item element.
 
@@ -105,13 +192,38 @@ class OVFItem(object):
             self.name_helper = ovf
         else:
             self.name_helper = name_helper(1.0)
+        self.profile_bits = getattr(ovf, 'profile_bits', None)
+        if self.profile_bits is None:
+            self.profile_bits = ProfileBits()
         self.properties = {}
-        """Dict of dicts. properties[name][value] = (profile1, profile2)."""
+        """Dict of dicts. properties[name][value] = profile_bitmask."""
         self.modified = False
         self.namespace = self.RASD   # default for most item types
         if item is not None:
             self.add_item(item)
 
+    def __deepcopy__(self, memo):
+        """Create a deep copy of this item, belonging to the same OVF.
+
+        Args:
+          memo (dict): Dictionary of objects already copied.
+
+        Returns:
+          OVFItem: Copy of this item.
+        """
+        new_item = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new_item
+        new_item.ovf = self.ovf
+        new_item.name_helper = self.name_helper
+        new_item.profile_bits = self.profile_bits
+        # Values and bitmasks are immutable, so no need to go any deeper
+        new_item.properties = dict((name, dict(value_dict)) for
+                                   (name, value_dict) in
+                                   self.properties.items())
+        new_item.modified = self.modified
+        new_item.namespace = self.namespace
+        return new_item
+
     def __str__(self):
         """Get human-readable string representation."""
         ret = "OVFItem:\n"
@@ -135,8 +247,9 @@ class OVFItem(object):
           AttributeError: Magic methods (``__foo``) will not be passed
               through but will raise an AttributeError as usual.
         """
-        # Don't pass 'special' attributes through to the helper
-        if re.match(r"^__", name):
+        # Don't pass 'special' attributes through to the helper, nor
+        # any of our own attributes that haven't been initialized yet
+        if re.match(r"^__", name) or name in self.__slots__:
             raise AttributeError("'OVFItem' object has no attribute '{0}'"
                                  .format(name))
         # Pass through to designated helper
@@ -187,7 +300,21 @@ class OVFItem(object):
         Returns:
           set: Profile strings associated with this name/value.
         """
-        return self.properties[name][value]
+        return self.profile_bits.names(self.properties[name][value])
+
+    def _all_mask(self, name):
+        """Bitmask of all profiles for which this name has a value.
+
+        Args:
+          name (str): Property name.
+
+        Returns:
+          int: Profile bitmask, or 0 if there are no values for this name.
+        """
+        mask = 0
+        for profile_mask in self.properties.get(name, {}).values():
+            mask |= profile_mask
+        return mask
 
     def all_profiles(self, name, default=None):
         """Superset of all profiles for which this name has a value.
@@ -199,10 +326,23 @@ class OVFItem(object):
         Returns:
           Set of profile strings, or the given `default` if no matches.
         """
-        value_dict = self.properties.get(name, None)
-        if not value_dict:
+        mask = self._all_mask(name)
+        if not mask:
             return default
-        return set.union(*value_dict.values())
+        return self.profile_bits.names(mask)
+
+    def _mask(self, profiles):
+        """Get the profile bitmask corresponding to the given profiles.
+
+        Args:
+          profiles (list): Profile names, or None.
+
+        Returns:
+          int: Profile bitmask, or None if ``profiles`` is None.
+        """
+        if profiles is None:
+            return None
+        return self.profile_bits.mask(profiles)
 
     def add_item(self, item):
         """Add the given ``Item`` element to this OVFItem.
@@ -274,7 +414,7 @@ class OVFItem(object):
                                   overwrite=False)
 
         self.modified = True
-        logger.spam("Added %s - new status:\n%s", item.tag, str(self))
+        logger.spam("Added %s - new status:\n%s", item.tag, self)
         self.validate()
 
     def value_add_wildcards(self, name, value, profiles):
@@ -297,21 +437,37 @@ class OVFItem(object):
         .. seealso::
            :meth:`value_replace_wildcards`
         """
+        return self._add_wildcards(name, value, self._mask(profiles))
+
+    def _add_wildcards(self, name, value, mask):
+        """Add wildcard placeholders to a string that may need updating.
+
+        Args:
+          name (str): Property name
+          value (str): Value to add wildcards to.
+          mask (int): Bitmask of profiles to which this (name, value) applies.
+
+        Returns:
+          str: The updated value string with wildcards added.
+
+        .. seealso::
+           :meth:`value_add_wildcards`
+        """
         if name == self.ITEM_DESCRIPTION:
-            en_val = self.get_value(self.ELEMENT_NAME, profiles)
+            en_val = self._resolve_value(self.ELEMENT_NAME, mask)
             if en_val is not None:
                 value = re.sub(en_val, "_EN_", value)
 
         if name == self.ELEMENT_NAME or name == self.ITEM_DESCRIPTION:
-            vq_val = self.get_value(self.VIRTUAL_QUANTITY, profiles)
+            vq_val = self._resolve_value(self.VIRTUAL_QUANTITY, mask)
             if vq_val is not None:
                 value = re.sub(vq_val, "_VQ_", value)
-            rst_val = self.get_value(self.RESOURCE_SUB_TYPE, profiles)
+            rst_val = self._resolve_value(self.RESOURCE_SUB_TYPE, mask)
             if rst_val is not None:
                 if isinstance(rst_val, tuple):
                     rst_val = "/".join(rst_val)
                 value = re.sub(rst_val, "_RST_", value)
-            conn_val = self.get_value(self.CONNECTION, profiles)
+            conn_val = self._resolve_value(self.CONNECTION, mask)
             if conn_val is not None:
                 value = re.sub(conn_val, "_CONN_", value)
 
@@ -331,19 +487,35 @@ class OVFItem(object):
         .. seealso::
            :meth:`value_add_wildcards`
         """
+        return self._replace_wildcards(name, value, self._mask(profiles))
+
+    def _replace_wildcards(self, name, value, mask):
+        """Replace wildcards with actual values.
+
+        Args:
+          name (str): Property name
+          value (str): Value to replace wildcards from.
+          mask (int): Bitmask of profiles to which this (name, value) applies.
+
+        Returns:
+          str: The updated value string, with wildcards replaced.
+
+        .. seealso::
+           :meth:`value_replace_wildcards`
+        """
         if not value:
             return value
         if name == self.ITEM_DESCRIPTION:
-            en_val = self._get_value(self.ELEMENT_NAME, profiles)
+            en_val = self._lookup_value(self.ELEMENT_NAME, mask)
             if en_val is not None:
                 value = re.sub("_EN_", str(en_val), str(value))
         if name == self.ELEMENT_NAME or name == self.ITEM_DESCRIPTION:
             # To regenerate text that depends on these values:
-            rst_val = self._get_value(self.RESOURCE_SUB_TYPE, profiles)
+            rst_val = self._lookup_value(self.RESOURCE_SUB_TYPE, mask)
             if isinstance(rst_val, tuple):
                 rst_val = "/".join(rst_val)
-            vq_val = self._get_value(self.VIRTUAL_QUANTITY, profiles)
-            conn_val = self._get_value(self.CONNECTION, profiles)
+            vq_val = self._lookup_value(self.VIRTUAL_QUANTITY, mask)
+            conn_val = self._lookup_value(self.CONNECTION, mask)
             if rst_val is not None:
                 value = re.sub("_RST_", str(rst_val), str(value))
             if vq_val is not None:
@@ -352,7 +524,7 @@ class OVFItem(object):
                 value = re.sub("_CONN_", str(conn_val), str(value))
         return value
 
-    def _set_new_property(self, name, value, profiles):
+    def _set_new_property(self, name, value, mask):
         """Create a new property entry.
 
         Helper for :meth:`set_property`.
@@ -360,18 +532,17 @@ class OVFItem(object):
         Args:
           name (str): Property name
           value (str): Value to store for this property.
-          profiles (list): Profiles to which this (name, value) applies.
+          mask (int): Bitmask of profiles to which this (name, value) applies.
         """
         if not value:
             return
 
-        if None in profiles:
-            self.properties[name] = {value: set([None])}
-        else:
-            self.properties[name] = {value: profiles}
+        if mask & ProfileBits.ANY:
+            mask = ProfileBits.ANY
+        self.properties[name] = {value: mask}
         self.modified = True
 
-    def _set_existing_property(self, name, value, profiles, overwrite):
+    def _set_existing_property(self, name, value, mask, overwrite):
         """Update an existing property.
 
         Helper for :meth:`set_property`.
@@ -379,48 +550,48 @@ class OVFItem(object):
         Args:
           name (str): Property name
           value (str): Value to store for this property.
-          profiles (list): Profiles to which this (name, value) applies.
+          mask (int): Bitmask of profiles to which this (name, value) applies.
           overwrite (bool): Whether to permit overwriting existing values.
 
         Raises:
           OVFItemDataError: If ``overwrite`` is False and the value is
-              already set for one or more of the requested ``profiles``.
+              already set for one or more of the requested profiles.
         """
-        for (known_value, profile_set) in list(self.properties[name].items()):
-            if not overwrite and profile_set.intersection(profiles):
+        value_dict = self.properties[name]
+        for (known_value, profile_mask) in list(value_dict.items()):
+            if not overwrite and profile_mask & mask:
                 raise OVFItemDataError(
                     "Tried to set value:\n'{0}'\nfor property\n'{1}'\n"
                     "under profile(s) {2} but already had value:\n'{3}'\n"
                     "for this property under profile(s) {4}"
-                    .format(value, name, profiles,
+                    .format(value, name, self.profile_bits.names(mask),
                             known_value,
-                            profile_set.intersection(profiles)))
-            new_set = profile_set.copy()
+                            self.profile_bits.names(profile_mask & mask)))
 
             if known_value != value:
                 # Our profiles should not use this old value
-                new_set -= profiles
-            elif None in profile_set:
+                new_mask = profile_mask & ~mask
+            elif profile_mask & ProfileBits.ANY:
                 # No need to add ourselves, we're already covered
                 # implicitly by the default
-                pass
+                new_mask = profile_mask
             else:
-                new_set |= profiles
+                new_mask = profile_mask | mask
 
-            if new_set != profile_set:
+            if new_mask != profile_mask:
                 self.modified = True
-                if not new_set:
+                if not new_mask:
                     logger.spam("No longer any profiles with value %s"
                                 " - deleting this value",
                                 known_value)
-                    del self.properties[name][known_value]
+                    del value_dict[known_value]
                 else:
-                    self.properties[name][known_value] = new_set
+                    value_dict[known_value] = new_mask
 
-        if value and value not in self.property_values(name):
-            self.properties[name][value] = profiles
+        if value and value not in value_dict:
+            value_dict[value] = mask
             self.modified = True
-        elif not self.properties[name]:
+        elif not value_dict:
             logger.debug("No longer any values saved for property %s"
                          " - deleting this property", name)
             del self.properties[name]
@@ -458,28 +629,55 @@ class OVFItem(object):
             # Just to be safe...
             value = str(value)
 
+        self._set_property(name, value,
+                           self._mask(profiles) if profiles else 0,
+                           overwrite)
+
+    def _set_property(self, name, value, mask, overwrite=True):
+        """Store the (already normalized) value for the given name.
+
+        Helper for :meth:`set_property` and :meth:`add_profile`.
+
+        Args:
+          name (str): Property name
+          value (object): Value associated with :attr:`name`
+          mask (int): Bitmask of profiles to set this value for. If 0,
+              set for all profiles currently known to this item.
+          overwrite (bool): Whether to permit overwriting of existing
+              value set in this item.
+        """
         if name == self.RESOURCE_TYPE:
             self.namespace = self.namespace_for_resource_type(value)
 
-        if not profiles:
+        if not mask:
             # Profiles not specified.
             # 1) If this property was already defined for a specific set of
             #    profiles, then change the value for all of these profiles.
             # 2) If this property was not defined previously, then set the
-            #    value for all profiles (the magic set([None]))
-            profiles = self.all_profiles(name, set([None]))
-        profiles = set(profiles)
+            #    value for all profiles (the magic ProfileBits.ANY)
+            mask = self._all_mask(name) or ProfileBits.ANY
 
-        value = self.value_add_wildcards(name, value, profiles)
+        value = self._add_wildcards(name, value, mask)
         logger.spam("Setting %s to %s under profiles %s",
-                    name, value, profiles)
+                    name, value, self.profile_bits.names(mask))
         if name not in self.properties:
-            self._set_new_property(name, value, profiles)
+            self._set_new_property(name, value, mask)
         else:
-            self._set_existing_property(name, value, profiles, overwrite)
+            self._set_existing_property(name, value, mask, overwrite)
 
         if self.modified:
             self.validate()
+            self._notify_hardware(name)
+
+    def _notify_hardware(self, name):
+        """Let the OVFHardware containing this item update its indexes.
+
+        Args:
+          name (str): Name of the property that was updated.
+        """
+        hardware = getattr(self.ovf, 'hardware', None)
+        if hardware is not None:
+            hardware.index_item(self, name)
 
     def add_profile(self, new_profile, from_item=None):
         """Add a new profile to this item.
@@ -502,28 +700,23 @@ class OVFItem(object):
             from_item = self
         logger.debug("Adding profile %s to item %s from item %s",
                      new_profile,
-                     # TODO: add instance_id property, as this still gets
-                     # a value_dict like "{'13': set(['4CPU-4GB-3NIC'])}"
-                     self.properties.get(self.INSTANCE_ID,
-                                         "<unknown instance>"),
-                     from_item.properties[self.INSTANCE_ID])
-        p_set = set([new_profile])
+                     self.get_value(self.INSTANCE_ID) or "<unknown instance>",
+                     from_item.get_value(self.INSTANCE_ID))
+        p_mask = self.profile_bits.bit(new_profile)
         for name in from_item.property_names:
-            found = False
-            if not from_item.properties[name]:
+            value_dict = from_item.properties[name]
+            if not value_dict:
                 logger.spam("No values stored for name %s - not cloning it",
                             name)
                 continue
-            for (value, profiles) in from_item.properties[name].items():
-                if (None in profiles or
-                        len(from_item.property_values(name)) == 1):
-                    self.set_property(name, value, p_set)
-                    found = True
+            for (value, profile_mask) in value_dict.items():
+                if profile_mask & ProfileBits.ANY or len(value_dict) == 1:
+                    self._set_property(name, value, p_mask)
                     break
-            if not found:
+            else:
                 raise RuntimeError(
                     "Not sure which value to clone for {0}: {1}"
-                    .format(name, from_item.properties[name].items()))
+                    .format(name, from_item.get(name)))
         self.modified = True
         self.validate()
 
@@ -543,31 +736,33 @@ class OVFItem(object):
                          "not present under %s!", profile, self)
             return
         logger.debug("Removing profile %s from item %s",
-                     profile, self.properties[self.INSTANCE_ID])
-        p_set = set([profile])
-        for name in self.property_names:
-            for (value, profiles) in list(self.properties[name].items()):
-                profiles -= p_set
+                     profile, self.get_value(self.INSTANCE_ID))
+        p_mask = self.profile_bits.bit(profile)
+        for value_dict in self.properties.values():
+            for (value, profile_mask) in list(value_dict.items()):
+                profile_mask &= ~p_mask
                 # Convert "any profile" to a list of all profiles minus
                 # this one and any profiles already set elsewhere
-                if None in profiles and split_default:
+                if profile_mask & ProfileBits.ANY and split_default:
                     logger.debug("Profile contains 'any profile'; "
                                  "fixing it up")
-                    profiles.update(self.ovf.config_profiles)
-                    profiles.discard(None)
-                    profiles.discard(profile)
+                    profile_mask |= self.profile_bits.mask(
+                        self.ovf.config_profiles)
+                    profile_mask &= ~(ProfileBits.ANY | p_mask)
                     # Discard all profiles set elsewhere
-                    for (val, prof) in list(self.properties[name].items()):
-                        if val == value:
-                            continue
-                        profiles -= prof
-                    logger.spam("Profiles are now: %s", profiles)
-                if not profiles:
-                    logger.debug("No more profiles for value %s, %s",
-                                 name, value)
-                    del self.properties[name][value]
+                    for (val, other_mask) in value_dict.items():
+                        if val != value:
+                            profile_mask &= ~other_mask
+                    logger.spam("Profiles are now: %s",
+                                self.profile_bits.names(profile_mask))
+                if profile_mask:
+                    value_dict[value] = profile_mask
+                else:
+                    logger.debug("No more profiles for value %s", value)
+                    del value_dict[value]
         self.modified = True
         self.validate()
+        self._notify_hardware(self.INSTANCE_ID)
 
     def get(self, tag):
         """Get the dict associated with the given XML tag, if any.
@@ -576,9 +771,14 @@ class OVFItem(object):
           tag (str): XML tag to look up
 
         Returns:
-          dict: Dictionary of values associated with this tag (TODO?)
+          dict: Dictionary of values associated with this tag, each mapped
+          to the set of profiles associated with that value.
         """
-        return self.properties.get(tag, None)
+        value_dict = self.properties.get(tag, None)
+        if value_dict is None:
+            return None
+        return dict((value, self.profile_bits.names(mask)) for
+                    (value, mask) in value_dict.items())
 
     def _get_value(self, tag, profiles=None):
         """Get internal value string for the given tag.
@@ -596,14 +796,26 @@ class OVFItem(object):
         Returns:
           Value, default value, or ``None``, unsanitized.
         """
-        if profiles is not None:
-            profiles = set(profiles)
+        return self._lookup_value(tag, self._mask(profiles))
+
+    def _lookup_value(self, tag, mask):
+        """Get internal value string for the given tag and profile bitmask.
+
+        Args:
+          tag (str): Tag to retrieve value for
+          mask (int): Bitmask of profiles, or None
+
+        Returns:
+          Value, default value, or ``None``, unsanitized.
+
+        .. seealso::
+           :meth:`_get_value`
+        """
         val_dict = self.properties.get(tag, {})
-        if profiles is None:
+        if mask is None:
             if len(val_dict) == 1:
-                return list(val_dict.keys())[0]
-            else:
-                return None
+                return next(iter(val_dict))
+            return None
         # A case we need to handle:
         # {'1': set([None])
         #  '4': set(['x'])
@@ -612,11 +824,11 @@ class OVFItem(object):
         # We have to recognize that y and z are implicit in None but z is not.
         default_val = None
         for (val, prof) in val_dict.items():
-            if prof.issuperset(profiles):
+            if prof & mask == mask:
                 return val
-            if None in prof:
+            if prof & ProfileBits.ANY:
                 default_val = val
-            elif not prof.isdisjoint(profiles):
+            elif prof & mask:
                 return None
         return default_val
 
@@ -637,14 +849,37 @@ class OVFItem(object):
           OVFItemDataError: if :meth:`value_replace_wildcards` failed to
               remove any wildcards from the internally stored value.
         """
-        val = self._get_value(tag, profiles)
-        val = self.value_replace_wildcards(tag, val, profiles)
+        return self._resolve_value(tag, self._mask(profiles))
+
+    def _resolve_value(self, tag, mask):
+        """Get the value for the given tag under the given profile bitmask.
+
+        Args:
+          tag (str): Tag to retrieve value for
+          mask (int): Bitmask of profiles, or None
+
+        Returns:
+          Value string or list, or ``None``
+
+        Raises:
+          OVFItemDataError: if :meth:`_replace_wildcards` failed to
+              remove any wildcards from the internally stored value.
+
+        .. seealso::
+           :meth:`get_value`
+        """
+        val = self._lookup_value(tag, mask)
+        val = self._replace_wildcards(tag, val, mask)
         # Sanity check
         if tag == self.ELEMENT_NAME or tag == self.ITEM_DESCRIPTION:
             if val and re.search(r"_RST_|_VQ_|_CONN_|_EN_", val):
-                raise OVFItemDataError("Unreplaced wildcard in value "
-                                       "for {0} profiles {1}:\n{2}\n{3}"
-                                       .format(tag, profiles, val, self))
+                raise OVFItemDataError(
+                    "Unreplaced wildcard in value for {0} profiles {1}:"
+                    "\n{2}\n{3}"
+                    .format(tag,
+                            None if mask is None else
+                            self.profile_bits.names(mask),
+                            val, self))
         return val
 
     def get_all_values(self, tag):
@@ -680,21 +915,25 @@ class OVFItem(object):
                                    .format(name,
                                            self.property_values(name)))
         for (name, value_dict) in self.properties.items():
-            set_so_far = set()
-            for profile_set in value_dict.values():
-                if None in profile_set and len(profile_set) > 1:
+            mask_so_far = 0
+            for (value, profile_mask) in list(value_dict.items()):
+                if (profile_mask & ProfileBits.ANY and
+                        profile_mask != ProfileBits.ANY):
                     logger.debug("Profile set %s contains redundant info; "
-                                 "cleaning it up now...", profile_set)
+                                 "cleaning it up now...",
+                                 self.profile_bits.names(profile_mask))
                     # Clean up...
-                    profile_set.clear()
-                    profile_set.add(None)
+                    profile_mask = ProfileBits.ANY
+                    value_dict[value] = profile_mask
                 # Make sure the profile sets are mutually exclusive
-                inter = set_so_far.intersection(profile_set)
-                if inter:
-                    raise RuntimeError("OVFItem illegally contains duplicate "
-                                       "profiles %s under %s: %s",
-                                       inter, name, value_dict)
-                set_so_far |= profile_set
+                if mask_so_far & profile_mask:
+                    raise RuntimeError(
+                        "OVFItem illegally contains duplicate profiles {0} "
+                        "under {1}: {2}"
+                        .format(self.profile_bits.names(mask_so_far &
+                                                        profile_mask),
+                                name, self.get(name)))
+                mask_so_far |= profile_mask
 
     def has_profile(self, profile):
         """Check if this Item exists under the given profile.
@@ -705,12 +944,12 @@ class OVFItem(object):
         Returns:
           bool: True if the item exists in this profile, False if not.
         """
-        profiles = self.all_profiles(self.INSTANCE_ID)
-        if profiles is None:
+        mask = self._all_mask(self.INSTANCE_ID)
+        if not mask:
             return False
-        if profile in profiles:
+        if mask & self.profile_bits.bit(profile):
             return True
-        elif None in profiles and profile in self.ovf.config_profiles:
+        elif mask & ProfileBits.ANY and profile in self.ovf.config_profiles:
             return True
         return False
 
@@ -720,38 +959,36 @@ class OVFItem(object):
         Returns:
           list: List of profile-set strings.
         """
-        set_list = []
-        for name in self.property_names:
-            for (_, new_set) in list(self.properties[name].items()):
-                new_set_list = []
-                for existing_set in set_list:
+        mask_list = []
+        for value_dict in self.properties.values():
+            for new_mask in value_dict.values():
+                new_mask_list = []
+                for existing_mask in mask_list:
                     # If the sets are identical or do not intersect, do nothing
-                    if (new_set == existing_set or
-                            not new_set.intersection(existing_set)):
-                        new_set_list.append(frozenset(existing_set))
+                    if (new_mask == existing_mask or
+                            not new_mask & existing_mask):
+                        new_mask_list.append(existing_mask)
                         continue
                     # Otherwise, need to re-partition!
-                    set_a = existing_set.difference(new_set)
-                    new_set_list.append(frozenset(set_a))
-
-                    set_b = existing_set.intersection(new_set)
-                    new_set_list.append(frozenset(set_b))
-
-                    new_set = new_set.difference(existing_set)
+                    new_mask_list.append(existing_mask & ~new_mask)
+                    new_mask_list.append(existing_mask & new_mask)
+                    new_mask &= ~existing_mask
 
-                new_set_list.append(frozenset(new_set))
+                new_mask_list.append(new_mask)
                 # Remove duplicate and empty entries
-                set_list = [x for x in set(new_set_list) if x]
+                mask_list = [x for x in set(new_mask_list) if x]
 
-        logger.spam("Final set list is %s", set_list)
+        logger.spam("Final set list is %s",
+                    [self.profile_bits.names(x) for x in mask_list])
 
         # Construct a list of profile strings
         set_string_list = []
-        for final_set in set_list:
-            if None in final_set:
+        for final_mask in mask_list:
+            if final_mask & ProfileBits.ANY:
                 set_string_list.append("")
             else:
-                set_string_list.append(" ".join(natural_sort(final_set)))
+                set_string_list.append(" ".join(natural_sort(
+                    self.profile_bits.names(final_mask))))
         set_string_list = natural_sort(set_string_list)
 
         logger.spam("set string list: %s", set_string_list)
@@ -774,14 +1011,14 @@ class OVFItem(object):
             if not set_string:
                 # no config profile
                 item = ET.Element(item_tag)
-                final_set = set([None])
+                final_mask = ProfileBits.ANY
                 set_string = '<generic>'
             else:
                 item = ET.Element(item_tag, {self.ITEM_CONFIG: set_string})
-                final_set = set(set_string.split())
-            logger.spam("set string: %s; final_set: %s", set_string, final_set)
+                final_mask = self.profile_bits.mask(set_string.split())
+            logger.spam("set string: %s", set_string)
             for name in sorted(self.property_names):
-                val = self.get_value(name, final_set)
+                val = self._resolve_value(name, final_mask)
                 if not val:
                     logger.debug("No value defined for attribute '%s' "
                                  "under profile set '%s' for instance %s",
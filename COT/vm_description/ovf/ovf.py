@@ -22,37 +22,62 @@
   :nosignatures:
 
   OVF
+
+**Constants**
+
+.. autosummary::
+  CONVERSION_CACHE
 """
 
+import io
 import logging
 import os
 import os.path
 import re
+import shutil
 import tarfile
+import tempfile
+import threading
+import time
+import warnings
 import xml.etree.ElementTree as ET    # noqa: N814
 from xml.etree.ElementTree import ParseError
 import textwrap
 
 from COT.xml_file import XML
+from COT.conversion_cache import converter_id
 from COT.data_validation import (
     match_or_die, check_for_conflict, file_checksum,
     ValueTooHighError, ValueUnsupportedError, canonicalize_nic_subtype,
 )
-from COT.file_reference import FileReference, FileOnDisk
+from COT.file_reference import (
+    ArchiveWriter, FileReference, FileOnDisk, FileInTAR, TarIndex,
+    calculate_checksums, run_concurrently,
+)
 from COT.platforms import Platform
 from COT.disks import DiskRepresentation
+from COT.disks.fat import FATReader
+from COT.disks.vmdk import SPARSE_MAGIC, decode_stream_optimized
 from COT.utilities import pretty_bytes, tar_entry_size
 
 from ..vm_description import VMDescription, VMInitError
 from .name_helper import name_helper, CIM_URI
 from .hardware import OVFHardware, OVFHardwareDataError
-from .item import list_union
+from .index import ElementIndex
+from .item import list_union, ProfileBits
 from .utilities import (
     int_bytes_to_programmatic_units, parse_manifest, programmatic_bytes_to_int,
 )
 
 logger = logging.getLogger(__name__)
 
+CONVERSION_CACHE = None
+"""Optional :class:`~COT.conversion_cache.ConversionCache` to use.
+
+If set, disk images converted by :meth:`OVF.convert_disk_if_needed` are
+stored in, and retrieved from, this persistent cache.
+"""
+
 
 class OVF(VMDescription, XML):
     """Representation of the contents of an OVF or OVA.
@@ -125,8 +150,9 @@ class OVF(VMDescription, XML):
         """Get the OVF descriptor for the given file.
 
         1. The file may be an OVF descriptor itself.
-        2. The file may be an OVA, in which case we need to untar it and
-           return the path to the extracted OVF descriptor.
+        2. The file may be an OVA, in which case we locate the OVF descriptor
+           within it and return its path relative to the OVA,
+           such as ``foo.ova/foo.ovf``.
 
         Args:
           input_file (str): Path to an OVF descriptor or OVA file.
@@ -136,14 +162,26 @@ class OVF(VMDescription, XML):
         """
         extension = self.detect_type_from_name(input_file)
         if extension == '.ova' or extension == '.box':
-            # Untar the ova to our working directory
-            return self.untar(input_file)
+            # The descriptor is read directly from the OVA, not extracted
+            self._ovf_descriptor_member = self.find_ova_descriptor(input_file)
+            return os.path.join(input_file, self._ovf_descriptor_member)
         elif extension == '.ovf':
             return input_file
         else:
             return None
 
-    def __init__(self, input_file, output_file):
+    def _open_ovf_descriptor(self):
+        """Open the OVF descriptor for reading.
+
+        Returns:
+          contextmanager: Context manager yielding a binary file object.
+        """
+        if self._ovf_descriptor_member is None:
+            return open(self.ovf_descriptor, 'rb')
+        return FileInTAR(os.path.abspath(self.input_file),
+                         self._ovf_descriptor_member).open('rb')
+
+    def __init__(self, input_file, output_file, verify_policy='strict'):
         """Open the specified OVF and read its XML into memory.
 
         Args:
@@ -152,6 +190,10 @@ class OVF(VMDescription, XML):
               (there will never be an output file) this value should be
               ``None``; if the output filename is not yet known, use ``""``
               and subsequently set :attr:`output_file` when it is determined.
+          verify_policy (str): When to verify referenced files against the
+              manifest - one of :data:`COT.file_reference.VERIFY_POLICIES`.
+              If ``'deferred'``, verification runs in a background thread,
+              which :meth:`write` and :meth:`destroy` wait for.
 
         Raises:
           VMInitError:
@@ -164,7 +206,10 @@ class OVF(VMDescription, XML):
         """
         try:
             self.output_extension = None
-            VMDescription.__init__(self, input_file, output_file)
+            self._verify_thread = None
+            self._ovf_descriptor_member = None
+            VMDescription.__init__(self, input_file, output_file,
+                                   verify_policy)
 
             # Make sure we know how to read the input
             self.ovf_descriptor = self._ovf_descriptor_from_name(input_file)
@@ -177,7 +222,8 @@ class OVF(VMDescription, XML):
 
             # Open the provided OVF
             try:
-                XML.__init__(self, self.ovf_descriptor)
+                with self._open_ovf_descriptor() as file_obj:
+                    XML.__init__(self, file_obj)
             except ParseError as exc:
                 raise VMInitError(2,
                                   "XML error in parsing file: " + str(exc),
@@ -247,7 +293,13 @@ class OVF(VMDescription, XML):
             # Initialize various caches
             self._configuration_profiles = None
             self._file_references = {}
+            self._descriptor_reference = None
             self._platform = None
+            self._file_index = ElementIndex(self.FILE,
+                                            [self.FILE_ID, self.FILE_HREF])
+            self._disk_index = ElementIndex(self.DISK,
+                                            [self.DISK_ID, self.DISK_FILE_REF])
+            self.profile_bits = ProfileBits()
 
             try:
                 self.hardware = OVFHardware(self)
@@ -263,6 +315,16 @@ class OVF(VMDescription, XML):
 
             Does not include the manifest file."""
 
+            if self.verify_policy == 'deferred':
+                # Snapshot the references now, as the main thread may
+                # add or remove references while verification is running
+                self._verify_thread = threading.Thread(
+                    target=self.verify_files, name="verify_files",
+                    args=([self._descriptor_reference] +
+                          list(self.file_references.values()),))
+                self._verify_thread.daemon = True
+                self._verify_thread.start()
+
         except Exception:
             self.destroy()
             raise
@@ -343,38 +405,80 @@ class OVF(VMDescription, XML):
         self._compare_file_lists(descriptor_files.keys(),
                                  manifest_entries.keys())
 
-        # Check the checksum of the descriptor itself
-        # We don't store this in file_references as that would be
-        # prone to self-recursion.
-        m_algo, m_cksum = manifest_entries.get(
-            os.path.basename(self.ovf_descriptor), (None, None))
-        if m_algo and m_algo != self.checksum_algorithm:
-            # TODO: log a warning? Discard the checksum?
-            pass
-        FileReference.create(
-            input_path, os.path.basename(self.ovf_descriptor),
-            checksum_algorithm=self.checksum_algorithm,
-            expected_checksum=m_cksum)
-
-        # Now check the checksum of the other files
-        for file_href, file_size in descriptor_files.items():
+        def check_file(entry):
+            """Create a reference to, and check the checksum of, a file."""
+            file_href, file_size, file_path = entry
             m_algo, m_cksum = manifest_entries.get(file_href, (None, None))
             if m_algo and m_algo != self.checksum_algorithm:
                 # TODO: log a warning? Discard the checksum?
                 pass
             try:
-                file_references[file_href] = FileReference.create(
-                    input_path, file_href,
+                return FileReference.create(
+                    input_path, file_path,
                     checksum_algorithm=self.checksum_algorithm,
                     expected_checksum=m_cksum,
-                    expected_size=file_size)
+                    expected_size=file_size,
+                    verify_policy=self.verify_policy)
             except IOError:
                 logger.error("File '%s' referenced in the OVF descriptor "
                              "does not exist.", file_href)
-                continue
+                return None
+
+        # Check the checksum of the descriptor itself as well as the other
+        # files, all concurrently.
+        # We don't store the descriptor in file_references as that would be
+        # prone to self-recursion.
+        # The descriptor is opened by its TAR member name (which may be
+        # something like "./foo.ovf") but listed in the manifest by its
+        # plain file name.
+        descriptor_path = (self._ovf_descriptor_member or
+                           os.path.basename(self.ovf_descriptor))
+        entries = ([(os.path.basename(os.path.normpath(descriptor_path)),
+                     None, descriptor_path)] +
+                   [(href, size, href) for href, size
+                    in descriptor_files.items()])
+        results = run_concurrently(check_file, entries)
+        self._descriptor_reference = results[0]
+        for (file_href, _, _), file_ref in zip(entries[1:], results[1:]):
+            if file_ref is not None:
+                file_references[file_href] = file_ref
 
         return file_references
 
+    def verify_files(self, file_refs=None):
+        """Verify all referenced files against the manifest, concurrently.
+
+        Any mismatches are logged as errors. If deferred verification is
+        already running in the background, waits for it to complete first.
+
+        Args:
+          file_refs (list): FileReferences to verify. If unspecified, the
+            descriptor and all files currently referenced are verified.
+
+        Returns:
+          bool: True if all files were successfully verified, else False.
+        """
+        if (self._verify_thread is not None and
+                self._verify_thread is not threading.current_thread()):
+            self._verify_thread.join()
+        if file_refs is None:
+            file_refs = ([self._descriptor_reference] +
+                         list(self.file_references.values()))
+        return all(run_concurrently(lambda file_ref: file_ref.verify(),
+                                    [file_ref for file_ref in file_refs
+                                     if file_ref is not None]))
+
+    def destroy(self):
+        """Clean up after ourselves.
+
+        Waits for any deferred verification to complete, then
+        deletes :attr:`self.working_dir` and its contents.
+        """
+        verify_thread = getattr(self, '_verify_thread', None)
+        if verify_thread is not None:
+            verify_thread.join()
+        super(OVF, self).destroy()
+
     @property
     def output_file(self):
         """OVF or OVA file that will be created or updated by :meth:`write`.
@@ -805,6 +909,8 @@ class OVF(VMDescription, XML):
 
     def write(self):
         """Write OVF or OVA to :attr:`output_file`, if set."""
+        if self._verify_thread is not None:
+            self._verify_thread.join()
         if not self.output_file:
             return
 
@@ -831,11 +937,11 @@ class OVF(VMDescription, XML):
         if extension == '.ova':
             ovf_file = os.path.join(self.working_dir, "{0}.ovf"
                                     .format(os.path.basename(prefix)))
-            self.write_xml(ovf_file)
-            self.generate_manifest(ovf_file)
+            self.write_xml(ovf_file, self.hardware.unchanged_items())
+            # The manifest is generated as part of the tar() process
             self.tar(ovf_file, self.output_file)
         elif extension == '.ovf':
-            self.write_xml(self.output_file)
+            self.write_xml(self.output_file, self.hardware.unchanged_items())
             # Copy all files from working directory to destination
             dest_dir = os.path.dirname(os.path.abspath(self.output_file))
 
@@ -849,6 +955,23 @@ class OVF(VMDescription, XML):
             raise NotImplementedError("Not sure how to write a '{0}' file"
                                       .format(extension))
 
+    @staticmethod
+    def _refresh_file_reference(file_ref):
+        """Refresh the given file reference if it still exists.
+
+        Helper method for :meth:`_refresh_file_references`.
+
+        Args:
+          file_ref (FileReference): File reference to refresh.
+
+        Returns:
+          bool: True if the file exists, False if not.
+        """
+        if not file_ref.exists:
+            return False
+        file_ref.refresh()
+        return True
+
     def _refresh_file_references(self):
         """Check all File entries to make sure they are valid and up to date.
 
@@ -856,10 +979,11 @@ class OVF(VMDescription, XML):
         """
         # Refresh the file references
         to_delete = []
-        for filename, file_ref in self.file_references.items():
-            if file_ref.exists:
-                file_ref.refresh()
-            else:
+        filenames = list(self.file_references.keys())
+        for filename, exists in zip(filenames, run_concurrently(
+                self._refresh_file_reference,
+                [self.file_references[f] for f in filenames])):
+            if not exists:
                 # file used to exist but no longer does??
                 logger.error("Referenced file '%s' does not exist!", filename)
                 to_delete.append(filename)
@@ -872,12 +996,12 @@ class OVF(VMDescription, XML):
             if href not in self.file_references:
                 # TODO this should probably have a confirm() check...
                 logger.notice("Removing reference to missing file %s", href)
+                self._file_index.remove(file_elem)
                 self.references.remove(file_elem)
                 # TODO remove references to this file from Disk, Item?
 
         for filename, file_ref in self.file_references.items():
-            file_elem = self.find_child(self.references, self.FILE,
-                                        {self.FILE_HREF: filename})
+            file_elem = self._find_file(self.FILE_HREF, filename)
             assert file_elem is not None
             file_elem.set(self.FILE_SIZE, str(file_ref.size))
 
@@ -1105,6 +1229,47 @@ class OVF(VMDescription, XML):
                 disk_cap_string,
                 device_str)
 
+    MAX_DECODED_DISK_SIZE = 16 * 1024 * 1024
+    """Largest VMDK file :meth:`_disk_contents` will decode to inspect."""
+
+    def _disk_contents(self, href):
+        """List the files in a disk image containing a FAT file system.
+
+        Used to describe hard disk configuration disks, such as those
+        created by ``cot inject-config``, in :meth:`info_string`.
+        The disk image may be raw, or a small streamOptimized VMDK, which
+        is decoded (directly from the OVA, if applicable) to a temporary
+        file for inspection. As this is purely informational, the file is
+        not verified against its expected checksum first.
+
+        Args:
+          href (str): File reference to inspect.
+
+        Returns:
+          list: Paths of the files in the disk image, or None if the file
+          doesn't contain a FAT file system.
+        """
+        file_ref = self.file_references.get(href)
+        if file_ref is None or not file_ref.exists:
+            return None
+        try:
+            with file_ref.open('rb', verify=False) as file_obj:
+                if file_obj.read(len(SPARSE_MAGIC)) != SPARSE_MAGIC:
+                    file_obj.seek(0)
+                    return FATReader(file_obj).files
+                if file_ref.size > self.MAX_DECODED_DISK_SIZE:
+                    logger.debug("Not decoding %s to list its contents, as "
+                                 "it is too large", href)
+                    return None
+                file_obj.seek(0)
+                with tempfile.TemporaryFile() as raw_obj:
+                    decode_stream_optimized(file_obj, raw_obj)
+                    raw_obj.seek(0)
+                    return FATReader(raw_obj).files
+        except (ValueError, NotImplementedError, IOError, OSError) as exc:
+            logger.debug("Not listing contents of %s: %s", href, exc)
+            return None
+
     def _info_string_files_disks(self, width, verbosity_option):
         """Describe files and disks as part of :meth:`info_string`.
 
@@ -1153,12 +1318,19 @@ class OVF(VMDescription, XML):
                 str_list.append("    File ID: {0}".format(file_id))
                 if disk_id:
                     str_list.append("    Disk ID: {0}".format(disk_id))
+                    # Only a hard disk image can hold a FAT file system
+                    contents = self._disk_contents(
+                        file_obj.get(self.FILE_HREF))
+                    if contents:
+                        str_list.extend(textwrap.wrap(
+                            ", ".join(contents), width=width,
+                            initial_indent="    Contents: ",
+                            subsequent_indent=" " * 14))
 
         # Find placeholder disks as well
         for disk in disk_list:
             file_id = disk.get(self.DISK_FILE_REF)
-            file_obj = self.find_child(self.references, self.FILE,
-                                       attrib={self.FILE_ID: file_id})
+            file_obj = self._find_file(self.FILE_ID, file_id)
             if file_obj is not None:
                 continue   # already reported on above
             disk_cap_string = pretty_bytes(self.get_capacity_from_disk(disk))
@@ -1975,6 +2147,9 @@ class OVF(VMDescription, XML):
           required, or a new :class:`~COT.disks.DiskRepresentation` instance
           representing a converted image that has been created in
           :attr:`output_dir`.
+
+        If :data:`CONVERSION_CACHE` is set, a previously converted copy of
+        the same image is reused rather than converting it again.
         """
         if kind != 'harddisk':
             logger.debug("No disk conversion needed")
@@ -1989,9 +2164,33 @@ class OVF(VMDescription, XML):
         logger.debug("Converting %s (%s, %s) to streamOptimized VMDK",
                      disk_image.path, disk_image.disk_format,
                      disk_image.disk_subformat)
-        return disk_image.convert_to(new_format='vmdk',
-                                     new_subformat='streamOptimized',
-                                     new_directory=self.working_dir)
+        if CONVERSION_CACHE is None:
+            return disk_image.convert_to(new_format='vmdk',
+                                         new_subformat='streamOptimized',
+                                         new_directory=self.working_dir)
+
+        source = FileOnDisk(os.path.dirname(os.path.abspath(disk_image.path)),
+                            os.path.basename(disk_image.path),
+                            checksum_algorithm='sha256')
+        vmdk_class = DiskRepresentation.class_for_format('vmdk')
+        # Identify only the software that will actually do the conversion
+        if vmdk_class.converts_natively(disk_image):
+            converter = converter_id()
+        else:
+            converter = converter_id(
+                vmdk_class.stream_optimized_helper().name)
+        key = CONVERSION_CACHE.key(source.checksum, 'vmdk', 'streamOptimized',
+                                   converter)
+        (file_prefix, _) = os.path.splitext(os.path.basename(disk_image.path))
+        output_path = os.path.join(self.working_dir, file_prefix + ".vmdk")
+        if CONVERSION_CACHE.get(key, output_path):
+            return vmdk_class(output_path)
+
+        new_image = disk_image.convert_to(new_format='vmdk',
+                                          new_subformat='streamOptimized',
+                                          new_directory=self.working_dir)
+        CONVERSION_CACHE.put(key, new_image.path)
+        return new_image
 
     def search_from_filename(self, filename):
         """From the given filename, try to find any existing objects.
@@ -2019,8 +2218,7 @@ class OVF(VMDescription, XML):
         logger.debug("Looking for existing disk info based on filename %s",
                      filename)
 
-        file_obj = self.find_child(self.references, self.FILE,
-                                   attrib={self.FILE_HREF: filename})
+        file_obj = self._find_file(self.FILE_HREF, filename)
 
         if file_obj is None:
             return (file_obj, disk, ctrl_item, disk_item)
@@ -2073,8 +2271,7 @@ class OVF(VMDescription, XML):
         ctrl_item = None
         disk_item = None
 
-        file_obj = self.find_child(self.references, self.FILE,
-                                   attrib={self.FILE_ID: file_id})
+        file_obj = self._find_file(self.FILE_ID, file_id)
 
         disk = self.find_disk_from_file_id(file_id)
 
@@ -2157,25 +2354,21 @@ class OVF(VMDescription, XML):
             # From disk Item to Disk
             disk_id = os.path.basename(host_resource)
             if self.disk_section is not None:
-                disk = self.find_child(self.disk_section, self.DISK,
-                                       attrib={self.DISK_ID: disk_id})
+                disk = self._find_disk(self.DISK_ID, disk_id)
 
             if disk is not None:
                 # From Disk to File
                 file_id = disk.get(self.DISK_FILE_REF)
-                file_obj = self.find_child(self.references, self.FILE,
-                                           attrib={self.FILE_ID: file_id})
+                file_obj = self._find_file(self.FILE_ID, file_id)
         elif (host_resource.startswith(self.HOST_RSRC_FILE_REF) or
               host_resource.startswith(self.OLD_HOST_RSRC_FILE_REF)):
             logger.debug("Looking for File and Disk matching disk Item")
             # From disk Item to File
             file_id = os.path.basename(host_resource)
-            file_obj = self.find_child(self.references, self.FILE,
-                                       attrib={self.FILE_ID: file_id})
+            file_obj = self._find_file(self.FILE_ID, file_id)
 
             if self.disk_section is not None:
-                disk = self.find_child(self.disk_section, self.DISK,
-                                       attrib={self.DISK_FILE_REF: file_id})
+                disk = self._find_disk(self.DISK_FILE_REF, file_id)
         else:
             logger.error(
                 "Unrecognized HostResource format '%s'; unable to identify "
@@ -2343,6 +2536,7 @@ class OVF(VMDescription, XML):
             if href in self.file_references.keys():
                 del self.file_references[href]
 
+            self._file_index.remove(file_obj)
             file_obj.clear()
         elif disk is None:
             file_obj = ET.SubElement(self.references, self.FILE)
@@ -2363,8 +2557,7 @@ class OVF(VMDescription, XML):
             file_index = len(all_files)
             while disk_index < len(all_disks):
                 tmp_file_id = all_disks[disk_index].get(self.DISK_FILE_REF)
-                next_file = self.find_child(self.references, self.FILE,
-                                            attrib={self.FILE_ID: tmp_file_id})
+                next_file = self._find_file(self.FILE_ID, tmp_file_id)
                 if next_file is not None:
                     file_index = all_files.index(next_file)
                     break
@@ -2379,6 +2572,7 @@ class OVF(VMDescription, XML):
         file_obj.set(self.FILE_ID, file_id)
         file_obj.set(self.FILE_HREF, file_name)
         file_obj.set(self.FILE_SIZE, file_size_string)
+        self._file_index.add(file_obj)
 
         # Make a note of the file's location - we'll copy it at write time.
         # The file_path is always a FileOnDisk
@@ -2401,10 +2595,12 @@ class OVF(VMDescription, XML):
           ValueUnsupportedError: If the ``disk_drive`` is a device type other
               than 'cdrom' or 'harddisk'
         """
+        self._file_index.remove(file_obj)
         self.references.remove(file_obj)
         del self.file_references[file_obj.get(self.FILE_HREF)]
 
         if disk is not None:
+            self._disk_index.remove(disk)
             self.disk_section.remove(disk)
 
         if disk_drive is not None:
@@ -2438,6 +2634,7 @@ class OVF(VMDescription, XML):
                 logger.notice("CD-ROMs do not require a Disk element. "
                               "Existing element will be deleted.")
                 if self.disk_section is not None:
+                    self._disk_index.remove(disk)
                     self.disk_section.remove(disk)
                     if not self.disk_section.findall(self.DISK):
                         logger.notice("No Disks left - removing DiskSection")
@@ -2459,6 +2656,7 @@ class OVF(VMDescription, XML):
 
         if disk is not None:
             disk_id = disk.get(self.DISK_ID)
+            self._disk_index.remove(disk)
             disk.clear()
         else:
             disk_id = file_id
@@ -2471,6 +2669,7 @@ class OVF(VMDescription, XML):
         disk.set(self.DISK_FORMAT,
                  ("http://www.vmware.com/interfaces/"
                   "specifications/vmdk.html#streamOptimized"))
+        self._disk_index.add(disk)
         return disk
 
     def add_controller_device(self, device_type, subtype, address,
@@ -2627,80 +2826,109 @@ class OVF(VMDescription, XML):
 
     # Helper methods - for internal use only
 
-    def untar(self, file_path):
-        """Untar the OVF descriptor from an .ova to the working directory.
+    def find_ova_descriptor(self, file_path):
+        """Locate the OVF descriptor within an .ova, and validate the .ova.
 
         Args:
           file_path (str): OVA file path
 
         Returns:
-          str: Path to extracted OVF descriptor
+          str: Name of the OVF descriptor within the OVA
 
         Raises:
           VMInitError: if the given file doesn't represent a valid OVA archive.
         """
-        logger.verbose("Untarring %s to working directory %s",
-                       file_path, self.working_dir)
+        logger.verbose("Locating OVF descriptor in %s", file_path)
 
         try:
-            tarf = tarfile.open(file_path, 'r')
+            # This index is shared with the FileInTAR references created
+            # later on, so the TAR headers only need to be read once.
+            members = TarIndex.for_path(file_path).members
         except (EOFError, tarfile.TarError) as exc:
             raise VMInitError(1, "Could not untar file: {0}".format(exc.args),
                               file_path)
 
-        try:
-            # The OVF standard says, with regard to OVAs:
-            # ...the files shall be in the following order inside the archive:
-            # 1) OVF descriptor
-            # 2) OVF manifest (optional)
-            # 3) OVF certificate (optional)
-            # 4) The remaining files shall be in the same order as listed
-            #    in the References section...
-            # 5) OVF manifest (optional)
-            # 6) OVF certificate (optional)
-            #
-            # For now we just validate #1.
-            if not tarf.getmembers():
-                raise VMInitError(1, "No files to untar", file_path)
-            # Make sure the provided file doesn't contain any malicious paths
-            # http://stackoverflow.com/questions/8112742/
-            for pathname in tarf.getnames():
-                logger.debug("Examining path of %s prior to untar", pathname)
-                if not (os.path.abspath(os.path.join(self.working_dir,
-                                                     pathname))
-                        .startswith(self.working_dir)):
-                    raise VMInitError(1, "Tar file contains malicious/unsafe "
-                                      "file path '{0}'!".format(pathname),
-                                      file_path)
-
-            ovf_descriptor = tarf.getmembers()[0]
-            if os.path.splitext(ovf_descriptor.name)[1] != '.ovf':
-                # Do we have an OVF descriptor elsewhere in the file?
-                candidates = [mem for mem in tarf.getmembers() if
-                              os.path.splitext(mem.name)[1] == '.ovf']
-                if not candidates:
-                    raise VMInitError(1,
-                                      "TAR file does not seem to contain any"
-                                      " .ovf file to serve as OVF descriptor"
-                                      " - OVA is invalid!",
-                                      file_path)
-                ovf_descriptor = candidates[0]
-                logger.error(
-                    "OVF file %s found, but is not the first file in the TAR "
-                    "as it should be - OVA is not standard-compliant!",
-                    ovf_descriptor.name)
-
-            # TODO: In theory we could read the ovf descriptor XML directly
-            # from the TAR and not need to even extract this file to disk...
-            tarf.extract(ovf_descriptor, path=self.working_dir)
-            logger.debug(
-                "Extracted OVF descriptor from %s to working dir %s",
-                file_path, self.working_dir)
-        finally:
-            tarf.close()
-
-        # Find the OVF file
-        return os.path.join(self.working_dir, ovf_descriptor.name)
+        # The OVF standard says, with regard to OVAs:
+        # ...the files shall be in the following order inside the archive:
+        # 1) OVF descriptor
+        # 2) OVF manifest (optional)
+        # 3) OVF certificate (optional)
+        # 4) The remaining files shall be in the same order as listed
+        #    in the References section...
+        # 5) OVF manifest (optional)
+        # 6) OVF certificate (optional)
+        #
+        # For now we just validate #1.
+        if not members:
+            raise VMInitError(1, "No files to untar", file_path)
+        # Make sure the provided file doesn't contain any malicious paths,
+        # as we may later need to extract files to the working directory.
+        # http://stackoverflow.com/questions/8112742/
+        for member in members:
+            pathname = os.path.normpath(member.name)
+            logger.debug("Examining path of %s", member.name)
+            if (os.path.isabs(pathname) or pathname == os.pardir or
+                    pathname.startswith(os.pardir + os.sep)):
+                raise VMInitError(1, "Tar file contains malicious/unsafe "
+                                  "file path '{0}'!".format(member.name),
+                                  file_path)
+
+        ovf_descriptor = members[0]
+        if os.path.splitext(ovf_descriptor.name)[1] != '.ovf':
+            # Do we have an OVF descriptor elsewhere in the file?
+            candidates = [mem for mem in members if
+                          os.path.splitext(mem.name)[1] == '.ovf']
+            if not candidates:
+                raise VMInitError(1,
+                                  "TAR file does not seem to contain any"
+                                  " .ovf file to serve as OVF descriptor"
+                                  " - OVA is invalid!",
+                                  file_path)
+            ovf_descriptor = candidates[0]
+            logger.error(
+                "OVF file %s found, but is not the first file in the TAR "
+                "as it should be - OVA is not standard-compliant!",
+                ovf_descriptor.name)
+
+        logger.debug("Found OVF descriptor %s in %s",
+                     ovf_descriptor.name, file_path)
+        return ovf_descriptor.name
+
+    def untar(self, file_path):
+        """Untar the OVF descriptor from an .ova to the working directory.
+
+        .. deprecated:: 2.3
+           The OVF descriptor is now read directly from the OVA; use
+           :meth:`find_ova_descriptor` to locate it instead.
+
+        Args:
+          file_path (str): OVA file path
+
+        Returns:
+          str: Path to extracted OVF descriptor
+
+        Raises:
+          VMInitError: if the given file doesn't represent a valid OVA archive.
+        """
+        warnings.warn("Use find_ova_descriptor() instead", DeprecationWarning)
+        name = self.find_ova_descriptor(file_path)
+        FileInTAR(file_path, name).copy_to(self.working_dir)
+        return os.path.join(self.working_dir, name)
+
+    def _manifest_text(self, checksums):
+        """Construct the contents of a manifest file.
+
+        Args:
+          checksums (list): List of ``(file_name, checksum)`` tuples,
+            in the order they should be listed in the manifest.
+
+        Returns:
+          bytes: Manifest file contents.
+        """
+        return "".join("{algo}({file})= {sum}\n"
+                       .format(algo=self.checksum_algorithm.upper(),
+                               file=file_name, sum=checksum)
+                       for (file_name, checksum) in checksums).encode('utf-8')
 
     def generate_manifest(self, ovf_file):
         """Construct the manifest file for this package, if possible.
@@ -2718,21 +2946,14 @@ class OVF(VMDescription, XML):
         manifest = prefix + '.mf'
         with open(ovf_file, 'rb') as ovfobj:
             checksum = file_checksum(ovfobj, self.checksum_algorithm)
+        checksums = [(os.path.basename(ovf_file), checksum)]
+        # Checksum all referenced files as well
+        file_names = [file_obj.get(self.FILE_HREF) for
+                      file_obj in self.references.findall(self.FILE)]
+        checksums.extend(zip(file_names, calculate_checksums(
+            [self.file_references[file_name] for file_name in file_names])))
         with open(manifest, 'wb') as mfobj:
-            mfobj.write("{algo}({file})= {sum}\n"
-                        .format(algo=self.checksum_algorithm.upper(),
-                                file=os.path.basename(ovf_file),
-                                sum=checksum)
-                        .encode('utf-8'))
-            # Checksum all referenced files as well
-            for file_obj in self.references.findall(self.FILE):
-                file_name = file_obj.get(self.FILE_HREF)
-                file_ref = self.file_references[file_name]
-
-                mfobj.write("{algo}({file})= {sum}\n"
-                            .format(algo=self.checksum_algorithm.upper(),
-                                    file=file_name, sum=file_ref.checksum)
-                            .encode('utf-8'))
+            mfobj.write(self._manifest_text(checksums))
 
         logger.debug("Manifest generated successfully")
         return True
@@ -2740,60 +2961,115 @@ class OVF(VMDescription, XML):
     def tar(self, ovf_descriptor, tar_file):
         """Create a .ova tar file based on the given OVF descriptor.
 
+        If the desired OVA is the input OVA, the new OVA is built alongside
+        it and then atomically replaces it, rather than extracting every
+        file from the input OVA to the working directory beforehand.
+
         Args:
           ovf_descriptor (str): File path for an OVF descriptor
           tar_file (str): File path for the desired OVA archive.
         """
         logger.verbose("Creating tar file %s", tar_file)
 
-        (prefix, _) = os.path.splitext(ovf_descriptor)
-
         # Issue #66 - need to detect any of the possible scenarios:
         # 1) output path and input path are the same real path
         #    (not just string-equal!)
         # 2) output file and input file are the same file (including links)
         # but not error out if (common case) output_file doesn't exist yet.
-        if (os.path.realpath(self.input_file) == os.path.realpath(tar_file) or
-            (os.path.exists(tar_file) and
-             os.path.samefile(self.input_file, tar_file))):
-            # We're about to overwrite the input OVA with a new OVA.
-            # (Python tarfile module doesn't support in-place edits.)
-            # Any files that we need to carry over need to be extracted NOW!
-            logger.info(
-                "Input OVA will be overwritten. Extracting files from %s to"
-                " working directory before overwriting it.", self.input_file)
-            for filename in self.file_references:
-                file_ref = self.file_references[filename]
-                if file_ref.file_path is None:
-                    file_ref.copy_to(self.working_dir)
-                    self.file_references[filename] = FileReference.create(
-                        self.working_dir, filename,
-                        checksum_algorithm=self.checksum_algorithm,
-                        expected_checksum=file_ref.checksum,
-                        expected_size=file_ref.size)
+        if not (os.path.realpath(self.input_file) ==
+                os.path.realpath(tar_file) or
+                (os.path.exists(tar_file) and
+                 os.path.samefile(self.input_file, tar_file))):
+            self._write_ova(ovf_descriptor, tar_file)
+            return
+
+        # We're about to overwrite the input OVA with a new OVA.
+        # (Python tarfile module doesn't support in-place edits.)
+        # Files carried over still need to be read from the input OVA while
+        # the new one is written, so write it to a temporary file first.
+        tar_file = os.path.realpath(tar_file)
+        (fd, temp_file) = tempfile.mkstemp(
+            prefix=".{0}.".format(os.path.basename(tar_file)),
+            suffix=".tmp", dir=os.path.dirname(tar_file))
+        os.close(fd)
+        logger.info("Input OVA will be overwritten. Writing updated OVA to"
+                    " %s before replacing %s with it.", temp_file, tar_file)
+        try:
+            self._write_ova(ovf_descriptor, temp_file)
+            shutil.copymode(tar_file, temp_file)
+            # os.replace() is atomic, and unlike os.rename() is happy to
+            # overwrite an existing file on Windows too, but is Python 3 only
+            getattr(os, 'replace', os.rename)(temp_file, tar_file)
+        except Exception:
+            os.remove(temp_file)
+            raise
+
+    def _write_ova(self, ovf_descriptor, tar_file):
+        """Write a .ova tar file based on the given OVF descriptor.
+
+        The manifest for the OVA is generated as part of this process.
+        Each referenced file is checksummed while its data is being copied
+        into the archive, so that each file is only read once. As the OVF
+        standard prefers the manifest to precede the other files in the
+        archive, a placeholder manifest of the correct length is written
+        first and then overwritten in place with the real checksums
+        once they are all known.
+
+        Args:
+          ovf_descriptor (str): File path for an OVF descriptor
+          tar_file (str): File path for the OVA archive to write.
+        """
+        (prefix, _) = os.path.splitext(ovf_descriptor)
+
+        with open(ovf_descriptor, 'rb') as ovfobj:
+            ovf_checksum = file_checksum(ovfobj, self.checksum_algorithm)
+        checksums = [(os.path.basename(ovf_descriptor), ovf_checksum)]
+        file_names = [file_obj.get(self.FILE_HREF) for
+                      file_obj in self.references.findall(self.FILE)]
+        placeholder = "0" * len(ovf_checksum)
+        manifest_text = self._manifest_text(
+            checksums + [(file_name, placeholder) for file_name in file_names])
 
         # Be sure to dereference any links to the actual file content!
-        with tarfile.open(tar_file, 'w', dereference=True) as tarf:
+        with ArchiveWriter.open(tar_file, 'w', dereference=True) as tarf:
             # OVF is always first
             logger.debug("Adding OVF descriptor %s to %s",
                          ovf_descriptor, tar_file)
             tarf.add(ovf_descriptor, os.path.basename(ovf_descriptor))
-            # Add manifest if present
-            manifest_path = prefix + '.mf'
-            if os.path.exists(manifest_path):
-                logger.debug("Adding manifest to %s", tar_file)
-                tarf.add(manifest_path, os.path.basename(manifest_path))
+            # Placeholder manifest, to be filled in once checksums are known
+            logger.debug("Adding manifest to %s", tar_file)
+            mf_info = tarfile.TarInfo(os.path.basename(prefix) + '.mf')
+            mf_info.size = len(manifest_text)
+            mf_info.mtime = time.time()
+            tarf.addfile(mf_info, io.BytesIO(manifest_text))
+            # The manifest data is the last thing written so far
+            manifest_offset = (tarf.offset -
+                               tar_entry_size(mf_info.size) + 512)
             if os.path.exists("{0}.cert".format(prefix)):
                 logger.warning("COT doesn't know how to re-sign a certificate"
                                " file, so the existing certificate will be"
                                " omitted from %s.", tar_file)
             # Add all other files mentioned in the OVF
-            for file_obj in self.references.findall(self.FILE):
-                file_name = file_obj.get(self.FILE_HREF)
+            for file_name in file_names:
                 file_ref = self.file_references[file_name]
                 logger.debug("Adding associated file %s to %s",
                              file_name, tar_file)
-                file_ref.add_to_archive(tarf)
+                checksum = file_ref.add_to_archive(tarf)
+                if checksum is None:
+                    checksum = file_ref.checksum
+                checksums.append((file_name, checksum))
+
+        manifest_text = self._manifest_text(checksums)
+        if len(manifest_text) != mf_info.size:
+            # Overwriting the placeholder would corrupt the rest of the OVA
+            raise RuntimeError("Manifest for {0} is {1} bytes long, but the "
+                               "space reserved for it is {2} bytes"
+                               .format(tar_file, len(manifest_text),
+                                       mf_info.size))
+        logger.debug("Writing manifest checksums into %s", tar_file)
+        with open(tar_file, 'r+b') as tarobj:
+            tarobj.seek(manifest_offset)
+            tarobj.write(manifest_text)
 
     def _ensure_section(self, section_tag, info_string,
                         attrib=None, parent=None):
@@ -2930,6 +3206,30 @@ class OVF(VMDescription, XML):
                 })
         return match
 
+    def _find_file(self, attrib, value):
+        """Find the File in the References with the given attribute value.
+
+        Args:
+          attrib (str): :attr:`FILE_ID` or :attr:`FILE_HREF`
+          value (str): Attribute value to match.
+
+        Returns:
+          xml.etree.ElementTree.Element: File element, or None
+        """
+        return self._file_index.find(self.references, attrib, value)
+
+    def _find_disk(self, attrib, value):
+        """Find the Disk in the DiskSection with the given attribute value.
+
+        Args:
+          attrib (str): :attr:`DISK_ID` or :attr:`DISK_FILE_REF`
+          value (str): Attribute value to match.
+
+        Returns:
+          xml.etree.ElementTree.Element: Disk element, or None
+        """
+        return self._disk_index.find(self.disk_section, attrib, value)
+
     def find_disk_from_file_id(self, file_id):
         """Find the Disk that uses the given file_id for backing.
 
@@ -2942,8 +3242,7 @@ class OVF(VMDescription, XML):
         if file_id is None or self.disk_section is None:
             return None
 
-        return self.find_child(self.disk_section, self.DISK,
-                               attrib={self.DISK_FILE_REF: file_id})
+        return self._find_disk(self.DISK_FILE_REF, file_id)
 
     def find_empty_drive(self, drive_type):
         """Find a disk device that exists but contains no data.
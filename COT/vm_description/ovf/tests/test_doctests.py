@@ -26,6 +26,8 @@ def load_tests(*_):
     For the parameters, see :mod:`unittest`. The parameters are unused here.
     """
     suite = TestSuite()
+    suite.addTests(DocTestSuite('COT.vm_description.ovf.hardware'))
+    suite.addTests(DocTestSuite('COT.vm_description.ovf.index'))
     suite.addTests(DocTestSuite('COT.vm_description.ovf.item'))
     suite.addTests(DocTestSuite('COT.vm_description.ovf.utilities'))
     return suite
@@ -14,6 +14,9 @@
 
 """Unit test cases for COT.vm_description.ovf.OVFHardware class."""
 
+import os
+import shutil
+
 from COT.tests import COTTestCase
 from COT.vm_description.ovf import OVF
 
@@ -54,3 +57,173 @@ class TestOVFHardware(COTTestCase):
         """Test that find_item returns None if no matches are found."""
         with OVF(self.input_ovf, None) as ovf:
             self.assertEqual(None, ovf.hardware.find_item(resource_type='usb'))
+
+    def test_find_item_index(self):
+        """Searches by HostResource and Parent track changes to Items."""
+        with OVF(self.iosv_ovf, None) as ovf:
+            hardware = ovf.hardware
+            flash = hardware.find_item(
+                properties={ovf.HOST_RESOURCE: 'ovf:/disk/flash2'})
+            self.assertEqual(flash.instance_id, '5')
+            self.assertEqual(
+                [item.instance_id for item in hardware.find_all_items(
+                    properties={ovf.PARENT: '3'})],
+                ['4', '5'])
+
+            flash.set_property(ovf.HOST_RESOURCE, 'ovf:/disk/flash3')
+            self.assertEqual(None, hardware.find_item(
+                properties={ovf.HOST_RESOURCE: 'ovf:/disk/flash2'}))
+            self.assertEqual(flash, hardware.find_item(
+                properties={ovf.HOST_RESOURCE: 'ovf:/disk/flash3'}))
+
+            (_, clone) = hardware.clone_item(flash, ['1CPU-384MB-2NIC'])
+            self.assertIs(clone.ovf, ovf)
+            (_, disk) = hardware.new_item('harddisk')
+            disk.set_property(ovf.HOST_RESOURCE, 'ovf:/disk/flash3')
+            disk.set_property(ovf.PARENT, '1')
+            self.assertEqual(disk, hardware.find_item(
+                properties={ovf.PARENT: '1'}))
+            self.assertRaises(LookupError, hardware.find_item,
+                              properties={ovf.HOST_RESOURCE:
+                                          'ovf:/disk/flash3'})
+
+            hardware.delete_item(flash)
+            self.assertEqual(disk, hardware.find_item(
+                properties={ovf.HOST_RESOURCE: 'ovf:/disk/flash3'}))
+            self.assertEqual(
+                [item.instance_id for item in hardware.find_all_items(
+                    properties={ovf.PARENT: '3'})],
+                ['4', clone.instance_id])
+        self.assertLogged(levelname='INFO', msg="Created new %s under")
+
+    def test_find_all_items_cache(self):
+        """Cached ordering and profile membership track changes to Items."""
+        with OVF(self.iosv_ovf, None) as ovf:
+            hardware = ovf.hardware
+            nics = hardware.find_all_items('ethernet')
+            self.assertEqual([nic.instance_id for nic in nics],
+                             [str(i) for i in range(11, 27)])
+            self.assertEqual(
+                hardware.get_item_count_per_profile('ethernet', None),
+                {'1CPU-384MB-2NIC': 2, '1CPU-1GB-8NIC': 8,
+                 '1CPU-3GB-10NIC': 10, '1CPU-3GB-16NIC': 16, None: 2})
+
+            nics[2].add_profile('1CPU-384MB-2NIC')
+            nics[15].remove_profile('1CPU-3GB-16NIC')
+            self.assertEqual(
+                hardware.get_item_count_per_profile('ethernet', None),
+                {'1CPU-384MB-2NIC': 3, '1CPU-1GB-8NIC': 8,
+                 '1CPU-3GB-10NIC': 10, '1CPU-3GB-16NIC': 15, None: 2})
+
+            hardware.delete_item(nics[1])
+            (instance, _) = hardware.new_item('ethernet', ['1CPU-1GB-8NIC'])
+            self.assertEqual(instance, '6')
+            self.assertEqual(
+                [nic.instance_id for nic in hardware.find_all_items(
+                    'ethernet', profile_list=['1CPU-1GB-8NIC'])],
+                ['6', '11'] + [str(i) for i in range(13, 19)])
+            self.assertEqual(
+                hardware.get_item_count('ethernet', '1CPU-384MB-2NIC'), 2)
+
+            ovf.create_configuration_profile('new', 'label', 'description')
+            self.assertEqual(
+                hardware.get_item_count('ethernet', 'new'), 1)
+        self.assertLogged(levelname='INFO', msg="Created new %s under")
+
+    def test_find_unused_instance_id(self):
+        """Unused InstanceIDs are found quickly even with many Items."""
+        with OVF(self.iosv_ovf, None) as ovf:
+            hardware = ovf.hardware
+            self.assertEqual(hardware.find_unused_instance_id(), '6')
+            self.assertEqual(hardware.find_unused_instance_id(start=11), '27')
+
+            hardware.set_item_count_per_profile('ethernet', 4096,
+                                                ['1CPU-3GB-16NIC'])
+            nics = hardware.find_all_items('ethernet')
+            self.assertEqual(len(nics), 4096)
+            self.assertEqual([nic.instance_id for nic in nics],
+                             [str(i) for i in range(11, 4107)])
+            self.assertEqual(hardware.find_unused_instance_id(start=11),
+                             '4107')
+
+            hardware.delete_item(nics[1000])
+            hardware.delete_item(nics[1001])
+            self.assertEqual(hardware.find_unused_instance_id(start=11),
+                             '1011')
+            (instance, _) = hardware.new_item('ethernet', ['1CPU-1GB-8NIC'])
+            self.assertEqual(instance, '6')
+            (instance, _) = hardware.clone_item(nics[0], ['1CPU-3GB-16NIC'])
+            self.assertEqual(instance, '1011')
+            self.assertEqual(hardware.find_unused_instance_id(start=11),
+                             '1012')
+            self.assertEqual(hardware.find_unused_instance_id(start=1013),
+                             '4107')
+        self.assertLogged(levelname='INFO', msg="Created new %s under")
+
+    def test_update_xml_incremental(self):
+        """Only the XML Items of changed devices are regenerated."""
+        with OVF(self.iosv_ovf, None) as ovf:
+            hardware = ovf.hardware
+            section = ovf.virtual_hw_section
+
+            def instances():
+                """Get the InstanceID of each Item under the section."""
+                return [item.findtext(ovf.RASD + ovf.INSTANCE_ID)
+                        for item in section.findall(ovf.ITEM)]
+
+            hardware.update_xml()
+            before = list(section)
+            nics = hardware.find_all_items('ethernet')
+            nics[1].set_property(ovf.ADDRESS, '00:00:00:00:00:01')
+            hardware.update_xml()
+            after = list(section)
+            self.assertEqual(len(before), len(after))
+            for (old, new) in zip(before, after):
+                if old.findtext(ovf.RASD + ovf.INSTANCE_ID) == '12':
+                    self.assertIsNot(old, new)
+                    self.assertEqual(new.findtext(ovf.RASD + ovf.INSTANCE_ID),
+                                     '12')
+                    self.assertEqual(new.findtext(ovf.RASD + ovf.ADDRESS),
+                                     '00:00:00:00:00:01')
+                else:
+                    self.assertIs(old, new)
+
+            expected = instances()
+            hardware.delete_item(nics[0])
+            hardware.new_item('ethernet', ['1CPU-1GB-8NIC'])
+            hardware.clone_item(nics[15], ['1CPU-3GB-16NIC'])
+            hardware.update_xml()
+            expected.remove('11')
+            expected.insert(expected.index('9'), '6')
+            expected.append('27')
+            self.assertEqual(instances(), expected)
+            self.assertEqual(len(list(section)), len(after) + 1)
+        self.assertLogged(levelname='INFO', msg="Created new %s under")
+
+    def test_write_preserves_unchanged_items(self):
+        """Unchanged Items are written out exactly as they were read."""
+        with open(self.input_ovf) as file_obj:
+            text = file_obj.read()
+        # A CPU Item with some unusual formatting
+        start = text.index("      <ovf:Item>")
+        end = text.index("</ovf:Item>", start) + len("</ovf:Item>\n")
+        item_text = text[start:end].replace("\n        <rasd:Description>",
+                                            "\n\n\t<rasd:Description>")
+        text = text[:start] + item_text + text[end:]
+        for name in ['input.vmdk', 'input.iso', 'sample_cfg.txt']:
+            shutil.copy(os.path.join(os.path.dirname(self.input_ovf), name),
+                        self.temp_dir)
+        input_ovf = os.path.join(self.temp_dir, 'input.ovf')
+        with open(input_ovf, 'w') as file_obj:
+            file_obj.write(text)
+
+        with OVF(input_ovf, self.temp_file) as ovf:
+            nics = ovf.hardware.find_all_items('ethernet')
+            nics[0].set_property(ovf.ADDRESS, '00:00:00:00:00:01')
+        with open(self.temp_file) as file_obj:
+            output = file_obj.read()
+        self.assertIn(item_text, output)
+        # The changed Item is regenerated and reindented as usual
+        self.assertIn("      <ovf:Item>\n        <rasd:Address>"
+                      "00:00:00:00:00:01</rasd:Address>\n"
+                      "        <rasd:AddressOnParent>", output)
@@ -16,6 +16,7 @@
 
 """Unit test cases for COT.vm_description.ovf.OVFItem class."""
 
+import copy
 import tempfile
 import shutil
 import xml.etree.ElementTree as ET   # noqa: N814
@@ -141,6 +142,41 @@ OVFItem:
          <rasd:AddressOnParent>11</rasd:AddressOnParent>
 """)
 
+    def test_profile_sets(self):
+        """Profile sets are shared bitmasks; items can be copied cheaply."""
+        with OVF(self.iosv_ovf, self.temp_file) as ovf:
+            # InstanceID 2, memory, with different values per profile
+            item = ovf.hardware.item_dict['2']
+            self.assertIs(item.profile_bits, ovf.profile_bits)
+            self.assertFalse(hasattr(item, '__dict__'))
+            self.assertEqual(item.property_profiles(ovf.VIRTUAL_QUANTITY,
+                                                    '3'),
+                             set(['1CPU-3GB-10NIC', '1CPU-3GB-16NIC']))
+            self.assertEqual(item.get(ovf.VIRTUAL_QUANTITY),
+                             {'384': set([None]),
+                              '1': set(['1CPU-1GB-8NIC']),
+                              '3': set(['1CPU-3GB-10NIC',
+                                        '1CPU-3GB-16NIC'])})
+            self.assertEqual(item.get_nonintersecting_set_list(),
+                             ['', '1CPU-1GB-8NIC',
+                              '1CPU-3GB-10NIC 1CPU-3GB-16NIC'])
+
+            new_item = copy.deepcopy(item)
+            self.assertIs(new_item.ovf, ovf)
+            self.assertIs(new_item.profile_bits, ovf.profile_bits)
+            new_item.set_property(ovf.VIRTUAL_QUANTITY, '4',
+                                  ['1CPU-3GB-16NIC'])
+            self.assertEqual(new_item.get_value(ovf.VIRTUAL_QUANTITY,
+                                                ['1CPU-3GB-16NIC']), '4')
+            self.assertEqual(new_item.get_value(ovf.ELEMENT_NAME,
+                                                ['1CPU-3GB-16NIC']),
+                             "4 GB of memory")
+            # Original item is unchanged
+            self.assertEqual(item.get_value(ovf.VIRTUAL_QUANTITY,
+                                            ['1CPU-3GB-16NIC']), '3')
+            self.assertEqual(item.get_value(ovf.VIRTUAL_QUANTITY,
+                                            ['1CPU-384MB-2NIC']), '384')
+
     def test_set_property(self):
         """Test cases for set_property() and related methods."""
         ovf = OVF(self.input_ovf, self.temp_file)
@@ -29,7 +29,7 @@ import mock
 from COT.tests import COTTestCase
 from COT.vm_description.ovf import OVF
 from COT.vm_description import VMInitError
-from COT.data_validation import ValueUnsupportedError
+from COT.data_validation import ValueUnsupportedError, file_checksum
 from COT.helpers import helpers, HelperError
 
 logger = logging.getLogger(__name__)
@@ -319,6 +319,147 @@ ovf:size="{cfg_size}" />
                     "{0} file changed after OVF->OVA->OVF conversion"
                     .format(ext))
 
+    def test_tar_manifest(self):
+        """Check the manifest generated while writing an OVA."""
+        output_ova = os.path.join(self.temp_dir, "temp.ova")
+        with OVF(self.minimal_ovf, output_ova) as ovf:
+            ovf.add_file(self.sample_cfg, "config")
+
+        with tarfile.open(output_ova, 'r') as tarf:
+            # Descriptor first, then manifest, then other files
+            self.assertEqual(tarf.getnames(),
+                             ['temp.ovf', 'temp.mf', 'sample_cfg.txt'])
+            manifest = tarf.extractfile('temp.mf').read().decode()
+            self.assertEqual(
+                manifest,
+                "SHA256(temp.ovf)= {0}\nSHA256(sample_cfg.txt)= {1}\n"
+                .format(file_checksum(tarf.extractfile('temp.ovf'),
+                                      'sha256'),
+                        file_checksum(self.sample_cfg, 'sha256')))
+
+    def test_tar_manifest_size_changed(self):
+        """Never overwrite more than the space reserved for the manifest."""
+        output_ova = os.path.join(self.temp_dir, "temp.ova")
+        with OVF(self.minimal_ovf, None) as ovf:
+            ovf.output_file = output_ova
+            with mock.patch.object(OVF, '_manifest_text',
+                                   side_effect=[b"x" * 10, b"x" * 11]):
+                self.assertRaisesRegex(RuntimeError, "space reserved",
+                                       ovf.write)
+
+    def test_ova_descriptor_not_extracted(self):
+        """Reading an OVA parses its descriptor without any scratch space."""
+        output_ova = os.path.join(self.temp_dir, "temp.ova")
+        with OVF(self.minimal_ovf, output_ova) as ovf:
+            ovf.add_file(self.sample_cfg, "config")
+
+        with mock.patch("tempfile.mkdtemp") as mkdtemp:
+            with OVF(output_ova, None) as ova:
+                self.assertEqual(ova.ovf_descriptor,
+                                 os.path.join(output_ova, "temp.ovf"))
+                self.assertEqual(list(ova.file_references.keys()),
+                                 ["sample_cfg.txt"])
+            mkdtemp.assert_not_called()
+
+    def test_ova_descriptor_dot_slash(self):
+        """Verify the descriptor of an OVA whose members begin with './'."""
+        ova_path = os.path.join(self.temp_dir, "dotslash.ova")
+        mf_path = os.path.join(self.temp_dir, "minimal.mf")
+        with open(mf_path, 'w') as mf_obj:
+            mf_obj.write("SHA256(minimal.ovf)= {0}\n".format("0" * 64))
+        with tarfile.open(ova_path, 'w') as tarf:
+            tarf.add(self.minimal_ovf, "./minimal.ovf")
+            tarf.add(mf_path, "./minimal.mf")
+
+        with OVF(ova_path, None) as ova:
+            self.assertLogged(
+                levelname='ERROR',
+                msg="The %s checksum for file '%s' is expected to be",
+                args=('sha256', '.*minimal.ovf', "0" * 64, '.*'))
+            self.assertFalse(ova.verify_files())
+
+    def test_deprecated_untar(self):
+        """The untar method is deprecated by find_ova_descriptor."""
+        output_ova = os.path.join(self.temp_dir, "temp.ova")
+        with OVF(self.minimal_ovf, output_ova):
+            pass
+
+        with OVF(output_ova, None) as ova:
+            self.assertEqual(ova.find_ova_descriptor(output_ova), "temp.ovf")
+            path = ova.untar(output_ova)
+            self.assertEqual(path, os.path.join(ova.working_dir, "temp.ovf"))
+            with open(path, 'rb') as file_obj:
+                with ova._open_ovf_descriptor() as descriptor:
+                    self.assertEqual(file_obj.read(), descriptor.read())
+
+    def test_tar_in_place(self):
+        """Rewrite an OVA in place without extracting its files."""
+        output_ova = os.path.join(self.temp_dir, "temp.ova")
+        with OVF(self.minimal_ovf, output_ova) as ovf:
+            ovf.add_file(self.sample_cfg, "config")
+        os.chmod(output_ova, 0o640)
+
+        with mock.patch("COT.file_reference.FileInTAR.copy_to") as copy_to:
+            with OVF(output_ova, output_ova) as ova:
+                ova.version_short = "1.0"
+            copy_to.assert_not_called()
+
+        self.assertEqual(os.listdir(self.temp_dir), ["temp.ova"])
+        self.assertEqual(os.stat(output_ova).st_mode & 0o777, 0o640)
+        with OVF(output_ova, None) as ova:
+            self.assertEqual(ova.version_short, "1.0")
+            self.assertEqual(ova.file_references["sample_cfg.txt"].checksum,
+                             file_checksum(self.sample_cfg, 'sha256'))
+        self.assertNoLogsOver(logging.INFO)
+
+    def test_verify_policy(self):
+        """Check when files are verified under each verify_policy."""
+        names = ['input.ovf', 'input.vmdk', 'input.iso', 'sample_cfg.txt']
+        with open(os.path.join(self.temp_dir, 'input.mf'), 'w') as mf_obj:
+            for name in names:
+                path = os.path.join(os.path.dirname(self.input_ovf), name)
+                shutil.copy(path, self.temp_dir)
+                mf_obj.write("SHA256({0})= {1}\n".format(
+                    name, file_checksum(path, 'sha256')))
+        # Tamper with a file without changing its size
+        with open(os.path.join(self.temp_dir, 'sample_cfg.txt'), 'r+b') as f:
+            f.write(b'?')
+        input_ovf = os.path.join(self.temp_dir, 'input.ovf')
+        tampered = {
+            'levelname': 'ERROR',
+            'msg': "The %s checksum for file '%s' is expected to be",
+            'args': ('sha256', 'sample_cfg.txt', '.*', '.*'),
+        }
+
+        with OVF(input_ovf, None, verify_policy='strict') as ovf:
+            self.assertLogged(**tampered)
+            self.assertFalse(ovf.verify_files())
+
+        for policy in ('lazy', 'off'):
+            with OVF(input_ovf, None, verify_policy=policy) as ovf:
+                self.assertNoLogsOver(logging.WARNING)
+                self.assertFalse(ovf.verify_files())
+                self.assertLogged(**tampered)
+
+        copy_dir = os.path.join(self.temp_dir, 'copy')
+        os.mkdir(copy_dir)
+        with OVF(input_ovf, None, verify_policy='lazy') as ovf:
+            ovf.file_references['sample_cfg.txt'].copy_to(copy_dir)
+            self.assertLogged(**tampered)
+
+        ovf = OVF(input_ovf, None, verify_policy='deferred')
+        ovf.destroy()
+        self.assertLogged(**tampered)
+
+    def test_deferred_verify_snapshot(self):
+        """Deferred verification works from a snapshot of the references."""
+        with mock.patch.object(OVF, 'verify_files') as mock_verify:
+            with OVF(self.input_ovf, None, verify_policy='deferred') as ovf:
+                ovf._verify_thread.join()
+                (file_refs,) = mock_verify.call_args[0]
+                self.assertEqual(file_refs[1:],
+                                 list(ovf.file_references.values()))
+
     def test_tar_links(self):
         """Check that OVA dereferences symlinks and hard links."""
         self.staging_dir = tempfile.mkdtemp(prefix="cot_ut_ovfio_stage")
@@ -452,6 +593,16 @@ ovf:size="{cfg_size}" />
                 tarf.addfile(tari, fileobj)
         self.assertRaises(VMInitError, OVF, fake_file, None)
 
+        # .ova with unsafe relative path references
+        with tarfile.open(fake_file, 'w') as tarf:
+            tari = tarf.gettarinfo(self.minimal_ovf)
+            tari.name = os.path.join("..", os.path.basename(self.minimal_ovf))
+            with open(self.minimal_ovf, 'rb') as fileobj:
+                tarf.addfile(tari, fileobj)
+        with self.assertRaises(VMInitError) as catcher:
+            OVF(fake_file, None)
+        self.assertRegex(catcher.exception.strerror, "malicious")
+
     def test_invalid_ovf_contents(self):
         """Check for rejection of OVF files with valid XML but invalid data."""
         # Multiple Items under same profile with same InstanceID
@@ -538,3 +689,33 @@ class TestOVFAPI(COTTestCase):
         with OVF(self.input_ovf, None) as ovf:
             self.assertRaises(ValueUnsupportedError,
                               ovf.find_empty_drive, 'floppy')
+
+    def test_search_after_changes(self):
+        """Searches for files and disks track added and removed files."""
+        with OVF(self.iosv_ovf, None) as ovf:
+            found = ovf.search_from_filename('input.vmdk')
+            (file_obj, disk, ctrl_item, disk_item) = found
+            self.assertEqual(ovf.get_id_from_file(file_obj),
+                             'vios-adventerprisek9-m.vmdk')
+            self.assertEqual(ovf.get_id_from_disk(disk),
+                             'vios-adventerprisek9-m.vmdk')
+            self.assertEqual(ctrl_item.instance_id, '3')
+            self.assertEqual(disk_item.instance_id, '4')
+            self.assertEqual(
+                ovf.search_from_file_id('vios-adventerprisek9-m.vmdk'), found)
+            self.assertEqual(ovf.search_from_controller('ide', '0:0'), found)
+
+            new_file = ovf.add_file(self.blank_vmdk, 'blank',
+                                    file_obj=file_obj)
+            self.assertEqual(ovf.search_from_filename('input.vmdk'),
+                             (None, None, None, None))
+            self.assertEqual(ovf.search_from_filename('blank.vmdk'),
+                             (new_file, None, None, None))
+
+            ovf.remove_file(new_file, disk=disk, disk_drive=disk_item)
+            self.assertEqual(ovf.search_from_file_id('blank'),
+                             (None, None, None, None))
+            self.assertIsNone(
+                ovf.find_disk_from_file_id('vios-adventerprisek9-m.vmdk'))
+            self.assertEqual(ovf.search_from_controller('ide', '0:0'),
+                             (None, None, ctrl_item, None))
@@ -42,8 +42,8 @@ class TestVMDescription(unittest.TestCase):
     def test_context_manager(self, write, rmtree, *_):
         """Verify context manager logic."""
         # Successful exit - write() is called and working_dir is cleaned up
-        with VMDescription("foo.txt", None):
-            pass
+        with VMDescription("foo.txt", None) as ins:
+            self.assertEqual(ins.working_dir, "/foo/bar")
         write.assert_called_once()
         rmtree.assert_called_once_with("/foo/bar")
 
@@ -52,11 +52,21 @@ class TestVMDescription(unittest.TestCase):
 
         # Error exit - cleanup still happens but write() is not called
         with self.assertRaises(RuntimeError):
-            with VMDescription("foo.txt", None):
+            with VMDescription("foo.txt", None) as ins:
+                self.assertEqual(ins.working_dir, "/foo/bar")
                 raise RuntimeError("Gotcha!")
         write.assert_not_called()
         rmtree.assert_called_once_with("/foo/bar")
 
+    @mock.patch("tempfile.mkdtemp")
+    @mock.patch("shutil.rmtree")
+    def test_working_dir_lazy(self, rmtree, mkdtemp):
+        """The working directory is only created if it is actually used."""
+        with VMDescription("foo.txt", None) as ins:
+            ins.output_file = None
+        mkdtemp.assert_not_called()
+        rmtree.assert_not_called()
+
     def test_generic_class_apis(self):
         """Verify class APIs with generic implementations."""
         self.assertRaises(ValueUnsupportedError,
@@ -72,8 +82,9 @@ class TestVMDescription(unittest.TestCase):
 
         self.assertRaises(NotImplementedError, ins.predicted_output_size)
 
+        working_dir = ins.working_dir
         ins.destroy()
-        self.assertFalse(os.path.exists(ins.working_dir))
+        self.assertFalse(os.path.exists(working_dir))
 
     def test_abstract_info_apis(self):
         """Get NotImplementedError from abstract info APIs."""
@@ -86,8 +97,9 @@ class TestVMDescription(unittest.TestCase):
         self.assertRaises(NotImplementedError,
                           ins.profile_info_string)
 
+        working_dir = ins.working_dir
         ins.destroy()
-        self.assertFalse(os.path.exists(ins.working_dir))
+        self.assertFalse(os.path.exists(working_dir))
 
     def test_abstract_disk_file_apis(self):
         """Get NotImplementedError from abstract disk and file APIs."""
@@ -132,8 +144,9 @@ class TestVMDescription(unittest.TestCase):
         self.assertRaises(NotImplementedError,
                           ins.find_empty_drive, None)
 
+        working_dir = ins.working_dir
         ins.destroy()
-        self.assertFalse(os.path.exists(ins.working_dir))
+        self.assertFalse(os.path.exists(working_dir))
 
     def test_abstract_hardware_apis(self):
         """Get NotImplementedError from abstract hardware APIs."""
@@ -193,8 +206,9 @@ class TestVMDescription(unittest.TestCase):
         self.assertRaises(NotImplementedError,
                           ins.find_device_location, None)
 
+        working_dir = ins.working_dir
         ins.destroy()
-        self.assertFalse(os.path.exists(ins.working_dir))
+        self.assertFalse(os.path.exists(working_dir))
 
     def test_abstract_product_apis(self):
         """Get NotImplementedError from abstract product APIs."""
@@ -209,8 +223,9 @@ class TestVMDescription(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             ins.version_long = "hello world!"
 
+        working_dir = ins.working_dir
         ins.destroy()
-        self.assertFalse(os.path.exists(ins.working_dir))
+        self.assertFalse(os.path.exists(working_dir))
 
     def test_abstract_property_apis(self):
         """Get NotImplementedError from abstract property APIs."""
@@ -229,8 +244,9 @@ class TestVMDescription(unittest.TestCase):
         self.assertRaises(NotImplementedError,
                           ins.config_file_to_properties, self.TEXT_FILE)
 
+        working_dir = ins.working_dir
         ins.destroy()
-        self.assertFalse(os.path.exists(ins.working_dir))
+        self.assertFalse(os.path.exists(working_dir))
 
     def test_generic_instance_apis(self):
         """Verify APIs with generic implementations."""
@@ -248,5 +264,6 @@ class TestVMDescription(unittest.TestCase):
         out = ins.convert_disk_if_needed(self.TEXT_FILE, None)
         self.assertEqual(out, self.TEXT_FILE)
 
+        working_dir = ins.working_dir
         ins.destroy()
-        self.assertFalse(os.path.exists(ins.working_dir))
+        self.assertFalse(os.path.exists(working_dir))
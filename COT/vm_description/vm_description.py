@@ -47,7 +47,7 @@ class VMDescription(object):
     """Abstract class for reading, editing, and writing VM definitions.
 
     Examples:
-      Because instantiating this class creates a temporary directory
+      Because this class may create a temporary directory
       (:attr:`working_dir`), it's important to always clean up.
       This can be done explicitly::
 
@@ -169,7 +169,7 @@ class VMDescription(object):
 
         return vm
 
-    def __init__(self, input_file, output_file=None):
+    def __init__(self, input_file, output_file=None, verify_policy='strict'):
         """Read the given VM description file into memory.
 
         Also creates a temporary directory as a working directory.
@@ -182,12 +182,14 @@ class VMDescription(object):
                 this value should be ``None``
               * If the output filename is not yet known, use ``""`` and
                 subsequently set :attr:`output` when it is determined.
+          verify_policy (str): When to verify the integrity of files
+              referenced by this VM - one of
+              :data:`COT.file_reference.VERIFY_POLICIES`.
         """
         self._input_file = input_file
+        self.verify_policy = verify_policy
         self._product_class = None
-        logger.verbose("Creating temporary working directory for this VM")
-        self._working_dir = tempfile.mkdtemp(prefix="cot")
-        logger.debug("Working directory: %s", self.working_dir)
+        self._working_dir = None
         self._output_file = None
         self.output_file = output_file
         atexit.register(self.destroy)
@@ -213,19 +215,18 @@ class VMDescription(object):
 
         Deletes :attr:`self.working_dir` and its contents.
         """
-        try:
-            if hasattr(self,
-                       'working_dir') and os.path.exists(self.working_dir):
-                logger.verbose("Removing working directory")
-                total_size = directory_size(self.working_dir)
-                logger.debug("Size of working directory '%s', prior to"
-                             " removal, is %s",
-                             self.working_dir,
-                             pretty_bytes(total_size))
-                # Clean up
-                shutil.rmtree(self.working_dir)
-        except AttributeError:
-            pass
+        # Don't use the working_dir property here, as that would create
+        # the directory if it was never needed.
+        working_dir = getattr(self, '_working_dir', None)
+        if working_dir and os.path.exists(working_dir):
+            logger.verbose("Removing working directory")
+            total_size = directory_size(working_dir)
+            logger.debug("Size of working directory '%s', prior to"
+                         " removal, is %s",
+                         working_dir,
+                         pretty_bytes(total_size))
+            # Clean up
+            shutil.rmtree(working_dir)
 
     @property
     def input_file(self):
@@ -245,8 +246,14 @@ class VMDescription(object):
     def working_dir(self):
         """Get a temporary directory this instance can use for storage.
 
+        The directory is only created when first requested, so that
+        operations that don't need any scratch space don't pay for it.
         Will be automatically erased when :meth:`destroy` is called.
         """
+        if self._working_dir is None:
+            logger.verbose("Creating temporary working directory for this VM")
+            self._working_dir = tempfile.mkdtemp(prefix="cot")
+            logger.debug("Working directory: %s", self._working_dir)
         return self._working_dir
 
     def write(self):
@@ -254,6 +261,14 @@ class VMDescription(object):
         if self.output_file:
             raise NotImplementedError("write not implemented")
 
+    def verify_files(self):
+        """Verify the integrity of all files referenced by this VM.
+
+        Returns:
+          bool: True if all files were successfully verified, else False.
+        """
+        raise NotImplementedError("verify_files not implemented")
+
     @property
     def product_class(self):
         """Get/set the product class identifier, such as com.cisco.csr1000v."""
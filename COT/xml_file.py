@@ -78,16 +78,18 @@ class XML(object):
         self.root = self.tree.getroot()
         """Root :class:`xml.etree.ElementTree.Element` instance of the tree."""
 
-    def write_xml(self, xml_file):
+    def write_xml(self, xml_file, preserve=()):
         """Write pretty XML out to the given file.
 
         Args:
           xml_file (str): Filename to write to
+          preserve (set): Elements whose formatting should be left as it
+            is, as for :meth:`xml_reindent`.
         """
         logger.verbose("Writing XML to %s", xml_file)
 
         # Pretty-print the XML for readability
-        self.xml_reindent(self.root, 0)
+        self.xml_reindent(self.root, 0, preserve)
 
         # We could make cleaner XML by passing "default_namespace=NSM['ovf']",
         # which will leave off the "ovf:" prefix on elements and attributes in
@@ -102,19 +104,25 @@ class XML(object):
         self.tree.write(xml_file, xml_declaration=True, encoding='utf-8')
 
     @staticmethod
-    def xml_reindent(parent, depth=0):
+    def xml_reindent(parent, depth=0, preserve=()):
         """Recursively add indentation to XML to make it look nice.
 
         Args:
           parent (xml.etree.ElementTree.Element): Current parent element
           depth (int): How far down the rabbit hole we have recursed.
               Increments by 2 for each successive level of nesting.
+          preserve (set): Elements whose formatting should be left as it
+              is. Their contents are not reindented, and their tails are
+              only changed if needed to indent whatever follows them.
         """
         depth += 2
         last = None
         for elem in list(parent):
-            elem.tail = "\n" + (" " * depth)
-            XML.xml_reindent(elem, depth)
+            if elem in preserve:
+                XML._reindent_tail(elem, depth)
+            else:
+                elem.tail = "\n" + (" " * depth)
+                XML.xml_reindent(elem, depth, preserve)
             last = elem
 
         if last is not None:
@@ -122,12 +130,29 @@ class XML(object):
             parent.text = "\n" + (" " * depth)
             # Last element indents back to parent
             depth -= 2
-            last.tail = "\n" + (" " * depth)
+            if last in preserve:
+                XML._reindent_tail(last, depth)
+            else:
+                last.tail = "\n" + (" " * depth)
 
         if depth == 0:
             # Add newline at end of file
             parent.tail = "\n"
 
+    @staticmethod
+    def _reindent_tail(elem, depth):
+        """Indent whatever follows the given element, if not already done.
+
+        Helper for :meth:`xml_reindent`.
+
+        Args:
+          elem (xml.etree.ElementTree.Element): Element to check.
+          depth (int): Indentation needed after the element.
+        """
+        tail = elem.tail or ""
+        if tail.strip() or tail.rpartition("\n")[1:] != ("\n", " " * depth):
+            elem.tail = "\n" + (" " * depth)
+
     @classmethod
     def find_child(cls, parent, tag, attrib=None, required=False):
         """Find the unique child element under the specified parent element.